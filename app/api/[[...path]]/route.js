@@ -1,10 +1,17 @@
 import { v4 as uuidv4 } from 'uuid'
 import { NextResponse } from 'next/server'
-import { connectToMongo } from '@/lib/db'
+import { connectToMongo, connectToAnalyticsDb, getPoolStats } from '@/lib/db'
 import { hashPassword, verifyPassword, generateToken, verifyToken, extractTokenFromHeader } from '@/lib/auth'
-import { encrypt, decrypt, maskSecret } from '@/lib/encryption'
+import { encrypt, maskSecret } from '@/lib/encryption'
 import { isAdminEmail, isSuperAdmin, getAdminRole, hasPermission, isAnyAdmin, ADMIN_ROLES } from '@/lib/admin'
-import { logAuditEvent, getAuditLogs, AUDIT_ACTIONS } from '@/lib/audit'
+import { logAuditEvent, getAuditLogs, archiveAuditLogs, AUDIT_ACTIONS } from '@/lib/audit'
+import { getIntegrationSecret, getIntegrationSecrets, getElevenLabsVoices, invalidateIntegrationSecrets } from '@/lib/integrations'
+import { prewarmAgentAudio, getLiveCalls, getLiveCall, endLiveCall, invalidateProviderConnections, startCallAnalyticsBackfill, profileVoiceEngineMemory } from '@/lib/voiceEngine'
+import { enqueueWorkspaceDeletion, startDeletionWorker, getDeletionJob, listDeletionJobs, retryDeletionJob } from '@/lib/deletion'
+import { trackCreated, trackDeleted, getWorkspaceStats, getGlobalStats, getStatsSeries, startSeriesBackfill, GLOBAL_SCOPE } from '@/lib/stats'
+import { getCallAnalytics } from '@/lib/analytics'
+import { recordError, getErrorGroups, resolveErrorGroup, deleteErrorGroup } from '@/lib/errors'
+import { ensureIndexes, getIndexReport } from '@/lib/indexes'
 
 // Helper function to handle CORS
 function handleCORS(response) {
@@ -23,6 +30,36 @@ function errorResponse(message, status = 400) {
   return handleCORS(NextResponse.json({ error: message }, { status }))
 }
 
+// Agent `vadSettings` ranges; backend/vad.py ignores values outside the same ranges
+const AGENT_VAD_RANGES = {
+  startDb: [3, 40],
+  endDb: [1, 30],
+  startFrames: [1, 10, true],
+  endFrames: [3, 100, true],
+  minSpeechDbfs: [-80, -10],
+  bargeInGraceMs: [0, 2000, true]
+}
+
+// Error message for invalid `vadSettings`, or null when they are valid (or absent)
+function validateVadSettings(settings) {
+  if (settings === undefined || settings === null) return null
+  if (typeof settings !== 'object' || Array.isArray(settings)) return 'vadSettings must be an object'
+  for (const [key, value] of Object.entries(settings)) {
+    const range = AGENT_VAD_RANGES[key]
+    if (!range) return `Unknown vadSettings field: ${key}`
+    if (value === null) continue
+    const [min, max, integer] = range
+    if (typeof value !== 'number' || !Number.isFinite(value) || (integer && !Number.isInteger(value)) ||
+        value < min || value > max) {
+      return `vadSettings.${key} must be ${integer ? 'an integer' : 'a number'} from ${min} to ${max}`
+    }
+  }
+  if (settings.startDb != null && settings.endDb != null && settings.endDb > settings.startDb) {
+    return 'vadSettings.endDb cannot be above startDb'
+  }
+  return null
+}
+
 // Auth middleware
 async function authenticateRequest(request, db) {
   const authHeader = request.headers.get('authorization')
@@ -72,9 +109,13 @@ async function handleRoute(request, { params }) {
   const { path = [] } = params
   const route = `/${path.join('/')}`
   const method = request.method
+  let db = null
+  let user = null
 
   try {
-    const db = await connectToMongo()
+    db = await connectToMongo()
+    startDeletionWorker(db)
+    startSeriesBackfill(db)
 
     // ====== PUBLIC ROUTES ======
     
@@ -121,6 +162,8 @@ async function handleRoute(request, { params }) {
         updatedAt: new Date()
       }
       await db.collection('users').insertOne(user)
+      await trackCreated(db, 'workspaces', workspace)
+      await trackCreated(db, 'users', user)
 
       const token = generateToken({ userId, workspaceId, email: user.email })
 
@@ -329,6 +372,8 @@ async function handleRoute(request, { params }) {
             updatedAt: new Date()
           }
           await db.collection('users').insertOne(user)
+          await trackCreated(db, 'workspaces', workspace)
+          await trackCreated(db, 'users', user)
         }
 
         // Generate JWT token
@@ -346,113 +391,13 @@ async function handleRoute(request, { params }) {
       }
     }
 
-    // Get voices list (public)
-if (route === '/voices' && method === 'GET') {
-  // NOTE: UI calls /api/voices but route here is "/voices" inside the catch-all
-  if (!user) return errorResponse('Unauthorized', 401)
-
-  const integrations = await db.collection('integrations').findOne({ workspaceId: user.workspaceId })
-
-  const configured = !!integrations?.elevenlabs?.configured
-  const hasApiKey = !!integrations?.elevenlabs?.apiKey
-
-  // If not configured, return fallback so UI still shows something
-  if (!configured || !hasApiKey) {
-    return jsonResponse({
-      source: 'fallback_not_configured',
-      debug: { configured, hasApiKey },
-      voices: ELEVENLABS_VOICES
-    })
-  }
-
-  let decryptedKey = null
-  try {
-    decryptedKey = decrypt(integrations.elevenlabs.apiKey)
-  } catch (e) {
-    return jsonResponse({
-      source: 'fallback_decrypt_failed',
-      debug: { configured, hasApiKey, decryptError: String(e?.message || e) },
-      voices: ELEVENLABS_VOICES
-    })
-  }
-
-  try {
-    const response = await fetch('https://api.elevenlabs.io/v1/voices', {
-      headers: {
-        'xi-api-key': decryptedKey,
-        'accept': 'application/json'
-      },
-      cache: 'no-store'
-    })
-
-    const text = await response.text()
-    if (!response.ok) {
-      return jsonResponse({
-        source: 'fallback_elevenlabs_http_error',
-        debug: {
-          configured,
-          hasApiKey,
-          status: response.status,
-          body: text?.slice(0, 300)
-        },
-        voices: ELEVENLABS_VOICES
-      }, 200)
-    }
-
-    const data = JSON.parse(text)
-
-    return jsonResponse({
-      source: 'elevenlabs',
-      debug: { configured, hasApiKey, count: data?.voices?.length || 0 },
-      voices: (data?.voices || []).map(v => ({
-        id: v.voice_id,
-        name: v.name,
-        description: v.labels?.accent || v.labels?.description || v.description || '',
-        avatar: ''
-      }))
-    })
-  } catch (e) {
-    return jsonResponse({
-      source: 'fallback_elevenlabs_exception',
-      debug: { configured, hasApiKey, error: String(e?.message || e) },
-      voices: ELEVENLABS_VOICES
-    })
-  }
-}
-
-  const decryptedKey = decrypt(integrations.elevenlabs.apiKey)
-
-  const response = await fetch('https://api.elevenlabs.io/v1/voices', {
-    headers: {
-  'xi-api-key': decryptedKey,
-  'accept': 'application/json'
-},
-    cache: 'no-store'
-  })
-
-  if (!response.ok) {
-    return errorResponse('Failed to fetch ElevenLabs voices', 500)
-  }
-
-  const data = await response.json()
-
-  return jsonResponse({
-    voices: data.voices.map(v => ({
-      id: v.voice_id,
-      name: v.name,
-      description: v.description || '',
-      avatar: ''
-    }))
-  })
-}
-
     // Get pre-made prompts (public)
     if (route === '/prompts' && method === 'GET') {
       return jsonResponse({ prompts: PREMADE_PROMPTS })
     }
 
     // ====== PROTECTED ROUTES ======
-    const user = await authenticateRequest(request, db)
+    user = await authenticateRequest(request, db)
 
     // Get current user
     if (route === '/auth/me' && method === 'GET') {
@@ -465,6 +410,22 @@ if (route === '/voices' && method === 'GET') {
       })
     }
 
+    // Get voices list (falls back to the built-in list without ElevenLabs)
+    if (route === '/voices' && method === 'GET') {
+      const apiKey = user ? await getIntegrationSecret(db, user.workspaceId, 'elevenlabs') : null
+      if (!apiKey) {
+        return jsonResponse({ source: 'fallback', voices: ELEVENLABS_VOICES })
+      }
+      
+      try {
+        const { voices, cache } = await getElevenLabsVoices(apiKey)
+        return jsonResponse({ source: 'elevenlabs', cache, voices })
+      } catch (error) {
+        console.error('ElevenLabs voices fetch failed:', error.status || '', error.body || error.message)
+        return jsonResponse({ source: 'fallback', voices: ELEVENLABS_VOICES })
+      }
+    }
+
     // ====== AGENTS ======
     
     // Create agent
@@ -472,6 +433,11 @@ if (route === '/voices' && method === 'GET') {
       if (!user) return errorResponse('Unauthorized', 401)
       
       const body = await request.json()
+      const vadError = validateVadSettings(body.vadSettings)
+      if (vadError) return errorResponse(vadError)
+      if (body.interruptSensitivity && !['low', 'medium', 'high'].includes(body.interruptSensitivity)) {
+        return errorResponse('interruptSensitivity must be low, medium or high')
+      }
       const agentId = uuidv4()
       
       const agent = {
@@ -483,6 +449,8 @@ if (route === '/voices' && method === 'GET') {
         voiceId: body.voiceId || 'rachel',
         language: body.language || 'en-US',
         interruptSensitivity: body.interruptSensitivity || 'high',
+        // Optional VAD/barge-in overrides (startDb, endDb, startFrames, endFrames, minSpeechDbfs, bargeInGraceMs)
+        vadSettings: body.vadSettings || null,
         responseSpeed: body.responseSpeed || 'auto',
         aiCreativity: body.aiCreativity ?? 0.7,
         // Call Transfer Settings
@@ -509,6 +477,8 @@ if (route === '/voices' && method === 'GET') {
       }
       
       await db.collection('agents').insertOne(agent)
+      await trackCreated(db, 'agents', agent)
+      prewarmAgentAudio(db, agent)
       
       // Audit log
       await logAuditEvent(db, {
@@ -557,6 +527,11 @@ if (route === '/voices' && method === 'GET') {
       
       const agentId = path[1]
       const body = await request.json()
+      const vadError = validateVadSettings(body.vadSettings)
+      if (vadError) return errorResponse(vadError)
+      if (body.interruptSensitivity && !['low', 'medium', 'high'].includes(body.interruptSensitivity)) {
+        return errorResponse('interruptSensitivity must be low, medium or high')
+      }
       
       const updateData = {
         ...body,
@@ -573,6 +548,7 @@ if (route === '/voices' && method === 'GET') {
       )
       
       if (!result) return errorResponse('Agent not found', 404)
+      prewarmAgentAudio(db, result)
       
       const { _id, ...cleanAgent } = result
       return jsonResponse(cleanAgent)
@@ -586,6 +562,7 @@ if (route === '/voices' && method === 'GET') {
       const result = await db.collection('agents').deleteOne({ id: agentId, workspaceId: user.workspaceId })
       
       if (result.deletedCount === 0) return errorResponse('Agent not found', 404)
+      await trackDeleted(db, 'agents', user.workspaceId)
       
       return jsonResponse({ success: true })
     }
@@ -614,27 +591,33 @@ if (route === '/voices' && method === 'GET') {
       }
       
       // Return masked version
+      const secrets = await getIntegrationSecrets(db, user.workspaceId)
       const masked = {
         id: integrations.id,
         twilio: {
-          configured: integrations.twilio?.configured || false,
-          accountSid: integrations.twilio?.accountSid ? maskSecret(decrypt(integrations.twilio.accountSid)) : null,
+          configured: secrets.twilio.configured,
+          accountSid: secrets.twilio.accountSid ? maskSecret(secrets.twilio.accountSid) : null,
+          decryptFailed: secrets.twilio.decryptFailed || undefined,
         },
         ghl: {
-          configured: integrations.ghl?.configured || false,
-          apiKey: integrations.ghl?.apiKey ? maskSecret(decrypt(integrations.ghl.apiKey)) : null,
+          configured: secrets.ghl.configured,
+          apiKey: secrets.ghl.apiKey ? maskSecret(secrets.ghl.apiKey) : null,
+          decryptFailed: secrets.ghl.decryptFailed || undefined,
         },
         calcom: {
-          configured: integrations.calcom?.configured || false,
-          apiKey: integrations.calcom?.apiKey ? maskSecret(decrypt(integrations.calcom.apiKey)) : null,
+          configured: secrets.calcom.configured,
+          apiKey: secrets.calcom.apiKey ? maskSecret(secrets.calcom.apiKey) : null,
+          decryptFailed: secrets.calcom.decryptFailed || undefined,
         },
         deepgram: {
-          configured: integrations.deepgram?.configured || false,
-          apiKey: integrations.deepgram?.apiKey ? maskSecret(decrypt(integrations.deepgram.apiKey)) : null,
+          configured: secrets.deepgram.configured,
+          apiKey: secrets.deepgram.apiKey ? maskSecret(secrets.deepgram.apiKey) : null,
+          decryptFailed: secrets.deepgram.decryptFailed || undefined,
         },
         elevenlabs: {
-          configured: integrations.elevenlabs?.configured || false,
-          apiKey: integrations.elevenlabs?.apiKey ? maskSecret(decrypt(integrations.elevenlabs.apiKey)) : null,
+          configured: secrets.elevenlabs.configured,
+          apiKey: secrets.elevenlabs.apiKey ? maskSecret(secrets.elevenlabs.apiKey) : null,
+          decryptFailed: secrets.elevenlabs.decryptFailed || undefined,
         }
       }
       
@@ -664,6 +647,8 @@ if (route === '/voices' && method === 'GET') {
         { $set: updateData },
         { upsert: true }
       )
+      invalidateIntegrationSecrets(user.workspaceId)
+      invalidateProviderConnections(user.workspaceId)
       
       return jsonResponse({ success: true, configured: true })
     }
@@ -691,6 +676,8 @@ if (route === '/voices' && method === 'GET') {
         { $set: updateData },
         { upsert: true }
       )
+      invalidateIntegrationSecrets(user.workspaceId)
+      invalidateProviderConnections(user.workspaceId)
       
       return jsonResponse({ success: true, configured: true })
     }
@@ -717,6 +704,8 @@ if (route === '/voices' && method === 'GET') {
         { $set: updateData },
         { upsert: true }
       )
+      invalidateIntegrationSecrets(user.workspaceId)
+      invalidateProviderConnections(user.workspaceId)
       
       return jsonResponse({ success: true, configured: true })
     }
@@ -743,6 +732,8 @@ if (route === '/voices' && method === 'GET') {
         { $set: updateData },
         { upsert: true }
       )
+      invalidateIntegrationSecrets(user.workspaceId)
+      invalidateProviderConnections(user.workspaceId)
       
       return jsonResponse({ success: true, configured: true })
     }
@@ -769,6 +760,8 @@ if (route === '/voices' && method === 'GET') {
         { $set: updateData },
         { upsert: true }
       )
+      invalidateIntegrationSecrets(user.workspaceId)
+      invalidateProviderConnections(user.workspaceId)
       
       return jsonResponse({ success: true, configured: true })
     }
@@ -790,6 +783,8 @@ if (route === '/voices' && method === 'GET') {
         { workspaceId: user.workspaceId },
         { $set: updateData }
       )
+      invalidateIntegrationSecrets(user.workspaceId)
+      invalidateProviderConnections(user.workspaceId)
       
       return jsonResponse({ success: true })
     }
@@ -860,27 +855,40 @@ if (route === '/voices' && method === 'GET') {
     if (route === '/dashboard/stats' && method === 'GET') {
       if (!user) return errorResponse('Unauthorized', 401)
       
-      const [agentCount, callCount, phoneCount] = await Promise.all([
-        db.collection('agents').countDocuments({ workspaceId: user.workspaceId }),
-        db.collection('call_logs').countDocuments({ workspaceId: user.workspaceId }),
-        db.collection('phone_numbers').countDocuments({ workspaceId: user.workspaceId })
-      ])
+      const stats = await getWorkspaceStats(db, user.workspaceId)
       
-      // Get recent calls
-      const recentCalls = await db.collection('call_logs')
-        .find({ workspaceId: user.workspaceId })
-        .sort({ createdAt: -1 })
-        .limit(5)
-        .toArray()
+      return jsonResponse({
+        totalAgents: stats?.totalAgents || 0,
+        totalCalls: stats?.totalCalls || 0,
+        totalPhoneNumbers: stats?.totalPhoneNumbers || 0,
+        totalContacts: stats?.totalContacts || 0,
+        totalErrors: stats?.totalErrors || 0,
+        recentCalls: stats?.recentCalls || []
+      })
+    }
+
+    // Daily series for dashboard charts
+    if (route === '/dashboard/stats/series' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
       
-      const cleaned = recentCalls.map(({ _id, ...rest }) => rest)
+      const url = new URL(request.url)
+      const series = await getStatsSeries(await connectToAnalyticsDb(), user.workspaceId, url.searchParams.get('days'))
       
-      return jsonResponse({
-        totalAgents: agentCount,
-        totalCalls: callCount,
-        totalPhoneNumbers: phoneCount,
-        recentCalls: cleaned
+      return jsonResponse({ series })
+    }
+
+    // Call volume, duration, cost and latency from the voice engine's roll-ups
+    if (route === '/dashboard/analytics' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      
+      const url = new URL(request.url)
+      const analytics = await getCallAnalytics(await connectToAnalyticsDb(), user.workspaceId, {
+        days: url.searchParams.get('days'),
+        granularity: url.searchParams.get('granularity') || 'day',
+        agentId: url.searchParams.get('agentId') || undefined
       })
+      
+      return jsonResponse(analytics)
     }
 
     // ====== ADMIN ROUTES ======
@@ -902,41 +910,41 @@ if (route === '/voices' && method === 'GET') {
       if (!user) return errorResponse('Unauthorized', 401)
       if (!isAdminEmail(user.email)) return errorResponse('Forbidden', 403)
       
-      const [userCount, workspaceCount, agentCount, callCount, phoneCount, errorCount] = await Promise.all([
-        db.collection('users').countDocuments(),
-        db.collection('workspaces').countDocuments(),
-        db.collection('agents').countDocuments(),
-        db.collection('call_logs').countDocuments(),
-        db.collection('phone_numbers').countDocuments(),
-        db.collection('error_logs').countDocuments()
-      ])
-      
-      // Get recent users
-      const recentUsers = await db.collection('users')
-        .find({}, { projection: { _id: 0, password: 0 } })
-        .sort({ createdAt: -1 })
-        .limit(5)
-        .toArray()
-      
-      // Get recent calls
-      const recentCalls = await db.collection('call_logs')
-        .find({}, { projection: { _id: 0 } })
-        .sort({ createdAt: -1 })
-        .limit(5)
-        .toArray()
+      const stats = await getGlobalStats(db)
       
       return jsonResponse({
-        totalUsers: userCount,
-        totalWorkspaces: workspaceCount,
-        totalAgents: agentCount,
-        totalCalls: callCount,
-        totalPhoneNumbers: phoneCount,
-        totalErrors: errorCount,
-        recentUsers,
-        recentCalls
+        totalUsers: stats?.totalUsers || 0,
+        totalWorkspaces: stats?.totalWorkspaces || 0,
+        totalAgents: stats?.totalAgents || 0,
+        totalCalls: stats?.totalCalls || 0,
+        totalPhoneNumbers: stats?.totalPhoneNumbers || 0,
+        totalErrors: stats?.totalErrors || 0,
+        totalContacts: stats?.totalContacts || 0,
+        recentUsers: stats?.recentUsers || [],
+        recentCalls: stats?.recentCalls || []
       })
     }
 
+    // Admin: platform-wide daily series
+    if (route === '/admin/stats/series' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!isAdminEmail(user.email)) return errorResponse('Forbidden', 403)
+      
+      const url = new URL(request.url)
+      const series = await getStatsSeries(await connectToAnalyticsDb(), GLOBAL_SCOPE, url.searchParams.get('days'))
+      
+      return jsonResponse({ series })
+    }
+
+    // Admin: rebuild call analytics roll-ups for past days from call_logs
+    if (route === '/admin/analytics/backfill' && method === 'POST') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canManageSystemSettings')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      await startCallAnalyticsBackfill()
+      return jsonResponse({ success: true, message: 'Backfill started' }, 202)
+    }
+
     // Admin: List all users
     if (route === '/admin/users' && method === 'GET') {
       if (!user) return errorResponse('Unauthorized', 401)
@@ -973,14 +981,11 @@ if (route === '/voices' && method === 'GET') {
         return errorResponse('Cannot delete super admin users', 403)
       }
       
-      // Delete user and their workspace
-      await Promise.all([
-        db.collection('users').deleteOne({ id: userId }),
-        db.collection('workspaces').deleteOne({ id: targetUser.workspaceId }),
-        db.collection('agents').deleteMany({ workspaceId: targetUser.workspaceId }),
-        db.collection('integrations').deleteMany({ workspaceId: targetUser.workspaceId }),
-        db.collection('contacts').deleteMany({ workspaceId: targetUser.workspaceId })
-      ])
+      // Workspace data is removed by a background job in throttled batches
+      const job = await enqueueWorkspaceDeletion(db, {
+        workspaceId: targetUser.workspaceId,
+        requestedBy: user.id
+      })
       
       await logAuditEvent(db, {
         action: AUDIT_ACTIONS.USER_DELETED,
@@ -988,10 +993,44 @@ if (route === '/voices' && method === 'GET') {
         userEmail: user.email,
         targetId: userId,
         targetType: 'user',
-        details: { deletedEmail: targetUser.email }
+        details: { deletedEmail: targetUser.email, workspaceId: targetUser.workspaceId, deletionJobId: job.id }
       })
       
-      return jsonResponse({ success: true })
+      return jsonResponse({ success: true, deletionJobId: job.id }, 202)
+    }
+
+    // Admin: List workspace deletion jobs
+    if (route === '/admin/deletion-jobs' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canDeleteUsers')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const jobs = await listDeletionJobs(db)
+      return jsonResponse({ jobs })
+    }
+
+    // Admin: Get deletion job progress
+    if (route.match(/^\/admin\/deletion-jobs\/[^/]+$/) && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canDeleteUsers')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const job = await getDeletionJob(db, path[2])
+      if (!job) return errorResponse('Deletion job not found', 404)
+      
+      return jsonResponse(job)
+    }
+
+    // Admin: Retry a deletion job now instead of after its backoff
+    if (route.match(/^\/admin\/deletion-jobs\/[^/]+\/retry$/) && method === 'POST') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canDeleteUsers')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const existing = await getDeletionJob(db, path[2])
+      if (!existing) return errorResponse('Deletion job not found', 404)
+      
+      const job = await retryDeletionJob(db, path[2])
+      if (!job) return errorResponse(`Deletion job is ${existing.status}`, 409)
+      
+      return jsonResponse(job, 202)
     }
 
     // Admin: List all agents
@@ -1028,6 +1067,7 @@ if (route === '/voices' && method === 'GET') {
       if (!agent) return errorResponse('Agent not found', 404)
       
       await db.collection('agents').deleteOne({ id: agentId })
+      await trackDeleted(db, 'agents', agent.workspaceId)
       
       await logAuditEvent(db, {
         action: AUDIT_ACTIONS.AGENT_DELETED,
@@ -1046,7 +1086,8 @@ if (route === '/voices' && method === 'GET') {
       if (!user) return errorResponse('Unauthorized', 401)
       if (!isAnyAdmin(user)) return errorResponse('Forbidden', 403)
       
-      const callLogs = await db.collection('call_logs')
+      const analyticsDb = await connectToAnalyticsDb()
+      const callLogs = await analyticsDb.collection('call_logs')
         .find({}, { projection: { _id: 0 } })
         .sort({ createdAt: -1 })
         .limit(500)
@@ -1061,9 +1102,10 @@ if (route === '/voices' && method === 'GET') {
       if (!hasPermission(user, 'canDeleteContent')) return errorResponse('Forbidden: Super admin required', 403)
       
       const logId = path[2]
-      const result = await db.collection('call_logs').deleteOne({ id: logId })
+      const callLog = await db.collection('call_logs').findOneAndDelete({ id: logId })
       
-      if (result.deletedCount === 0) return errorResponse('Call log not found', 404)
+      if (!callLog) return errorResponse('Call log not found', 404)
+      await trackDeleted(db, 'call_logs', callLog.workspaceId, { ids: [logId] })
       return jsonResponse({ success: true })
     }
 
@@ -1072,7 +1114,8 @@ if (route === '/voices' && method === 'GET') {
       if (!user) return errorResponse('Unauthorized', 401)
       if (!isAnyAdmin(user)) return errorResponse('Forbidden', 403)
       
-      const errorLogs = await db.collection('error_logs')
+      const analyticsDb = await connectToAnalyticsDb()
+      const errorLogs = await analyticsDb.collection('error_logs')
         .find({}, { projection: { _id: 0 } })
         .sort({ createdAt: -1 })
         .limit(500)
@@ -1087,12 +1130,137 @@ if (route === '/voices' && method === 'GET') {
       if (!hasPermission(user, 'canDeleteContent')) return errorResponse('Forbidden: Super admin required', 403)
       
       const logId = path[2]
-      const result = await db.collection('error_logs').deleteOne({ id: logId })
+      const errorLog = await db.collection('error_logs').findOneAndDelete({ id: logId })
       
-      if (result.deletedCount === 0) return errorResponse('Error log not found', 404)
+      if (!errorLog) return errorResponse('Error log not found', 404)
+      await trackDeleted(db, 'error_logs', errorLog.workspaceId)
       return jsonResponse({ success: true })
     }
 
+    // Admin: Errors grouped by fingerprint, most recently seen first
+    if (route === '/admin/error-groups' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!isAnyAdmin(user)) return errorResponse('Forbidden', 403)
+      
+      const url = new URL(request.url)
+      const errorGroups = await getErrorGroups(db, {
+        workspaceId: url.searchParams.get('workspaceId') || undefined,
+        since: url.searchParams.get('since') || undefined,
+        includeResolved: url.searchParams.get('includeResolved') === 'true',
+        limit: url.searchParams.get('limit') || undefined
+      })
+      
+      return jsonResponse({ errorGroups })
+    }
+
+    // Admin: Mark an error group resolved (it reappears if the error recurs)
+    if (route.match(/^\/admin\/error-groups\/[^/]+\/resolve$/) && method === 'POST') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!isAnyAdmin(user)) return errorResponse('Forbidden', 403)
+      
+      const resolved = await resolveErrorGroup(db, path[2])
+      if (!resolved) return errorResponse('Error group not found', 404)
+      return jsonResponse({ success: true })
+    }
+
+    // Admin: Delete error group
+    if (route.match(/^\/admin\/error-groups\/[^/]+$/) && method === 'DELETE') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canDeleteContent')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const deleted = await deleteErrorGroup(db, path[2])
+      if (!deleted) return errorResponse('Error group not found', 404)
+      return jsonResponse({ success: true })
+    }
+
+    // Admin: Index advisor (missing, unused and undeclared indexes, profiled collection scans)
+    if (route === '/admin/indexes' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canManageSystemSettings')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const report = await getIndexReport(db)
+      return jsonResponse(report)
+    }
+
+    // Admin: Build any missing declared indexes
+    if (route === '/admin/indexes/build' && method === 'POST') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canManageSystemSettings')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const results = await ensureIndexes(db, undefined, { rebuild: true })
+      return jsonResponse({ success: results.every(r => r.failed.length === 0), collections: results })
+    }
+
+    // Admin: Mongo connection pool checkout waits (transactional and analytics pools)
+    if (route === '/admin/db/pools' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canManageSystemSettings')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      return jsonResponse({ pools: getPoolStats() })
+    }
+
+    // Admin: Calls currently in progress on the voice engine
+    if (route === '/admin/live-calls' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!isAnyAdmin(user)) return errorResponse('Forbidden', 403)
+      
+      const url = new URL(request.url)
+      try {
+        const { calls, stats } = await getLiveCalls(url.searchParams.get('workspaceId'))
+        return jsonResponse({ calls, stats })
+      } catch (error) {
+        console.error('Live calls lookup failed:', error.message)
+        return errorResponse('Voice engine unavailable', 503)
+      }
+    }
+
+    // Admin: Live call detail (recent transcript) / force hang-up
+    if (route.match(/^\/admin\/live-calls\/[^/]+$/) && (method === 'GET' || method === 'DELETE')) {
+      if (!user) return errorResponse('Unauthorized', 401)
+      const permitted = method === 'GET' ? isAnyAdmin(user) : hasPermission(user, 'canDeleteContent')
+      if (!permitted) return errorResponse('Forbidden', 403)
+      
+      const callSid = path[2]
+      try {
+        if (method === 'GET') {
+          return jsonResponse({ call: await getLiveCall(callSid) })
+        }
+        await endLiveCall(callSid)
+        await logAuditEvent(db, {
+          action: AUDIT_ACTIONS.LIVE_CALL_ENDED,
+          userId: user.id,
+          userEmail: user.email,
+          targetType: 'call',
+          targetId: callSid
+        })
+        return jsonResponse({ success: true })
+      } catch (error) {
+        if (error.status === 404) return errorResponse('Call not found', 404)
+        console.error('Live call request failed:', error.message)
+        return errorResponse('Voice engine unavailable', 503)
+      }
+    }
+
+    // Admin: voice engine memory profiling (POST baseline, GET diff, DELETE stop).
+    // The voice engine's /internal/profile endpoints only check for an internal caller.
+    if (route === '/admin/profile/memory' && ['GET', 'POST', 'DELETE'].includes(method)) {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canManageSystemSettings')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const url = new URL(request.url)
+      try {
+        const result = await profileVoiceEngineMemory(method, {
+          top: url.searchParams.get('top'),
+          groupBy: url.searchParams.get('groupBy')
+        })
+        return jsonResponse(result)
+      } catch (error) {
+        if (error.status === 400 || error.status === 409) return errorResponse(error.detail || error.message, error.status)
+        console.error('Memory profile request failed:', error.message)
+        return errorResponse('Voice engine unavailable', 503)
+      }
+    }
+
     // ====== ADMIN ROLE & INVITE MANAGEMENT ======
 
     // Admin: Get admin role info
@@ -1251,15 +1419,26 @@ if (route === '/voices' && method === 'GET') {
         workspaceId: url.searchParams.get('workspaceId'),
         action: url.searchParams.get('action'),
         startDate: url.searchParams.get('startDate'),
-        endDate: url.searchParams.get('endDate')
+        endDate: url.searchParams.get('endDate'),
+        // Archived days are only read on request
+        includeArchive: url.searchParams.get('includeArchive') === 'true'
       }
       
       const limit = parseInt(url.searchParams.get('limit')) || 100
-      const logs = await getAuditLogs(db, filters, limit)
+      const logs = await getAuditLogs(await connectToAnalyticsDb(), filters, limit)
       
       return jsonResponse({ auditLogs: logs })
     }
 
+    // Admin: Move audit logs past the retention window into the archive tier
+    if (route === '/admin/audit-logs/archive' && method === 'POST') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      if (!hasPermission(user, 'canManageSystemSettings')) return errorResponse('Forbidden: Super admin required', 403)
+      
+      const summary = await archiveAuditLogs(db)
+      return jsonResponse({ success: true, ...summary })
+    }
+
     // ====== CLIENT MANAGEMENT (for admin) ======
 
     // Admin: Get all clients with details
@@ -1267,21 +1446,24 @@ if (route === '/voices' && method === 'GET') {
       if (!user) return errorResponse('Unauthorized', 401)
       if (!hasPermission(user, 'canViewClientDetails')) return errorResponse('Forbidden', 403)
       
+      // Per-workspace counts for every client: a report, so it runs on the analytics pool
+      const analyticsDb = await connectToAnalyticsDb()
+      
       // Get all workspaces with their owners
-      const workspaces = await db.collection('workspaces')
+      const workspaces = await analyticsDb.collection('workspaces')
         .find({}, { projection: { _id: 0 } })
         .sort({ createdAt: -1 })
         .toArray()
       
       // Get owner info for each workspace
       const clientsWithDetails = await Promise.all(workspaces.map(async (ws) => {
-        const owner = await db.collection('users').findOne(
+        const owner = await analyticsDb.collection('users').findOne(
           { workspaceId: ws.id, role: 'owner' },
           { projection: { _id: 0, password: 0 } }
         )
-        const agentCount = await db.collection('agents').countDocuments({ workspaceId: ws.id })
-        const contactCount = await db.collection('contacts').countDocuments({ workspaceId: ws.id })
-        const integrations = await db.collection('integrations').findOne({ workspaceId: ws.id })
+        const agentCount = await analyticsDb.collection('agents').countDocuments({ workspaceId: ws.id })
+        const contactCount = await analyticsDb.collection('contacts').countDocuments({ workspaceId: ws.id })
+        const integrations = await analyticsDb.collection('integrations').findOne({ workspaceId: ws.id })
         
         return {
           ...ws,
@@ -1363,6 +1545,7 @@ if (route === '/voices' && method === 'GET') {
       }
       
       await db.collection('contacts').insertOne(contact)
+      await trackCreated(db, 'contacts', contact)
       
       await logAuditEvent(db, {
         action: AUDIT_ACTIONS.CONTACT_CREATED,
@@ -1441,6 +1624,7 @@ if (route === '/voices' && method === 'GET') {
       }))
       
       await db.collection('contacts').insertMany(contacts)
+      await trackCreated(db, 'contacts', contacts)
       
       await logAuditEvent(db, {
         action: AUDIT_ACTIONS.CONTACTS_IMPORTED,
@@ -1461,6 +1645,7 @@ if (route === '/voices' && method === 'GET') {
       const result = await db.collection('contacts').deleteOne({ id: contactId, workspaceId: user.workspaceId })
       
       if (result.deletedCount === 0) return errorResponse('Contact not found', 404)
+      await trackDeleted(db, 'contacts', user.workspaceId)
       
       await logAuditEvent(db, {
         action: AUDIT_ACTIONS.CONTACT_DELETED,
@@ -1474,11 +1659,220 @@ if (route === '/voices' && method === 'GET') {
       return jsonResponse({ success: true })
     }
 
+    // ====== CAMPAIGNS ======
+    // Outbound dialing runs in the voice engine (backend/dialer.py), which
+    // picks up campaigns with status 'running' and records progress here.
+
+    // Create campaign
+    if (route === '/campaigns' && method === 'POST') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      
+      const body = await request.json()
+      if (!body.agentId || !body.fromNumber) {
+        return errorResponse('Agent and from number are required')
+      }
+      const agent = await db.collection('agents').findOne({ id: body.agentId, workspaceId: user.workspaceId })
+      if (!agent) return errorResponse('Agent not found', 404)
+      const fromNumber = await db.collection('phone_numbers').countDocuments(
+        { workspaceId: user.workspaceId, number: body.fromNumber }, { limit: 1 }
+      )
+      if (!fromNumber) return errorResponse('From number must be one of your phone numbers')
+      
+      const hours = body.callingHours || null
+      if (hours) {
+        const timePattern = /^([01]\d|2[0-3]):[0-5]\d$/
+        if (!timePattern.test(hours.start || '') || !timePattern.test(hours.end || '') || hours.start >= hours.end) {
+          return errorResponse('Calling hours need start and end times (HH:MM), with start before end')
+        }
+        try {
+          new Intl.DateTimeFormat('en-US', { timeZone: hours.timezone || 'UTC' })
+        } catch {
+          return errorResponse('Unknown calling hours timezone')
+        }
+      }
+      
+      const campaign = {
+        id: uuidv4(),
+        workspaceId: user.workspaceId,
+        name: body.name || 'New Campaign',
+        agentId: body.agentId,
+        fromNumber: body.fromNumber,
+        status: 'draft', // 'draft', 'running', 'paused', 'completed', 'cancelled'
+        priority: parseInt(body.priority) || 0,
+        contactFilter: { tags: body.contactFilter?.tags || [] },
+        maxConcurrentCalls: Math.max(1, parseInt(body.maxConcurrentCalls) || 5),
+        callsPerSecond: Math.max(0.1, parseFloat(body.callsPerSecond) || 1),
+        // Retried Twilio outcomes: 'busy', 'no-answer', 'failed'
+        retry: {
+          maxAttempts: Math.max(1, parseInt(body.retry?.maxAttempts) || 2),
+          delayMinutes: Math.max(1, parseFloat(body.retry?.delayMinutes) || 60),
+          on: body.retry?.on || ['busy', 'no-answer', 'failed']
+        },
+        // { timezone, start: 'HH:MM', end: 'HH:MM', days: ISO weekdays 1-7 }
+        callingHours: hours && {
+          timezone: hours.timezone || 'UTC',
+          start: hours.start,
+          end: hours.end,
+          days: hours.days || [1, 2, 3, 4, 5]
+        },
+        progress: { dialed: 0, retried: 0, skipped: 0, outcomes: {} },
+        lastError: null,
+        createdAt: new Date(),
+        updatedAt: new Date()
+      }
+      
+      await db.collection('campaigns').insertOne(campaign)
+      
+      await logAuditEvent(db, {
+        action: AUDIT_ACTIONS.CAMPAIGN_CREATED,
+        userId: user.id,
+        userEmail: user.email,
+        workspaceId: user.workspaceId,
+        targetId: campaign.id,
+        targetType: 'campaign',
+        details: { campaignName: campaign.name, agentId: campaign.agentId }
+      })
+      
+      const { _id, ...cleanCampaign } = campaign
+      return jsonResponse(cleanCampaign, 201)
+    }
+
+    // List campaigns
+    if (route === '/campaigns' && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      
+      const campaigns = await db.collection('campaigns')
+        .find({ workspaceId: user.workspaceId }, { projection: { _id: 0, 'progress.cursor': 0, dialer: 0 } })
+        .sort({ createdAt: -1 })
+        .limit(100)
+        .toArray()
+      
+      return jsonResponse({ campaigns })
+    }
+
+    // Get single campaign
+    if (route.match(/^\/campaigns\/[^/]+$/) && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      
+      const campaign = await db.collection('campaigns').findOne(
+        { id: path[1], workspaceId: user.workspaceId },
+        { projection: { _id: 0, 'progress.cursor': 0, dialer: 0 } }
+      )
+      if (!campaign) return errorResponse('Campaign not found', 404)
+      
+      return jsonResponse(campaign)
+    }
+
+    // Dial attempts for a campaign
+    if (route.match(/^\/campaigns\/[^/]+\/calls$/) && method === 'GET') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      
+      const url = new URL(request.url)
+      const limit = Math.min(parseInt(url.searchParams.get('limit')) || 100, 500)
+      const skip = parseInt(url.searchParams.get('skip')) || 0
+      const status = url.searchParams.get('status')
+      
+      const query = { campaignId: path[1], workspaceId: user.workspaceId }
+      if (status) query.status = status
+      
+      const [calls, total] = await Promise.all([
+        db.collection('campaign_calls')
+          .find(query, { projection: { _id: 0 } })
+          .sort({ updatedAt: -1 })
+          .skip(skip)
+          .limit(limit)
+          .toArray(),
+        db.collection('campaign_calls').countDocuments(query)
+      ])
+      
+      return jsonResponse({ calls, total, limit, skip })
+    }
+
+    // Start, pause or cancel a campaign
+    if (route.match(/^\/campaigns\/[^/]+\/(start|pause|cancel)$/) && method === 'POST') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      
+      const campaignId = path[1]
+      const transitions = {
+        start: { from: ['draft', 'paused'], to: 'running' },
+        pause: { from: ['running'], to: 'paused' },
+        cancel: { from: ['draft', 'running', 'paused'], to: 'cancelled' }
+      }
+      const { from, to } = transitions[path[2]]
+      
+      // The number may have been released since the campaign was created; the dialer checks again
+      if (to === 'running') {
+        const campaign = await db.collection('campaigns').findOne(
+          { id: campaignId, workspaceId: user.workspaceId }, { projection: { fromNumber: 1 } }
+        )
+        if (!campaign) return errorResponse('Campaign not found', 404)
+        const fromNumber = await db.collection('phone_numbers').countDocuments(
+          { workspaceId: user.workspaceId, number: campaign.fromNumber }, { limit: 1 }
+        )
+        if (!fromNumber) return errorResponse('From number must be one of your phone numbers', 409)
+      }
+      
+      const updateData = { status: to, updatedAt: new Date() }
+      if (to === 'running') {
+        updateData.lastError = null
+        updateData.startedAt = new Date()
+      }
+      
+      const result = await db.collection('campaigns').findOneAndUpdate(
+        { id: campaignId, workspaceId: user.workspaceId, status: { $in: from } },
+        { $set: updateData },
+        { returnDocument: 'after', projection: { _id: 0, 'progress.cursor': 0, dialer: 0 } }
+      )
+      
+      if (!result) {
+        const exists = await db.collection('campaigns').countDocuments({ id: campaignId, workspaceId: user.workspaceId })
+        return exists ? errorResponse(`Campaign cannot ${path[2]} from its current status`, 409) : errorResponse('Campaign not found', 404)
+      }
+      
+      await logAuditEvent(db, {
+        action: AUDIT_ACTIONS.CAMPAIGN_STATUS_CHANGED,
+        userId: user.id,
+        userEmail: user.email,
+        workspaceId: user.workspaceId,
+        targetId: campaignId,
+        targetType: 'campaign',
+        details: { status: to }
+      })
+      
+      return jsonResponse(result)
+    }
+
+    // Delete campaign (and its dial attempts)
+    if (route.match(/^\/campaigns\/[^/]+$/) && method === 'DELETE') {
+      if (!user) return errorResponse('Unauthorized', 401)
+      
+      const campaignId = path[1]
+      const campaign = await db.collection('campaigns').findOne({ id: campaignId, workspaceId: user.workspaceId })
+      if (!campaign) return errorResponse('Campaign not found', 404)
+      if (campaign.status === 'running') return errorResponse('Pause or cancel the campaign first', 409)
+      
+      await db.collection('campaigns').deleteOne({ id: campaignId, workspaceId: user.workspaceId })
+      await db.collection('campaign_calls').deleteMany({ campaignId, workspaceId: user.workspaceId })
+      
+      await logAuditEvent(db, {
+        action: AUDIT_ACTIONS.CAMPAIGN_DELETED,
+        userId: user.id,
+        userEmail: user.email,
+        workspaceId: user.workspaceId,
+        targetId: campaignId,
+        targetType: 'campaign',
+        details: { campaignName: campaign.name }
+      })
+      
+      return jsonResponse({ success: true })
+    }
+
     // Route not found
     return errorResponse(`Route ${route} not found`, 404)
 
   } catch (error) {
     console.error('API Error:', error)
+    if (db) recordError(db, error, { workspaceId: user?.workspaceId, route: `${method} ${route}` })
     return errorResponse('Internal server error', 500)
   }
 }
@@ -1,7 +1,7 @@
 import { NextResponse } from 'next/server'
 import { connectToMongo } from '@/lib/db'
 import { verifyToken, extractTokenFromHeader } from '@/lib/auth'
-import { decrypt } from '@/lib/encryption'
+import { getIntegrationSecret, getElevenLabsVoices } from '@/lib/integrations'
 
 // Helper function to handle CORS
 function handleCORS(response) {
@@ -60,45 +60,18 @@ export async function GET(request) {
       return jsonResponse({ source: 'fallback', voices: FALLBACK_VOICES })
     }
 
-    const integrations = await db.collection('integrations').findOne({ workspaceId: user.workspaceId })
-
-    const eleven = integrations?.elevenlabs
-    const isConfigured = !!eleven?.configured && !!eleven?.apiKey
-
-    if (!isConfigured) {
+    const apiKey = await getIntegrationSecret(db, user.workspaceId, 'elevenlabs')
+    if (!apiKey) {
       return jsonResponse({ source: 'fallback', voices: FALLBACK_VOICES })
     }
 
-    const apiKey = decrypt(eleven.apiKey)
-
-    const res = await fetch('https://api.elevenlabs.io/v1/voices', {
-      method: 'GET',
-      headers: {
-        'xi-api-key': apiKey,
-        'Content-Type': 'application/json',
-      },
-      cache: 'no-store',
-    })
-
-    if (!res.ok) {
-      const text = await res.text().catch(() => '')
-      console.error('ElevenLabs voices fetch failed:', res.status, text)
+    try {
+      const { voices, cache } = await getElevenLabsVoices(apiKey)
+      return jsonResponse({ source: 'elevenlabs', cache, voices })
+    } catch (error) {
+      console.error('ElevenLabs voices fetch failed:', error.status || '', error.body || error.message)
       return jsonResponse({ source: 'fallback', voices: FALLBACK_VOICES })
     }
-
-    const data = await res.json()
-
-    const voices = (data?.voices || []).map((v) => ({
-      id: v.voice_id,
-      name: v.name,
-      description: v?.labels?.description || v?.description || '',
-      avatar: `https://api.dicebear.com/7.x/avataaars/svg?seed=${encodeURIComponent(v.voice_id)}`,
-      // Optional: keep raw fields if you want later
-      // category: v.category,
-      // labels: v.labels,
-    }))
-
-    return jsonResponse({ source: 'elevenlabs', voices })
   } catch (err) {
     console.error('GET /api/voices error:', err)
     return errorResponse('Internal server error', 500)
@@ -0,0 +1,390 @@
+"""Call analytics roll-ups.
+
+Call-completion events are buffered in memory and written in batches. A
+batch is first aggregated per bucket, then written as one ordered bulk
+write of ``$inc`` updates to ``call_analytics``. That collection has one
+document per workspace, agent and UTC day:
+
+    {workspaceId, agentId, date: "2026-10-19",
+     count, durationS, cost, outcomes: {completed: 41, ...},
+     latencyBoundsMs: [...], latencyBins: [...],             # whole day
+     hourly: {count: [24], durationS: [24], cost: [24],      # one slot per hour
+              latencyBins: [24][bins]}}
+
+Hourly values are stored column-wise, as one 24-slot array per metric. A
+chart reads a whole day from a single document and never scans
+``call_logs``. Averages and p95 are derived at read time (lib/analytics.js)
+from sums and fixed latency bins. Bins merge across batches and agents;
+stored percentiles would not.
+
+Each flush is a batch with its own id. A bucket update only applies to a
+document whose ``batches`` list (the last ``ANALYTICS_BATCH_IDS_KEPT`` ids)
+does not already hold that id, and it pushes the id in the same update. A
+batch that failed part-way is retried unchanged, under the same id, so the
+buckets it already reached are not counted twice.
+
+``backfill`` builds the documents for days before a cutoff from
+``call_logs`` in one streaming pass. It never touches a document that live
+ingestion has written to (``source: "live"``).
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from integrations import get_analytics_db, get_db
+from loop_monitor import is_overloaded
+from metrics import DEFAULT_MS_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE", 500))
+ANALYTICS_FLUSH_S = float(os.environ.get("ANALYTICS_FLUSH_S", 5))
+# Events kept while Mongo is unreachable; older ones are dropped first
+ANALYTICS_MAX_PENDING = int(os.environ.get("ANALYTICS_MAX_PENDING", 50000))
+# Used when an event carries no cost of its own
+CALL_COST_PER_MINUTE = float(os.environ.get("CALL_COST_PER_MINUTE", 0))
+LATENCY_BOUNDS_MS = DEFAULT_MS_BUCKETS
+LATENCY_BINS = len(LATENCY_BOUNDS_MS) + 1
+BACKFILL_BATCH_SIZE = 1000
+# Batch ids remembered per document; retries happen well within this many flushes
+ANALYTICS_BATCH_IDS_KEPT = 50
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return datetime.now(timezone.utc)
+
+
+def _outcome_key(value) -> str:
+    # Used as a field name under `outcomes`
+    return str(value or "unknown").replace(".", "_").replace("$", "_")
+
+
+def latency_bins(event: dict) -> list[int] | None:
+    """Histogram counts for an event's latencies (``latencyBins`` or raw ``latencyMs``)."""
+    bins = event.get("latencyBins")
+    if bins is not None:
+        return list(bins) if len(bins) == LATENCY_BINS else None
+    samples = event.get("latencyMs")
+    if samples is None:
+        return None
+    counts = [0] * LATENCY_BINS
+    for ms in samples if isinstance(samples, (list, tuple)) else (samples,):
+        counts[bisect.bisect_left(LATENCY_BOUNDS_MS, ms)] += 1
+    return counts
+
+
+class _Bucket:
+    """Aggregate of the events for one workspace, agent and day."""
+
+    __slots__ = ("count", "duration", "cost", "outcomes", "bins", "hourly_count", "hourly_duration",
+                 "hourly_cost", "hourly_bins")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.cost = 0.0
+        self.outcomes: dict[str, int] = {}
+        self.bins = [0] * LATENCY_BINS
+        self.hourly_count = [0] * 24
+        self.hourly_duration = [0.0] * 24
+        self.hourly_cost = [0.0] * 24
+        self.hourly_bins = [[0] * LATENCY_BINS for _ in range(24)]
+
+    def add(self, hour: int, event: dict) -> None:
+        duration = float(event.get("durationS", event.get("duration")) or 0)
+        cost = event.get("cost")
+        cost = float(cost) if cost is not None else duration / 60 * CALL_COST_PER_MINUTE
+        outcome = _outcome_key(event.get("outcome", event.get("status")))
+
+        self.count += 1
+        self.duration += duration
+        self.cost += cost
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.hourly_count[hour] += 1
+        self.hourly_duration[hour] += duration
+        self.hourly_cost[hour] += cost
+        bins = latency_bins(event)
+        if bins:
+            hourly = self.hourly_bins[hour]
+            for i, n in enumerate(bins):
+                self.bins[i] += n
+                hourly[i] += n
+
+    def increments(self) -> dict:
+        inc = {"count": self.count, "durationS": self.duration, "cost": self.cost}
+        inc.update({f"outcomes.{name}": n for name, n in self.outcomes.items()})
+        inc.update({f"latencyBins.{i}": n for i, n in enumerate(self.bins) if n})
+        for hour in range(24):
+            if not self.hourly_count[hour] and not any(self.hourly_bins[hour]):
+                continue
+            inc[f"hourly.count.{hour}"] = self.hourly_count[hour]
+            inc[f"hourly.durationS.{hour}"] = self.hourly_duration[hour]
+            inc[f"hourly.cost.{hour}"] = self.hourly_cost[hour]
+            inc.update({f"hourly.latencyBins.{hour}.{i}": n for i, n in enumerate(self.hourly_bins[hour]) if n})
+        return inc
+
+    def document(self) -> dict:
+        return {
+            "count": self.count,
+            "durationS": self.duration,
+            "cost": self.cost,
+            "outcomes": self.outcomes,
+            "latencyBoundsMs": list(LATENCY_BOUNDS_MS),
+            "latencyBins": self.bins,
+            "hourly": {
+                "count": self.hourly_count,
+                "durationS": self.hourly_duration,
+                "cost": self.hourly_cost,
+                "latencyBins": self.hourly_bins,
+            },
+        }
+
+
+def _empty_document() -> dict:
+    return _Bucket().document()
+
+
+def aggregate(events) -> dict[tuple[str, str, str], _Bucket]:
+    """Group events into (workspaceId, agentId, date) buckets."""
+    buckets: dict[tuple[str, str, str], _Bucket] = {}
+    for event in events:
+        workspace_id = event.get("workspaceId")
+        if not workspace_id:
+            continue
+        at = _as_datetime(event.get("endedAt") or event.get("createdAt")).astimezone(timezone.utc)
+        key = (workspace_id, event.get("agentId") or "none", at.strftime("%Y-%m-%d"))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _Bucket()
+        bucket.add(at.hour, event)
+    return buckets
+
+
+def _key_filter(key: tuple[str, str, str]) -> dict:
+    workspace_id, agent_id, date = key
+    return {"workspaceId": workspace_id, "agentId": agent_id, "date": date}
+
+
+# Also declared in lib/indexes.js (tests/test_indexes.py keeps the two in step)
+CALL_ANALYTICS_INDEXES = [
+    ([("workspaceId", ASCENDING), ("agentId", ASCENDING), ("date", ASCENDING)],
+     {"name": "workspaceId_1_agentId_1_date_1", "unique": True}),
+    ([("workspaceId", ASCENDING), ("date", ASCENDING)], {"name": "workspaceId_1_date_1"}),
+]
+
+
+async def ensure_indexes(db) -> None:
+    for keys, options in CALL_ANALYTICS_INDEXES:
+        await db.call_analytics.create_index(keys, **options)
+
+
+class CallAnalytics:
+    def __init__(self, db=None, batch_size: int = ANALYTICS_BATCH_SIZE, flush_interval: float = ANALYTICS_FLUSH_S):
+        self._db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: list[dict] = []
+        # (batch id, events) that failed to write, oldest first; retried as they are
+        self._failed: deque[tuple[str, list[dict]]] = deque()
+        self._failed_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._indexed = False
+        self.ingested = 0
+        self.dropped = 0
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_db()
+
+    @property
+    def backlog(self) -> int:
+        return len(self._pending) + self._failed_events
+
+    def record(self, event: dict) -> None:
+        """Queue one call-completion event; written with the next batch."""
+        self._pending.append(event)
+        overflow = self.backlog - ANALYTICS_MAX_PENDING
+        while overflow > 0 and self._failed:
+            events = self._failed[0][1]
+            n = min(overflow, len(events))
+            del events[:n]
+            if not events:
+                self._failed.popleft()
+            self._failed_events -= n
+            self.dropped += n
+            overflow -= n
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+        if len(self._pending) >= self.batch_size and not self._flush_lock.locked():
+            task = asyncio.create_task(self._flush_logged())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            events, self._pending = self._pending, []
+            if events:
+                self._failed.append((uuid.uuid4().hex, events))
+                self._failed_events += len(events)
+            written = 0
+            while self._failed:
+                # Off the queue while it is written, so record() trims other batches instead
+                batch_id, events = self._failed.popleft()
+                try:
+                    await self._write_batch(batch_id, events)
+                except BaseException:
+                    self._failed.appendleft((batch_id, events))
+                    raise
+                self._failed_events -= len(events)
+                written += len(events)
+            return written
+
+    async def _write_batch(self, batch_id: str, events: list[dict]) -> None:
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        ops = []
+        for key, bucket in aggregate(events).items():
+            # Create the zeroed columns first; $inc on "hourly.count.13" then
+            # lands in the array instead of creating an object field "13"
+            ops.append(UpdateOne(
+                _key_filter(key),
+                {"$setOnInsert": {**_empty_document(), "createdAt": now}},
+                upsert=True,
+            ))
+            # A no-op when a failed earlier attempt of this batch already got here
+            ops.append(UpdateOne(
+                {**_key_filter(key), "batches": {"$ne": batch_id}},
+                {
+                    "$inc": bucket.increments(),
+                    "$set": {"updatedAt": now, "source": "live"},
+                    "$push": {"batches": {"$each": [batch_id], "$slice": -ANALYTICS_BATCH_IDS_KEPT}},
+                },
+            ))
+        if not self._indexed:
+            # Concurrent upserts on the same day need this to stay one document
+            await ensure_indexes(self.db)
+            self._indexed = True
+        await self.db.call_analytics.bulk_write(ops, ordered=True)
+        self.ingested += len(events)
+        registry.histogram("voice_analytics_flush_ms", "Call analytics batch write time").observe(
+            (time.perf_counter() - started) * 1000
+        )
+        registry.counter("voice_analytics_events_total", "Call-completion events written to roll-ups").inc(
+            len(events)
+        )
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Call analytics flush failed ({self.backlog} events pending): {e}")
+
+    def start(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_forever())
+
+    async def _flush_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Events keep buffering while the loop lags; flush anyway before they would be dropped
+            if self.backlog < ANALYTICS_MAX_PENDING // 2 and is_overloaded("analytics_flush"):
+                continue
+            await self._flush_logged()
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._flush_logged()
+
+    def stats(self) -> dict:
+        return {"pending": self.backlog, "ingested": self.ingested, "dropped": self.dropped}
+
+
+async def backfill(db=None, until: datetime | None = None) -> dict:
+    """Build roll-ups for days before ``until`` (default: today, UTC) from call_logs.
+
+    Logs are read once, in createdAt order, so only one day's buckets are in
+    memory at a time. Each finished day replaces the roll-up documents an
+    earlier backfill wrote, so running it again gives the same result. A
+    document live ingestion has written to is left alone and counted as
+    skipped; replacing it would drop increments for calls that never reached
+    call_logs in the same form.
+    """
+    # Writes go to the primary; the full call_logs scan reads from a secondary when there is one
+    source = db if db is not None else get_analytics_db()
+    db = db if db is not None else get_db()
+    if until is None:
+        until = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    started = time.perf_counter()
+    await ensure_indexes(db)
+    # No endedAt: every log of a day must land in that day's documents
+    projection = {"_id": 0, "workspaceId": 1, "agentId": 1, "createdAt": 1, "duration": 1, "durationS": 1,
+                  "status": 1, "outcome": 1, "cost": 1, "latencyMs": 1}
+    cursor = source.call_logs.find({"createdAt": {"$lt": until}}, projection).sort("createdAt", 1) \
+        .batch_size(BACKFILL_BATCH_SIZE)
+
+    logs = days = documents = skipped = 0
+    current_day = None
+    batch: list[dict] = []
+
+    async def write_day() -> int:
+        nonlocal skipped
+        now = datetime.now(timezone.utc)
+        # Matches only documents a backfill wrote. For a live document the upsert
+        # hits the unique key index instead, and that op alone fails.
+        ops = [
+            ReplaceOne({**_key_filter(key), "source": "backfill"},
+                       {**_key_filter(key), **bucket.document(), "source": "backfill", "createdAt": now,
+                        "updatedAt": now},
+                       upsert=True)
+            for key, bucket in aggregate(batch).items()
+        ]
+        if not ops:
+            return 0
+        try:
+            await db.call_analytics.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            skipped += len(errors)
+            return len(ops) - len(errors)
+        return len(ops)
+
+    async for log in cursor:
+        day = _as_datetime(log.get("createdAt")).strftime("%Y-%m-%d")
+        if day != current_day and batch:
+            documents += await write_day()
+            days += 1
+            batch = []
+        current_day = day
+        batch.append(log)
+        logs += 1
+    if batch:
+        documents += await write_day()
+        days += 1
+
+    result = {"logs": logs, "days": days, "documents": documents, "skipped": skipped,
+              "seconds": round(time.perf_counter() - started, 2)}
+    logger.info(f"Call analytics backfill: {result}")
+    return result
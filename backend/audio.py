@@ -0,0 +1,294 @@
+"""Realtime audio transcoding for Twilio media streams.
+
+Twilio sends and expects 8 kHz G.711 μ-law in 20 ms frames (160 bytes).
+Deepgram is fed 16 kHz PCM16 and ElevenLabs returns PCM16 at 22.05/24 kHz,
+so every call needs μ-law <-> PCM16 conversion, resampling and re-chunking
+in both directions.
+
+Everything on the per-frame path is NumPy-vectorized and writes into
+buffers allocated once per call: μ-law conversion is a table lookup,
+resampling uses interpolation indices/weights precomputed for the frame
+size, and re-chunking goes through fixed-capacity ring buffers. Results are
+returned as views into those buffers, valid until the next call on the
+same object.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+
+TWILIO_SAMPLE_RATE = 8000
+FRAME_MS = 20
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def frame_samples(rate: int, frame_ms: int = FRAME_MS) -> int:
+    """Samples in one frame at ``rate``; frames must be a whole number of samples."""
+    samples, remainder = divmod(rate * frame_ms, 1000)
+    if remainder:
+        raise ValueError(f"{frame_ms} ms is not a whole number of samples at {rate} Hz")
+    return samples
+
+
+def _build_decode_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + _MULAW_BIAS) << exponent) - _MULAW_BIAS
+    return np.where(sign != 0, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_encode_table() -> np.ndarray:
+    # Indexed by the int16 sample reinterpreted as uint16
+    samples = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+    sign = (samples < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(samples), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = np.clip(np.floor(np.log2(magnitude)).astype(np.int32) - 7, 0, 7)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+MULAW_DECODE_TABLE = _build_decode_table()
+MULAW_DECODE_TABLE_F32 = MULAW_DECODE_TABLE.astype(np.float32)
+MULAW_ENCODE_TABLE = _build_encode_table()
+
+
+def mulaw_to_pcm16(mulaw, out: np.ndarray | None = None) -> np.ndarray:
+    """Decode μ-law bytes (bytes/bytearray/memoryview/uint8 array) to int16."""
+    codes = np.frombuffer(mulaw, dtype=np.uint8) if not isinstance(mulaw, np.ndarray) else mulaw
+    if out is None:
+        out = np.empty(codes.shape[0], dtype=np.int16)
+    np.take(MULAW_DECODE_TABLE, codes, out=out[: codes.shape[0]])
+    return out[: codes.shape[0]]
+
+
+def pcm16_to_mulaw(pcm: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """Encode int16 samples to μ-law codes (uint8)."""
+    if out is None:
+        out = np.empty(pcm.shape[0], dtype=np.uint8)
+    np.take(MULAW_ENCODE_TABLE, pcm.view(np.uint16), out=out[: pcm.shape[0]])
+    return out[: pcm.shape[0]]
+
+
+@lru_cache(maxsize=None)
+def _resample_weights(src_rate: int, dst_rate: int, frame_ms: int) -> np.ndarray:
+    """Dense (out, in + 2) matrix mapping [prev[-2], prev[-1], *frame] to output.
+
+    Output sample i sits at input position i * in/out measured from the
+    previous frame's last sample (one input sample of latency), linearly
+    interpolated. When downsampling, a 3-tap [1/4, 1/2, 1/4] low-pass is
+    folded in first to tame aliasing. Shared by every resampler with the
+    same rates, so per-call state stays small.
+    """
+    n = frame_samples(src_rate, frame_ms)
+    m = frame_samples(dst_rate, frame_ms)
+
+    # smooth: (n + 1, n + 2), row k is the (optionally filtered) extended sample k + 1
+    smooth = np.zeros((n + 1, n + 2), dtype=np.float64)
+    if dst_rate < src_rate:
+        for k in range(n):
+            smooth[k, k:k + 3] = (0.25, 0.5, 0.25)
+        smooth[n, n + 1] = 1.0
+    else:
+        smooth[np.arange(n + 1), np.arange(1, n + 2)] = 1.0
+
+    positions = np.arange(m, dtype=np.float64) * (n / m)
+    index = np.floor(positions).astype(np.intp)
+    frac = positions - index
+    interp = np.zeros((m, n + 1), dtype=np.float64)
+    interp[np.arange(m), index] = 1.0 - frac
+    interp[np.arange(m), index + 1] += frac
+
+    weights = (interp @ smooth).astype(np.float32)
+    weights.flags.writeable = False
+    return weights
+
+
+class Resampler:
+    """Streaming fixed-frame resampler between two rates.
+
+    One matrix-vector product per frame against precomputed weights (see
+    ``_resample_weights``); the last two input samples are carried over so
+    consecutive frames join without discontinuities. Weights are convex
+    combinations, so output never leaves the int16 range and needs no clip.
+    """
+
+    __slots__ = ("src_rate", "dst_rate", "in_samples", "out_samples", "_weights", "_extended", "_work", "_out")
+
+    def __init__(self, src_rate: int, dst_rate: int, frame_ms: int = FRAME_MS):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.in_samples = frame_samples(src_rate, frame_ms)
+        self.out_samples = frame_samples(dst_rate, frame_ms)
+        self._weights = _resample_weights(src_rate, dst_rate, frame_ms)
+        self._extended = np.zeros(self.in_samples + 2, dtype=np.float32)
+        self._work = np.empty(self.out_samples, dtype=np.float32)
+        self._out = np.empty(self.out_samples, dtype=np.int16)
+
+    @property
+    def input(self) -> np.ndarray:
+        """Float32 view to fill in place with the next frame before ``resample()``."""
+        return self._extended[2:]
+
+    def reset(self) -> None:
+        self._extended[:] = 0
+
+    def resample(self) -> np.ndarray:
+        """Resample the frame currently in ``input``; returns a reused int16 view."""
+        ext = self._extended
+        np.matmul(self._weights, ext, out=self._work)
+        ext[:2] = ext[-2:]
+        np.rint(self._work, out=self._work)
+        np.copyto(self._out, self._work, casting="unsafe")
+        return self._out
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        """Resample one int16 frame of ``in_samples``; returns a reused int16 view."""
+        if frame.shape[0] != self.in_samples:
+            raise ValueError(f"expected {self.in_samples} samples, got {frame.shape[0]}")
+        self._extended[2:] = frame
+        return self.resample()
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO of samples backed by one preallocated array."""
+
+    __slots__ = ("_data", "_capacity", "_start", "_size", "dropped")
+
+    def __init__(self, capacity: int, dtype=np.int16):
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._capacity = capacity
+        self._start = 0
+        self._size = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+    def write(self, samples: np.ndarray) -> None:
+        """Append samples; on overflow the oldest samples are dropped and counted."""
+        n = samples.shape[0]
+        if n >= self._capacity:
+            self.dropped += self._size + n - self._capacity
+            samples = samples[n - self._capacity:]
+            n = self._capacity
+            self._start = 0
+            self._size = 0
+
+        overflow = self._size + n - self._capacity
+        if overflow > 0:
+            self._start = (self._start + overflow) % self._capacity
+            self._size -= overflow
+            self.dropped += overflow
+
+        end = (self._start + self._size) % self._capacity
+        first = min(n, self._capacity - end)
+        self._data[end:end + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:]
+        self._size += n
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Move up to ``len(out)`` samples into ``out``; returns how many were read."""
+        n = min(out.shape[0], self._size)
+        first = min(n, self._capacity - self._start)
+        out[:first] = self._data[self._start:self._start + first]
+        if first < n:
+            out[first:n] = self._data[:n - first]
+        self._start = (self._start + n) % self._capacity
+        self._size -= n
+        return n
+
+
+class FrameChunker:
+    """Re-chunks arbitrarily sized sample blocks into fixed-size frames."""
+
+    __slots__ = ("frame_samples", "_ring", "_frame")
+
+    def __init__(self, frame_samples: int, max_frames: int = 50, dtype=np.int16):
+        self.frame_samples = frame_samples
+        self._ring = RingBuffer(frame_samples * max_frames, dtype=dtype)
+        self._frame = np.zeros(frame_samples, dtype=dtype)
+
+    @property
+    def buffered_frames(self) -> int:
+        return len(self._ring) // self.frame_samples
+
+    @property
+    def dropped(self) -> int:
+        return self._ring.dropped
+
+    def push(self, samples: np.ndarray) -> None:
+        self._ring.write(samples)
+
+    def pop(self) -> np.ndarray | None:
+        """Next full frame as a reused view, or None when less than a frame is buffered."""
+        if len(self._ring) < self.frame_samples:
+            return None
+        self._ring.read_into(self._frame)
+        return self._frame
+
+    def clear(self) -> None:
+        self._ring.clear()
+
+
+class InboundTranscoder:
+    """Caller audio: Twilio μ-law 8 kHz frames -> PCM16 at the STT rate."""
+
+    __slots__ = ("_pcm", "_resampler")
+
+    def __init__(self, stt_rate: int = 16000):
+        self._pcm = np.empty(frame_samples(TWILIO_SAMPLE_RATE), dtype=np.int16)
+        self._resampler = Resampler(TWILIO_SAMPLE_RATE, stt_rate) if stt_rate != TWILIO_SAMPLE_RATE else None
+
+    def process(self, mulaw_frame) -> np.ndarray:
+        if self._resampler is None:
+            return mulaw_to_pcm16(mulaw_frame, out=self._pcm)
+        # Decode straight into the resampler's float input, skipping the int16 step
+        codes = np.frombuffer(mulaw_frame, dtype=np.uint8) if not isinstance(mulaw_frame, np.ndarray) else mulaw_frame
+        np.take(MULAW_DECODE_TABLE_F32, codes, out=self._resampler.input)
+        return self._resampler.resample()
+
+
+class OutboundTranscoder:
+    """Agent audio: PCM16 at the TTS rate, any block size -> μ-law 8 kHz frames."""
+
+    __slots__ = ("_input", "_resampler", "_mulaw")
+
+    def __init__(self, tts_rate: int = 24000, max_buffered_ms: int = 2000):
+        self._input = FrameChunker(frame_samples(tts_rate), max_frames=max_buffered_ms // FRAME_MS)
+        self._resampler = Resampler(tts_rate, TWILIO_SAMPLE_RATE) if tts_rate != TWILIO_SAMPLE_RATE else None
+        self._mulaw = np.empty(frame_samples(TWILIO_SAMPLE_RATE), dtype=np.uint8)
+
+    def push(self, pcm: np.ndarray) -> None:
+        self._input.push(pcm)
+
+    def push_bytes(self, data) -> None:
+        """Push little-endian PCM16 bytes as returned by TTS providers."""
+        self._input.push(np.frombuffer(data, dtype="<i2"))
+
+    def pop_frame(self) -> np.ndarray | None:
+        """Next 20 ms μ-law frame (160 codes, reused view) or None if not enough audio."""
+        frame = self._input.pop()
+        if frame is None:
+            return None
+        pcm = self._resampler.process(frame) if self._resampler else frame
+        return pcm16_to_mulaw(pcm, out=self._mulaw)
+
+    def clear(self) -> None:
+        """Drop buffered audio (e.g. when the caller barges in)."""
+        self._input.clear()
+        if self._resampler:
+            self._resampler.reset()
@@ -0,0 +1,104 @@
+"""Micro-benchmark for the per-frame audio path in audio.py.
+
+Simulates N concurrent calls on one core. Every 20 ms tick, each call
+decodes and upsamples one inbound Twilio frame (μ-law 8 kHz -> PCM16 16 kHz),
+runs it through the barge-in VAD (vad.py), and downsamples and encodes one
+outbound TTS frame (PCM16 24 kHz -> μ-law 8 kHz). Reports the per-call cost, how many calls fit in the 20 ms
+frame budget, and the bytes allocated on the hot path.
+
+    python backend/benchmarks/bench_audio.py --calls 500 --ticks 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Measure a single core: keep BLAS from spreading the matmuls over threads
+for _var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from audio import FRAME_MS, InboundTranscoder, OutboundTranscoder, frame_samples  # noqa: E402
+from vad import BargeInController, StreamingVad  # noqa: E402
+
+
+def run(calls: int, ticks: int, tts_rate: int = 24000, vad: bool = True) -> dict:
+    rng = np.random.default_rng(0)
+    inbound = [InboundTranscoder(16000) for _ in range(calls)]
+    outbound = [OutboundTranscoder(tts_rate) for _ in range(calls)]
+    barge_in = [BargeInController(StreamingVad(frame_samples=frame_samples(16000))) for _ in range(calls)]
+    mulaw_frame = rng.integers(0, 256, frame_samples(8000), dtype=np.uint8).tobytes()
+    tts_frame = rng.integers(-8000, 8000, frame_samples(tts_rate), dtype=np.int16)
+
+    def tick():
+        for i in range(calls):
+            pcm = inbound[i].process(mulaw_frame)
+            if vad:
+                barge_in[i].feed(pcm)
+            out = outbound[i]
+            out.push(tts_frame)
+            out.pop_frame()
+
+    for _ in range(10):  # warm caches and lazily-initialised NumPy paths
+        tick()
+
+    durations = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        tick()
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(20):
+        tick()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "lineno") if stat.size_diff > 0)
+
+    budget = FRAME_MS / 1000
+    mean_tick = statistics.fmean(durations)
+    per_call = mean_tick / calls
+    durations.sort()
+    return {
+        "calls": calls,
+        "ticks": ticks,
+        "tick_mean_ms": round(mean_tick * 1000, 3),
+        "tick_p99_ms": round(durations[int(len(durations) * 0.99) - 1] * 1000, 3),
+        "frame_budget_ms": FRAME_MS,
+        "per_call_frame_us": round(per_call * 1e6, 2),
+        "calls_per_core": int(budget / per_call),
+        "budget_utilisation": round(mean_tick / budget, 3),
+        "hot_path_retained_bytes": retained,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--tts-rate", type=int, default=24000, choices=[16000, 22050, 24000])
+    parser.add_argument("--no-vad", action="store_true", help="skip the VAD stage")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    result = run(args.calls, args.ticks, args.tts_rate, vad=not args.no_vad)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    for key, value in result.items():
+        print(f"{key:>26}: {value}")
+    verdict = "fits" if result["tick_p99_ms"] < FRAME_MS else "DOES NOT fit"
+    print(f"\n{args.calls} concurrent calls {verdict} in one {FRAME_MS} ms frame on one core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Campaign dialer throughput against the fake Twilio server (dialer.py).
+
+Seeds a scratch Mongo database (MONGO_URL) with workspaces, Twilio
+credentials, contacts and one running campaign per workspace. It then runs
+a CampaignDialer against fakes:twilio_app until every campaign completes.
+Twilio's signed status callbacks are delivered to an in-process
+/api/dialer/status endpoint.
+
+The report covers dials per hour, the per-workspace concurrency and CPS the
+fake observed (compare them with the caps), and duplicate dials. The
+scratch database is dropped afterwards.
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_dialer.py \\
+        --workspaces 8 --contacts 2000 --cps 5 --concurrency 40 --call-ms 3000
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def encrypt(text: str) -> str:
+    """lib/encryption.js format: iv:authTag:ciphertext, hex."""
+    import integrations
+
+    iv = os.urandom(16)
+    sealed = integrations._cipher().encrypt(iv, text.encode(), None)
+    return f"{iv.hex()}:{sealed[-16:].hex()}:{sealed[:-16].hex()}"
+
+
+async def seed(db, workspaces: int, contacts: int, cps: float, concurrency: int, invalid_every: int) -> list[str]:
+    campaign_ids = []
+    for w in range(workspaces):
+        workspace_id = f"bench-ws-{w}"
+        await db.integrations.insert_one({
+            "workspaceId": workspace_id,
+            "twilio": {"configured": True, "accountSid": encrypt(f"AC{w:032d}"), "authToken": encrypt(uuid.uuid4().hex)},
+        })
+        await db.contacts.insert_many([
+            {
+                "id": str(uuid.uuid4()),
+                "workspaceId": workspace_id,
+                "phone": "n/a" if invalid_every and i % invalid_every == 0 else f"(555) {w:03d}-{i:04d}",
+                "tags": ["bench"],
+            }
+            for i in range(contacts)
+        ])
+        await db.phone_numbers.insert_one({"id": str(uuid.uuid4()), "workspaceId": workspace_id, "number": "+15550000000"})
+        campaign_id = str(uuid.uuid4())
+        await db.campaigns.insert_one({
+            "id": campaign_id,
+            "workspaceId": workspace_id,
+            "agentId": "bench-agent",
+            "fromNumber": "+15550000000",
+            "status": "running",
+            "contactFilter": {"tags": ["bench"]},
+            "maxConcurrentCalls": concurrency,
+            "callsPerSecond": cps,
+            "retry": {"maxAttempts": 2, "delayMinutes": 0.01, "on": ["busy", "no-answer"]},
+            "progress": {},
+        })
+        campaign_ids.append(campaign_id)
+    return campaign_ids
+
+
+def serve_fake_twilio(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config("fakes:twilio_app", host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(db, args, twilio_url: str) -> dict:
+    import httpx
+    from dialer import CampaignDialer
+
+    campaign_ids = await seed(db, args.workspaces, args.contacts, args.cps, args.concurrency, args.invalid_every)
+
+    callback_port = free_port()
+    dialer = CampaignDialer(db=db, twilio_url=twilio_url, public_url=f"http://127.0.0.1:{callback_port}",
+                            answer_url=f"http://127.0.0.1:{callback_port}/twiml", poll_interval=0.5)
+    callbacks = FastAPI()
+
+    @callbacks.post("/api/dialer/status")
+    async def status(request: Request):
+        from urllib.parse import parse_qsl
+        params = dict(parse_qsl((await request.body()).decode()))
+        ok = await dialer.handle_status(params, request.headers.get("x-twilio-signature", ""))
+        return Response(status_code=204 if ok else 403)
+
+    server = uvicorn.Server(uvicorn.Config(callbacks, host="127.0.0.1", port=callback_port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    dialer.start()
+    while await db.campaigns.count_documents({"id": {"$in": campaign_ids}, "status": "completed"}) < len(campaign_ids):
+        await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - started
+    await dialer.close()
+    server.should_exit = True
+    await serving
+
+    async with httpx.AsyncClient(base_url=twilio_url) as client:
+        fake = (await client.get("/_stats")).json()
+    dialed = 0
+    outcomes: dict[str, int] = {}
+    async for campaign in db.campaigns.find({"id": {"$in": campaign_ids}}):
+        progress = campaign.get("progress") or {}
+        dialed += progress.get("dialed", 0)
+        for status, count in (progress.get("outcomes") or {}).items():
+            outcomes[status] = outcomes.get(status, 0) + count
+    rows = await db.campaign_calls.count_documents({"campaignId": {"$in": campaign_ids}})
+    return {
+        "workspaces": args.workspaces,
+        "contacts": args.workspaces * args.contacts,
+        "seconds": round(elapsed, 1),
+        "dialed": dialed,
+        "dials_per_hour": round(dialed / elapsed * 3600),
+        "cps_cap_per_hour": round(args.workspaces * args.cps * 3600),
+        "outcomes": outcomes,
+        "attempt_rows": rows,
+        "twilio_calls": fake["calls"],
+        "duplicate_dials": fake["calls"] - dialed,
+        "rate_limited": fake["rateLimited"],
+        "peak_concurrency": max(fake["peak"].values() or [0]),
+        "concurrency_cap": args.concurrency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workspaces", type=int, default=4)
+    parser.add_argument("--contacts", type=int, default=500, help="contacts per workspace")
+    parser.add_argument("--cps", type=float, default=5, help="campaign calls per second")
+    parser.add_argument("--concurrency", type=int, default=20, help="campaign concurrent-call cap")
+    parser.add_argument("--call-ms", type=float, default=2000, help="simulated call length")
+    parser.add_argument("--invalid-every", type=int, default=50, help="every Nth contact has no dialable number")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    if not os.environ.get("MONGO_URL"):
+        parser.error("MONGO_URL must point at a MongoDB server (a scratch database is created and dropped)")
+    os.environ["FAKE_TWILIO_CALL_MS"] = str(args.call_ms)
+    os.environ.setdefault("DIALER_WORKSPACE_MAX_CPS", str(args.cps))
+    os.environ.setdefault("DIALER_WORKSPACE_MAX_CONCURRENT", str(args.concurrency))
+    # Twilio enforces CPS per account; let the fake reject anything faster
+    os.environ.setdefault("FAKE_TWILIO_CPS", str(args.cps))
+
+    twilio_port = free_port()
+    serve_fake_twilio(twilio_port)
+
+    async def bench():
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        name = f"bench_dialer_{os.getpid()}"
+        try:
+            return await run(client[name], args, f"http://127.0.0.1:{twilio_port}")
+        finally:
+            await client.drop_database(name)
+            client.close()
+
+    result = asyncio.run(bench())
+    if args.json:
+        print(json.dumps(result))
+        return
+    for key, value in result.items():
+        print(f"{key:>18}: {value}")
+
+
+if __name__ == "__main__":
+    main()
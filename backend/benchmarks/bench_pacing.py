@@ -0,0 +1,124 @@
+"""Timing-jitter benchmark for outbound frame pacing (pacing.py).
+
+Runs N simulated calls on one event loop for a few seconds. Each call's TTS
+producer delivers bursty audio: a first-byte delay, then one utterance
+streamed at several times real time in 200 ms pieces, then a pause while
+the caller talks. Every frame handed to the call's ``send`` is timestamped.
+Jitter is the deviation of each inter-frame interval from 20 ms within a
+continuous playout run. Intervals of 30 ms or more are excluded: those
+are the one-tick gaps between utterances, or a late tick, which also
+shows up as the short interval that follows it.
+
+    python backend/benchmarks/bench_pacing.py --calls 500 --seconds 10
+    python backend/benchmarks/bench_pacing.py --calls 500 --mode tasks   # one sleeping task per call
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from audio import FRAME_MS  # noqa: E402
+from metrics import registry  # noqa: E402
+from pacing import FRAME_BYTES, JitterBuffer, TimerWheel  # noqa: E402
+
+PERIOD = FRAME_MS / 1000
+
+
+async def tts_producer(buffer: JitterBuffer, rng: random.Random, realtime_factor: float) -> None:
+    piece = b"\xff" * (FRAME_BYTES * 10)  # 200 ms of audio
+    while True:
+        await asyncio.sleep(rng.uniform(0.15, 0.4))  # TTS first byte
+        for _ in range(rng.randint(5, 20)):  # 1-4 s utterance
+            buffer.push(piece)
+            await asyncio.sleep(0.2 / realtime_factor * rng.uniform(0.5, 1.5))
+        buffer.end_stream()
+        await asyncio.sleep(rng.uniform(0.5, 2.0))  # caller's turn
+
+
+async def per_call_pacer(buffer: JitterBuffer) -> None:
+    while True:
+        await asyncio.sleep(PERIOD)
+        buffer.tick()
+
+
+async def run(calls: int, seconds: float, mode: str = "wheel", slots: int = 4, realtime_factor: float = 5.0) -> dict:
+    loop = asyncio.get_running_loop()
+    rng = random.Random(0)
+    sent_at = [[] for _ in range(calls)]
+    buffers = []
+    for i in range(calls):
+        stamps = sent_at[i]
+        buffers.append(JitterBuffer(lambda frame, stamps=stamps: stamps.append(loop.time())))
+
+    tasks = [asyncio.create_task(tts_producer(b, rng, realtime_factor)) for b in buffers]
+    wheel = None
+    if mode == "wheel":
+        wheel = TimerWheel(slots=slots)
+        for b in buffers:
+            wheel.add(b.tick)
+        wheel.start()
+    else:
+        tasks += [asyncio.create_task(per_call_pacer(b)) for b in buffers]
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.sleep(seconds)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+    if wheel is not None:
+        await wheel.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    deviations = []
+    for stamps in sent_at:
+        intervals = np.diff(np.asarray(stamps))
+        deviations.append(np.abs(intervals[intervals < 1.5 * PERIOD] - PERIOD))
+    jitter = np.concatenate(deviations) * 1000 if deviations else np.zeros(1)
+    frames = sum(len(s) for s in sent_at)
+    return {
+        "mode": mode,
+        "calls": calls,
+        "seconds": seconds,
+        "frames_sent": frames,
+        "frames_per_sec": round(frames / wall),
+        "jitter_mean_ms": round(float(jitter.mean()), 3),
+        "jitter_p50_ms": round(float(np.percentile(jitter, 50)), 3),
+        "jitter_p99_ms": round(float(np.percentile(jitter, 99)), 3),
+        "jitter_max_ms": round(float(jitter.max()), 3),
+        "underruns": sum(b.underruns for b in buffers),
+        "overrun_frames": sum(b.overrun_frames for b in buffers),
+        "wheel_tick_lateness": registry.histogram("voice_pacing_tick_lateness_ms").snapshot() if wheel else None,
+        "wheel_resyncs": wheel.resyncs if wheel is not None else None,
+        "loop_cpu_utilisation": round(cpu / wall, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--mode", choices=["wheel", "tasks"], default="wheel")
+    parser.add_argument("--slots", type=int, default=4, help="timer wheel slots per 20 ms period")
+    parser.add_argument("--realtime-factor", type=float, default=5.0, help="TTS generation speed vs playback")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.calls, args.seconds, args.mode, args.slots, args.realtime_factor))
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
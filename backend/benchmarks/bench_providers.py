@@ -0,0 +1,176 @@
+"""Connect-time vs. pool-hit latency for provider connections (providers.py).
+
+Starts the stand-in Deepgram and ElevenLabs servers from fakes.py over TLS
+(self-signed certificate) in a background thread. It then measures what a
+new call waits for before it can stream:
+
+- STT: a fresh authenticated WebSocket vs. a warm spare from the pool.
+- TTS: time to first audio byte with a new HTTP client (TCP + TLS + request)
+  vs. the pool's kept-alive client.
+
+Local TLS handshakes are far cheaper than real ones across the internet,
+so --connect-ms adds the provider-side session setup cost to each
+WebSocket handshake.
+
+    python backend/benchmarks/bench_providers.py --iterations 50 --connect-ms 80
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+
+API_KEY = "bench-key"
+
+
+def make_certificate(directory: Path) -> tuple[str, str]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = directory / "cert.pem", directory / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    return str(cert_path), str(key_path)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app: str, port: int, cert: str, key: str) -> uvicorn.Server:
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, ssl_certfile=cert, ssl_keyfile=key, log_level="warning")
+    server = uvicorn.Server(config)
+    server.install_signal_handlers = lambda: None
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def summarize(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(samples), 2),
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2),
+    }
+
+
+async def first_audio_byte(client: httpx.AsyncClient, url: str) -> float:
+    start = time.perf_counter()
+    async with client.stream("POST", url, json={"text": "Hello there."}, headers={"xi-api-key": API_KEY}) as response:
+        async for _ in response.aiter_bytes():
+            break
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(iterations: int, cert: str, stt_url: str, tts_url: str) -> dict:
+    from providers import ProviderPool
+
+    context = ssl.create_default_context(cafile=cert)
+    pool = ProviderPool(warm_per_key=2, deepgram_url=stt_url, elevenlabs_url=tts_url, ssl=context)
+
+    stt_cold, stt_warm = [], []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        ws = await pool._open_stt(API_KEY)
+        stt_cold.append((time.perf_counter() - start) * 1000)
+        await ws.close()
+
+    await pool.warm(deepgram_key=API_KEY)
+    for _ in range(iterations):
+        start = time.perf_counter()
+        ws = await pool.acquire_stt(API_KEY)
+        stt_warm.append((time.perf_counter() - start) * 1000)
+        await ws.close()
+        # A real call lasts minutes; let the replacement spare finish connecting
+        while len(pool._spares[next(iter(pool._spares))]) < pool.warm_per_key:
+            await asyncio.sleep(0.005)
+
+    stream_path = "/v1/text-to-speech/bench-voice/stream"
+    tts_cold, tts_warm = [], []
+    for _ in range(iterations):
+        async with httpx.AsyncClient(verify=context) as client:
+            tts_cold.append(await first_audio_byte(client, tts_url + stream_path))
+
+    client = await pool.elevenlabs_client(API_KEY)
+    for _ in range(iterations):
+        tts_warm.append(await first_audio_byte(client, stream_path))
+
+    stats = pool.stats()
+    await pool.close()
+    return {
+        "iterations": iterations,
+        "stt_connect": summarize(stt_cold),
+        "stt_pool_hit": summarize(stt_warm),
+        "tts_cold_first_byte": summarize(tts_cold),
+        "tts_pooled_first_byte": summarize(tts_warm),
+        "pool": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--connect-ms", type=float, default=0, help="simulated provider session setup per handshake")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    os.environ["FAKE_STT_CONNECT_MS"] = str(args.connect_ms)
+    os.environ["FAKE_TTS_FIRST_BYTE_MS"] = "0"
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_certificate(Path(tmp))
+        stt_port, tts_port = free_port(), free_port()
+        servers = [
+            serve_in_thread("fakes:stt_app", stt_port, cert, key),
+            serve_in_thread("fakes:elevenlabs_app", tts_port, cert, key),
+        ]
+        try:
+            result = asyncio.run(run(
+                args.iterations, cert, f"wss://localhost:{stt_port}/v1/listen", f"https://localhost:{tts_port}"
+            ))
+        finally:
+            for server in servers:
+                server.should_exit = True
+
+    if args.json:
+        print(json.dumps(result))
+        return
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Memory benchmark for the call session registry (sessions.py).
+
+Opens N sessions and drives each one through a long call. Every session
+gets many transcript turns and more caller audio than its history ring
+holds. The benchmark then reports the retained bytes per session. Because
+every per-call structure is bounded, the figure should not grow with
+--turns or --audio-seconds. It also times a full teardown of all sessions.
+
+    python backend/benchmarks/bench_sessions.py --sessions 5000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sessions import CallSessionRegistry  # noqa: E402
+
+
+class FakeSocket:
+    __slots__ = ("closed",)
+
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+async def run(sessions: int, turns: int, audio_seconds: int) -> dict:
+    line = "Could you tell me what times are available on Thursday afternoon? " * 2
+    frame = b"\x7f" * 160
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    reg = CallSessionRegistry(max_sessions=sessions)
+    sockets = []
+    for i in range(sessions):
+        session = reg.open(f"CA{i:032x}", workspace_id=f"ws-{i % 50}", agent_id=f"agent-{i % 200}")
+        session.state = "in-progress"
+        for name in ("stt", "tts"):
+            sock = FakeSocket()
+            sockets.append(sock)
+            session.attach_provider(name, sock)
+        for t in range(turns):
+            session.add_turn("user" if t % 2 else "assistant", f"{line}{t}")
+        for _ in range(audio_seconds * 50):
+            session.record_inbound(frame)
+
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    await reg.close_all("benchmark")
+    teardown = time.perf_counter() - start
+
+    return {
+        "sessions": sessions,
+        "turns_per_call": turns,
+        "audio_seconds_per_call": audio_seconds,
+        "bytes_per_session": retained // sessions,
+        "total_mb": round(retained / 2**20, 1),
+        "teardown_ms": round(teardown * 1000, 1),
+        "sockets_closed": sum(s.closed for s in sockets),
+        "sessions_left": len(reg),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--audio-seconds", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.sessions, args.turns, args.audio_seconds))
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Replay captured API traffic (traffic.py) against a local stack and compare builds.
+
+Reads one or more capture files and sends each request to --base-url. By
+default requests keep their original spacing. --speed 2 halves the gaps,
+and --speed 0 sends them as fast as --concurrency allows. Requests that
+were authenticated when captured carry --token instead of the original
+credentials, which were never stored. Redacted fields are sent as
+"<redacted>", so requests that need a real secret fail the same way on
+every build.
+
+Requests whose body was not captured (too large, not JSON or form data;
+see ``bodyOmitted`` in traffic.py) are skipped. Sending them empty would
+measure a different request and change its status. The report counts them
+per reason under ``skipped``.
+
+The report gives latency percentiles per route (ids collapsed), the status
+codes and the share of responses whose status differs from the capture.
+Save one build's run with --save and compare a later run against it with
+--baseline. Any route whose p95 grew by more than --max-regression is
+listed, and the exit status is 1.
+
+Captures include writes (imports, deletes). Replay them only against a
+disposable stack, or pass --methods GET.
+
+    python backend/benchmarks/replay_traffic.py backend/traces/capture-*.jsonl.gz \\
+        --base-url http://localhost:8001 --token "$TOKEN" --speed 4 --save before.json
+    python backend/benchmarks/replay_traffic.py backend/traces/capture-*.jsonl.gz \\
+        --base-url http://localhost:8001 --token "$TOKEN" --speed 4 --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+
+from traffic import read_trace  # noqa: E402
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": round(percentile(ordered, 0.50), 1),
+        "p95": round(percentile(ordered, 0.95), 1),
+        "p99": round(percentile(ordered, 0.99), 1),
+        "max": round(ordered[-1], 1) if ordered else 0.0,
+    }
+
+
+def omitted_body(record: dict) -> str | None:
+    """Why the record's body can't be resent, or None. Older captures have no
+    bodyOmitted: a body that has bytes but was stored as null is treated as omitted."""
+    if record.get("bodyOmitted"):
+        return record["bodyOmitted"]
+    if record.get("body") is None and record.get("bodyBytes"):
+        return "not_captured"
+    return None
+
+
+def request_args(record: dict, token: str | None) -> dict:
+    headers = {}
+    if record.get("contentType"):
+        headers["content-type"] = record["contentType"]
+    if record.get("auth") and token:
+        headers["authorization"] = f"Bearer {token}"
+    body = record.get("body")
+    if body is None:
+        content = None
+    elif isinstance(body, str):
+        content = body.encode()
+    else:
+        content = json.dumps(body).encode()
+    return {"method": record["method"], "url": record["path"], "headers": headers, "content": content}
+
+
+async def replay(records: list[dict], base_url: str, token: str | None, speed: float, concurrency: int,
+                 timeout: float) -> dict:
+    skipped: dict[str, int] = {}
+    for record in records:
+        reason = omitted_body(record)
+        if reason:
+            skipped[reason] = skipped.get(reason, 0) + 1
+    records = sorted((r for r in records if not omitted_body(r)), key=lambda r: r["t"])
+    latencies: dict[str, list[float]] = {}
+    statuses: dict[str, int] = {}
+    mismatched = errors = 0
+    limit = asyncio.Semaphore(concurrency)
+
+    async def send(client: httpx.AsyncClient, record: dict) -> None:
+        nonlocal mismatched, errors
+        async with limit:
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request_args(record, token))
+            except httpx.HTTPError:
+                errors += 1
+                return
+            ms = (time.perf_counter() - started) * 1000
+        latencies.setdefault(record["route"], []).append(ms)
+        status = str(response.status_code)
+        statuses[status] = statuses.get(status, 0) + 1
+        if response.status_code != record.get("status"):
+            mismatched += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        first = records[0]["t"] if records else 0.0
+        tasks = []
+        for record in records:
+            if speed > 0:
+                delay = (record["t"] - first) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, record)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    every = [ms for samples in latencies.values() for ms in samples]
+    return {
+        "requests": len(records),
+        "skipped": skipped,
+        "seconds": round(elapsed, 1),
+        "rps": round(len(records) / elapsed, 1) if elapsed else 0.0,
+        "errors": errors,
+        "status_mismatch_pct": round(100 * mismatched / len(records), 1) if records else 0.0,
+        "statuses": statuses,
+        "overall": summarize(every),
+        "routes": {route: summarize(samples) for route, samples in sorted(latencies.items())},
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression: float, min_count: int) -> list[str]:
+    """Routes whose p95 grew by more than ``max_regression`` (a fraction) over the baseline."""
+    regressions = []
+    for route, now in result["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before or now["count"] < min_count or before["count"] < min_count or before["p95"] <= 0:
+            continue
+        change = now["p95"] / before["p95"] - 1
+        if change > max_regression:
+            regressions.append(f"{route}: p95 {before['p95']} -> {now['p95']} ms (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+", help="capture files (capture-*.jsonl.gz)")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--token", help="bearer token for requests that were authenticated when captured")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale; 0 = no pacing")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--methods", default="", help="comma-separated methods to replay, e.g. GET")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON from an earlier build to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 growth per route")
+    parser.add_argument("--min-count", type=int, default=20, help="skip routes with fewer samples")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    records = read_trace(args.traces)
+    if args.methods:
+        methods = {m.strip().upper() for m in args.methods.split(",")}
+        records = [r for r in records if r["method"] in methods]
+
+    result = asyncio.run(replay(records, args.base_url, args.token, args.speed, args.concurrency, args.timeout))
+    if args.save:
+        Path(args.save).write_text(json.dumps(result, indent=2))
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(result, json.loads(Path(args.baseline).read_text()), args.max_regression,
+                              args.min_count)
+        result["regressions"] = regressions
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key in ("requests", "skipped", "seconds", "rps", "errors", "status_mismatch_pct", "statuses", "overall"):
+            print(f"{key:>20}: {result[key]}")
+        print()
+        for route, stats in result["routes"].items():
+            print(f"  {route:<50} n={stats['count']:<6} p50={stats['p50']:<8} p95={stats['p95']:<8} p99={stats['p99']}")
+        for line in regressions:
+            print(f"REGRESSION {line}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Benchmark suite with stored baselines and regression gating.
+
+Runs a fixed set of benchmarks against the stand-in servers from fakes.py.
+The server.py app runs in-process with its proxy pointed at fakes:api_app.
+Results are compared with benchmarks/baselines.json:
+
+    proxy        per-request overhead of the /api proxy over calling the upstream directly
+    streaming    proxy throughput for a large response body
+    cache        TTS cache hit latency (index lookup + mmap)
+    json         encoding 10k-row contact and audit-log listings with jsoncodec, and
+                 decoding the contact listing
+    import       contact import rows/sec through the proxy (1000-row bulk requests)
+    ws           many concurrent real-time audio WebSockets to the STT stand-in
+    startup      importing server.py in a fresh interpreter, and a fresh uvicorn worker's
+                 time from spawn until /internal/ready answers 200
+
+A metric regresses when it is worse than its baseline by more than the
+threshold. Higher is worse for latencies and lower is worse for
+throughputs. The default threshold is --threshold or BENCH_MAX_REGRESSION,
+and a baseline entry can override it with its own "threshold". The report
+lists every metric with its baseline, current value and change, and the
+exit status is 1 on any regression.
+
+Baselines are machine-specific. Refresh them with --update on the machine
+that gates (CI), and commit the file.
+
+    python backend/benchmarks/suite.py
+    python backend/benchmarks/suite.py --only proxy,json --threshold 0.1
+    python backend/benchmarks/suite.py --update
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+BASELINES = Path(__file__).with_name("baselines.json")
+DEFAULT_THRESHOLD = float(os.environ.get("BENCH_MAX_REGRESSION", 0.25))
+LOWER, HIGHER = "lower", "higher"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+class Stack:
+    """fakes:api_app as the upstream, server.py's app proxying to it, and fakes:stt_app."""
+
+    def __init__(self):
+        self.scratch = tempfile.TemporaryDirectory(prefix="bench-suite-")
+        os.environ.setdefault("RECORDINGS_DIR", os.path.join(self.scratch.name, "recordings"))
+        os.environ.setdefault("TTS_CACHE_DIR", os.path.join(self.scratch.name, "tts_cache"))
+        # Nothing here needs Mongo; keep backend/.env from starting the dialer and analytics writers
+        os.environ["MONGO_URL"] = ""
+        import fakes
+        import server
+
+        upstream_port, proxy_port, stt_port = free_port(), free_port(), free_port()
+        self.upstream = f"http://127.0.0.1:{upstream_port}"
+        self.proxy = f"http://127.0.0.1:{proxy_port}"
+        self.stt = f"ws://127.0.0.1:{stt_port}/v1/listen"
+        server.NEXTJS_URL = self.upstream
+        # server.py logs every proxied request through httpx at INFO
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        self.servers = [serve(fakes.api_app, upstream_port), serve(server.app, proxy_port), serve(fakes.stt_app, stt_port)]
+
+    def close(self) -> None:
+        for server in self.servers:
+            server.should_exit = True
+        self.scratch.cleanup()
+
+
+async def bench_proxy(stack: Stack, args) -> dict:
+    async def timings(base_url: str) -> list[float]:
+        samples = []
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            for i in range(args.requests + 20):
+                started = time.perf_counter()
+                response = await client.get("/api/contacts", params={"limit": 20})
+                response.raise_for_status()
+                if i >= 20:
+                    samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    direct = await timings(stack.upstream)
+    proxied = await timings(stack.proxy)
+    return {
+        "proxy_overhead_p50_ms": metric(percentile(proxied, 0.5) - percentile(direct, 0.5), "ms", LOWER),
+        "proxy_overhead_p95_ms": metric(percentile(proxied, 0.95) - percentile(direct, 0.95), "ms", LOWER),
+    }
+
+
+async def bench_streaming(stack: Stack, args) -> dict:
+    size = args.stream_mb * 1024 * 1024
+    best = 0.0
+    async with httpx.AsyncClient(base_url=stack.proxy, timeout=60.0) as client:
+        for _ in range(3):
+            started = time.perf_counter()
+            received = 0
+            async with client.stream("GET", "/api/_bytes", params={"n": size}) as response:
+                async for chunk in response.aiter_raw():
+                    received += len(chunk)
+            best = max(best, received / 2**20 / (time.perf_counter() - started))
+    return {"proxy_stream_mb_s": metric(best, "MB/s", HIGHER)}
+
+
+CACHE_BLOCKS = 10
+
+
+async def bench_cache(stack: Stack, args) -> dict:
+    from tts_cache import TtsCache
+
+    cache = TtsCache(os.path.join(stack.scratch.name, "bench_cache"), max_bytes=1 << 30)
+    keys = [f"{i:064x}" for i in range(256)]
+    audio = b"\xff" * 16000
+    for key in keys:
+        cache.put(key, audio)
+    samples = []
+    block_p50s = []
+    # µs-scale: one scheduler hiccup moves a whole run, so the median is the best of several blocks
+    block = max(args.cache_reads // CACHE_BLOCKS, 1)
+    for _ in range(CACHE_BLOCKS):
+        block_samples = []
+        for _ in range(block):
+            key = random.choice(keys)
+            started = time.perf_counter_ns()
+            mapped = cache.get(key)
+            len(mapped)
+            mapped.close()
+            block_samples.append((time.perf_counter_ns() - started) / 1000)
+        block_p50s.append(percentile(block_samples, 0.5))
+        samples += block_samples
+    return {
+        "cache_hit_p50_us": metric(min(block_p50s), "us", LOWER),
+        "cache_hit_p99_us": metric(percentile(samples, 0.99), "us", LOWER),
+    }
+
+
+async def bench_json(stack: Stack, args) -> dict:
+    import fakes
+    import jsoncodec
+
+    def best_ms(fn, runs: int = 5) -> float:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        # Normalized to 10k rows so --rows can shrink a run without moving the baseline
+        return min(timings) * 10000 / args.rows
+
+    contacts = fakes.contact_listing(args.rows)
+    audit_logs = fakes.audit_log_listing(args.rows)
+    contacts_body = jsoncodec.dumps(contacts)
+
+    return {
+        # What a native endpoint returning the listing spends in its response class
+        "json_listing_10k_ms": metric(best_ms(lambda: jsoncodec.JSONResponse(contacts)), "ms", LOWER),
+        "json_audit_10k_ms": metric(best_ms(lambda: jsoncodec.JSONResponse(audit_logs)), "ms", LOWER),
+        "json_decode_10k_ms": metric(best_ms(lambda: jsoncodec.loads(contacts_body)), "ms", LOWER),
+    }
+
+
+async def bench_import(stack: Stack, args) -> dict:
+    batch = {"contacts": [
+        {"firstName": "Import", "lastName": str(i), "phone": f"+1555{i:07d}", "email": f"i{i}@example.com",
+         "tags": ["bench"], "customFields": {"source": "bench"}}
+        for i in range(1000)
+    ]}
+    body = json.dumps(batch).encode()
+    headers = {"content-type": "application/json"}
+    limit = asyncio.Semaphore(4)
+    imported = 0
+
+    async def send(client):
+        nonlocal imported
+        async with limit:
+            response = await client.post("/api/contacts/bulk", content=body, headers=headers)
+            response.raise_for_status()
+            imported += response.json()["imported"]
+
+    async with httpx.AsyncClient(base_url=stack.proxy, timeout=60.0) as client:
+        await send(client)
+        imported = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(send(client) for _ in range(args.import_batches)))
+        elapsed = time.perf_counter() - started
+    return {"contact_import_rows_s": metric(imported / elapsed, "rows/s", HIGHER)}
+
+
+async def bench_ws(stack: Stack, args) -> dict:
+    """Each session sends a 20 ms μ-law frame every 20 ms, like a live call's inbound audio."""
+    from websockets.asyncio.client import connect
+
+    frame = b"\xff" * 160
+    frames_due = int(args.ws_seconds / 0.02)
+    lags: list[float] = []
+
+    async def session():
+        async with connect(stack.stt, additional_headers={"Authorization": "Token bench"}) as ws:
+            async def receive():
+                async for _ in ws:
+                    pass
+
+            receiver = asyncio.create_task(receive())
+            start = time.perf_counter()
+            for i in range(frames_due):
+                due = start + i * 0.02
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lags.append((time.perf_counter() - due) * 1000)
+                await ws.send(frame)
+            await ws.send(json.dumps({"type": "CloseStream"}))
+            # The server closes after CloseStream; let pending transcripts drain first
+            await receiver
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(args.ws_sessions)))
+    elapsed = time.perf_counter() - started
+    return {
+        "ws_frame_lag_p95_ms": metric(percentile(lags, 0.95), "ms", LOWER),
+        # Audio seconds sent per wall-clock second; 1.0 when every session kept up
+        "ws_realtime_ratio": metric(min(1.0, args.ws_seconds / elapsed), "ratio", HIGHER),
+    }
+
+
+async def bench_startup(stack: Stack, args) -> dict:
+    """Cold start of a worker process, the way the autoscaler sees it."""
+    env = {**os.environ, "NEXTJS_URL": stack.upstream}
+    probe = "import time; t = time.perf_counter(); import server; print((time.perf_counter() - t) * 1000)"
+    result = await asyncio.to_thread(subprocess.run, [sys.executable, "-c", probe], cwd=BACKEND, env=env,
+                                     capture_output=True, text=True, check=True)
+    import_ms = float(result.stdout.strip().splitlines()[-1])
+
+    port = free_port()
+    started = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while True:
+                if worker.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {worker.returncode} before it was ready")
+                try:
+                    if (await client.get("/internal/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.005)
+        ready_ms = (time.perf_counter() - started) * 1000
+    finally:
+        worker.terminate()
+        await asyncio.to_thread(worker.wait)
+    return {
+        "server_import_ms": metric(import_ms, "ms", LOWER),
+        "cold_start_ready_ms": metric(ready_ms, "ms", LOWER),
+    }
+
+
+BENCHMARKS = {
+    "proxy": bench_proxy,
+    "streaming": bench_streaming,
+    "cache": bench_cache,
+    "json": bench_json,
+    "import": bench_import,
+    "ws": bench_ws,
+    "startup": bench_startup,
+}
+
+
+def compare(results: dict, baselines: dict, threshold: float) -> tuple[list[dict], bool]:
+    rows, regressed = [], False
+    for name, current in results.items():
+        base = baselines.get(name)
+        row = {"metric": name, "unit": current["unit"], "current": current["value"], "baseline": None,
+               "change": None, "status": "new"}
+        if base:
+            limit = base.get("threshold", threshold)
+            before, now = base["value"], current["value"]
+            if before:
+                # Positive change means worse, whichever direction is better
+                change = (now - before) / abs(before) if current["better"] == LOWER else (before - now) / abs(before)
+                row["change"] = round(change, 3)
+                row["status"] = "REGRESSED" if change > limit else ("improved" if change < -limit else "ok")
+                regressed |= change > limit
+            row["baseline"] = before
+        rows.append(row)
+    return rows, regressed
+
+
+def report(rows: list[dict]) -> str:
+    lines = [f"{'metric':<26} {'baseline':>12} {'current':>12} {'worse by':>9}  status"]
+    for row in rows:
+        baseline = "-" if row["baseline"] is None else f"{row['baseline']:g}"
+        change = "-" if row["change"] is None else f"{row['change']:+.0%}"
+        lines.append(f"{row['metric']:<26} {baseline:>12} {row['current']:>12g} {change:>9}  {row['status']}"
+                     f"  ({row['unit']})")
+    return "\n".join(lines)
+
+
+async def run(names: list[str], args) -> dict:
+    stack = await asyncio.to_thread(Stack)
+    try:
+        results = {}
+        for name in names:
+            # Best of --repeat runs: noise on a shared machine only ever makes a run slower
+            for _ in range(args.repeat):
+                for key, current in (await BENCHMARKS[name](stack, args)).items():
+                    best = results.get(key)
+                    if best is None or (current["value"] < best["value"]) == (current["better"] == LOWER):
+                        results[key] = current
+        return results
+    finally:
+        stack.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--baselines", default=str(BASELINES))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed fraction worse")
+    parser.add_argument("--update", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the best is kept")
+    parser.add_argument("--requests", type=int, default=300, help="proxy: sequential requests per path")
+    parser.add_argument("--stream-mb", type=int, default=32)
+    parser.add_argument("--cache-reads", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=10000, help="json: listing size")
+    parser.add_argument("--import-batches", type=int, default=40, help="import: 1000-row requests")
+    parser.add_argument("--ws-sessions", type=int, default=200)
+    parser.add_argument("--ws-seconds", type=float, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(names, args))
+    path = Path(args.baselines)
+    stored = json.loads(path.read_text()) if path.exists() else {}
+    rows, regressed = compare(results, stored, args.threshold)
+
+    if args.update:
+        for name, current in results.items():
+            # Keep hand-tuned per-metric thresholds
+            stored[name] = {**stored.get(name, {}), **current}
+        path.write_text(json.dumps(dict(sorted(stored.items())), indent=2) + "\n")
+        regressed = False
+
+    if args.json:
+        print(json.dumps({"results": results, "comparison": rows, "regressed": regressed}))
+    else:
+        print(report(rows))
+        if regressed:
+            print(f"\nRegression past the {args.threshold:.0%} threshold (or a metric's own) - see REGRESSED rows")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
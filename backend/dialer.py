@@ -0,0 +1,843 @@
+"""Outbound campaign dialer.
+
+A campaign (``campaigns`` collection, written by the Next.js API) dials a
+workspace's contacts through the workspace's Twilio integration. Each
+node runs one ``CampaignDialer``:
+
+- Contacts are streamed from Mongo in ``_id`` order with a cursor. At most
+  ``DIALER_PREFETCH`` contacts per campaign are in memory at a time, so a
+  100k-contact list costs the same as a small one.
+- Ready dial jobs go through a single ``asyncio.PriorityQueue``, ordered
+  by campaign priority and then by arrival. Jobs that have to wait (retry
+  delays, calling hours) sit in a timer heap until they are due.
+- A job is dialed only once it passes three limiters: the campaign's and
+  the workspace's (concurrent calls plus calls per second) and the node's
+  concurrent-call cap. A blocked job is parked on the limiter that blocked
+  it, and is re-queued when that limiter frees a slot or a token. A busy
+  workspace therefore never holds up another.
+- Twilio reports each call's outcome to ``/api/dialer/status``. Busy,
+  no-answer and failed calls are retried according to the campaign's retry
+  policy.
+
+Twilio fetches TwiML from ``DIALER_ANSWER_URL`` when a contact answers.
+This server has no TwiML handler, so the URL has to point at whatever
+connects the call to the agent. Until it is set the dialer pauses every
+campaign it picks up instead of dialing it. A campaign is also paused if its
+``fromNumber`` is not one of the workspace's ``phone_numbers``.
+
+Progress is persisted in two places:
+
+- Every dial attempt is a ``campaign_calls`` row. The row is unique per
+  campaign and contact, so one campaign never dials a contact twice.
+- The campaign document stores a contact cursor. Every contact below the
+  cursor has been handled.
+
+After a restart, a campaign resumes from its cursor and reloads its
+pending retries. A lease on the campaign document stops two nodes from
+running the same campaign.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import heapq
+import hmac
+import itertools
+import logging
+import math
+import os
+import re
+import socket
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict, deque
+from datetime import datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import httpx
+from pymongo import ASCENDING
+from pymongo.errors import CursorNotFound, DuplicateKeyError
+
+from integrations import get_db, get_integration_secrets
+from loop_monitor import is_overloaded
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TWILIO_API_URL = os.environ.get("TWILIO_API_URL", "https://api.twilio.com")
+# Public URL Twilio uses to reach this server (status webhooks)
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "http://localhost:8001")
+# TwiML Twilio fetches when a contact answers; agentId and campaignId are appended
+DIALER_ANSWER_URL = os.environ.get("DIALER_ANSWER_URL") or None
+DIALER_MAX_CONCURRENT = int(os.environ.get("DIALER_MAX_CONCURRENT", 500))
+DIALER_WORKSPACE_MAX_CONCURRENT = int(os.environ.get("DIALER_WORKSPACE_MAX_CONCURRENT", 50))
+DIALER_WORKSPACE_MAX_CPS = float(os.environ.get("DIALER_WORKSPACE_MAX_CPS", 5))
+DIALER_PREFETCH = int(os.environ.get("DIALER_PREFETCH", 200))
+DIALER_POLL_S = float(os.environ.get("DIALER_POLL_S", 5))
+DIALER_CALL_TIMEOUT_S = float(os.environ.get("DIALER_CALL_TIMEOUT_S", 1800))
+DIALER_DEFAULT_COUNTRY_CODE = os.environ.get("DIALER_DEFAULT_COUNTRY_CODE", "1")
+LEASE_S = 30.0
+RATE_LIMITED_BACKOFF_S = 1.0
+RECORD_RETRY_S = 5.0
+
+# Built by the dialer itself because the unique index is what stops a campaign dialing a contact twice.
+# lib/indexes.js declares the same indexes (tests/test_indexes.py keeps the two in step).
+CAMPAIGN_CALLS_INDEXES = [
+    ([("campaignId", ASCENDING), ("contactId", ASCENDING)], {"name": "campaignId_1_contactId_1", "unique": True}),
+    ([("callSid", ASCENDING)], {"name": "callSid_1", "sparse": True}),
+]
+
+# Twilio's terminal CallStatus values
+FINAL_STATUSES = frozenset({"completed", "busy", "no-answer", "failed", "canceled"})
+DEFAULT_RETRY = {"maxAttempts": 2, "delayMinutes": 60, "on": ["busy", "no-answer", "failed"]}
+
+
+def to_e164(phone: str | None) -> str | None:
+    """Best-effort E.164 for a stored contact number, or None if it can't be dialed."""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) < 8:
+        return None
+    if not phone.strip().startswith("+") and len(digits) == 10:
+        digits = DIALER_DEFAULT_COUNTRY_CODE + digits
+    return "+" + digits
+
+
+def twilio_signature(auth_token: str, url: str, params: dict) -> str:
+    """X-Twilio-Signature for a form-encoded webhook POST."""
+    payload = url + "".join(f"{key}{params[key]}" for key in sorted(params))
+    digest = hmac.new(auth_token.encode(), payload.encode(), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode()
+
+
+def retry_policy(campaign: dict) -> tuple[int, float, frozenset]:
+    """(max attempts, delay in seconds, statuses worth retrying) for a campaign document."""
+    retry = {**DEFAULT_RETRY, **(campaign.get("retry") or {})}
+    return max(1, int(retry["maxAttempts"])), float(retry["delayMinutes"]) * 60, frozenset(retry["on"])
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, matching what motor returns for stored dates
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class CallingHours:
+    """Local dialing window, e.g. 09:00-20:00 Monday to Friday in the campaign's timezone."""
+
+    __slots__ = ("tz", "start", "end", "days")
+
+    def __init__(self, config: dict | None):
+        config = config or {}
+        self.tz = ZoneInfo(config.get("timezone") or "UTC")
+        self.start = dtime.fromisoformat(config.get("start") or "00:00")
+        self.end = dtime.fromisoformat(config["end"]) if config.get("end") else dtime.max
+        self.days = frozenset(config.get("days") or range(1, 8))  # ISO weekdays
+
+    def wait(self, now: float) -> float | None:
+        """Seconds until dialing is allowed: 0 inside the window, None if it never opens."""
+        local = datetime.fromtimestamp(now, self.tz)
+        for offset in range(8):
+            day = local.date() + timedelta(days=offset)
+            if day.isoweekday() not in self.days:
+                continue
+            # Compare timestamps, not aware datetimes, so DST shifts are counted
+            opens = datetime.combine(day, self.start, self.tz).timestamp()
+            closes = datetime.combine(day, self.end, self.tz).timestamp()
+            if now < opens:
+                return opens - now
+            if now < closes:
+                return 0.0
+        return None
+
+
+class _Limiter:
+    """Concurrent-call cap plus a calls-per-second token bucket (burst of one)."""
+
+    __slots__ = ("max_active", "rate", "tokens", "updated", "active", "parked", "timer")
+
+    def __init__(self, max_active: int, rate: float = math.inf):
+        self.max_active = max_active
+        self.rate = rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.active = 0
+        self.parked: deque[DialJob] = deque()
+        self.timer: asyncio.TimerHandle | None = None
+
+    def wait(self, now: float) -> float:
+        """Seconds until a call may start here (inf while at the concurrency cap)."""
+        if self.active >= self.max_active:
+            return math.inf
+        if self.rate == math.inf:
+            return 0.0
+        self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1.0 - 1e-9 else (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.active += 1
+        if self.rate != math.inf:
+            self.tokens -= 1.0
+
+    def release(self) -> None:
+        self.active -= 1
+
+
+class DialJob:
+    __slots__ = ("run", "seq", "contact_id", "oid", "phone", "attempt", "call_sid", "deadline", "limiters")
+
+    def __init__(self, run: _CampaignRun, seq: int, contact_id: str, phone: str, attempt: int = 1, oid=None):
+        self.run = run
+        self.seq = seq
+        self.contact_id = contact_id
+        self.oid = oid  # contacts._id until the first attempt is recorded
+        self.phone = phone
+        self.attempt = attempt
+        self.call_sid: str | None = None
+        self.deadline = 0.0
+        self.limiters: tuple[_Limiter, ...] = ()
+
+
+class _CampaignRun:
+    """In-memory state of a campaign this node is dialing."""
+
+    def __init__(self, doc: dict):
+        self.id = doc["id"]
+        self.workspace_id = doc["workspaceId"]
+        self.agent_id = doc.get("agentId")
+        self.from_number = doc.get("fromNumber")
+        self.priority = int(doc.get("priority") or 0)
+        self.hours = CallingHours(doc.get("callingHours"))
+        self.max_attempts, self.retry_delay, self.retry_on = retry_policy(doc)
+        self.limiter = _Limiter(
+            min(int(doc.get("maxConcurrentCalls") or 5), DIALER_WORKSPACE_MAX_CONCURRENT),
+            min(float(doc.get("callsPerSecond") or 1), DIALER_WORKSPACE_MAX_CPS),
+        )
+        self.tags = (doc.get("contactFilter") or {}).get("tags") or []
+        self.cursor = (doc.get("progress") or {}).get("cursor")
+        self.last_fed = self.cursor
+        # contacts._id -> settled, in feed order; the cursor advances over the settled prefix
+        self.fed: OrderedDict[object, bool] = OrderedDict()
+        self.outstanding = 0  # jobs queued, parked, waiting or on a call
+        self.exhausted = False
+        self.stopped = False
+        self.room = asyncio.Event()
+        self.feeder: asyncio.Task | None = None
+        self.cursor_dirty = False
+
+    def settle(self, oid) -> None:
+        """Mark a fed contact as handled and advance the cursor past the handled prefix."""
+        if oid not in self.fed:
+            return
+        self.fed[oid] = True
+        while self.fed and next(iter(self.fed.values())):
+            self.cursor = self.fed.popitem(last=False)[0]
+            self.cursor_dirty = True
+        self.room.set()
+
+
+class CampaignDialer:
+    def __init__(self, db=None, twilio_url: str = TWILIO_API_URL, public_url: str = PUBLIC_BASE_URL,
+                 answer_url: str | None = DIALER_ANSWER_URL, max_concurrent: int = DIALER_MAX_CONCURRENT,
+                 poll_interval: float = DIALER_POLL_S):
+        self._db = db
+        self.twilio_url = twilio_url
+        self.public_url = public_url.rstrip("/")
+        self.status_callback_url = f"{self.public_url}/api/dialer/status"
+        self.answer_url = answer_url
+        self.poll_interval = poll_interval
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._node = _Limiter(max_concurrent)
+        self._workspaces: dict[str, _Limiter] = {}
+        self._runs: dict[str, _CampaignRun] = {}
+        self._active: dict[str, DialJob] = {}  # Twilio CallSid -> job
+        self._ready: asyncio.PriorityQueue | None = None
+        self._delayed: list[tuple[float, int, DialJob]] = []
+        self._delayed_changed: asyncio.Event | None = None
+        self._seq = itertools.count()
+        self._client: httpx.AsyncClient | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._loops: list[asyncio.Task] = []
+        self._indexed = False
+        # Progress increments by campaign id, not by run: a call that finishes after its
+        # campaign was paused (or resumed as a new run) still counts toward the campaign
+        self._counts: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self._active_gauge = registry.gauge("voice_dialer_active_calls", "Campaign calls ringing or in progress")
+        self._twilio_ms = registry.histogram("voice_dialer_twilio_request_ms", "Twilio create-call request latency")
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else get_db()
+
+    # ----- lifecycle -----
+
+    def start(self) -> None:
+        if self._loops:
+            return
+        self._ready = asyncio.PriorityQueue()
+        self._delayed_changed = asyncio.Event()
+        self._client = httpx.AsyncClient(
+            base_url=self.twilio_url,
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        )
+        self._loops = [
+            asyncio.create_task(self._dispatch_forever()),
+            asyncio.create_task(self._timers_forever()),
+            asyncio.create_task(self._sync_forever()),
+        ]
+
+    async def close(self) -> None:
+        for task in self._loops:
+            task.cancel()
+        for run in list(self._runs.values()):
+            self._stop(run)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._loops, *self._tasks, return_exceptions=True)
+        self._loops = []
+        runs = list(self._runs.values())
+        self._runs.clear()
+        for run in runs:
+            try:
+                await self._flush(run)
+            except Exception:
+                logger.exception(f"Failed to save progress for campaign {run.id}")
+        try:
+            await self._flush_counts()
+        except Exception:
+            logger.exception("Failed to save campaign progress")
+        if runs:
+            # Hand the campaigns over immediately instead of after the lease runs out
+            await self.db.campaigns.update_many(
+                {"id": {"$in": [run.id for run in runs]}, "dialer.owner": self.node_id},
+                {"$set": {"dialer.leaseUntil": _utcnow()}},
+            )
+        if self._client is not None:
+            await self._client.aclose()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ----- campaign ownership -----
+
+    async def _sync_forever(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Dialer sync failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def sync(self) -> None:
+        """Claim running campaigns, drop paused or cancelled ones, renew leases, save progress."""
+        if not self._indexed:
+            await self._ensure_indexes()
+            self._indexed = True
+
+        now = _utcnow()
+        docs = await self.db.campaigns.find({"status": "running"}, {"_id": 0}).to_list(None)
+        running = {doc["id"]: doc for doc in docs}
+
+        for run in list(self._runs.values()):
+            doc = running.get(run.id)
+            if doc is None or (doc.get("dialer") or {}).get("owner") != self.node_id:
+                self._stop(run)
+                del self._runs[run.id]
+                await self._flush(run)
+
+        lease = {"owner": self.node_id, "leaseUntil": now + timedelta(seconds=LEASE_S)}
+        for campaign_id, doc in running.items():
+            if campaign_id in self._runs:
+                continue
+            claimed = await self.db.campaigns.update_one(
+                {
+                    "id": campaign_id,
+                    "status": "running",
+                    "$or": [{"dialer": None}, {"dialer.owner": self.node_id}, {"dialer.leaseUntil": {"$lt": now}}],
+                },
+                {"$set": {"dialer": lease}},
+            )
+            if claimed.modified_count:
+                await self._start_run(doc)
+
+        if self._runs:
+            await self.db.campaigns.update_many(
+                {"id": {"$in": list(self._runs)}, "dialer.owner": self.node_id},
+                {"$set": {"dialer.leaseUntil": lease["leaseUntil"]}},
+            )
+        self._expire_calls()
+        for run in list(self._runs.values()):
+            await self._flush(run)
+        await self._flush_counts()
+
+    async def _ensure_indexes(self) -> None:
+        for keys, options in CAMPAIGN_CALLS_INDEXES:
+            await self.db.campaign_calls.create_index(keys, **options)
+
+    async def _start_run(self, doc: dict) -> None:
+        run = _CampaignRun(doc)
+        self._runs[run.id] = run
+        if not self.answer_url:
+            # Twilio would play its application-error message to every contact who answers
+            await self._halt(run, "Outbound calling is not configured (DIALER_ANSWER_URL)")
+            return
+        if not run.from_number or not await self.db.phone_numbers.count_documents(
+                {"workspaceId": run.workspace_id, "number": run.from_number}, limit=1):
+            await self._halt(run, "From number is not one of the workspace's phone numbers")
+            return
+        if run.hours.wait(time.time()) is None:
+            await self._halt(run, "Calling hours never open")
+            return
+
+        # Attempts a crashed node left ringing will never report back here
+        await self.db.campaign_calls.update_many(
+            {
+                "campaignId": run.id,
+                "status": {"$in": ["dialing", "ringing"]},
+                "updatedAt": {"$lt": _utcnow() - timedelta(seconds=DIALER_CALL_TIMEOUT_S)},
+            },
+            {"$set": {"status": "unknown", "updatedAt": _utcnow()}},
+        )
+        await self._load_retries(run)
+        run.feeder = self._spawn(self._feed(run))
+        logger.info(f"Dialing campaign {run.id} (resuming after {run.cursor})")
+
+    async def _load_retries(self, run: _CampaignRun) -> int:
+        """Schedule retries recorded in Mongo (by an earlier run, or by a late status callback)."""
+        now = _utcnow()
+        retries = self.db.campaign_calls.find(
+            {"campaignId": run.id, "status": "retry"},
+            {"_id": 0, "contactId": 1, "phone": 1, "attempts": 1, "nextAttemptAt": 1},
+        )
+        loaded = 0
+        async for row in retries:
+            job = DialJob(run, next(self._seq), row["contactId"], row["phone"], attempt=row["attempts"] + 1)
+            run.outstanding += 1
+            self._defer(job, max(0.0, (row["nextAttemptAt"] - now).total_seconds()))
+            loaded += 1
+        return loaded
+
+    def _stop(self, run: _CampaignRun) -> None:
+        # Queued and parked jobs are dropped lazily. Calls already in progress
+        # finish and report back as usual.
+        run.stopped = True
+        if run.feeder is not None:
+            run.feeder.cancel()
+
+    async def _halt(self, run: _CampaignRun, error: str) -> None:
+        """Pause a campaign that can't make progress and tell the dashboard why."""
+        logger.warning(f"Pausing campaign {run.id}: {error}")
+        self._stop(run)
+        self._runs.pop(run.id, None)
+        await self.db.campaigns.update_one(
+            {"id": run.id, "status": "running"},
+            {"$set": {"status": "paused", "lastError": error, "updatedAt": _utcnow()}},
+        )
+
+    async def _complete(self, run: _CampaignRun) -> None:
+        # Every retry this run scheduled has been dialed, so any left in Mongo
+        # came from callbacks for calls placed before a restart
+        if await self._load_retries(run):
+            run.stopped = False
+            return
+        self._runs.pop(run.id, None)
+        await self._flush(run)
+        await self.db.campaigns.update_one(
+            {"id": run.id, "status": "running", "dialer.owner": self.node_id},
+            {"$set": {"status": "completed", "completedAt": _utcnow(), "updatedAt": _utcnow()}},
+        )
+        logger.info(f"Campaign {run.id} completed")
+
+    def _check_done(self, run: _CampaignRun) -> None:
+        if run.exhausted and run.outstanding == 0 and not run.stopped:
+            run.stopped = True
+            self._spawn(self._complete(run))
+
+    async def _flush(self, run: _CampaignRun) -> None:
+        counts = self._counts.pop(run.id, None)
+        update: dict = {}
+        if counts:
+            update["$inc"] = {f"progress.{key}": value for key, value in counts.items()}
+        if run.cursor_dirty:
+            run.cursor_dirty = False
+            update["$set"] = {"progress.cursor": run.cursor, "updatedAt": _utcnow()}
+        if not update:
+            return
+        try:
+            await self.db.campaigns.update_one({"id": run.id}, update)
+        except Exception:
+            if counts:
+                self._counts[run.id].update(counts)
+            run.cursor_dirty = run.cursor_dirty or "$set" in update
+            raise
+
+    async def _flush_counts(self) -> None:
+        """Save the progress of campaigns this node no longer runs (calls that outlived their run)."""
+        for campaign_id in [campaign_id for campaign_id in self._counts if campaign_id not in self._runs]:
+            counts = self._counts.pop(campaign_id)
+            try:
+                await self.db.campaigns.update_one(
+                    {"id": campaign_id}, {"$inc": {f"progress.{key}": value for key, value in counts.items()}}
+                )
+            except Exception:
+                self._counts[campaign_id].update(counts)
+                raise
+
+    # ----- contacts -----
+
+    async def _feed(self, run: _CampaignRun) -> None:
+        query = {"workspaceId": run.workspace_id}
+        if run.tags:
+            query["tags"] = {"$in": run.tags}
+        projection = {"_id": 1, "id": 1, "phone": 1}
+
+        while True:
+            if run.last_fed is not None:
+                query["_id"] = {"$gt": run.last_fed}
+            cursor = self.db.contacts.find(query, projection).sort("_id", ASCENDING).batch_size(DIALER_PREFETCH)
+            try:
+                async for contact in cursor:
+                    while len(run.fed) >= DIALER_PREFETCH:
+                        run.room.clear()
+                        await run.room.wait()
+                    wait = run.hours.wait(time.time())
+                    if wait:
+                        break  # don't hold a server-side cursor open overnight
+                    self._feed_contact(run, contact)
+                else:
+                    run.exhausted = True
+                    self._check_done(run)
+                    return
+            except CursorNotFound:
+                continue  # idled out while the campaign was at its limits; re-query from last_fed
+            finally:
+                await cursor.close()
+            await asyncio.sleep(wait)
+
+    def _feed_contact(self, run: _CampaignRun, contact: dict) -> None:
+        oid = contact["_id"]
+        run.last_fed = oid
+        run.fed[oid] = False
+        phone = to_e164(contact.get("phone"))
+        if phone is None:
+            self._counts[run.id]["skipped"] += 1
+            run.settle(oid)
+            return
+        run.outstanding += 1
+        self._enqueue(DialJob(run, next(self._seq), contact["id"], phone, oid=oid))
+
+    # ----- scheduling -----
+
+    def _enqueue(self, job: DialJob) -> None:
+        self._ready.put_nowait((-job.run.priority, job.seq, job))
+
+    def _defer(self, job: DialJob, delay: float) -> None:
+        heapq.heappush(self._delayed, (time.monotonic() + delay, job.seq, job))
+        self._delayed_changed.set()
+
+    async def _timers_forever(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._enqueue(heapq.heappop(self._delayed)[2])
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._delayed_changed.clear()
+            try:
+                await asyncio.wait_for(self._delayed_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch_forever(self) -> None:
+        while True:
+            _, _, job = await self._ready.get()
+            run = job.run
+            if run.stopped:
+                continue
+            wait = run.hours.wait(time.time())
+            if wait is None:
+                self._stop(run)
+                self._spawn(self._halt(run, "Calling hours never open"))
+            elif wait:
+                self._defer(job, wait)
+            elif is_overloaded("campaign_dial"):
+                # New calls add load; live ones are unaffected
+                self._defer(job, RATE_LIMITED_BACKOFF_S)
+            else:
+                self._try_dial(job)
+
+    def _workspace_limiter(self, workspace_id: str) -> _Limiter:
+        limiter = self._workspaces.get(workspace_id)
+        if limiter is None:
+            limiter = _Limiter(DIALER_WORKSPACE_MAX_CONCURRENT, DIALER_WORKSPACE_MAX_CPS)
+            self._workspaces[workspace_id] = limiter
+        return limiter
+
+    def _try_dial(self, job: DialJob) -> None:
+        now = time.monotonic()
+        limiters = (job.run.limiter, self._workspace_limiter(job.run.workspace_id), self._node)
+        for limiter in limiters:
+            if limiter.wait(now) > 0:
+                limiter.parked.append(job)
+                self._kick(limiter)
+                return
+        for limiter in limiters:
+            limiter.take()
+        job.limiters = limiters
+        self._spawn(self._dial(job))
+        for limiter in limiters:
+            self._kick(limiter)
+
+    def _kick(self, limiter: _Limiter) -> None:
+        """Re-queue the next parked job once the limiter can take it."""
+        while limiter.parked and limiter.parked[0].run.stopped:
+            limiter.parked.popleft()
+        if not limiter.parked or limiter.timer is not None:
+            return
+        wait = limiter.wait(time.monotonic())
+        if wait == 0:
+            self._enqueue(limiter.parked.popleft())
+        elif wait != math.inf:
+            limiter.timer = asyncio.get_running_loop().call_later(wait, self._unpark, limiter)
+
+    def _unpark(self, limiter: _Limiter) -> None:
+        limiter.timer = None
+        self._kick(limiter)
+
+    def _release(self, job: DialJob) -> None:
+        limiters, job.limiters = job.limiters, ()
+        for limiter in limiters:
+            limiter.release()
+            self._kick(limiter)
+
+    # ----- calls -----
+
+    async def _dial(self, job: DialJob) -> None:
+        run = job.run
+        try:
+            if job.oid is not None:
+                if not await self._record_first_attempt(job):
+                    return
+            else:
+                await self.db.campaign_calls.update_one(
+                    {"campaignId": run.id, "contactId": job.contact_id},
+                    {"$set": {"status": "dialing", "attempts": job.attempt, "updatedAt": _utcnow()}},
+                )
+            status, detail = await self._place_call(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Dial failed for campaign {run.id}: {e}")
+            # Once Twilio returned a SID the call exists; retrying would dial the contact twice
+            status, detail = ("ringing", None) if job.call_sid else ("failed", str(e))
+
+        if status == "rate-limited":
+            self._release(job)
+            self._defer(job, RATE_LIMITED_BACKOFF_S)
+        elif status != "ringing":
+            await self._finish(job, status, detail)
+
+    async def _record_first_attempt(self, job: DialJob) -> bool:
+        """Insert the contact's campaign_calls row. False if the job must not be dialed now.
+
+        The row is what stops the contact being dialed twice, so the contact is only
+        settled once the row exists. A failed insert re-queues the job instead.
+        """
+        run = job.run
+        try:
+            await self.db.campaign_calls.insert_one({
+                "id": str(uuid.uuid4()),
+                "campaignId": run.id,
+                "workspaceId": run.workspace_id,
+                "contactId": job.contact_id,
+                "phone": job.phone,
+                "attempts": job.attempt,
+                "status": "dialing",
+                "createdAt": _utcnow(),
+                "updatedAt": _utcnow(),
+            })
+        except DuplicateKeyError:
+            # Dialed before the last restart, after the cursor was saved
+            self._release(job)
+            run.outstanding -= 1
+            run.settle(job.oid)
+            self._check_done(run)
+            return False
+        except Exception as e:
+            logger.warning(f"Failed to record dial attempt for campaign {run.id}, retrying: {e}")
+            self._release(job)
+            self._defer(job, RECORD_RETRY_S)
+            return False
+        run.settle(job.oid)
+        job.oid = None
+        return True
+
+    async def _place_call(self, job: DialJob) -> tuple[str, str | None]:
+        run = job.run
+        twilio = (await get_integration_secrets(run.workspace_id, self.db))["twilio"]
+        account_sid, auth_token = twilio.get("accountSid"), twilio.get("authToken")
+        if not (twilio["configured"] and account_sid and auth_token):
+            self._stop(run)
+            self._spawn(self._halt(run, "Twilio integration is not configured"))
+            return "canceled", "Twilio integration is not configured"
+
+        started = time.perf_counter()
+        response = await self._client.post(
+            f"/2010-04-01/Accounts/{account_sid}/Calls.json",
+            auth=(account_sid, auth_token),
+            data={
+                "To": job.phone,
+                "From": run.from_number,
+                "Url": str(httpx.URL(self.answer_url).copy_merge_params({"agentId": run.agent_id, "campaignId": run.id})),
+                "StatusCallback": self.status_callback_url,
+            },
+        )
+        self._twilio_ms.observe((time.perf_counter() - started) * 1000)
+        if response.status_code == 429:
+            # Account-level CPS exceeded (error 20429); not the contact's fault
+            return "rate-limited", None
+        self._counts[run.id]["dialed"] += 1
+        if response.status_code >= 400:
+            message = response.json().get("message") if response.headers.get("content-type", "").startswith(
+                "application/json") else response.text
+            # 4xx is permanent (bad number, unverified caller id); 5xx is worth retrying
+            return ("failed" if response.status_code >= 500 else "rejected"), message
+
+        job.call_sid = response.json()["sid"]
+        job.deadline = time.monotonic() + DIALER_CALL_TIMEOUT_S
+        self._active[job.call_sid] = job
+        self._active_gauge.set(len(self._active))
+        try:
+            await self.db.campaign_calls.update_one(
+                {"campaignId": run.id, "contactId": job.contact_id},
+                {"$set": {"status": "ringing", "callSid": job.call_sid, "updatedAt": _utcnow()}},
+            )
+        except Exception as e:
+            # The job keeps the SID, so the status callback still finds it and _finish records it
+            logger.warning(f"Failed to record ringing call {job.call_sid} for campaign {run.id}: {e}")
+        return "ringing", None
+
+    async def handle_status(self, params: dict, signature: str) -> bool:
+        """Apply a Twilio status callback. False if the signature doesn't verify."""
+        call_sid = params.get("CallSid")
+        job = self._active.get(call_sid)
+        row = None
+        if job is None:
+            # Placed before a restart, or by another node
+            row = await self.db.campaign_calls.find_one({"callSid": call_sid}, {"_id": 0})
+            if row is None:
+                return True
+        twilio = (await get_integration_secrets(job.run.workspace_id if job else row["workspaceId"], self.db))["twilio"]
+        expected = twilio_signature(twilio.get("authToken") or "", self.status_callback_url, params)
+        if not hmac.compare_digest(expected, signature or ""):
+            return False
+
+        status = params.get("CallStatus")
+        if status not in FINAL_STATUSES:
+            return True
+        duration = int(params.get("CallDuration") or 0)
+        if job is None:
+            await self._finish_row(row, status, duration)
+        elif self._active.pop(call_sid, None) is not None:
+            self._active_gauge.set(len(self._active))
+            await self._finish(job, status, duration=duration)
+        return True
+
+    async def _finish_row(self, row: dict, status: str, duration: int) -> None:
+        """Record the outcome of a call this node has no job for."""
+        campaign = await self.db.campaigns.find_one({"id": row["campaignId"]}, {"_id": 0, "status": 1, "retry": 1})
+        max_attempts, retry_delay, retry_on = retry_policy(campaign or {})
+        update = {"status": status, "duration": duration, "updatedAt": _utcnow()}
+        inc = {f"progress.outcomes.{status}": 1}
+        retry = (campaign or {}).get("status") in ("running", "paused") and status in retry_on \
+            and row["attempts"] < max_attempts
+        if retry:
+            update["status"] = "retry"
+            update["nextAttemptAt"] = _utcnow() + timedelta(seconds=retry_delay)
+            inc["progress.retried"] = 1
+        recorded = await self.db.campaign_calls.update_one(
+            {"callSid": row["callSid"], "status": {"$in": ["dialing", "ringing", "unknown"]}}, {"$set": update}
+        )
+        if not recorded.modified_count:
+            return
+        registry.counter("voice_dialer_calls_total", "Campaign dial attempts by outcome", {"status": status}).inc()
+        await self.db.campaigns.update_one({"id": row["campaignId"]}, {"$inc": inc})
+        run = self._runs.get(row["campaignId"])
+        if retry and run is not None and not run.stopped:
+            job = DialJob(run, next(self._seq), row["contactId"], row["phone"], attempt=row["attempts"] + 1)
+            run.outstanding += 1
+            self._defer(job, retry_delay)
+
+    def _expire_calls(self) -> None:
+        now = time.monotonic()
+        for call_sid, job in list(self._active.items()):
+            if job.deadline < now:
+                del self._active[call_sid]
+                self._spawn(self._finish(job, "unknown", "No status callback received"))
+        self._active_gauge.set(len(self._active))
+
+    async def _finish(self, job: DialJob, status: str, detail: str | None = None, duration: int | None = None) -> None:
+        run = job.run
+        self._release(job)
+        self._counts[run.id][f"outcomes.{status}"] += 1
+        registry.counter("voice_dialer_calls_total", "Campaign dial attempts by outcome", {"status": status}).inc()
+        update = {"status": status, "attempts": job.attempt, "lastError": detail, "updatedAt": _utcnow()}
+        if job.call_sid:
+            update["callSid"] = job.call_sid
+        if duration is not None:
+            update["duration"] = duration
+
+        if status in run.retry_on and job.attempt < run.max_attempts:
+            update["status"] = "retry"
+            update["nextAttemptAt"] = _utcnow() + timedelta(seconds=run.retry_delay)
+            self._counts[run.id]["retried"] += 1
+            job.attempt += 1
+            job.call_sid = None
+            current = self._runs.get(run.id)
+            if current is run:
+                self._defer(job, run.retry_delay)
+            else:
+                # Paused meanwhile. The row keeps the retry for whichever run dials the campaign
+                # next; one already resumed on this node has loaded its retries, so it takes it here.
+                run.outstanding -= 1
+                if current is not None and not current.stopped:
+                    current.outstanding += 1
+                    self._defer(DialJob(current, next(self._seq), job.contact_id, job.phone, attempt=job.attempt),
+                                run.retry_delay)
+        else:
+            run.outstanding -= 1
+        try:
+            await self.db.campaign_calls.update_one(
+                {"campaignId": run.id, "contactId": job.contact_id}, {"$set": update}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record dial outcome for campaign {run.id}: {e}")
+        self._check_done(run)
+
+    # ----- introspection -----
+
+    def stats(self) -> dict:
+        return {
+            "node": self.node_id,
+            "activeCalls": len(self._active),
+            "ready": self._ready.qsize() if self._ready is not None else 0,
+            "delayed": len(self._delayed),
+            "campaigns": {
+                run.id: {
+                    "outstanding": run.outstanding,
+                    "prefetched": len(run.fed),
+                    "active": run.limiter.active,
+                    "parked": len(run.limiter.parked),
+                    "exhausted": run.exhausted,
+                }
+                for run in self._runs.values()
+            },
+            "workspaces": {
+                workspace_id: {"active": limiter.active, "parked": len(limiter.parked)}
+                for workspace_id, limiter in self._workspaces.items()
+                if limiter.active or limiter.parked
+            },
+        }
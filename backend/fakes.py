@@ -0,0 +1,407 @@
+"""Local stand-in provider servers for development, tests and benchmarks.
+
+Each app mimics just enough of a provider's API for the platform to run
+against it without network access or real credentials:
+
+    uvicorn fakes:elevenlabs_app --port 8011   # ELEVENLABS_API_URL=http://localhost:8011
+    uvicorn fakes:llm_app --port 8012          # OpenAI-compatible /v1/chat/completions
+    uvicorn fakes:stt_app --port 8013          # Deepgram-style /v1/listen websocket
+    uvicorn fakes:twilio_app --port 8014       # TWILIO_API_URL=http://localhost:8014
+    uvicorn fakes:api_app --port 3000          # Next.js /api behind the server.py proxy
+
+Latency and payload size are tunable through FAKE_* environment variables;
+a few failures can be switched on at runtime through ``POST /_faults``.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections import deque
+from urllib.parse import parse_qsl
+
+import httpx
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+# ElevenLabs ----------------------------------------------------------------
+
+elevenlabs_app = FastAPI(title="Fake ElevenLabs")
+elevenlabs_app.state.requests = 0
+elevenlabs_app.state.voices_status = None  # set through /_faults
+
+
+@elevenlabs_app.get("/v1/voices")
+async def fake_elevenlabs_voices(request: Request):
+    """Voice catalog; FAKE_ELEVENLABS_LATENCY_MS simulates a slow upstream."""
+    elevenlabs_app.state.requests += 1
+    if not request.headers.get("xi-api-key"):
+        return JSONResponse({"detail": {"status": "invalid_api_key"}}, status_code=401)
+
+    await asyncio.sleep(_env_float("FAKE_ELEVENLABS_LATENCY_MS", 150) / 1000)
+    status = elevenlabs_app.state.voices_status
+    if status:
+        return JSONResponse({"detail": {"status": "service_unavailable"}}, status_code=status)
+    count = _env_int("FAKE_ELEVENLABS_VOICE_COUNT", 40)
+    return {
+        "voices": [
+            {
+                "voice_id": f"fake-voice-{i}",
+                "name": f"Fake Voice {i}",
+                "category": "premade",
+                "labels": {"accent": "american", "description": f"Stand-in voice {i}"},
+            }
+            for i in range(count)
+        ]
+    }
+
+
+@elevenlabs_app.post("/v1/text-to-speech/{voice_id}")
+async def fake_elevenlabs_tts(voice_id: str, request: Request):
+    """Returns μ-law silence sized like real speech (~14 characters per second)."""
+    elevenlabs_app.state.requests += 1
+    if not request.headers.get("xi-api-key"):
+        return JSONResponse({"detail": {"status": "invalid_api_key"}}, status_code=401)
+
+    body = await request.json()
+    await asyncio.sleep(_env_float("FAKE_ELEVENLABS_TTS_LATENCY_MS", 300) / 1000)
+    seconds = max(len(body.get("text", "")) / 14, 0.5)
+    return Response(content=b"\xff" * int(8000 * seconds), media_type="audio/basic")
+
+
+@elevenlabs_app.post("/v1/text-to-speech/{voice_id}/stream")
+async def fake_elevenlabs_tts_stream(voice_id: str, request: Request):
+    """Streams μ-law silence after FAKE_TTS_FIRST_BYTE_MS, generated at
+    FAKE_TTS_REALTIME_FACTOR times real time (ElevenLabs turbo is ~4-10x)."""
+    elevenlabs_app.state.requests += 1
+    if not request.headers.get("xi-api-key"):
+        return JSONResponse({"detail": {"status": "invalid_api_key"}}, status_code=401)
+
+    body = await request.json()
+    total = int(8000 * max(len(body.get("text", "")) / 14, 0.3))
+    first_byte = _env_float("FAKE_TTS_FIRST_BYTE_MS", 250) / 1000
+    factor = _env_float("FAKE_TTS_REALTIME_FACTOR", 5.0)
+    piece = 1600  # 200 ms of audio
+
+    async def audio():
+        await asyncio.sleep(first_byte)
+        sent = 0
+        while sent < total:
+            n = min(piece, total - sent)
+            yield b"\xff" * n
+            sent += n
+            await asyncio.sleep(n / 8000 / factor)
+
+    return StreamingResponse(audio(), media_type="audio/basic")
+
+
+@elevenlabs_app.get("/v1/user")
+async def fake_elevenlabs_user(request: Request):
+    """Cheap authenticated endpoint, used by the provider pool to pre-connect."""
+    elevenlabs_app.state.requests += 1
+    if not request.headers.get("xi-api-key"):
+        return JSONResponse({"detail": {"status": "invalid_api_key"}}, status_code=401)
+    return {"subscription": {"tier": "fake"}}
+
+
+@elevenlabs_app.get("/_stats")
+async def fake_elevenlabs_stats():
+    """Request counter so tests can assert cache hits never reached upstream."""
+    return {"requests": elevenlabs_app.state.requests}
+
+
+@elevenlabs_app.post("/_faults")
+async def fake_elevenlabs_faults(request: Request):
+    """``{"voicesStatus": 503}`` makes /v1/voices fail with that status; ``null`` clears it."""
+    elevenlabs_app.state.voices_status = (await request.json()).get("voicesStatus")
+    return {"voicesStatus": elevenlabs_app.state.voices_status}
+
+
+# LLM (OpenAI-compatible chat completions) ----------------------------------
+
+llm_app = FastAPI(title="Fake LLM")
+
+FAKE_LLM_REPLY = (
+    "Thanks for calling! I can help you with that. Let me check the calendar, "
+    "and I'll see what times we have open this week. Dr. Smith has a slot on "
+    "Thursday at 10 am, or Friday afternoon if that works better for you."
+)
+
+
+@llm_app.post("/v1/chat/completions")
+async def fake_chat_completions(request: Request):
+    """Streams FAKE_LLM_REPLY word by word as SSE after FAKE_LLM_FIRST_TOKEN_MS,
+    at FAKE_LLM_TOKENS_PER_SEC."""
+    body = await request.json()
+    words = os.environ.get("FAKE_LLM_REPLY", FAKE_LLM_REPLY).split(" ")
+    tokens = [w if i == 0 else " " + w for i, w in enumerate(words)]
+    first_token = _env_float("FAKE_LLM_FIRST_TOKEN_MS", 350) / 1000
+    interval = 1 / _env_float("FAKE_LLM_TOKENS_PER_SEC", 60)
+
+    if not body.get("stream"):
+        await asyncio.sleep(first_token + interval * len(tokens))
+        return {"choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}}]}
+
+    async def events():
+        await asyncio.sleep(first_token)
+        for token in tokens:
+            chunk = {"choices": [{"index": 0, "delta": {"content": token}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(interval)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# STT (Deepgram-style streaming websocket) ----------------------------------
+
+stt_app = FastAPI(title="Fake STT")
+stt_app.state.connections = 0
+
+
+@stt_app.websocket("/v1/listen")
+async def fake_listen(websocket: WebSocket):
+    """Accepts binary audio and emits a final transcript for every
+    FAKE_STT_UTTERANCE_MS of audio received, FAKE_STT_LATENCY_MS later.
+    FAKE_STT_CONNECT_MS delays the handshake (Deepgram auth/session setup)."""
+    if not (websocket.headers.get("authorization") or "").startswith("Token "):
+        await websocket.close(code=4001)
+        return
+    await asyncio.sleep(_env_float("FAKE_STT_CONNECT_MS", 0) / 1000)
+    await websocket.accept()
+    stt_app.state.connections += 1
+    utterance_bytes = int(8000 * _env_float("FAKE_STT_UTTERANCE_MS", 1500) / 1000)
+    latency = _env_float("FAKE_STT_LATENCY_MS", 200) / 1000
+    transcript = os.environ.get("FAKE_STT_TRANSCRIPT", "I'd like to book an appointment.")
+    received = 0
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("bytes")
+            if data is None:
+                # KeepAlive and other control messages need no reply
+                if '"CloseStream"' in (message.get("text") or ""):
+                    # Deepgram closes the socket once the stream is flushed
+                    await websocket.close()
+                    break
+                continue
+            before, received = received, received + len(data)
+            if before // utterance_bytes != received // utterance_bytes:
+                await asyncio.sleep(latency)
+                await websocket.send_json({
+                    "type": "Results",
+                    "is_final": True,
+                    "speech_final": True,
+                    "start": before / 8000,
+                    "duration": round((received - before) / 8000, 3),
+                    "channel": {"alternatives": [{"transcript": transcript, "confidence": 0.99}]},
+                })
+    except WebSocketDisconnect:
+        pass
+
+
+@stt_app.get("/_stats")
+async def fake_stt_stats():
+    return {"connections": stt_app.state.connections}
+
+
+# Twilio (programmable voice REST API) --------------------------------------
+
+twilio_app = FastAPI(title="Fake Twilio")
+twilio_app.state.calls = 0
+twilio_app.state.rate_limited = 0
+twilio_app.state.active = {}  # account sid -> calls in progress
+twilio_app.state.peak = {}  # account sid -> most calls in progress at once
+twilio_app.state.recent_creates = {}  # account sid -> accepted create times in the last second
+_twilio_tasks = set()
+
+
+def _twilio_error(status: int, code: int, message: str) -> JSONResponse:
+    return JSONResponse({"code": code, "message": message, "status": status}, status_code=status)
+
+
+def _parse_outcomes(spec: str) -> tuple[list[str], list[float]]:
+    pairs = [item.split(":") for item in spec.split(",") if item]
+    return [name for name, _ in pairs], [float(weight) for _, weight in pairs]
+
+
+@twilio_app.post("/2010-04-01/Accounts/{account_sid}/Calls.json")
+async def fake_twilio_create_call(account_sid: str, request: Request):
+    """Accepts the call, then POSTs a signed status callback FAKE_TWILIO_CALL_MS
+    later. Outcomes are drawn from FAKE_TWILIO_OUTCOMES. Creates arriving faster
+    than FAKE_TWILIO_CPS per account (in any one-second window) get 429 (error 20429), like Twilio's CPS limit."""
+    try:
+        username, token = base64.b64decode(request.headers["authorization"].split(" ", 1)[1]).decode().split(":", 1)
+    except (KeyError, IndexError, ValueError):
+        username = token = None
+    if username != account_sid or not token:
+        return _twilio_error(401, 20003, "Authenticate")
+
+    cps = _env_float("FAKE_TWILIO_CPS", 0)
+    if cps:
+        now = time.monotonic()
+        window = twilio_app.state.recent_creates.setdefault(account_sid, deque())
+        while window and window[0] <= now - 1:
+            window.popleft()
+        if len(window) >= cps:
+            twilio_app.state.rate_limited += 1
+            return _twilio_error(429, 20429, "Too Many Requests")
+        window.append(now)
+
+    form = dict(parse_qsl((await request.body()).decode()))
+    to = form.get("To", "")
+    if not re.fullmatch(r"\+\d{8,15}", to):
+        return _twilio_error(400, 21211, f"The 'To' number {to} is not a valid phone number.")
+
+    call_sid = "CA" + uuid.uuid4().hex
+    twilio_app.state.calls += 1
+    active = twilio_app.state.active[account_sid] = twilio_app.state.active.get(account_sid, 0) + 1
+    twilio_app.state.peak[account_sid] = max(active, twilio_app.state.peak.get(account_sid, 0))
+    task = asyncio.create_task(_fake_twilio_call(account_sid, token, call_sid, form))
+    _twilio_tasks.add(task)
+    task.add_done_callback(_twilio_tasks.discard)
+    return JSONResponse(
+        {"sid": call_sid, "account_sid": account_sid, "to": to, "from": form.get("From"), "status": "queued"},
+        status_code=201,
+    )
+
+
+async def _fake_twilio_call(account_sid: str, auth_token: str, call_sid: str, form: dict) -> None:
+    await asyncio.sleep(_env_float("FAKE_TWILIO_CALL_MS", 2000) / 1000)
+    twilio_app.state.active[account_sid] -= 1
+    names, weights = _parse_outcomes(os.environ.get("FAKE_TWILIO_OUTCOMES", "completed:0.7,no-answer:0.2,busy:0.1"))
+    status = random.choices(names, weights)[0]
+    params = {
+        "AccountSid": account_sid,
+        "CallSid": call_sid,
+        "CallStatus": status,
+        "CallDuration": str(random.randint(20, 180) if status == "completed" else 0),
+        "To": form.get("To", ""),
+        "From": form.get("From", ""),
+    }
+    url = form.get("StatusCallback")
+    if not url:
+        return
+    payload = url + "".join(f"{key}{params[key]}" for key in sorted(params))
+    signature = base64.b64encode(hmac.new(auth_token.encode(), payload.encode(), hashlib.sha1).digest()).decode()
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            await client.post(url, data=params, headers={"X-Twilio-Signature": signature})
+    except httpx.HTTPError:
+        pass  # Twilio doesn't retry status callbacks either
+
+
+@twilio_app.get("/_stats")
+async def fake_twilio_stats():
+    return {
+        "calls": twilio_app.state.calls,
+        "rateLimited": twilio_app.state.rate_limited,
+        "active": twilio_app.state.active,
+        "peak": twilio_app.state.peak,
+    }
+
+
+# Next.js API (the upstream of the server.py proxy) -------------------------
+
+api_app = FastAPI(title="Fake Next.js API")
+
+
+@api_app.get("/api/")
+async def fake_api_health():
+    return {"message": "ENT Solutions API", "version": "1.0.0"}
+
+
+def contact_listing(limit: int) -> dict:
+    """A contact listing of ``limit`` rows, shaped like the real one."""
+    return {
+        "contacts": [
+            {
+                "id": f"{i:08x}-0000-4000-8000-000000000000",
+                "workspaceId": "fake-workspace",
+                "firstName": "Contact",
+                "lastName": str(i),
+                "email": f"contact{i}@example.com",
+                "phone": f"+1555{i:07d}",
+                "company": "",
+                "tags": ["fake"],
+                "notes": "",
+                "customFields": {},
+                "createdAt": "2026-01-01T00:00:00.000Z",
+                "updatedAt": "2026-01-01T00:00:00.000Z",
+            }
+            for i in range(limit)
+        ]
+    }
+
+
+def audit_log_listing(limit: int) -> dict:
+    """An audit-log listing of ``limit`` rows, shaped like the real one."""
+    return {
+        "auditLogs": [
+            {
+                "id": f"{i:08x}-0000-4000-8000-000000000001",
+                "action": "contact.updated",
+                "userId": "fake-user",
+                "userEmail": "admin@example.com",
+                "workspaceId": "fake-workspace",
+                "targetId": f"{i:08x}-0000-4000-8000-000000000000",
+                "targetType": "contact",
+                "details": {"fields": ["phone", "tags"], "source": "api"},
+                "ipAddress": "203.0.113.7",
+                "createdAt": "2026-01-01T00:00:00.000Z",
+            }
+            for i in range(limit)
+        ]
+    }
+
+
+# Rendered directly rather than through FastAPI's encoder, which would dominate large listings
+@api_app.get("/api/contacts")
+async def fake_api_contacts(limit: int = 100):
+    return JSONResponse(contact_listing(limit))
+
+
+@api_app.get("/api/admin/audit-logs")
+async def fake_api_audit_logs(limit: int = 100):
+    return JSONResponse(audit_log_listing(limit))
+
+
+@api_app.post("/api/contacts/bulk")
+async def fake_api_contacts_bulk(request: Request):
+    """Same limits as the real import: a non-empty array of at most 1000 rows."""
+    contacts = (await request.json()).get("contacts")
+    if not isinstance(contacts, list) or not contacts:
+        return JSONResponse({"error": "Contacts array is required"}, status_code=400)
+    if len(contacts) > 1000:
+        return JSONResponse({"error": "Maximum 1000 contacts per import"}, status_code=400)
+    return {"success": True, "imported": len(contacts)}
+
+
+@api_app.get("/api/_bytes")
+async def fake_api_bytes(n: int = 1024 * 1024):
+    """``n`` bytes streamed in 64 KiB pieces, for proxy throughput."""
+    piece = b"\x00" * 65536
+
+    async def body():
+        sent = 0
+        while sent < n:
+            yield piece[:min(len(piece), n - sent)]
+            sent += len(piece)
+
+    return StreamingResponse(body(), media_type="application/octet-stream")
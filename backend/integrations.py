@@ -0,0 +1,203 @@
+"""Workspace provider credentials for the voice engine.
+
+Reads the same ``integrations`` documents the Next.js API writes (see
+lib/integrations.js and lib/encryption.js). Secrets are AES-256-GCM,
+stored as ``iv:authTag:ciphertext`` in hex. Decrypted keys are cached per
+workspace for SECRETS_CACHE_TTL_S, so a busy workspace hits Mongo and
+decrypts once per TTL rather than once per call.
+
+It also owns the voice engine's Mongo clients (the same split as lib/db.js):
+``get_db`` for call-path reads and every write, and ``get_analytics_db`` for
+scans such as the analytics backfill. The analytics client reads from a
+secondary within MONGO_ANALYTICS_MAX_STALENESS_S, falling back to the primary.
+Pool sizes, wait-queue timeout and compression come from MONGO_* settings,
+and MONGO_ANALYTICS_* settings for the analytics client. Connection checkout
+waits feed the ``voice_mongo_pool_wait_ms`` histogram.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from pymongo import monitoring
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SECRETS_TTL_S = float(os.environ.get("SECRETS_CACHE_TTL_S", 60))
+SECRET_FIELDS = ("apiKey", "accountSid", "authToken")
+PROVIDERS = ("twilio", "ghl", "calcom", "deepgram", "elevenlabs")
+
+_KEY_LENGTH = 32
+_DEV_KEY = "dev-only-encryption-key-32bytes!"
+
+_aesgcm: AESGCM | None = None
+_aesgcm_source: str | None = None
+MONGO_SLOW_CHECKOUT_MS = float(os.environ.get("MONGO_SLOW_CHECKOUT_MS", 100))
+
+_db = None
+_analytics_db = None
+# workspaceId -> (expires_at, {provider: {configured, apiKey, ...}})
+_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _cipher() -> AESGCM:
+    global _aesgcm, _aesgcm_source
+    source = os.environ.get("ENCRYPTION_KEY")
+    if _aesgcm is None or source != _aesgcm_source:
+        # Same derivation as lib/encryption.js: pad with "0" / truncate to 32 bytes
+        key = (source or _DEV_KEY).ljust(_KEY_LENGTH, "0")[:_KEY_LENGTH].encode()
+        _aesgcm = AESGCM(key)
+        _aesgcm_source = source
+    return _aesgcm
+
+
+def decrypt(value: str | None) -> str | None:
+    if not value:
+        return None
+    iv_hex, tag_hex, data_hex = value.split(":")
+    plaintext = _cipher().decrypt(bytes.fromhex(iv_hex), bytes.fromhex(data_hex) + bytes.fromhex(tag_hex), None)
+    return plaintext.decode()
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Connection checkout wait per pool. The wait queue is FIFO per server, so a
+    finished checkout is matched with the oldest one started on that server."""
+
+    def __init__(self, pool: str):
+        self.pool = pool
+        self._started: dict[tuple, deque[float]] = defaultdict(deque)
+        # Events arrive on whichever thread runs the operation (Motor's executor)
+        self._lock = threading.Lock()
+        self._wait = registry.histogram("voice_mongo_pool_wait_ms", "Mongo connection checkout wait", {"pool": pool})
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._started[event.address].append(time.perf_counter())
+
+    def connection_checked_out(self, event):
+        self._finish(event, None)
+
+    def connection_check_out_failed(self, event):
+        self._finish(event, str(event.reason))
+
+    def _finish(self, event, failure: str | None) -> None:
+        with self._lock:
+            queue = self._started.get(event.address)
+            if not queue:
+                return
+            wait_ms = (time.perf_counter() - queue.popleft()) * 1000
+            self._wait.observe(wait_ms)
+        if failure:
+            registry.counter("voice_mongo_checkout_failed_total", "Mongo connection checkouts that failed",
+                             {"pool": self.pool, "reason": failure}).inc()
+        if wait_ms > MONGO_SLOW_CHECKOUT_MS:
+            logger.warning(f"Mongo {self.pool} pool: checkout {'failed (' + failure + ')' if failure else 'took'} "
+                           f"{wait_ms:.0f} ms on {event.address}")
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+def _pool_options(prefix: str, max_pool_size: int, wait_queue_timeout_ms: int) -> dict:
+    options = {
+        "maxPoolSize": int(os.environ.get(f"{prefix}MAX_POOL_SIZE", max_pool_size)),
+        "minPoolSize": int(os.environ.get(f"{prefix}MIN_POOL_SIZE", 0)),
+        "waitQueueTimeoutMS": int(os.environ.get(f"{prefix}WAIT_QUEUE_TIMEOUT_MS", wait_queue_timeout_ms)),
+    }
+    # zlib is built in; snappy and zstd need python-snappy / zstandard
+    compressors = os.environ.get(f"{prefix}COMPRESSORS", os.environ.get("MONGO_COMPRESSORS"))
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def get_db():
+    global _db
+    if _db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _db = AsyncIOMotorClient(
+            os.environ["MONGO_URL"],
+            appname="voice-engine",
+            event_listeners=[PoolWaitListener("transactional")],
+            **_pool_options("MONGO_", 50, 5000),
+        )[os.environ["DB_NAME"]]
+    return _db
+
+
+def get_analytics_db():
+    """Reads for reports and backfills; may be up to MONGO_ANALYTICS_MAX_STALENESS_S behind. Never write through it."""
+    global _analytics_db
+    if _analytics_db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _analytics_db = AsyncIOMotorClient(
+            os.environ.get("MONGO_ANALYTICS_URL") or os.environ["MONGO_URL"],
+            appname="voice-engine-analytics",
+            event_listeners=[PoolWaitListener("analytics")],
+            readPreference=os.environ.get("MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred"),
+            # The server's minimum is 90 s
+            maxStalenessSeconds=max(int(os.environ.get("MONGO_ANALYTICS_MAX_STALENESS_S", 120)), 90),
+            **_pool_options("MONGO_ANALYTICS_", 10, 30000),
+        )[os.environ["DB_NAME"]]
+    return _analytics_db
+
+
+def _decrypt_provider(config: dict | None) -> dict:
+    config = config or {}
+    provider = {"configured": bool(config.get("configured"))}
+    for field in SECRET_FIELDS:
+        try:
+            provider[field] = decrypt(config.get(field))
+        except Exception as e:
+            logger.warning(f"Failed to decrypt integration field {field}: {e}")
+            provider[field] = None
+    return provider
+
+
+async def get_integration_secrets(workspace_id: str, db=None) -> dict:
+    cached = _cache.get(workspace_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    db = db if db is not None else get_db()
+    doc = await db.integrations.find_one({"workspaceId": workspace_id}, {"_id": 0})
+    secrets = {name: _decrypt_provider((doc or {}).get(name)) for name in PROVIDERS}
+    _cache[workspace_id] = (time.monotonic() + SECRETS_TTL_S, secrets)
+    return secrets
+
+
+async def get_provider_key(workspace_id: str, provider: str, db=None) -> str | None:
+    config = (await get_integration_secrets(workspace_id, db)).get(provider) or {}
+    if not config.get("configured"):
+        return None
+    return config.get("apiKey")
+
+
+def invalidate(workspace_id: str) -> None:
+    _cache.pop(workspace_id, None)
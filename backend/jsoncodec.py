@@ -0,0 +1,52 @@
+"""JSON encoding and decoding for native endpoints, proxy error bodies and traffic capture.
+
+Uses orjson when it is installed, which is several times faster than the
+stdlib on large listings. Otherwise it falls back to the stdlib ``json``.
+Set JSON_CODEC=json to force the stdlib. Both produce compact UTF-8 bytes.
+
+``JSONResponse`` is a drop-in for starlette's. server.py also uses it as
+the FastAPI default response class, so endpoints that return dicts are
+encoded here too.
+
+The /api proxy does not use this module at all. It forwards the exact
+bytes Next.js sent, still compressed if Next.js compressed them. A body
+is decoded only by the features that read it (traffic capture redaction).
+"""
+from __future__ import annotations
+
+import json
+import os
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse as _StarletteJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CODEC = "orjson" if orjson is not None and os.environ.get("JSON_CODEC", "orjson") != "json" else "json"
+
+if CODEC == "orjson":
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(value, default=None) -> bytes:
+        return orjson.dumps(value, default=default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(value, default=None) -> bytes:
+        return json.dumps(value, default=default, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class JSONResponse(_StarletteJSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+async def read_json(request: Request):
+    """The request body decoded with the fast codec (``await request.json()`` uses the stdlib)."""
+    return loads(await request.body())
@@ -0,0 +1,152 @@
+"""Continuous event-loop lag monitor, slow-callback detector and load shedding.
+
+Two parts, both cheap enough to run all the time:
+
+- A heartbeat task on the loop wakes every LOOP_MONITOR_INTERVAL_MS. How
+  late it wakes is the loop lag. Lag feeds the ``voice_event_loop_lag_ms``
+  histogram and a smoothed (EWMA) lag value.
+- A watchdog thread checks the heartbeat. When the loop has not come back
+  for LOOP_SLOW_CALLBACK_MS, one callback is blocking it (a synchronous
+  call, a big copy, CPU-bound work). The watchdog then reads the loop
+  thread's stack through ``sys._current_frames``, so the stack is the
+  culprit's own and not a guess after the fact. It logs the stack once per
+  stall and keeps it in a small ring for ``/internal/loop``.
+
+When the smoothed lag exceeds LOOP_SHED_LAG_MS the process counts as
+overloaded until the lag falls back below half that. While overloaded,
+callers of ``is_overloaded()`` shed or defer work that can wait:
+- traffic capture;
+- recording maintenance;
+- analytics flushes;
+- prewarm requests;
+- new campaign dials.
+Live calls are never shed.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_MONITOR_INTERVAL_MS = float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", 100))
+LOOP_SLOW_CALLBACK_MS = float(os.environ.get("LOOP_SLOW_CALLBACK_MS", 250))
+LOOP_SHED_LAG_MS = float(os.environ.get("LOOP_SHED_LAG_MS", 200))
+# Weight of the newest sample in the smoothed lag
+LAG_EWMA_ALPHA = 0.2
+STALL_STACK_DEPTH = 30
+RECENT_STALLS = 20
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms: float = LOOP_MONITOR_INTERVAL_MS, slow_callback_ms: float = LOOP_SLOW_CALLBACK_MS,
+                 shed_lag_ms: float = LOOP_SHED_LAG_MS):
+        self.interval = interval_ms / 1000
+        self.slow_callback = slow_callback_ms / 1000
+        self.shed_lag_ms = shed_lag_ms
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.overloaded = False
+        self.stalls: deque[dict] = deque(maxlen=RECENT_STALLS)
+        self._heartbeat = time.monotonic()
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._lag = registry.histogram("voice_event_loop_lag_ms", "Event-loop timer lag")
+        self._lag_gauge = registry.gauge("voice_event_loop_lag_smoothed_ms", "Smoothed event-loop lag")
+        self._overloaded_gauge = registry.gauge("voice_event_loop_overloaded", "1 while non-critical work is shed")
+        self._stall_counter = registry.counter("voice_event_loop_stalls_total", "Callbacks that blocked the loop")
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._beat_forever())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def close(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _beat_forever(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.observe(max(0.0, (now - before - self.interval) * 1000))
+
+    def observe(self, lag_ms: float) -> None:
+        self._lag.observe(lag_ms)
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.lag_ms += LAG_EWMA_ALPHA * (lag_ms - self.lag_ms)
+        self._lag_gauge.set(round(self.lag_ms, 3))
+        if not self.overloaded and self.lag_ms > self.shed_lag_ms:
+            self.overloaded = True
+            logger.warning(f"Event loop lag {self.lag_ms:.0f} ms over {self.shed_lag_ms:.0f} ms; shedding background work")
+        elif self.overloaded and self.lag_ms < self.shed_lag_ms / 2:
+            self.overloaded = False
+            logger.info(f"Event loop lag back to {self.lag_ms:.0f} ms; resuming background work")
+        self._overloaded_gauge.set(1 if self.overloaded else 0)
+
+    def _watch(self) -> None:
+        """Watchdog thread: capture the loop thread's stack while a callback is blocking it."""
+        reported = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.slow_callback or reported == heartbeat:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame, limit=STALL_STACK_DEPTH)
+            del frame
+            self._stall_counter.inc()
+            self.stalls.append({"at": time.time(), "blockedMs": round(blocked * 1000), "stack": [s.strip() for s in stack]})
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f}+ ms in:\n{''.join(stack[-4:])}")
+
+    def stats(self) -> dict:
+        return {
+            "lagMs": round(self.lag_ms, 3),
+            "maxLagMs": round(self.max_lag_ms, 3),
+            "histogram": self._lag.snapshot(),
+            "overloaded": self.overloaded,
+            "shedLagMs": self.shed_lag_ms,
+            "slowCallbackMs": self.slow_callback * 1000,
+            "stalls": int(self._stall_counter.value),
+            "recentStalls": list(self.stalls),
+        }
+
+
+_monitor: LoopMonitor | None = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor()
+    return _monitor
+
+
+def is_overloaded(work: str | None = None) -> bool:
+    """True while non-critical work should be skipped; counts the skip under ``work``."""
+    if _monitor is None or not _monitor.overloaded:
+        return False
+    if work:
+        registry.counter("voice_shed_total", "Background work skipped under loop lag", {"work": work}).inc()
+    return True
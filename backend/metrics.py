@@ -0,0 +1,151 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Deliberately tiny: counters, gauges and fixed-bucket histograms keyed by
+(name, labels). Updates are plain attribute arithmetic on the event loop
+thread, cheap enough for per-frame and per-request paths. Rendered by the
+``/internal/metrics`` endpoint in server.py.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+
+# Milliseconds; covers sub-frame costs up to multi-second provider stalls
+DEFAULT_MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000)
+
+
+def _label_key(labels: dict | None) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=DEFAULT_MS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (max for the overflow bucket)."""
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 3),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, tuple[str, str, dict]] = {}
+
+    def _get(self, kind: str, factory, name: str, help: str, labels: dict | None):
+        entry = self._metrics.get(name)
+        if entry is None:
+            entry = (kind, help, {})
+            self._metrics[name] = entry
+        elif entry[0] != kind:
+            raise ValueError(f"metric {name} already registered as {entry[0]}")
+        series = entry[2]
+        key = _label_key(labels)
+        metric = series.get(key)
+        if metric is None:
+            metric = series[key] = factory()
+        return metric
+
+    def counter(self, name: str, help: str = "", labels: dict | None = None) -> Counter:
+        return self._get("counter", Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = "", labels: dict | None = None) -> Gauge:
+        return self._get("gauge", Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str = "", labels: dict | None = None, buckets=DEFAULT_MS_BUCKETS) -> Histogram:
+        return self._get("histogram", lambda: Histogram(buckets), name, help, labels)
+
+    def snapshot(self) -> dict:
+        """JSON-friendly view: {name: {labels-string: value or histogram summary}}."""
+        out = {}
+        for name, (kind, _, series) in self._metrics.items():
+            out[name] = {
+                _format_labels(key) or "_": metric.snapshot() if kind == "histogram" else metric.value
+                for key, metric in series.items()
+            }
+        return out
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for name, (kind, help, series) in sorted(self._metrics.items()):
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in series.items():
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(key)} {metric.value}")
+                    continue
+                cumulative = 0
+                for bound, n in zip(metric.buckets, metric.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {metric.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {metric.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,248 @@
+"""Outbound audio pacing: per-call jitter buffers on one shared timer wheel.
+
+TTS audio arrives in bursts (several seconds of speech in a few hundred
+ms, then nothing while the next sentence is synthesized). Twilio expects
+one 20 ms μ-law frame every 20 ms; forwarding bursts as-is makes the
+receiver clip or play choppily.
+
+Each call owns a ``JitterBuffer`` that slices incoming audio into frames.
+It starts playout only once ``target_frames`` are queued, and it grows that
+target after an underrun and shrinks it again after a stable stretch.
+Instead of one sleeping task per call, every buffer is registered on a
+shared ``TimerWheel``: one task ticks ``slots`` times per 20 ms period and
+services a slot's buffers per tick, which spreads the per-frame work across
+the period instead of waking every call at the same instant.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Callable
+
+from audio import FRAME_MS, TWILIO_SAMPLE_RATE, frame_samples
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+FRAME_BYTES = frame_samples(TWILIO_SAMPLE_RATE)  # μ-law: one byte per sample
+MULAW_SILENCE = b"\xff"
+
+_LATENESS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+
+
+class TimerWheel:
+    """Fires registered callbacks once per ``period_ms``, spread over ``slots``.
+
+    Callbacks are synchronous and must be cheap (they run on the event loop
+    for every frame). Deadlines are absolute, so lateness does not
+    accumulate. If the loop stalls for more than a full period, the wheel
+    resyncs instead of firing a burst of catch-up ticks.
+    """
+
+    def __init__(self, period_ms: int = FRAME_MS, slots: int = 4):
+        self.period = period_ms / 1000
+        self.tick_interval = self.period / slots
+        self._slots: list[dict[int, Callable[[], None]]] = [{} for _ in range(slots)]
+        self._where: dict[int, int] = {}
+        self._next_id = 0
+        self._task: asyncio.Task | None = None
+        self.ticks = 0
+        self.resyncs = 0
+        self._lateness = registry.histogram(
+            "voice_pacing_tick_lateness_ms", "Timer wheel tick delay past its deadline", buckets=_LATENESS_BUCKETS
+        )
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def add(self, callback: Callable[[], None]) -> int:
+        """Register a callback in the least-loaded slot; returns a handle for ``remove``."""
+        slot = min(range(len(self._slots)), key=lambda i: len(self._slots[i]))
+        handle = self._next_id
+        self._next_id += 1
+        self._slots[slot][handle] = callback
+        self._where[handle] = slot
+        return handle
+
+    def remove(self, handle: int) -> None:
+        slot = self._where.pop(handle, None)
+        if slot is not None:
+            self._slots[slot].pop(handle, None)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        slot = 0
+        while True:
+            deadline += self.tick_interval
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = loop.time()
+            late = now - deadline
+            if late > self.period:
+                self.resyncs += 1
+                deadline = now
+            self._lateness.observe(max(late, 0.0) * 1000)
+            self.ticks += 1
+            # Copy: callbacks may unregister themselves
+            for callback in list(self._slots[slot].values()):
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Timer wheel callback failed")
+            slot = (slot + 1) % len(self._slots)
+
+
+class JitterBuffer:
+    """Adaptive playout buffer turning bursty μ-law audio into paced frames.
+
+    ``push`` never blocks; audio beyond ``max_frames`` is dropped and
+    counted as overrun. Producers that can wait (e.g. the speech pipeline's
+    ``play``) should use ``write``, which applies backpressure instead.
+    Call ``end_stream`` when an utterance is complete so the tail drains
+    without being counted as an underrun, and ``clear`` on barge-in.
+    """
+
+    __slots__ = (
+        "send", "min_frames", "max_target", "max_frames", "stable_frames", "target_frames",
+        "frames_sent", "underruns", "overrun_frames", "_frames", "_partial", "_playing",
+        "_ended", "_stable", "_space",
+    )
+
+    def __init__(
+        self,
+        send: Callable[[bytes], None],
+        target_frames: int = 3,
+        min_frames: int = 2,
+        max_target: int = 10,
+        max_frames: int = 1500,
+        stable_frames: int = 250,
+    ):
+        self.send = send
+        self.target_frames = target_frames
+        self.min_frames = min_frames
+        self.max_target = max_target
+        self.max_frames = max_frames       # 30 s of audio
+        self.stable_frames = stable_frames  # 5 s without underrun before shrinking the target
+        self.frames_sent = 0
+        self.underruns = 0
+        self.overrun_frames = 0
+        self._frames: deque[bytes] = deque()
+        self._partial = b""
+        self._playing = False
+        self._ended = False
+        self._stable = 0
+        self._space = asyncio.Event()
+        self._space.set()
+
+    @property
+    def buffered_frames(self) -> int:
+        return len(self._frames)
+
+    @property
+    def buffered_ms(self) -> int:
+        return len(self._frames) * FRAME_MS
+
+    def push(self, audio: bytes) -> int:
+        """Queue μ-law audio; returns the number of whole frames accepted."""
+        self._ended = False
+        data = self._partial + audio if self._partial else audio
+        whole = len(data) - len(data) % FRAME_BYTES
+        frames = self._frames
+        accepted = 0
+        for offset in range(0, whole, FRAME_BYTES):
+            if len(frames) >= self.max_frames:
+                self.overrun_frames += (whole - offset) // FRAME_BYTES
+                registry.counter("voice_pacing_overrun_frames_total", "Outbound frames dropped on a full buffer").inc(
+                    (whole - offset) // FRAME_BYTES
+                )
+                break
+            frames.append(data[offset:offset + FRAME_BYTES])
+            accepted += 1
+        self._partial = data[whole:]
+        if len(frames) >= self.max_frames:
+            self._space.clear()
+        return accepted
+
+    async def write(self, audio: bytes) -> None:
+        """Like ``push`` but waits while the buffer is full."""
+        view = memoryview(audio)
+        offset = 0
+        while offset < len(view):
+            room = (self.max_frames - len(self._frames)) * FRAME_BYTES - len(self._partial)
+            if room <= 0:
+                self._space.clear()
+                await self._space.wait()
+                continue
+            self.push(bytes(view[offset:offset + room]))
+            offset += room
+
+    def end_stream(self) -> None:
+        """Mark the current utterance complete: pad and release the tail."""
+        if self._partial:
+            self._frames.append(self._partial + MULAW_SILENCE * (FRAME_BYTES - len(self._partial)))
+            self._partial = b""
+        self._ended = True
+
+    def clear(self) -> int:
+        """Drop everything queued (barge-in); returns frames discarded."""
+        dropped = len(self._frames)
+        self._frames.clear()
+        self._partial = b""
+        self._playing = False
+        self._ended = False
+        self._space.set()
+        return dropped
+
+    def tick(self) -> None:
+        """Timer wheel callback: emit at most one frame."""
+        frames = self._frames
+        if not self._playing:
+            if not frames or (len(frames) < self.target_frames and not self._ended):
+                return
+            self._playing = True
+
+        if frames:
+            self.send(frames.popleft())
+            self.frames_sent += 1
+            if not self._space.is_set() and len(frames) < self.max_frames // 2:
+                self._space.set()
+            self._stable += 1
+            if self._stable >= self.stable_frames and self.target_frames > self.min_frames:
+                self.target_frames -= 1
+                self._stable = 0
+            return
+
+        self._playing = False
+        if self._ended:
+            self._ended = False
+            return
+        # Starved mid-utterance: rebuffer with more headroom next time
+        self.underruns += 1
+        self._stable = 0
+        self.target_frames = min(self.target_frames + 1, self.max_target)
+        registry.counter("voice_pacing_underruns_total", "Outbound buffer underruns mid-utterance").inc()
+
+    def stats(self) -> dict:
+        return {
+            "bufferedMs": self.buffered_ms,
+            "targetMs": self.target_frames * FRAME_MS,
+            "framesSent": self.frames_sent,
+            "underruns": self.underruns,
+            "overrunFrames": self.overrun_frames,
+        }
@@ -0,0 +1,320 @@
+"""Streaming LLM -> TTS -> playback pipeline for one agent turn.
+
+Instead of waiting for the full LLM reply and then the full TTS audio, the
+reply is cut into speakable chunks at sentence (or, for long runs, clause)
+boundaries while tokens are still arriving. Each chunk goes to TTS at once,
+and its audio is played as soon as the first bytes come back. Chunks are
+always played in order; TTS for the next chunk overlaps playback of the
+current one.
+
+``SpeechPipeline.cancel()`` tears everything down (LLM stream, in-flight
+TTS requests, playback), which is what barge-in (vad.BargeInController)
+calls. A cancelled ``run()`` raises CancelledError once the turn's metrics
+are recorded, and a cancel that arrives before ``run()`` starts still
+cancels it. Each turn records per-stage latencies in ``TurnMetrics`` and in
+the shared metrics registry.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ELEVENLABS_API_URL = os.environ.get("ELEVENLABS_API_URL", "https://api.elevenlabs.io")
+
+_SENTENCE_END = re.compile(r"""[.!?]+["')\]]*\s""")
+_CLAUSE_END = re.compile(r"""[,;:—]\s""")
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "jr", "sr", "vs", "etc", "e.g", "i.e", "approx"}
+
+_STAGE_HISTOGRAM = "voice_pipeline_stage_ms"
+
+
+class SentenceChunker:
+    """Incrementally splits streamed text into speakable chunks.
+
+    A chunk ends at a sentence boundary, or at a clause boundary once the
+    pending text reaches ``clause_min_chars``. Text past ``max_chars`` with
+    no boundary is cut at the last space. The first chunk uses lower
+    thresholds so audio starts as early as possible.
+    """
+
+    def __init__(self, min_chars: int = 12, clause_min_chars: int = 60, max_chars: int = 220, first_clause_min_chars: int = 24):
+        self.min_chars = min_chars
+        self.clause_min_chars = clause_min_chars
+        self.max_chars = max_chars
+        self.first_clause_min_chars = first_clause_min_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def feed(self, text: str) -> list[str]:
+        self._buffer += text
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if chunk:
+                chunks.append(chunk)
+                self._emitted += 1
+        return chunks
+
+    def flush(self) -> str | None:
+        chunk, self._buffer = self._buffer.strip(), ""
+        return chunk or None
+
+    def _find_cut(self) -> int | None:
+        buf = self._buffer
+        for match in _SENTENCE_END.finditer(buf):
+            end = match.end()
+            if end < self.min_chars:
+                continue
+            word = buf[:match.start()].rsplit(None, 1)[-1].lower() if buf[:match.start()].strip() else ""
+            if buf[match.start()] == "." and word.rstrip(".") in _ABBREVIATIONS:
+                continue
+            return end
+
+        clause_min = self.first_clause_min_chars if self._emitted == 0 else self.clause_min_chars
+        if len(buf) >= clause_min:
+            for match in _CLAUSE_END.finditer(buf):
+                if match.end() >= clause_min:
+                    return match.end()
+
+        if len(buf) >= self.max_chars:
+            space = buf.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
+
+
+@dataclass
+class TurnMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    first_token: float | None = None
+    first_chunk: float | None = None
+    first_audio: float | None = None
+    first_playback: float | None = None
+    finished: float | None = None
+    cancelled: bool = False
+    chunks: int = 0
+    audio_bytes: int = 0
+    tts_first_byte_ms: list = field(default_factory=list)
+
+    def _ms(self, mark: float | None) -> float | None:
+        return None if mark is None else round((mark - self.started) * 1000, 2)
+
+    def as_dict(self) -> dict:
+        return {
+            "firstTokenMs": self._ms(self.first_token),
+            "firstChunkMs": self._ms(self.first_chunk),
+            "firstAudioMs": self._ms(self.first_audio),
+            "timeToFirstPlaybackMs": self._ms(self.first_playback),
+            "totalMs": self._ms(self.finished),
+            "cancelled": self.cancelled,
+            "chunks": self.chunks,
+            "audioBytes": self.audio_bytes,
+            "ttsFirstByteMs": self.tts_first_byte_ms,
+        }
+
+    def record(self) -> None:
+        for stage, mark in (
+            ("first_token", self.first_token),
+            ("first_chunk", self.first_chunk),
+            ("first_audio", self.first_audio),
+            ("first_playback", self.first_playback),
+            ("total", self.finished),
+        ):
+            if mark is not None:
+                registry.histogram(_STAGE_HISTOGRAM, "Agent turn latency by pipeline stage", {"stage": stage}).observe(
+                    (mark - self.started) * 1000
+                )
+        for ms in self.tts_first_byte_ms:
+            registry.histogram(_STAGE_HISTOGRAM, labels={"stage": "tts_first_byte"}).observe(ms)
+        outcome = "cancelled" if self.cancelled else "completed"
+        registry.counter("voice_pipeline_turns_total", "Agent turns by outcome", {"outcome": outcome}).inc()
+
+
+_DONE = object()
+
+
+class SpeechPipeline:
+    """Runs one agent turn: LLM tokens -> chunks -> TTS audio -> playback.
+
+    ``synthesize(text)`` returns an async iterator of audio bytes and
+    ``play(audio)`` delivers audio to the call (e.g. a jitter buffer).
+    At most ``max_tts_ahead`` chunks are synthesized ahead of playback.
+
+    ``started`` is the ``time.perf_counter()`` at which the caller stopped
+    speaking (defaults to now). When ``session`` (a sessions.CallSession) is
+    given, the time from then to the first agent audio is recorded on it and
+    ends up in the call's analytics roll-up. If the session has barge-in
+    enabled, caller speech during playback cancels the turn.
+    """
+
+    def __init__(
+        self,
+        tokens: AsyncIterator[str],
+        synthesize: Callable[[str], AsyncIterator[bytes]],
+        play: Callable[[bytes], Awaitable[None]],
+        chunker: SentenceChunker | None = None,
+        max_tts_ahead: int = 2,
+        session=None,
+        started: float | None = None,
+    ):
+        self._tokens = tokens
+        self._synthesize = synthesize
+        self._play = play
+        self._chunker = chunker or SentenceChunker()
+        self._ahead = asyncio.Semaphore(max_tts_ahead)
+        self._order: asyncio.Queue = asyncio.Queue()
+        self._tasks: set[asyncio.Task] = set()
+        self._run_task: asyncio.Task | None = None
+        self._cancel_requested = False
+        self._session = session
+        self.metrics = TurnMetrics() if started is None else TurnMetrics(started=started)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run(self) -> TurnMetrics:
+        self._run_task = asyncio.current_task()
+        if self._cancel_requested:
+            # cancel() came first: the first await below raises
+            self._run_task.cancel()
+        producer = self._spawn(self._produce())
+        try:
+            await self._consume()
+            await producer
+        except asyncio.CancelledError:
+            self.metrics.cancelled = True
+            raise
+        finally:
+            if self._session is not None and self._session.barge_in is not None:
+                self._session.barge_in.end_playback()
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self.metrics.finished = time.perf_counter()
+            self.metrics.record()
+        return self.metrics
+
+    def cancel(self) -> None:
+        """Stop the turn now (barge-in). Safe to call from sync callbacks."""
+        self._cancel_requested = True
+        if self._run_task is not None and not self._run_task.done():
+            self._run_task.cancel()
+
+    async def _produce(self) -> None:
+        try:
+            async for token in self._tokens:
+                if self.metrics.first_token is None:
+                    self.metrics.first_token = time.perf_counter()
+                for chunk in self._chunker.feed(token):
+                    await self._dispatch(chunk)
+            tail = self._chunker.flush()
+            if tail:
+                await self._dispatch(tail)
+        finally:
+            self._order.put_nowait(_DONE)
+
+    async def _dispatch(self, chunk: str) -> None:
+        if self.metrics.first_chunk is None:
+            self.metrics.first_chunk = time.perf_counter()
+        self.metrics.chunks += 1
+        await self._ahead.acquire()
+        audio: asyncio.Queue = asyncio.Queue()
+        self._spawn(self._tts(chunk, audio))
+        self._order.put_nowait(audio)
+
+    async def _tts(self, chunk: str, audio: asyncio.Queue) -> None:
+        requested = time.perf_counter()
+        first = True
+        try:
+            async for piece in self._synthesize(chunk):
+                if first:
+                    first = False
+                    now = time.perf_counter()
+                    self.metrics.tts_first_byte_ms.append(round((now - requested) * 1000, 2))
+                    if self.metrics.first_audio is None:
+                        self.metrics.first_audio = now
+                audio.put_nowait(piece)
+        except Exception as e:
+            audio.put_nowait(e)
+        finally:
+            audio.put_nowait(_DONE)
+
+    async def _consume(self) -> None:
+        while True:
+            audio = await self._order.get()
+            if audio is _DONE:
+                return
+            try:
+                while True:
+                    piece = await audio.get()
+                    if piece is _DONE:
+                        break
+                    if isinstance(piece, Exception):
+                        # Skip the failed chunk rather than end the turn
+                        logger.warning(f"TTS chunk failed: {piece}")
+                        continue
+                    if self.metrics.first_playback is None:
+                        self.metrics.first_playback = time.perf_counter()
+                        if self._session is not None:
+                            self._session.record_latency((self.metrics.first_playback - self.metrics.started) * 1000)
+                            if self._session.barge_in is not None:
+                                self._session.barge_in.start_playback(self.cancel)
+                    self.metrics.audio_bytes += len(piece)
+                    await self._play(piece)
+            finally:
+                self._ahead.release()
+
+
+# ====== Provider streams ======
+
+async def stream_chat_tokens(client: httpx.AsyncClient, url: str, api_key: str, messages: list, model: str, **params) -> AsyncIterator[str]:
+    """Tokens from an OpenAI-compatible streaming chat completions endpoint."""
+    payload = {"model": model, "messages": messages, "stream": True, **params}
+    headers = {"Authorization": f"Bearer {api_key}"}
+    async with client.stream("POST", url, json=payload, headers=headers, timeout=30.0) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+def elevenlabs_stream(client: httpx.AsyncClient, api_key: str, voice_id: str, model: str = "eleven_turbo_v2_5", output_format: str = "ulaw_8000"):
+    """``synthesize`` callable streaming ElevenLabs audio for a text chunk."""
+
+    async def synthesize(text: str) -> AsyncIterator[bytes]:
+        async with client.stream(
+            "POST",
+            f"{ELEVENLABS_API_URL}/v1/text-to-speech/{voice_id}/stream",
+            params={"output_format": output_format},
+            headers={"xi-api-key": api_key},
+            json={"text": text, "model_id": model},
+            timeout=30.0,
+        ) as response:
+            response.raise_for_status()
+            async for piece in response.aiter_bytes():
+                yield piece
+
+    return synthesize
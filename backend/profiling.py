@@ -0,0 +1,272 @@
+"""On-demand profiling of the running process (the /internal/profile endpoints).
+
+Nothing here costs anything until a capture is requested:
+
+- ``sample_cpu`` runs a sampling profiler in its own thread. It reads the
+  event-loop thread's stack through ``sys._current_frames`` every few
+  milliseconds and returns folded stacks (``a;b;c 42`` per line), which
+  flamegraph.pl, speedscope and inferno accept as-is. The loop is never
+  paused; each sample only holds the GIL for one stack walk.
+- ``measure_loop`` measures timer lag for a window by sleeping in small
+  steps on the loop. Over the same window it tracks which tasks stay
+  pending. The tasks pending longest, with the line each one is suspended
+  at, point at stuck awaits.
+- ``MemoryTracer`` starts tracemalloc, takes a baseline snapshot and diffs
+  later snapshots against it. Tracing slows every allocation, so ``stop``
+  ends it, and so does a timer PROFILE_MEMORY_MAX_S after the baseline if
+  nobody calls ``stop``. Snapshots run in a worker thread but still stall
+  the loop: ``tracemalloc.take_snapshot`` copies the whole trace table in
+  C without releasing the GIL. The stall grows with the number of live
+  traced blocks times the frames kept per block (tens to hundreds of ms on
+  a busy worker). PROFILE_TRACEMALLOC_FRAMES therefore defaults to 5. The
+  diff itself runs in Python and only shares the GIL with the loop.
+
+Only one capture of each kind runs at a time; callers get ``ProfilerBusy``.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import Counter
+
+MAX_CAPTURE_S = float(os.environ.get("PROFILE_MAX_CAPTURE_S", 60))
+TRACEMALLOC_FRAMES = int(os.environ.get("PROFILE_TRACEMALLOC_FRAMES", 5))
+MEMORY_TRACE_MAX_S = float(os.environ.get("PROFILE_MEMORY_MAX_S", 900))
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _folded(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+_cpu_lock = threading.Lock()
+
+
+def sample_cpu(thread_id: int, duration_s: float, interval_ms: float = 5.0) -> dict:
+    """Sample ``thread_id``'s stack for ``duration_s``; blocking, so call it from a worker thread."""
+    if not _cpu_lock.acquire(blocking=False):
+        raise ProfilerBusy("A CPU profile is already running")
+    try:
+        duration_s = min(max(duration_s, 0.1), MAX_CAPTURE_S)
+        interval = max(interval_ms, 1.0) / 1000
+        stacks: Counter[str] = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + duration_s
+        while (now := time.perf_counter()) < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            stacks[_folded(frame)] += 1
+            del frame
+            samples += 1
+            time.sleep(max(0.0, interval - (time.perf_counter() - now)))
+        return {
+            "samples": samples,
+            "seconds": round(time.perf_counter() - started, 3),
+            "intervalMs": interval * 1000,
+            "stacks": stacks,
+        }
+    finally:
+        _cpu_lock.release()
+
+
+def folded_text(profile: dict) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+
+def top_functions(profile: dict, limit: int = 30) -> list[dict]:
+    """Functions by self samples (the leaf of each stack) and total samples (anywhere in it)."""
+    own: Counter[str] = Counter()
+    total: Counter[str] = Counter()
+    for stack, count in profile["stacks"].items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for label in set(frames):
+            total[label] += count
+    samples = profile["samples"] or 1
+    return [
+        {"function": label, "selfPct": round(100 * n / samples, 1), "totalPct": round(100 * total[label] / samples, 1)}
+        for label, n in own.most_common(limit)
+    ]
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+def _task_site(task: asyncio.Task) -> str | None:
+    frames = task.get_stack(limit=1)
+    if not frames:
+        return None
+    frame = frames[-1]
+    return f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+
+
+_loop_busy = False
+
+
+async def measure_loop(duration_s: float, interval_ms: float = 10.0, top: int = 20) -> dict:
+    """Timer lag over ``duration_s`` and the tasks that stayed pending longest during it."""
+    global _loop_busy
+    if _loop_busy:
+        raise ProfilerBusy("A loop measurement is already running")
+    _loop_busy = True
+    try:
+        duration_s = min(max(duration_s, 0.1), MAX_CAPTURE_S)
+        interval = max(interval_ms, 1.0) / 1000
+        current = asyncio.current_task()
+        first_seen: weakref.WeakKeyDictionary[asyncio.Task, float] = weakref.WeakKeyDictionary()
+        started = time.perf_counter()
+        for task in asyncio.all_tasks():
+            first_seen[task] = started
+        lags = []
+        while time.perf_counter() - started < duration_s:
+            before = time.perf_counter()
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            lags.append((now - before - interval) * 1000)
+            for task in asyncio.all_tasks():
+                first_seen.setdefault(task, now)
+        ended = time.perf_counter()
+
+        pending = sorted(
+            ((seen, task) for task, seen in first_seen.items() if not task.done() and task is not current),
+            key=lambda item: item[0],
+        )
+        lags.sort()
+        return {
+            "seconds": round(ended - started, 3),
+            "lagMs": {
+                "samples": len(lags),
+                "mean": round(sum(lags) / len(lags), 3) if lags else 0.0,
+                "p50": round(_percentile(lags, 0.50), 3),
+                "p95": round(_percentile(lags, 0.95), 3),
+                "p99": round(_percentile(lags, 0.99), 3),
+                "max": round(lags[-1], 3) if lags else 0.0,
+            },
+            "pendingTasks": len(pending),
+            "longestPending": [
+                {
+                    "name": task.get_name(),
+                    "coroutine": getattr(task.get_coro(), "__qualname__", repr(task.get_coro())),
+                    "awaitingAt": _task_site(task),
+                    # Tasks already running when the window opened are at least this old
+                    "pendingForS": round(ended - seen, 3),
+                    "olderThanWindow": seen == started,
+                }
+                for seen, task in pending[:top]
+            ],
+        }
+    finally:
+        _loop_busy = False
+
+
+class MemoryTracer:
+    def __init__(self, max_s: float = MEMORY_TRACE_MAX_S):
+        self.max_s = max_s
+        self._baseline: tracemalloc.Snapshot | None = None
+        self._lock = asyncio.Lock()
+        self._started_here = False
+        self._expiry: asyncio.Task | None = None
+        self._expires_at: float | None = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    async def baseline(self) -> dict:
+        """Start tracing if needed and take the snapshot later diffs compare against."""
+        async with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_here = True
+            if self._started_here:
+                # A new baseline restarts the clock
+                if self._expiry is not None:
+                    self._expiry.cancel()
+                self._expires_at = time.monotonic() + self.max_s
+                self._expiry = asyncio.create_task(self._expire(self.max_s))
+            self._baseline = await asyncio.to_thread(self._snapshot)
+            return self.stats()
+
+    async def _expire(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._expiry = None  # don't let stop() cancel the task running it
+        await self.stop()
+
+    async def diff(self, top: int = 25, group_by: str = "lineno") -> dict:
+        """Top allocation changes since the baseline, grouped by ``lineno``, ``filename`` or ``traceback``."""
+        async with self._lock:
+            if self._baseline is None or not tracemalloc.is_tracing():
+                raise ProfilerBusy("No baseline; POST /internal/profile/memory first")
+            baseline = self._baseline
+
+            def compare():
+                snapshot = self._snapshot()
+                return snapshot, snapshot.compare_to(baseline, group_by)
+
+            snapshot, changes = await asyncio.to_thread(compare)
+            return {
+                "sizeDiffBytes": sum(s.size_diff for s in changes),
+                "countDiff": sum(s.count_diff for s in changes),
+                "tracedBytes": sum(s.size for s in snapshot.statistics("filename")),
+                "top": [
+                    {
+                        "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+                        if group_by == "traceback" else f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "sizeDiffBytes": stat.size_diff,
+                        "countDiff": stat.count_diff,
+                        "sizeBytes": stat.size,
+                        "count": stat.count,
+                    }
+                    for stat in changes[:top]
+                ],
+            }
+
+    async def stop(self) -> dict:
+        async with self._lock:
+            if self._expiry is not None:
+                self._expiry.cancel()
+                self._expiry = None
+            self._expires_at = None
+            self._baseline = None
+            if tracemalloc.is_tracing() and self._started_here:
+                tracemalloc.stop()
+            self._started_here = False
+            return self.stats()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        # Leave out tracemalloc's own bookkeeping
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def stats(self) -> dict:
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        stops_in = None if self._expires_at is None else round(max(self._expires_at - time.monotonic(), 0), 1)
+        return {"tracing": self.tracing, "hasBaseline": self._baseline is not None,
+                "tracedBytes": traced, "peakBytes": peak, "frames": tracemalloc.get_traceback_limit(),
+                "stopsInS": stops_in}
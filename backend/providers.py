@@ -0,0 +1,355 @@
+"""Warm, authenticated provider connections handed out to new calls.
+
+Opening a TLS WebSocket to Deepgram, or the first HTTPS request to
+ElevenLabs, costs one or more round trips plus auth before a call can hear
+or speak. ``ProviderPool`` pays that cost ahead of time, per workspace API
+key:
+
+- **Deepgram (STT)**: a live stream is stateful, so sockets are not shared.
+  The pool keeps ``warm_per_key`` spare sockets already open and
+  authenticated. ``acquire_stt`` hands a spare to the call, exclusively,
+  and opens a replacement in the background. Idle spares get Deepgram's
+  ``KeepAlive`` message so the server does not time them out, and they are
+  retired after ``max_idle_s``.
+- **ElevenLabs (TTS)**: plain HTTPS, so each key gets one shared
+  ``httpx.AsyncClient`` whose keep-alive connections are pre-opened with a
+  cheap authenticated request.
+
+Open sockets (spare plus in use) are capped at ``max_connections``. At the
+cap the oldest spares of other keys are evicted first. If no spare is
+left, ``PoolExhaustedError`` is raised.
+
+Keys are remembered per workspace when callers pass ``workspace_id``.
+``drop_workspace`` then closes the spares and HTTP clients of every key the
+workspace used, so nobody has to know the old keys after a rotation.
+Sockets already handed to calls stay with their calls.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlencode
+
+import httpx
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.protocol import State
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEEPGRAM_WS_URL = os.environ.get("DEEPGRAM_WS_URL", "wss://api.deepgram.com/v1/listen")
+ELEVENLABS_API_URL = os.environ.get("ELEVENLABS_API_URL", "https://api.elevenlabs.io")
+PROVIDER_POOL_MAX = int(os.environ.get("PROVIDER_POOL_MAX", 500))
+PROVIDER_POOL_WARM = int(os.environ.get("PROVIDER_POOL_WARM", 2))
+PROVIDER_POOL_IDLE_S = float(os.environ.get("PROVIDER_POOL_IDLE_S", 300))
+KEEPALIVE_INTERVAL_S = 5.0
+CONNECT_TIMEOUT_S = 10.0
+
+# Twilio media streams: μ-law 8 kHz mono
+DEEPGRAM_PARAMS = {
+    "encoding": "mulaw",
+    "sample_rate": 8000,
+    "channels": 1,
+    "model": "nova-2",
+    "interim_results": "true",
+    "endpointing": 300,
+}
+
+_KEEPALIVE = '{"type": "KeepAlive"}'
+
+
+class PoolExhaustedError(Exception):
+    """Raised when every pooled connection slot is in use."""
+
+
+def key_id(api_key: str) -> str:
+    """Stable, non-reversible identifier for an API key (logs, stats, pool buckets)."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class _Spare:
+    __slots__ = ("ws", "opened", "key")
+
+    def __init__(self, ws: ClientConnection, key: str):
+        self.ws = ws
+        self.key = key
+        self.opened = time.monotonic()
+
+
+class _HttpEntry:
+    __slots__ = ("client", "last_used")
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.last_used = time.monotonic()
+
+
+class ProviderPool:
+    def __init__(self, max_connections: int = PROVIDER_POOL_MAX, warm_per_key: int = PROVIDER_POOL_WARM,
+                 max_idle_s: float = PROVIDER_POOL_IDLE_S, deepgram_url: str = DEEPGRAM_WS_URL,
+                 elevenlabs_url: str = ELEVENLABS_API_URL, ssl=None):
+        self.max_connections = max_connections
+        self.warm_per_key = warm_per_key
+        self.max_idle_s = max_idle_s
+        self.deepgram_url = f"{deepgram_url}?{urlencode(DEEPGRAM_PARAMS)}"
+        self.elevenlabs_url = elevenlabs_url
+        self.ssl = ssl
+        self._spares: dict[str, deque[_Spare]] = defaultdict(deque)
+        self._keys: dict[str, str] = {}  # key id -> api key, for replenishing
+        self._workspaces: dict[str, set[str]] = defaultdict(set)  # workspace id -> key ids
+        self._in_use = 0
+        self._opening = 0
+        self._replenishing: set[str] = set()
+        self._http: dict[str, _HttpEntry] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._health: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+
+    # ----- accounting -----
+
+    @property
+    def open_connections(self) -> int:
+        return self._in_use + self._opening + sum(len(q) for q in self._spares.values())
+
+    def _observe(self, provider: str, result: str, started: float) -> None:
+        registry.histogram(
+            "voice_provider_acquire_ms", "Time to hand a provider connection to a call",
+            {"provider": provider, "result": result},
+        ).observe((time.perf_counter() - started) * 1000)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _bind(self, workspace_id: str | None, key: str) -> None:
+        if workspace_id:
+            self._workspaces[workspace_id].add(key)
+
+    # ----- Deepgram -----
+
+    async def _open_stt(self, api_key: str) -> ClientConnection:
+        self._opening += 1
+        try:
+            return await connect(
+                self.deepgram_url,
+                additional_headers={"Authorization": f"Token {api_key}"},
+                open_timeout=CONNECT_TIMEOUT_S,
+                ssl=self.ssl,
+                max_queue=64,
+            )
+        finally:
+            self._opening -= 1
+
+    def _make_room(self, key: str) -> bool:
+        """Free a slot by evicting the oldest spare of another key (then any key)."""
+        if self.open_connections < self.max_connections:
+            return True
+        candidates = [s for k, q in self._spares.items() if k != key for s in q] or \
+            [s for q in self._spares.values() for s in q]
+        if not candidates:
+            return False
+        victim = min(candidates, key=lambda s: s.opened)
+        self._spares[victim.key].remove(victim)
+        self._spawn(victim.ws.close())
+        registry.counter("voice_provider_evictions_total", "Spare connections evicted at the pool cap").inc()
+        return True
+
+    async def acquire_stt(self, api_key: str, workspace_id: str | None = None) -> ClientConnection:
+        """An open, authenticated Deepgram socket owned by the caller until it closes it."""
+        started = time.perf_counter()
+        key = key_id(api_key)
+        self._keys[key] = api_key
+        self._bind(workspace_id, key)
+        spares = self._spares[key]
+        while spares:
+            spare = spares.popleft()
+            if spare.ws.state is State.OPEN:
+                self.hits += 1
+                self._in_use += 1
+                self._observe("deepgram", "hit", started)
+                self._schedule_replenish(key)
+                return self._watch(spare.ws)
+            self._spawn(spare.ws.close())
+
+        if not self._make_room(key):
+            raise PoolExhaustedError(f"Provider connection cap reached ({self.max_connections})")
+        self.misses += 1
+        ws = await self._open_stt(api_key)
+        self._in_use += 1
+        self._observe("deepgram", "miss", started)
+        self._schedule_replenish(key)
+        return self._watch(ws)
+
+    def _watch(self, ws: ClientConnection) -> ClientConnection:
+        """Give the slot back once the call's socket closes, however it closes."""
+        task = asyncio.create_task(ws.wait_closed())
+        self._tasks.add(task)
+        task.add_done_callback(self._released)
+        return ws
+
+    def _released(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._in_use -= 1
+
+    def _schedule_replenish(self, key: str) -> None:
+        if key not in self._replenishing:
+            self._replenishing.add(key)
+            self._spawn(self._replenish(key))
+
+    async def _replenish(self, key: str) -> None:
+        try:
+            spares = self._spares[key]
+            while len(spares) < self.warm_per_key and self.open_connections < self.max_connections:
+                api_key = self._keys.get(key)
+                if api_key is None:  # dropped while we were connecting
+                    return
+                try:
+                    ws = await self._open_stt(api_key)
+                except Exception as e:
+                    logger.warning(f"Deepgram pre-connect failed for key {key}: {e}")
+                    return
+                spares.append(_Spare(ws, key))
+        finally:
+            self._replenishing.discard(key)
+
+    # ----- ElevenLabs -----
+
+    async def elevenlabs_client(self, api_key: str, workspace_id: str | None = None) -> httpx.AsyncClient:
+        """Shared warm client for this key; do not close it."""
+        started = time.perf_counter()
+        key = key_id(api_key)
+        self._bind(workspace_id, key)
+        entry = self._http.get(key)
+        if entry is not None and not entry.client.is_closed:
+            entry.last_used = time.monotonic()
+            self.hits += 1
+            self._observe("elevenlabs", "hit", started)
+            return entry.client
+
+        self.misses += 1
+        client = httpx.AsyncClient(
+            base_url=self.elevenlabs_url,
+            headers={"xi-api-key": api_key},
+            limits=httpx.Limits(max_keepalive_connections=self.warm_per_key * 4, keepalive_expiry=self.max_idle_s),
+            timeout=httpx.Timeout(30.0, connect=CONNECT_TIMEOUT_S),
+            verify=self.ssl if self.ssl is not None else True,
+        )
+        self._http[key] = _HttpEntry(client)
+        await self._touch_elevenlabs(client)
+        self._observe("elevenlabs", "miss", started)
+        return client
+
+    async def _touch_elevenlabs(self, client: httpx.AsyncClient) -> None:
+        # Opens the TLS connection and validates the key; the connection stays pooled
+        try:
+            response = await client.get("/v1/user")
+            if response.status_code == 401:
+                logger.warning("ElevenLabs rejected a pooled API key")
+        except httpx.HTTPError as e:
+            logger.warning(f"ElevenLabs pre-connect failed: {e}")
+
+    # ----- lifecycle -----
+
+    async def warm(self, deepgram_key: str | None = None, elevenlabs_key: str | None = None,
+                   workspace_id: str | None = None) -> None:
+        """Pre-open connections for a workspace's keys (e.g. when a call starts ringing)."""
+        jobs = []
+        if deepgram_key:
+            key = key_id(deepgram_key)
+            self._keys[key] = deepgram_key
+            self._bind(workspace_id, key)
+            if key not in self._replenishing:
+                self._replenishing.add(key)
+                jobs.append(self._replenish(key))
+        if elevenlabs_key:
+            jobs.append(self.elevenlabs_client(elevenlabs_key, workspace_id))
+        await asyncio.gather(*jobs)
+
+    def drop_key(self, api_key: str) -> None:
+        """Close spares and the HTTP client for a rotated or removed key."""
+        self._drop(key_id(api_key))
+
+    def drop_workspace(self, workspace_id: str) -> int:
+        """Close spares and HTTP clients of every key the workspace used; returns how many keys."""
+        keys = self._workspaces.pop(workspace_id, set())
+        for key in keys:
+            self._drop(key)
+        return len(keys)
+
+    def _drop(self, key: str) -> None:
+        for spare in self._spares.pop(key, ()):
+            self._spawn(spare.ws.close())
+        self._keys.pop(key, None)
+        entry = self._http.pop(key, None)
+        if entry is not None:
+            self._spawn(entry.client.aclose())
+
+    async def check_health(self) -> None:
+        now = time.monotonic()
+        for key, spares in list(self._spares.items()):
+            for spare in list(spares):
+                if spare.ws.state is not State.OPEN or now - spare.opened > self.max_idle_s:
+                    spares.remove(spare)
+                    await spare.ws.close()
+                    continue
+                try:
+                    await spare.ws.send(_KEEPALIVE)
+                except Exception:
+                    spares.remove(spare)
+                    self._spawn(spare.ws.close())
+            if not spares and key not in self._keys:
+                del self._spares[key]
+        for key, entry in list(self._http.items()):
+            if now - entry.last_used > self.max_idle_s:
+                del self._http[key]
+                await entry.client.aclose()
+        # Forget workspace bindings of keys the pool no longer holds anything for
+        live = set(self._keys) | set(self._http)
+        for workspace_id, keys in list(self._workspaces.items()):
+            keys &= live
+            if not keys:
+                del self._workspaces[workspace_id]
+
+    def start(self) -> None:
+        if self._health is None or self._health.done():
+            self._health = asyncio.create_task(self._health_forever())
+
+    async def _health_forever(self) -> None:
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL_S)
+            try:
+                await self.check_health()
+            except Exception:
+                logger.exception("Provider pool health check failed")
+
+    async def close(self) -> None:
+        if self._health is not None:
+            self._health.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        spares = [s for q in self._spares.values() for s in q]
+        self._spares.clear()
+        await asyncio.gather(*(s.ws.close() for s in spares), return_exceptions=True)
+        clients = [e.client for e in self._http.values()]
+        self._http.clear()
+        await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "open": self.open_connections,
+            "inUse": self._in_use,
+            "spare": {key: len(q) for key, q in self._spares.items() if q},
+            "httpClients": len(self._http),
+            "maxConnections": self.max_connections,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
@@ -0,0 +1,396 @@
+"""Call recordings as chunked append-only files on local disk.
+
+Layout, one directory per call under the day it started:
+
+    RECORDINGS_DIR/2026-10-19/<callSid>/audio-000.ulaw   # stereo μ-law 8 kHz, caller left / agent right
+                                       /audio-001.ulaw   # rotated every RECORDING_CHUNK_BYTES
+                                       /transcript.jsonl # {"t": seconds, "role", "text"} per turn
+                                       /index.json       # written when the call ends
+
+Audio is never held in memory or in Mongo. The writer appends each 20 ms
+frame pair to the current chunk through a small write buffer. Readers
+memory-map the chunks and serve byte ranges of a virtual WAV file (a
+generated header followed by the chunks) as memoryview slices, so playback
+and HTTP range requests copy nothing in Python.
+
+``maintain`` is the retention/compaction job. It deletes days past
+RECORDING_RETENTION_DAYS, then the oldest calls while the store is over
+RECORDING_MAX_BYTES. It recovers the index of calls whose writer died, and
+merges the chunks of finished calls into one file.
+
+``maintain`` runs in a worker thread while the event loop serves
+recordings. The store's call map is guarded by a lock. Compaction writes
+the merged file under a new name and switches index.json to it before
+removing the old chunks, so an index never names a missing file. A reader
+that raced a compaction or deletion re-reads the index once.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from audio import TWILIO_SAMPLE_RATE, frame_samples
+
+logger = logging.getLogger(__name__)
+
+RECORDINGS_DIR = os.environ.get("RECORDINGS_DIR", str(Path(__file__).parent / "recordings"))
+RECORDING_CHUNK_BYTES = int(os.environ.get("RECORDING_CHUNK_BYTES", 8 * 1024 * 1024))
+RECORDING_RETENTION_DAYS = int(os.environ.get("RECORDING_RETENTION_DAYS", 30))
+RECORDING_MAX_BYTES = int(os.environ.get("RECORDING_MAX_BYTES", 20 * 1024 ** 3))
+# Calls without an index.json this long after their last write are orphans
+ORPHAN_AFTER_S = 3600
+
+CHANNELS = 2
+FRAME_BYTES = frame_samples(TWILIO_SAMPLE_RATE)
+MULAW_SILENCE = b"\xff" * FRAME_BYTES
+STREAM_CHUNK_BYTES = 64 * 1024
+
+_WAVE_FORMAT_MULAW = 7
+
+
+def wav_header(data_bytes: int) -> bytes:
+    """Canonical WAV header for stereo μ-law 8 kHz (non-PCM formats carry cbSize)."""
+    byte_rate = TWILIO_SAMPLE_RATE * CHANNELS
+    fmt = struct.pack("<HHIIHHH", _WAVE_FORMAT_MULAW, CHANNELS, TWILIO_SAMPLE_RATE, byte_rate, CHANNELS, 8, 0)
+    fact = struct.pack("<I", data_bytes // CHANNELS)
+    body = (
+        b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"fact" + struct.pack("<I", len(fact)) + fact
+        + b"data" + struct.pack("<I", data_bytes)
+    )
+    return b"RIFF" + struct.pack("<I", len(body) + data_bytes) + body
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+class RecordingWriter:
+    """Appends one call's audio and transcript. Not thread-safe; one per call."""
+
+    __slots__ = ("call_sid", "directory", "meta", "chunk_index", "chunk_bytes", "total_bytes",
+                 "_audio", "_transcript", "_frame", "closed")
+
+    def __init__(self, directory: Path, call_sid: str, meta: dict):
+        self.call_sid = call_sid
+        self.directory = directory
+        self.meta = meta
+        self.chunk_index = 0
+        self.chunk_bytes = 0
+        self.total_bytes = 0
+        self.closed = False
+        directory.mkdir(parents=True, exist_ok=True)
+        self._audio = open(directory / "audio-000.ulaw", "ab", buffering=64 * 1024)
+        self._transcript = open(directory / "transcript.jsonl", "a", buffering=1)
+        self._frame = np.empty(FRAME_BYTES * CHANNELS, dtype=np.uint8)
+
+    def append_frame(self, caller: bytes | None, agent: bytes | None) -> None:
+        """One 20 ms tick: caller and agent μ-law frames (None = silence)."""
+        frame = self._frame
+        frame[0::2] = np.frombuffer(caller or MULAW_SILENCE, dtype=np.uint8)
+        frame[1::2] = np.frombuffer(agent or MULAW_SILENCE, dtype=np.uint8)
+        if self.chunk_bytes + frame.nbytes > RECORDING_CHUNK_BYTES:
+            self._rotate()
+        self._audio.write(frame.data)
+        self.chunk_bytes += frame.nbytes
+        self.total_bytes += frame.nbytes
+
+    def append_segment(self, role: str, text: str, t: float | None = None) -> None:
+        if t is None:
+            t = round(self.total_bytes / (TWILIO_SAMPLE_RATE * CHANNELS), 2)
+        self._transcript.write(json.dumps({"t": t, "role": role, "text": text}, ensure_ascii=False) + "\n")
+
+    def _rotate(self) -> None:
+        self._audio.flush()
+        os.fsync(self._audio.fileno())
+        self._audio.close()
+        self.chunk_index += 1
+        self.chunk_bytes = 0
+        self._audio = open(self.directory / f"audio-{self.chunk_index:03d}.ulaw", "ab", buffering=64 * 1024)
+
+    def close(self) -> dict:
+        if self.closed:
+            return self.meta
+        self.closed = True
+        self._audio.flush()
+        os.fsync(self._audio.fileno())
+        self._audio.close()
+        self._transcript.close()
+        return _write_index(self.directory, self.call_sid, self.meta)
+
+
+def _chunk_files(directory: Path) -> list[Path]:
+    return sorted(directory.glob("audio-*.ulaw"))
+
+
+_DERIVED_INDEX_FIELDS = {"callSid", "format", "chunks", "audioBytes", "durationS", "finalizedAt"}
+
+
+def _write_index(directory: Path, call_sid: str, meta: dict, chunk_files: list[Path] | None = None) -> dict:
+    files = _chunk_files(directory) if chunk_files is None else chunk_files
+    chunks = [{"name": p.name, "bytes": p.stat().st_size} for p in files]
+    audio_bytes = sum(c["bytes"] for c in chunks)
+    index = {
+        **meta,
+        "callSid": call_sid,
+        "format": "ulaw_8000_stereo",
+        "chunks": chunks,
+        "audioBytes": audio_bytes,
+        "durationS": round(audio_bytes / (TWILIO_SAMPLE_RATE * CHANNELS), 2),
+        "finalizedAt": time.time(),
+    }
+    tmp = directory / "index.json.tmp"
+    tmp.write_text(json.dumps(index))
+    os.replace(tmp, directory / "index.json")
+    return index
+
+
+class RecordingReader:
+    """Zero-copy view of a recording as one WAV byte stream."""
+
+    def __init__(self, index: dict, directory: Path):
+        self.index = index
+        self._maps: list[mmap.mmap] = []
+        for chunk in index["chunks"]:
+            if chunk["bytes"] == 0:
+                continue
+            with open(directory / chunk["name"], "rb") as f:
+                self._maps.append(mmap.mmap(f.fileno(), chunk["bytes"], access=mmap.ACCESS_READ))
+        data_bytes = sum(len(m) for m in self._maps)
+        self._parts = [memoryview(wav_header(data_bytes))] + [memoryview(m) for m in self._maps]
+        self.size = sum(len(p) for p in self._parts)
+
+    def iter_range(self, start: int = 0, end: int | None = None, chunk_size: int = STREAM_CHUNK_BYTES):
+        """Yield memoryview slices covering bytes [start, end] inclusive."""
+        end = self.size - 1 if end is None else min(end, self.size - 1)
+        offset = 0
+        for part in self._parts:
+            part_end = offset + len(part)
+            if part_end > start and offset <= end:
+                lo = max(start - offset, 0)
+                hi = min(end - offset + 1, len(part))
+                for pos in range(lo, hi, chunk_size):
+                    yield part[pos:min(pos + chunk_size, hi)]
+            offset = part_end
+            if offset > end:
+                break
+
+    def close(self) -> None:
+        for part in self._parts:
+            part.release()
+        for m in self._maps:
+            try:
+                m.close()
+            except BufferError:
+                # A response still holds a slice; the map closes when it is collected
+                pass
+
+
+class RecordingStore:
+    def __init__(self, root: str | os.PathLike = RECORDINGS_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index: dict[str, Path] = {}
+        self._writers: dict[str, RecordingWriter] = {}
+        # _index and _writers are shared with maintain(), which runs in a worker thread
+        self._lock = threading.Lock()
+        for directory in self.root.glob("????-??-??/*"):
+            self._index[directory.name] = directory
+
+    def start(self, call_sid: str, workspace_id: str | None = None, **meta) -> RecordingWriter:
+        now = time.time()
+        directory = self.root / _day(now) / call_sid
+        writer = RecordingWriter(directory, call_sid, {"workspaceId": workspace_id, "startedAt": now, **meta})
+        with self._lock:
+            self._index[call_sid] = directory
+            self._writers[call_sid] = writer
+        return writer
+
+    def finish(self, call_sid: str) -> dict | None:
+        with self._lock:
+            writer = self._writers.pop(call_sid, None)
+        return writer.close() if writer else None
+
+    def is_active(self, call_sid: str) -> bool:
+        return call_sid in self._writers
+
+    def _lookup(self, call_sid: str) -> tuple[Path | None, RecordingWriter | None]:
+        with self._lock:
+            return self._index.get(call_sid), self._writers.get(call_sid)
+
+    def get_index(self, call_sid: str) -> dict | None:
+        directory, writer = self._lookup(call_sid)
+        if directory is None:
+            return None
+        if writer is not None:
+            # In progress: expose what has been flushed so far
+            writer._audio.flush()
+            chunks = [{"name": p.name, "bytes": p.stat().st_size} for p in _chunk_files(directory)]
+            return {**writer.meta, "callSid": call_sid, "chunks": chunks, "inProgress": True}
+        try:
+            return json.loads((directory / "index.json").read_text())
+        except FileNotFoundError:
+            return None
+
+    def open_reader(self, call_sid: str) -> RecordingReader | None:
+        """Reader for a recording; None if it doesn't exist (or was deleted meanwhile)."""
+        for attempt in range(2):
+            directory, _ = self._lookup(call_sid)
+            index = self.get_index(call_sid)
+            if index is None or directory is None:
+                return None
+            try:
+                return RecordingReader(index, directory)
+            except FileNotFoundError:
+                # The index was read just before a compaction or deletion removed its chunks
+                continue
+        return None
+
+    def transcript(self, call_sid: str) -> list[dict]:
+        directory, _ = self._lookup(call_sid)
+        if directory is None:
+            return []
+        try:
+            with open(directory / "transcript.jsonl") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    # ----- retention & compaction -----
+
+    def finish_workspace(self, workspace_id: str) -> int:
+        """Close the workspace's in-progress recordings (call from the event loop, like append_frame)."""
+        with self._lock:
+            sids = [sid for sid, writer in self._writers.items() if writer.meta.get("workspaceId") == workspace_id]
+        for sid in sids:
+            self.finish(sid)
+        return len(sids)
+
+    def delete_workspace(self, workspace_id: str) -> dict:
+        """Delete every finished recording of a workspace (tenant removal). Blocking; run in a thread."""
+        result = {"deletedCalls": 0, "freedBytes": 0}
+        with self._lock:
+            known = [(sid, directory) for sid, directory in self._index.items() if sid not in self._writers]
+        for sid, directory in known:
+            try:
+                index = json.loads((directory / "index.json").read_text())
+            except FileNotFoundError:
+                continue
+            if index.get("workspaceId") != workspace_id:
+                continue
+            result["freedBytes"] += self._delete(sid, directory)
+            result["deletedCalls"] += 1
+        return result
+
+    def _delete(self, call_sid: str, directory: Path) -> int:
+        size = sum(p.stat().st_size for p in directory.iterdir())
+        with self._lock:
+            self._index.pop(call_sid, None)
+        # Open readers keep their mmaps; new ones now get a 404
+        shutil.rmtree(directory, ignore_errors=True)
+        return size
+
+    def _compact_call(self, directory: Path, index: dict) -> bool:
+        chunks = [c for c in index["chunks"] if c["bytes"]]
+        if len(chunks) <= 1:
+            # Chunks a compaction switched away from but didn't get to remove
+            listed = {c["name"] for c in index["chunks"]}
+            for path in _chunk_files(directory):
+                if path.name not in listed:
+                    path.unlink(missing_ok=True)
+            return False
+        # A new name after the existing chunks, so the old ones stay valid until the index moves on
+        last = max(int(c["name"][len("audio-"):-len(".ulaw")]) for c in index["chunks"])
+        merged = directory / f"audio-{last + 1:03d}.ulaw"
+        tmp = directory / "audio-merged.tmp"
+        with open(tmp, "wb") as out:
+            for chunk in chunks:
+                with open(directory / chunk["name"], "rb") as f:
+                    shutil.copyfileobj(f, out, 1024 * 1024)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, merged)
+        meta = {k: v for k, v in index.items() if k not in _DERIVED_INDEX_FIELDS}
+        _write_index(directory, index["callSid"], meta, chunk_files=[merged])
+        for chunk in index["chunks"]:
+            (directory / chunk["name"]).unlink(missing_ok=True)
+        return True
+
+    def maintain(self, now: float | None = None) -> dict:
+        now = time.time() if now is None else now
+        cutoff = _day(now - RECORDING_RETENTION_DAYS * 86400)
+        result = {"expiredCalls": 0, "evictedCalls": 0, "recovered": 0, "compacted": 0, "freedBytes": 0}
+
+        for day in sorted(p for p in self.root.glob("????-??-??") if p.is_dir()):
+            if day.name >= cutoff:
+                continue
+            for directory in list(day.iterdir()):
+                if self.is_active(directory.name):
+                    continue
+                result["freedBytes"] += self._delete(directory.name, directory)
+                result["expiredCalls"] += 1
+            if not any(day.iterdir()):
+                day.rmdir()
+
+        calls = []  # (startedAt, size, sid, directory)
+        with self._lock:
+            known = list(self._index.items())
+        for sid, directory in known:
+            if self.is_active(sid):
+                continue
+            index_path = directory / "index.json"
+            if not index_path.exists():
+                chunks = _chunk_files(directory)
+                last_write = max((p.stat().st_mtime for p in chunks), default=0)
+                if now - last_write < ORPHAN_AFTER_S:
+                    continue
+                _write_index(directory, sid, {"recovered": True, "startedAt": min(p.stat().st_mtime for p in chunks)} if chunks else {"recovered": True})
+                result["recovered"] += 1
+            index = json.loads(index_path.read_text())
+            if self._compact_call(directory, index):
+                result["compacted"] += 1
+            calls.append((index.get("startedAt", 0), index["audioBytes"], sid, directory))
+
+        total = sum(size for _, size, _, _ in calls)
+        for _, size, sid, directory in sorted(calls):
+            if total <= RECORDING_MAX_BYTES:
+                break
+            result["freedBytes"] += self._delete(sid, directory)
+            result["evictedCalls"] += 1
+            total -= size
+        result["totalBytes"] = total
+        return result
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Single ``bytes=start-end`` range -> (start, end) inclusive; None if absent.
+
+    Raises ValueError for unsatisfiable or multi-range requests.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError("unsupported range")
+    first, _, last = spec.strip().partition("-")
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
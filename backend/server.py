@@ -1,6 +1,19 @@
+import time
+
+# Start of module import, for the startup timings in /internal/ready
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, Request
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import hmac
+import threading
+from urllib.parse import parse_qsl
 import os
 import logging
 from pathlib import Path
@@ -9,11 +22,47 @@ import httpx
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+from loop_monitor import get_loop_monitor, is_overloaded  # noqa: E402  (reads env set by .env)
+from jsoncodec import JSONResponse, read_json  # noqa: E402  (JSON_CODEC may come from .env)
+
+@asynccontextmanager
+async def lifespan(app):
+    started = time.perf_counter()
+    get_loop_monitor().start()
+    get_provider_pool().start()
+    maintenance = asyncio.create_task(maintain_recordings_forever())
+    if os.environ.get('MONGO_URL'):
+        get_dialer().start()
+        get_call_analytics().start()
+    # Only pay for the capture module (gzip, redaction) when capture is configured
+    if os.environ.get('TRAFFIC_CAPTURE_SAMPLE'):
+        from traffic import TRAFFIC_CAPTURE_SAMPLE
+        if TRAFFIC_CAPTURE_SAMPLE > 0:
+            get_traffic_recorder().start(TRAFFIC_CAPTURE_SAMPLE)
+    # Uvicorn accepts connections only once this returns
+    await warm_up(started)
+    yield
+    startup_state['draining'] = True
+    maintenance.cancel()
+    # Subsystems nobody used were never imported; don't import them just to close them
+    if _dialer is not None:
+        await _dialer.close()
+    if _call_sessions is not None:
+        await _call_sessions.close_all()
+    if _call_analytics is not None:
+        await _call_analytics.close()
+    await get_provider_pool().close()
+    if _traffic_recorder is not None:
+        await _traffic_recorder.stop()
+    if _proxy_client is not None:
+        await _proxy_client.aclose()
+    await get_loop_monitor().close()
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=JSONResponse)
 
 # Next.js app URL (running on port 3000)
-NEXTJS_URL = "http://localhost:3000"
+NEXTJS_URL = os.environ.get('NEXTJS_URL', "http://localhost:3000")
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +79,558 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Shared secret for service-to-service calls from the Next.js app. When
+# unset, internal endpoints only accept loopback clients.
+INTERNAL_API_TOKEN = os.environ.get('INTERNAL_API_TOKEN')
+
+def is_internal_request(request: Request) -> bool:
+    if INTERNAL_API_TOKEN:
+        return hmac.compare_digest(request.headers.get('x-internal-token', ''), INTERNAL_API_TOKEN)
+    return request.client is not None and request.client.host in ('127.0.0.1', '::1')
+
+# Background tasks must be referenced until done or they may be collected
+background_tasks = set()
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def overloaded_response():
+    """503 for deferrable work refused while the event loop is lagging"""
+    return JSONResponse({"error": "Overloaded, retry later"}, status_code=503, headers={"Retry-After": "5"})
+
+# ====== TTS CACHE ======
+
+_tts_cache = None
+
+def get_tts_cache():
+    global _tts_cache
+    if _tts_cache is None:
+        from tts_cache import TtsCache
+        _tts_cache = TtsCache(
+            os.environ.get('TTS_CACHE_DIR', str(ROOT_DIR / 'tts_cache')),
+            int(os.environ.get('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024)),
+        )
+    return _tts_cache
+
+@app.post("/internal/tts-cache/prewarm")
+async def prewarm_tts_cache(request: Request):
+    """Synthesize an agent's fixed lines (greeting, transfer, booking) in the background"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    if is_overloaded("tts_prewarm"):
+        return overloaded_response()
+
+    from tts_cache import prewarm_agent, agent_utterances
+
+    body = await read_json(request)
+    agent = body.get('agent') or {}
+    api_key = body.get('apiKey')
+    if not api_key:
+        return JSONResponse({"error": "apiKey is required"}, status_code=400)
+
+    run_in_background(prewarm_agent(get_tts_cache(), agent, api_key))
+    return JSONResponse({"queued": len(agent_utterances(agent))}, status_code=202)
+
+@app.get("/internal/tts-cache/stats")
+async def tts_cache_stats(request: Request):
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return get_tts_cache().stats()
+
+# ====== CALL SESSIONS ======
+
+_call_sessions = None
+
+def get_call_sessions():
+    global _call_sessions
+    if _call_sessions is None:
+        from sessions import CallSessionRegistry
+        _call_sessions = CallSessionRegistry(recordings=get_recording_store(), analytics=get_call_analytics())
+        # Created on the first call rather than at startup: sessions pull in numpy and the recorder
+        _call_sessions.start_reaper()
+    return _call_sessions
+
+@app.get("/internal/calls")
+async def list_live_calls(request: Request):
+    """Live calls on this node, optionally filtered by ?workspaceId="""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    sessions = get_call_sessions()
+    return {
+        "calls": sessions.list_sessions(request.query_params.get('workspaceId')),
+        "stats": sessions.stats(),
+    }
+
+@app.get("/internal/calls/{call_sid}")
+async def get_live_call(call_sid: str, request: Request):
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    session = get_call_sessions().get(call_sid)
+    if session is None:
+        return JSONResponse({"error": "Call not found"}, status_code=404)
+    return session.detail()
+
+@app.delete("/internal/calls/{call_sid}")
+async def end_live_call(call_sid: str, request: Request):
+    """Tear down a call's session (tasks and provider sockets) on this node"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    session = await get_call_sessions().close(call_sid, reason='admin')
+    if session is None:
+        return JSONResponse({"error": "Call not found"}, status_code=404)
+    return {"success": True}
+
+# ====== PROVIDER CONNECTIONS ======
+
+_provider_pool = None
+
+def get_provider_pool():
+    global _provider_pool
+    if _provider_pool is None:
+        from providers import ProviderPool
+        _provider_pool = ProviderPool()
+    return _provider_pool
+
+async def warm_workspace_providers(workspace_id):
+    from integrations import get_provider_key
+    await get_provider_pool().warm(
+        deepgram_key=await get_provider_key(workspace_id, 'deepgram'),
+        elevenlabs_key=await get_provider_key(workspace_id, 'elevenlabs'),
+        workspace_id=workspace_id,
+    )
+
+@app.post("/internal/providers/prewarm")
+async def prewarm_providers(request: Request):
+    """Open Deepgram/ElevenLabs connections for a workspace ahead of its next call"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    if is_overloaded("provider_prewarm"):
+        return overloaded_response()
+    body = await read_json(request)
+    workspace_id = body.get('workspaceId')
+    if not workspace_id:
+        return JSONResponse({"error": "workspaceId is required"}, status_code=400)
+    run_in_background(warm_workspace_providers(workspace_id))
+    return JSONResponse({"queued": True}, status_code=202)
+
+@app.post("/internal/providers/invalidate")
+async def invalidate_providers(request: Request):
+    """Forget a workspace's cached keys and close connections opened with them"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    from integrations import invalidate
+    body = await read_json(request)
+    workspace_id = body.get('workspaceId')
+    if not workspace_id:
+        return JSONResponse({"error": "workspaceId is required"}, status_code=400)
+    invalidate(workspace_id)
+    # The pool knows which keys this workspace used; the stored ones may already be rotated
+    dropped = get_provider_pool().drop_workspace(workspace_id)
+    return {"success": True, "droppedKeys": dropped}
+
+@app.get("/internal/providers/stats")
+async def provider_pool_stats(request: Request):
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return get_provider_pool().stats()
+
+# ====== RECORDINGS ======
+
+RECORDING_MAINTENANCE_INTERVAL_S = 3600
+RECORDING_AUTH_TTL_S = 30
+RECORDING_AUTH_CACHE_MAX = 4096
+
+_recording_store = None
+# sha256(Authorization header) -> (expires_at, workspace_id, is_admin)
+_recording_auth_cache = {}
+
+def get_recording_store():
+    global _recording_store
+    if _recording_store is None:
+        from recordings import RecordingStore
+        _recording_store = RecordingStore()
+    return _recording_store
+
+async def maintain_recordings_forever():
+    while True:
+        await asyncio.sleep(RECORDING_MAINTENANCE_INTERVAL_S)
+        if is_overloaded("recording_maintenance"):
+            continue
+        try:
+            result = await asyncio.to_thread(get_recording_store().maintain)
+            logger.info(f"Recording maintenance: {result}")
+        except Exception:
+            logger.exception("Recording maintenance failed")
+
+@app.post("/internal/recordings/purge")
+async def purge_workspace_recordings(request: Request):
+    """Delete a workspace's recordings (workspace deletion job)"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    body = await read_json(request)
+    workspace_id = body.get('workspaceId')
+    if not workspace_id:
+        return JSONResponse({"error": "workspaceId is required"}, status_code=400)
+    store = get_recording_store()
+    finished = store.finish_workspace(workspace_id)
+    result = await asyncio.to_thread(store.delete_workspace, workspace_id)
+    return {"success": True, "finishedCalls": finished, **result}
+
+async def resolve_caller(request: Request):
+    """(workspace_id, is_admin) for the request's bearer token, checked against Next.js"""
+    authorization = request.headers.get('authorization')
+    if not authorization:
+        return None
+    cache_key = hashlib.sha256(authorization.encode()).hexdigest()
+    cached = _recording_auth_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1:]
+
+    headers = {'authorization': authorization}
+    client = get_proxy_client()
+    me = await client.get(f'{NEXTJS_URL}/api/auth/me', headers=headers, timeout=10.0)
+    if me.status_code != 200:
+        return None
+    admin = await client.get(f'{NEXTJS_URL}/api/admin/verify', headers=headers, timeout=10.0)
+    caller = (me.json()['user'].get('workspaceId'), admin.status_code == 200)
+    now = time.monotonic()
+    if len(_recording_auth_cache) >= RECORDING_AUTH_CACHE_MAX:
+        for key in [key for key, entry in _recording_auth_cache.items() if entry[0] <= now]:
+            del _recording_auth_cache[key]
+        # Still full of live tokens: drop the oldest entries (dicts keep insertion order)
+        while len(_recording_auth_cache) >= RECORDING_AUTH_CACHE_MAX:
+            del _recording_auth_cache[next(iter(_recording_auth_cache))]
+    _recording_auth_cache[cache_key] = (now + RECORDING_AUTH_TTL_S, *caller)
+    return caller
+
+async def authorize_recording(request: Request, call_sid: str):
+    """Recording index if the caller may access it, else an error response"""
+    caller = await resolve_caller(request)
+    if caller is None:
+        return None, JSONResponse({"error": "Unauthorized"}, status_code=401)
+    index = get_recording_store().get_index(call_sid)
+    workspace_id, is_admin = caller
+    if index is None or not (is_admin or index.get('workspaceId') == workspace_id):
+        # Same answer for "missing" and "someone else's" so call ids can't be probed
+        return None, JSONResponse({"error": "Recording not found"}, status_code=404)
+    return index, None
+
+class MemoryviewStreamingResponse(StreamingResponse):
+    """StreamingResponse that hands memoryview chunks to the server uncopied"""
+
+    async def stream_response(self, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+# Served here rather than proxied: audio is streamed straight from mmap'd files
+@app.get("/api/recordings/{call_sid}/audio")
+async def recording_audio(call_sid: str, request: Request):
+    from recordings import parse_range
+
+    _, error = await authorize_recording(request, call_sid)
+    if error:
+        return error
+    reader = get_recording_store().open_reader(call_sid)
+    if reader is None:
+        # Deleted by retention between the auth check and here
+        return JSONResponse({"error": "Recording not found"}, status_code=404)
+    try:
+        byte_range = parse_range(request.headers.get('range'), reader.size)
+    except ValueError:
+        reader.close()
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{reader.size}"})
+
+    start, end = byte_range or (0, reader.size - 1)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start + 1), "Cache-Control": "private"}
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{reader.size}"
+
+    async def body():
+        for piece in reader.iter_range(start, end):
+            yield piece
+
+    return MemoryviewStreamingResponse(
+        body(),
+        status_code=206 if byte_range else 200,
+        media_type="audio/wav",
+        headers=headers,
+        background=BackgroundTask(reader.close),
+    )
+
+@app.get("/api/recordings/{call_sid}/transcript")
+async def recording_transcript(call_sid: str, request: Request):
+    index, error = await authorize_recording(request, call_sid)
+    if error:
+        return error
+    return {
+        "callSid": call_sid,
+        "durationS": index.get('durationS'),
+        "inProgress": bool(index.get('inProgress')),
+        "segments": get_recording_store().transcript(call_sid),
+    }
+
+@app.post("/internal/recordings/maintenance")
+async def run_recording_maintenance(request: Request):
+    """Apply retention, the size cap and chunk compaction now"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return await asyncio.to_thread(get_recording_store().maintain)
+
+# ====== CAMPAIGN DIALER ======
+
+_dialer = None
+
+def get_dialer():
+    global _dialer
+    if _dialer is None:
+        from dialer import CampaignDialer
+        _dialer = CampaignDialer()
+    return _dialer
+
+@app.post("/api/dialer/status")
+async def dialer_status_callback(request: Request):
+    """Twilio status callback for campaign calls (signed with the workspace's auth token)"""
+    params = dict(parse_qsl((await request.body()).decode()))
+    if not await get_dialer().handle_status(params, request.headers.get('x-twilio-signature', '')):
+        return JSONResponse({"error": "Invalid signature"}, status_code=403)
+    return Response(status_code=204)
+
+@app.get("/internal/dialer/stats")
+async def dialer_stats(request: Request):
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return get_dialer().stats()
+
+# ====== CALL ANALYTICS ======
+
+_call_analytics = None
+
+def get_call_analytics():
+    global _call_analytics
+    if _call_analytics is None:
+        from analytics import CallAnalytics
+        _call_analytics = CallAnalytics()
+    return _call_analytics
+
+@app.post("/internal/analytics/events")
+async def ingest_call_events(request: Request):
+    """Queue call-completion events for the next roll-up batch"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    body = await read_json(request)
+    events = body.get('events') or []
+    for event in events:
+        get_call_analytics().record(event)
+    return JSONResponse({"queued": len(events)}, status_code=202)
+
+@app.post("/internal/analytics/backfill")
+async def backfill_call_analytics(request: Request):
+    """Rebuild roll-ups for past days from call_logs, in the background"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    from analytics import backfill
+    run_in_background(backfill())
+    return JSONResponse({"started": True}, status_code=202)
+
+@app.get("/internal/analytics/stats")
+async def call_analytics_stats(request: Request):
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return get_call_analytics().stats()
+
+# ====== TRAFFIC CAPTURE ======
+
+_traffic_recorder = None
+
+def get_traffic_recorder():
+    global _traffic_recorder
+    if _traffic_recorder is None:
+        from traffic import TrafficRecorder
+        _traffic_recorder = TrafficRecorder()
+    return _traffic_recorder
+
+@app.post("/internal/traffic/capture")
+async def start_traffic_capture(request: Request):
+    """Start sampling proxied requests into a new trace file ({sample: 0-1, durationS?})"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    body = await read_json(request)
+    return get_traffic_recorder().start(body.get('sample', 0.1), body.get('durationS'))
+
+@app.delete("/internal/traffic/capture")
+async def stop_traffic_capture(request: Request):
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return await get_traffic_recorder().stop()
+
+@app.get("/internal/traffic/capture")
+async def traffic_capture_stats(request: Request):
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return get_traffic_recorder().stats()
+
+# ====== PROFILING ======
+
+_memory_tracer = None
+
+def get_memory_tracer():
+    global _memory_tracer
+    if _memory_tracer is None:
+        from profiling import MemoryTracer
+        _memory_tracer = MemoryTracer()
+    return _memory_tracer
+
+@app.post("/internal/profile/cpu")
+async def profile_cpu(request: Request, seconds: float = 10, intervalMs: float = 5, format: str = "folded"):
+    """Sample the event-loop thread from a side thread; folded stacks for flamegraphs, or JSON"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    from profiling import ProfilerBusy, folded_text, sample_cpu, top_functions
+    try:
+        profile = await asyncio.to_thread(sample_cpu, threading.get_ident(), seconds, intervalMs)
+    except ProfilerBusy as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    if format == "json":
+        return {
+            "samples": profile["samples"],
+            "seconds": profile["seconds"],
+            "intervalMs": profile["intervalMs"],
+            "top": top_functions(profile),
+            "folded": folded_text(profile),
+        }
+    return Response(content=folded_text(profile), media_type="text/plain")
+
+@app.get("/internal/profile/loop")
+async def profile_loop(request: Request, seconds: float = 5, intervalMs: float = 10, top: int = 20):
+    """Event-loop timer lag over a window, and the tasks pending longest during it"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    from profiling import ProfilerBusy, measure_loop
+    try:
+        return await measure_loop(seconds, intervalMs, top)
+    except ProfilerBusy as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+
+@app.post("/internal/profile/memory")
+async def profile_memory_baseline(request: Request):
+    """Start tracemalloc (if needed) and take the baseline snapshot"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return await get_memory_tracer().baseline()
+
+@app.get("/internal/profile/memory")
+async def profile_memory_diff(request: Request, top: int = 25, groupBy: str = "lineno"):
+    """Allocation growth since the baseline snapshot"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    if groupBy not in ("lineno", "filename", "traceback"):
+        return JSONResponse({"error": "groupBy must be lineno, filename or traceback"}, status_code=400)
+    from profiling import ProfilerBusy
+    try:
+        return await get_memory_tracer().diff(top, groupBy)
+    except ProfilerBusy as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+
+@app.delete("/internal/profile/memory")
+async def profile_memory_stop(request: Request):
+    """Stop tracemalloc; tracing slows every allocation"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return await get_memory_tracer().stop()
+
+# ====== EVENT LOOP ======
+
+@app.get("/internal/loop")
+async def event_loop_stats(request: Request):
+    """Loop lag, the shedding state and the stacks of recent loop stalls"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return get_loop_monitor().stats()
+
+# ====== STARTUP AND HEALTH ======
+
+# Import + lifespan startup + warmup above this is logged as a warning
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 2000))
+# Keep-alive connections to Next.js opened before the worker accepts traffic
+WARMUP_UPSTREAM_CONNECTIONS = int(os.environ.get('WARMUP_UPSTREAM_CONNECTIONS', 4))
+WARMUP_TIMEOUT_S = float(os.environ.get('WARMUP_TIMEOUT_S', 5))
+PROXY_MAX_CONNECTIONS = int(os.environ.get('PROXY_MAX_CONNECTIONS', 100))
+
+startup_state = {"importMs": None, "startupMs": None, "warmupMs": None, "upstreamConnections": 0,
+                 "ready": False, "draining": False}
+
+_proxy_client = None
+
+def get_proxy_client():
+    """Pooled client for Next.js; keeps connections alive across proxied requests"""
+    global _proxy_client
+    if _proxy_client is None:
+        _proxy_client = httpx.AsyncClient(timeout=30.0, limits=httpx.Limits(
+            max_connections=PROXY_MAX_CONNECTIONS, max_keepalive_connections=PROXY_MAX_CONNECTIONS))
+    return _proxy_client
+
+async def warm_up(started: float):
+    """Pre-open upstream connections, then record startup timings and mark the worker ready"""
+    warmup_started = time.perf_counter()
+    client = get_proxy_client()
+    # Concurrent requests each need their own connection, so this leaves that many in the pool
+    results = await asyncio.gather(
+        *(client.get(f"{NEXTJS_URL}/api/", timeout=WARMUP_TIMEOUT_S) for _ in range(WARMUP_UPSTREAM_CONNECTIONS)),
+        return_exceptions=True,
+    )
+    opened = sum(1 for r in results if not isinstance(r, Exception))
+    if opened < WARMUP_UPSTREAM_CONNECTIONS:
+        errors = {type(r).__name__ for r in results if isinstance(r, Exception)}
+        logger.warning(f"Warmup opened {opened}/{WARMUP_UPSTREAM_CONNECTIONS} connections to {NEXTJS_URL}: "
+                       f"{', '.join(sorted(errors))}")
+    now = time.perf_counter()
+    startup_state.update({
+        "importMs": round((started - _IMPORT_STARTED) * 1000, 1),
+        "startupMs": round((warmup_started - started) * 1000, 1),
+        "warmupMs": round((now - warmup_started) * 1000, 1),
+        "upstreamConnections": opened,
+        "ready": True,
+    })
+    total_ms = (now - _IMPORT_STARTED) * 1000
+    from metrics import registry
+    for phase in ("import", "startup", "warmup"):
+        registry.gauge("voice_startup_ms", "Worker cold start time by phase", {"phase": phase}).set(
+            startup_state[f"{phase}Ms"])
+    if total_ms > STARTUP_BUDGET_MS:
+        logger.warning(f"Cold start took {total_ms:.0f} ms, over the {STARTUP_BUDGET_MS:.0f} ms budget "
+                       f"(import {startup_state['importMs']}, startup {startup_state['startupMs']}, "
+                       f"warmup {startup_state['warmupMs']})")
+    else:
+        logger.info(f"Ready in {total_ms:.0f} ms")
+
+@app.get("/internal/live")
+async def liveness():
+    """Liveness probe: the event loop is answering. No auth, so orchestrators can call it"""
+    return {"status": "ok"}
+
+@app.get("/internal/ready")
+async def readiness():
+    """Readiness probe: warmed up, not shutting down and not shedding load. No auth"""
+    overloaded = get_loop_monitor().overloaded
+    ready = startup_state["ready"] and not startup_state["draining"] and not overloaded
+    return JSONResponse({**startup_state, "ready": ready, "overloaded": overloaded},
+                        status_code=200 if ready else 503)
+
+# ====== METRICS ======
+
+@app.get("/internal/metrics")
+async def internal_metrics(request: Request):
+    """Prometheus text exposition of the in-process voice metrics"""
+    if not is_internal_request(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    from metrics import registry
+    return Response(content=registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Proxy all /api requests to Next.js
 @app.api_route("/api/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"])
 async def proxy_to_nextjs(request: Request, path: str):
@@ -45,25 +646,41 @@ async def proxy_to_nextjs(request: Request, path: str):
     headers = dict(request.headers)
     headers.pop('host', None)
     
-    async with httpx.AsyncClient() as client:
+    # Hop-by-hop: a client closing its connection must not close the pooled upstream one
+    headers.pop('connection', None)
+    headers.pop('keep-alive', None)
+    
+    capture = _traffic_recorder is not None and _traffic_recorder.should_capture()
+    started = time.perf_counter()
+    client = get_proxy_client()
+    try:
+        upstream = await client.send(client.build_request(
+            method=request.method,
+            url=target_url,
+            content=body,
+            headers=headers,
+            params=dict(request.query_params),
+            timeout=30.0
+        ), stream=True)
         try:
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                content=body,
-                headers=headers,
-                params=dict(request.query_params),
-                timeout=30.0
-            )
-            
-            # Return the response from Next.js
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers=dict(response.headers)
-            )
-        except Exception as e:
-            logger.error(f"Proxy error: {e}")
-            return {"error": "Proxy error", "detail": str(e)}
+            # Raw bytes, not response.content: the body is never decoded or re-encoded on the way
+            # through, and stays compressed when Next.js compressed it
+            content = b"".join([chunk async for chunk in upstream.aiter_raw()])
+        finally:
+            await upstream.aclose()
+        
+        if capture:
+            _traffic_recorder.record(request.method, f"/api/{path}", request.url.query, request.headers, body,
+                                     upstream.status_code, len(content), (time.perf_counter() - started) * 1000)
+
+        # Return the response from Next.js
+        return Response(
+            content=content,
+            status_code=upstream.status_code,
+            headers=dict(upstream.headers)
+        )
+    except Exception as e:
+        logger.error(f"Proxy error: {e}")
+        return JSONResponse({"error": "Proxy error", "detail": str(e)}, status_code=502)
 
 from starlette.responses import Response
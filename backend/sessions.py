@@ -0,0 +1,327 @@
+"""In-process registry of live calls with bounded per-call memory.
+
+A ``CallSession`` holds everything a live call accumulates:
+- the transcript, capped in both turns and characters;
+- recent caller audio, in a preallocated μ-law ring;
+- barge-in detection (vad.py), tuned by the agent's settings;
+- provider connections (STT/TTS/LLM sockets);
+- the tasks working on the call.
+
+Sessions use ``__slots__`` and fixed-size buffers, so their memory does
+not depend on call length. ``bench_sessions.py`` measures the per-session
+footprint.
+
+``CallSessionRegistry`` caps the number of sessions and reaps idle or
+overlong calls. ``close`` is the single teardown path: it cancels the
+call's tasks, closes every provider connection and unregisters the call
+from the pacing wheel. It is idempotent, so hangup webhooks, socket errors
+and the reaper can all call it safely.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from audio import RingBuffer, TWILIO_SAMPLE_RATE, frame_samples, mulaw_to_pcm16
+from metrics import Histogram, registry
+from vad import BargeInController, StreamingVad, vad_config_for_agent
+
+logger = logging.getLogger(__name__)
+
+MAX_CALL_SESSIONS = int(os.environ.get("MAX_CALL_SESSIONS", 5000))
+CALL_IDLE_TIMEOUT_S = float(os.environ.get("CALL_IDLE_TIMEOUT_S", 60))
+CALL_MAX_DURATION_S = float(os.environ.get("CALL_MAX_DURATION_S", 4 * 3600))
+CALL_TRANSCRIPT_MAX_TURNS = int(os.environ.get("CALL_TRANSCRIPT_MAX_TURNS", 200))
+CALL_TRANSCRIPT_MAX_CHARS = int(os.environ.get("CALL_TRANSCRIPT_MAX_CHARS", 32000))
+CALL_AUDIO_HISTORY_MS = int(os.environ.get("CALL_AUDIO_HISTORY_MS", 2000))
+PROVIDER_CLOSE_TIMEOUT_S = 2.0
+REAP_INTERVAL_S = 5.0
+
+
+class SessionLimitError(Exception):
+    """Raised when the node is already at MAX_CALL_SESSIONS."""
+
+
+class CallSession:
+    """State of one live call. Create through ``CallSessionRegistry.open``."""
+
+    __slots__ = (
+        "call_sid", "workspace_id", "agent_id", "direction", "from_number", "to_number",
+        "state", "started_at", "started", "last_activity", "transcript", "transcript_chars",
+        "transcript_dropped", "audio_history", "providers", "tasks", "frames_in", "frames_out",
+        "interruptions", "response_latency", "wheel_handle", "recording", "barge_in", "_pcm", "closed",
+        "close_reason",
+    )
+
+    def __init__(self, call_sid: str, workspace_id: str | None = None, agent_id: str | None = None,
+                 direction: str = "inbound", from_number: str | None = None, to_number: str | None = None):
+        self.call_sid = call_sid
+        self.workspace_id = workspace_id
+        self.agent_id = agent_id
+        self.direction = direction
+        self.from_number = from_number
+        self.to_number = to_number
+        self.state = "ringing"
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.last_activity = self.started
+        # (seconds into call, role, text)
+        self.transcript: deque[tuple[float, str, str]] = deque(maxlen=CALL_TRANSCRIPT_MAX_TURNS)
+        self.transcript_chars = 0
+        self.transcript_dropped = 0
+        self.audio_history = RingBuffer(TWILIO_SAMPLE_RATE * CALL_AUDIO_HISTORY_MS // 1000, dtype=np.uint8)
+        self.providers: dict[str, object] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.frames_in = 0
+        self.frames_out = 0
+        self.interruptions = 0
+        self.response_latency: Histogram | None = None  # caller stops speaking -> agent audio starts (pipeline.py)
+        self.wheel_handle: int | None = None
+        self.recording = None  # recordings.RecordingWriter when the call is recorded
+        self.barge_in: BargeInController | None = None  # set by CallSessionRegistry.open when the agent is known
+        self._pcm: np.ndarray | None = None
+        self.closed = False
+        self.close_reason: str | None = None
+
+    def record_latency(self, ms: float) -> None:
+        if self.response_latency is None:
+            self.response_latency = Histogram()
+        self.response_latency.observe(ms)
+
+    def completion_event(self) -> dict:
+        """Call-completion event for the analytics roll-ups (analytics.py)."""
+        return {
+            "callSid": self.call_sid,
+            "workspaceId": self.workspace_id,
+            "agentId": self.agent_id,
+            "direction": self.direction,
+            "outcome": self.close_reason,
+            "durationS": round(time.monotonic() - self.started, 1),
+            "endedAt": time.time(),
+            "latencyBins": list(self.response_latency.counts) if self.response_latency else None,
+        }
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+    def add_turn(self, role: str, text: str) -> None:
+        text = text[:CALL_TRANSCRIPT_MAX_CHARS]
+        transcript = self.transcript
+        if len(transcript) == transcript.maxlen:
+            self._drop_oldest_turn()
+        t = round(time.monotonic() - self.started, 2)
+        transcript.append((t, role, text))
+        self.transcript_chars += len(text)
+        if self.recording is not None:
+            # The bounded in-memory transcript is a live view; the recording keeps every turn
+            self.recording.append_segment(role, text, t)
+        while self.transcript_chars > CALL_TRANSCRIPT_MAX_CHARS and len(transcript) > 1:
+            self._drop_oldest_turn()
+        self.touch()
+
+    def _drop_oldest_turn(self) -> None:
+        self.transcript_chars -= len(self.transcript.popleft()[2])
+        self.transcript_dropped += 1
+
+    def enable_barge_in(self, agent: dict) -> None:
+        """Watch caller audio for speech over agent playback, with the agent's VAD settings."""
+        vad = StreamingVad(vad_config_for_agent(agent), frame_samples(TWILIO_SAMPLE_RATE))
+        self.barge_in = BargeInController(vad, on_barge_in=self._count_interruption)
+        self._pcm = np.empty(frame_samples(TWILIO_SAMPLE_RATE), dtype=np.int16)
+
+    def _count_interruption(self) -> None:
+        self.interruptions += 1
+
+    def record_inbound(self, mulaw: bytes) -> None:
+        self.audio_history.write(np.frombuffer(mulaw, dtype=np.uint8))
+        self.frames_in += 1
+        self.last_activity = time.monotonic()
+        if self.barge_in is not None:
+            pcm = self._pcm if len(mulaw) <= self._pcm.shape[0] else None
+            self.barge_in.feed(mulaw_to_pcm16(mulaw, out=pcm))
+
+    def attach_provider(self, name: str, connection) -> None:
+        """Track a provider connection (anything with close()/aclose()) for teardown."""
+        self.providers[name] = connection
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Run a task owned by this call; it is cancelled on teardown."""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def summary(self) -> dict:
+        now = time.monotonic()
+        return {
+            "callSid": self.call_sid,
+            "workspaceId": self.workspace_id,
+            "agentId": self.agent_id,
+            "direction": self.direction,
+            "from": self.from_number,
+            "to": self.to_number,
+            "state": self.state,
+            "startedAt": self.started_at,
+            "durationS": round(now - self.started, 1),
+            "idleS": round(now - self.last_activity, 1),
+            "turns": len(self.transcript),
+            "framesIn": self.frames_in,
+            "framesOut": self.frames_out,
+            "interruptions": self.interruptions,
+            "providers": sorted(self.providers),
+        }
+
+    def detail(self) -> dict:
+        return {
+            **self.summary(),
+            "transcript": [{"t": t, "role": role, "text": text} for t, role, text in self.transcript],
+            "transcriptDropped": self.transcript_dropped,
+            "audioHistoryMs": len(self.audio_history) * 1000 // TWILIO_SAMPLE_RATE,
+        }
+
+
+async def _close_connection(name: str, connection) -> None:
+    closer = getattr(connection, "aclose", None) or getattr(connection, "close", None)
+    if closer is None:
+        return
+    try:
+        result = closer()
+        if inspect.isawaitable(result):
+            await asyncio.wait_for(result, PROVIDER_CLOSE_TIMEOUT_S)
+    except Exception as e:
+        logger.warning(f"Closing {name} connection failed: {e}")
+
+
+class CallSessionRegistry:
+    def __init__(self, max_sessions: int = MAX_CALL_SESSIONS, idle_timeout: float = CALL_IDLE_TIMEOUT_S,
+                 max_duration: float = CALL_MAX_DURATION_S, wheel=None, recordings=None, analytics=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.wheel = wheel
+        self.recordings = recordings
+        self.analytics = analytics
+        self._sessions: dict[str, CallSession] = {}
+        self._reaper: asyncio.Task | None = None
+        self._active = registry.gauge("voice_call_sessions_active", "Live call sessions on this node")
+        self._durations = registry.histogram(
+            "voice_call_duration_s", "Call session duration", buckets=(10, 30, 60, 120, 300, 600, 1800, 3600, 14400)
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, call_sid: str) -> bool:
+        return call_sid in self._sessions
+
+    def get(self, call_sid: str) -> CallSession | None:
+        return self._sessions.get(call_sid)
+
+    def open(self, call_sid: str, record: bool = False, agent: dict | None = None, **fields) -> CallSession:
+        existing = self._sessions.get(call_sid)
+        if existing is not None:
+            # Twilio retries webhooks; reuse rather than leak a second session
+            existing.touch()
+            return existing
+        if len(self._sessions) >= self.max_sessions:
+            registry.counter("voice_call_sessions_rejected_total", "Calls refused at the session cap").inc()
+            raise SessionLimitError(f"Call session limit reached ({self.max_sessions})")
+        session = CallSession(call_sid, **fields)
+        if agent is not None:
+            session.enable_barge_in(agent)
+        if record and self.recordings is not None:
+            session.recording = self.recordings.start(
+                call_sid, workspace_id=session.workspace_id, agentId=session.agent_id, direction=session.direction
+            )
+        self._sessions[call_sid] = session
+        self._active.set(len(self._sessions))
+        return session
+
+    async def close(self, call_sid: str, reason: str = "completed") -> CallSession | None:
+        session = self._sessions.pop(call_sid, None)
+        if session is None or session.closed:
+            return session
+        session.closed = True
+        session.close_reason = reason
+        session.state = "closed"
+        self._active.set(len(self._sessions))
+
+        if self.wheel is not None and session.wheel_handle is not None:
+            self.wheel.remove(session.wheel_handle)
+            session.wheel_handle = None
+
+        current = asyncio.current_task()
+        tasks = [task for task in session.tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        providers, session.providers = session.providers, {}
+        await asyncio.gather(*(_close_connection(name, conn) for name, conn in providers.items()))
+
+        if session.recording is not None:
+            try:
+                self.recordings.finish(call_sid)
+            except OSError as e:
+                logger.error(f"Finalizing recording for call {call_sid} failed: {e}")
+
+        if self.analytics is not None and session.workspace_id:
+            self.analytics.record(session.completion_event())
+        self._durations.observe(time.monotonic() - session.started)
+        registry.counter("voice_call_sessions_closed_total", "Call sessions closed by reason", {"reason": reason}).inc()
+        return session
+
+    async def close_all(self, reason: str = "shutdown") -> None:
+        await asyncio.gather(*(self.close(sid, reason) for sid in list(self._sessions)))
+
+    def reap_candidates(self, now: float | None = None) -> list[tuple[str, str]]:
+        now = time.monotonic() if now is None else now
+        expired = []
+        for sid, session in self._sessions.items():
+            if now - session.started > self.max_duration:
+                expired.append((sid, "max_duration"))
+            elif now - session.last_activity > self.idle_timeout:
+                expired.append((sid, "idle_timeout"))
+        return expired
+
+    async def reap(self) -> int:
+        expired = self.reap_candidates()
+        for sid, reason in expired:
+            logger.info(f"Closing call {sid}: {reason}")
+            await self.close(sid, reason)
+        return len(expired)
+
+    def start_reaper(self, interval: float = REAP_INTERVAL_S) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_forever(interval))
+
+    async def _reap_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reap()
+            except Exception:
+                logger.exception("Call session reaper failed")
+
+    def list_sessions(self, workspace_id: str | None = None) -> list[dict]:
+        return [
+            s.summary() for s in self._sessions.values()
+            if workspace_id is None or s.workspace_id == workspace_id
+        ]
+
+    def stats(self) -> dict:
+        states: dict[str, int] = {}
+        for session in self._sessions.values():
+            states[session.state] = states.get(session.state, 0) + 1
+        return {
+            "active": len(self._sessions),
+            "maxSessions": self.max_sessions,
+            "idleTimeoutS": self.idle_timeout,
+            "byState": states,
+        }
@@ -0,0 +1,217 @@
+"""Sampled capture of proxied API traffic for replay (benchmarks/replay_traffic.py).
+
+When capture is on, the /api proxy hands a sample of its requests to
+``TrafficRecorder.record``. Each sampled request becomes one JSON line:
+
+    {"t": 12.031, "method": "POST", "path": "/api/contacts/import?x=1",
+     "route": "POST /api/contacts/import", "auth": true,
+     "contentType": "application/json", "body": {...} | "a=1&b=2" | null, "bodyBytes": 48213,
+     "bodyOmitted": null | "too_large" | "invalid_json" | "unsupported_type",
+     "status": 200, "responseBytes": 912, "ms": 143.2}
+
+``t`` is the offset from the start of the capture, so a replay can keep
+the original spacing. Secrets are removed before anything is buffered:
+
+- Authorization, Cookie, internal-token and Twilio-signature headers are
+  reduced to the ``auth`` flag.
+- Object keys and query/form fields that name a password, token, secret,
+  key, SID or credential become "<redacted>".
+- Bearer tokens and JWTs left inside strings are masked.
+
+Bodies over TRAFFIC_CAPTURE_MAX_BODY_BYTES, malformed JSON and other content
+types (multipart uploads, binary) keep only their size, and ``bodyOmitted``
+says why. Replay skips those records, since it cannot resend them. Lines are
+written off the event loop in batches, to gzip files under
+TRAFFIC_CAPTURE_DIR that rotate at TRAFFIC_CAPTURE_FILE_BYTES.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from jsoncodec import dumps, loads
+from loop_monitor import is_overloaded
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_CAPTURE_DIR = os.environ.get("TRAFFIC_CAPTURE_DIR", str(Path(__file__).parent / "traces"))
+# Fraction of requests captured when capture is started from the environment
+TRAFFIC_CAPTURE_SAMPLE = float(os.environ.get("TRAFFIC_CAPTURE_SAMPLE", 0))
+TRAFFIC_CAPTURE_MAX_BODY_BYTES = int(os.environ.get("TRAFFIC_CAPTURE_MAX_BODY_BYTES", 256 * 1024))
+TRAFFIC_CAPTURE_FILE_BYTES = int(os.environ.get("TRAFFIC_CAPTURE_FILE_BYTES", 64 * 1024 * 1024))
+TRAFFIC_CAPTURE_FLUSH_S = 2.0
+# Records buffered while the writer is behind; newer ones are dropped past this
+TRAFFIC_CAPTURE_MAX_PENDING = 10000
+
+REDACTED = "<redacted>"
+_SECRET_KEY = re.compile(r"pass(word)?|token|secret|api[_-]?key|^auth$|authorization|credential|accountsid|signature|cookie",
+                         re.IGNORECASE)
+_SECRET_VALUE = re.compile(r"(Bearer\s+)[\w\-.~+/]+=*|\beyJ[\w-]+\.[\w-]+\.[\w-]+")
+_ID_SEGMENT = re.compile(r"^(?:[0-9a-f]{8}-[0-9a-f-]{27}|\d+|[0-9a-f]{16,}|[A-Z]{2}[0-9a-f]{32})$", re.IGNORECASE)
+
+
+def route_key(method: str, path: str) -> str:
+    """``GET /api/agents/:id`` - the path without its query, ids collapsed."""
+    segments = path.split("?", 1)[0].split("/")
+    return f"{method} " + "/".join(":id" if _ID_SEGMENT.match(s) else s for s in segments)
+
+
+def _mask(text: str) -> str:
+    return _SECRET_VALUE.sub(lambda m: f"{m.group(1)}{REDACTED}" if m.group(1) else REDACTED, text)
+
+
+def redact(value):
+    """Copy of a decoded JSON value with secret fields and embedded tokens removed."""
+    if isinstance(value, dict):
+        return {k: REDACTED if _SECRET_KEY.search(k) and v not in (None, "") else redact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return _mask(value)
+    return value
+
+
+def redact_query(query: str) -> str:
+    if not query:
+        return ""
+    pairs = parse_qsl(query, keep_blank_values=True)
+    return urlencode([(k, REDACTED if _SECRET_KEY.search(k) else _mask(v)) for k, v in pairs])
+
+
+def redact_body(body: bytes, content_type: str) -> tuple[object, str | None]:
+    """(body, omitted reason): JSON bodies as a redacted object, form bodies as a
+    redacted query string. Anything else is dropped, with the reason."""
+    if not body:
+        return None, None
+    if len(body) > TRAFFIC_CAPTURE_MAX_BODY_BYTES:
+        return None, "too_large"
+    if "json" in content_type:
+        try:
+            return redact(loads(body)), None
+        except ValueError:
+            return None, "invalid_json"
+    if "x-www-form-urlencoded" in content_type:
+        return redact_query(body.decode("latin-1")), None
+    return None, "unsupported_type"
+
+
+class TrafficRecorder:
+    def __init__(self, directory: str = TRAFFIC_CAPTURE_DIR, file_bytes: int = TRAFFIC_CAPTURE_FILE_BYTES):
+        self.directory = Path(directory)
+        self.file_bytes = file_bytes
+        self.sample = 0.0
+        self.until: float | None = None
+        self.started = 0.0
+        self._pending: list[str] = []
+        self._writer: asyncio.Task | None = None
+        self._file: Path | None = None
+        self.captured = 0
+        self.dropped = 0
+
+    @property
+    def active(self) -> bool:
+        if self.sample <= 0:
+            return False
+        if self.until is not None and time.monotonic() >= self.until:
+            self.sample = 0.0
+            return False
+        return True
+
+    def should_capture(self) -> bool:
+        return self.active and random.random() < self.sample and not is_overloaded("traffic_capture")
+
+    def start(self, sample: float, duration_s: float | None = None) -> dict:
+        """Capture ``sample`` of requests (0-1), optionally for ``duration_s`` seconds, into a new file."""
+        self.sample = max(0.0, min(float(sample), 1.0))
+        self.until = time.monotonic() + duration_s if duration_s else None
+        self.started = time.monotonic()
+        self._file = None
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_forever())
+        return self.stats()
+
+    async def stop(self) -> dict:
+        self.sample = 0.0
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        await asyncio.to_thread(self._write, self._take())
+        return self.stats()
+
+    def record(self, method: str, path: str, query: str, headers, body: bytes, status: int,
+               response_bytes: int, ms: float) -> None:
+        if len(self._pending) >= TRAFFIC_CAPTURE_MAX_PENDING:
+            self.dropped += 1
+            return
+        content_type = headers.get("content-type", "")
+        query = redact_query(query)
+        captured_body, omitted = redact_body(body, content_type)
+        line = {
+            "t": round(time.monotonic() - self.started, 3),
+            "method": method,
+            "path": f"{path}?{query}" if query else path,
+            "route": route_key(method, path),
+            "auth": "authorization" in headers or "cookie" in headers,
+            "contentType": content_type or None,
+            "body": captured_body,
+            "bodyBytes": len(body),
+            "bodyOmitted": omitted,
+            "status": status,
+            "responseBytes": response_bytes,
+            "ms": round(ms, 2),
+        }
+        self._pending.append(dumps(line, default=str).decode())
+        self.captured += 1
+
+    def _take(self) -> list[str]:
+        lines, self._pending = self._pending, []
+        return lines
+
+    def _path(self) -> Path:
+        if self._file is None or (self._file.exists() and self._file.stat().st_size >= self.file_bytes):
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            self._file = self.directory / f"capture-{stamp}.jsonl.gz"
+        return self._file
+
+    def _write(self, lines: list[str]) -> None:
+        if not lines:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Each batch is its own gzip member; readers see one continuous stream
+        with gzip.open(self._path(), "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def _write_forever(self) -> None:
+        while True:
+            await asyncio.sleep(TRAFFIC_CAPTURE_FLUSH_S)
+            try:
+                await asyncio.to_thread(self._write, self._take())
+            except Exception:
+                logger.exception("Traffic capture write failed")
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "sample": self.sample,
+            "file": str(self._file) if self._file else None,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+        }
+
+
+def read_trace(paths) -> list[dict]:
+    """Records from one or more capture files (rotated files of one capture share its clock)."""
+    records = []
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            records.extend(loads(line) for line in f if line.strip())
+    return records
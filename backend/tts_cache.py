@@ -0,0 +1,199 @@
+"""Content-addressed on-disk cache for synthesized agent audio.
+
+Agents repeat the same lines on every call: the greeting, the call-transfer
+line, the booking confirmation. Those are synthesized once, in Twilio's
+native format (μ-law 8 kHz), and stored under the SHA-256 of
+(voice id, model, text, settings). Playback memory-maps the file, so the
+first words of a call go out with no synthesis wait and no copy. The cache
+is bounded by total size with LRU eviction, and recency survives restarts
+through file mtimes.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ELEVENLABS_API_URL = os.environ.get("ELEVENLABS_API_URL", "https://api.elevenlabs.io")
+DEFAULT_MODEL = "eleven_turbo_v2_5"
+OUTPUT_FORMAT = "ulaw_8000"
+
+
+def cache_key(voice_id: str, text: str, model: str = DEFAULT_MODEL, settings: dict | None = None) -> str:
+    payload = json.dumps(
+        {"voice": voice_id, "model": model, "text": text, "settings": settings or {}, "format": OUTPUT_FORMAT},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def agent_utterances(agent: dict) -> list[str]:
+    """Fixed lines an agent speaks verbatim, worth having synthesized up front."""
+    lines = [agent.get("initialMessage")]
+    if agent.get("callTransferEnabled"):
+        lines.append(agent.get("callTransferMessage"))
+    if agent.get("calendarBookingEnabled"):
+        lines.append(agent.get("bookingConfirmationMessage"))
+    seen = set()
+    return [line for line in lines if line and not (line in seen or seen.add(line))]
+
+
+class TtsCache:
+    """Size-capped LRU of audio files named by content hash."""
+
+    def __init__(self, root: str | os.PathLike, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _load_index(self) -> None:
+        entries = []
+        for path in self.root.glob("??/*"):
+            if path.name.endswith(".tmp"):
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def get(self, key: str) -> mmap.mmap | None:
+        """Read-only mapping of the cached audio, or None. Caller closes it."""
+        if key not in self._index:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Removed behind our back, or empty file
+            self.total_bytes -= self._index.pop(key, 0)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._index.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return mapped
+
+    def put(self, key: str, audio: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(audio)
+        os.replace(tmp, path)
+
+        self.total_bytes -= self._index.pop(key, 0)
+        self._index[key] = len(audio)
+        self.total_bytes += len(audio)
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            # Open mappings stay valid after unlink on POSIX
+            self._path(key).unlink(missing_ok=True)
+
+    async def get_or_synthesize(self, key: str, synthesize: Callable[[], Awaitable[bytes]]) -> mmap.mmap:
+        """Cached audio, synthesizing at most once per key even under concurrency."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(synthesize())
+            self._inflight[key] = pending
+            try:
+                self.put(key, await pending)
+            finally:
+                self._inflight.pop(key, None)
+        else:
+            await pending
+
+        cached = self.get(key)
+        if cached is None:
+            raise RuntimeError(f"TTS cache entry {key} vanished right after being written")
+        return cached
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+async def synthesize_elevenlabs(
+    client: httpx.AsyncClient,
+    api_key: str,
+    voice_id: str,
+    text: str,
+    model: str = DEFAULT_MODEL,
+    settings: dict | None = None,
+) -> bytes:
+    payload = {"text": text, "model_id": model}
+    if settings:
+        payload["voice_settings"] = settings
+    response = await client.post(
+        f"{ELEVENLABS_API_URL}/v1/text-to-speech/{voice_id}",
+        params={"output_format": OUTPUT_FORMAT},
+        headers={"xi-api-key": api_key, "accept": "audio/basic"},
+        json=payload,
+        timeout=30.0,
+    )
+    response.raise_for_status()
+    return response.content
+
+
+async def prewarm_agent(cache: TtsCache, agent: dict, api_key: str) -> list[str]:
+    """Synthesize any of the agent's fixed lines missing from the cache."""
+    voice_id = agent.get("voiceId") or "rachel"
+    model = agent.get("ttsModel") or DEFAULT_MODEL
+    settings = agent.get("voiceSettings") or None
+    keys = []
+    async with httpx.AsyncClient() as client:
+        for text in agent_utterances(agent):
+            key = cache_key(voice_id, text, model, settings)
+            keys.append(key)
+            if key in cache:
+                continue
+            try:
+                mapped = await cache.get_or_synthesize(
+                    key, lambda text=text: synthesize_elevenlabs(client, api_key, voice_id, text, model, settings)
+                )
+                mapped.close()
+            except Exception as e:
+                logger.warning(f"TTS prewarm failed for agent {agent.get('id')}: {e}")
+    return keys
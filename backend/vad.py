@@ -0,0 +1,220 @@
+"""Streaming voice-activity detection and barge-in for the call loop.
+
+``StreamingVad`` runs on decoded PCM16 caller frames (see audio.py) and
+emits ``speech_start`` / ``speech_end`` events. Detection is frame energy
+against an adaptive noise floor with hysteresis: speech must exceed the
+floor by ``start_db`` for ``start_frames`` consecutive frames (1-2 frames,
+i.e. 20-40 ms) and ends after ``end_frames`` frames below ``end_db``.
+Per frame this is one dot product and a few scalar operations.
+
+The noise floor keeps adapting during speech, at a much slower rate. A
+lasting rise in background noise therefore eventually ends the speech
+segment instead of holding it open. Speech is also ended after
+``max_speech_frames``, with the floor reset to the current level. Either
+way the VAD can detect the next ``speech_start``, so barge-in keeps working
+for the rest of the call.
+
+Each call gets its config from the agent document (``vad_config_for_agent``).
+sessions.CallSessionRegistry builds a ``BargeInController`` from it when a
+call is opened with its agent.
+
+``BargeInController`` turns a ``speech_start`` during agent playback into a
+cancellation of the in-flight TTS/playback work.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from dataclasses import dataclass, replace
+from typing import Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+_FULL_SCALE_ENERGY = 32768.0 ** 2
+
+
+@dataclass(frozen=True)
+class VadConfig:
+    start_db: float = 12.0           # above noise floor to count as speech
+    end_db: float = 6.0              # below this margin speech is considered over
+    start_frames: int = 2            # consecutive speech frames before speech_start
+    end_frames: int = 15             # consecutive quiet frames before speech_end (300 ms)
+    min_speech_dbfs: float = -45.0   # absolute floor; quieter frames are never speech
+    noise_floor_dbfs: float = -60.0  # initial noise estimate
+    noise_rise: float = 0.02         # slow adaptation upwards (avoid learning speech as noise)
+    noise_fall: float = 0.3          # fast adaptation downwards
+    speech_noise_rise: float = 0.002  # upwards while speaking: a 12 dB noise step ends speech in ~7 s
+    max_speech_frames: int = 1500    # force speech_end after this long (30 s)
+    barge_in_grace_ms: int = 200     # ignore speech this soon after playback starts (echo tail)
+
+
+# Presets for the agent's `interruptSensitivity` setting
+SENSITIVITY_PRESETS = {
+    "low": VadConfig(start_db=18.0, start_frames=3, min_speech_dbfs=-38.0, barge_in_grace_ms=400),
+    "medium": VadConfig(start_db=14.0, start_frames=2, min_speech_dbfs=-42.0, barge_in_grace_ms=300),
+    "high": VadConfig(start_db=10.0, start_frames=1, min_speech_dbfs=-48.0, barge_in_grace_ms=150),
+}
+
+# Agent `vadSettings` keys (camelCase, as stored by the API) -> (VadConfig field, min, max).
+# The API validates the same ranges (AGENT_VAD_RANGES in app/api/[[...path]]/route.js).
+_AGENT_SETTINGS = {
+    "startDb": ("start_db", 3.0, 40.0),
+    "endDb": ("end_db", 1.0, 30.0),
+    "startFrames": ("start_frames", 1, 10),
+    "endFrames": ("end_frames", 3, 100),
+    "minSpeechDbfs": ("min_speech_dbfs", -80.0, -10.0),
+    "bargeInGraceMs": ("barge_in_grace_ms", 0, 2000),
+}
+
+
+def vad_config_for_agent(agent: dict) -> VadConfig:
+    """Build the VAD config from an agent document.
+
+    Starts from the `interruptSensitivity` preset and applies any explicit
+    overrides in `vadSettings`. Values outside the allowed range (documents
+    saved before the API validated them) are ignored.
+    """
+    config = SENSITIVITY_PRESETS.get(agent.get("interruptSensitivity") or "high", SENSITIVITY_PRESETS["high"])
+    overrides = {}
+    for key, value in (agent.get("vadSettings") or {}).items():
+        setting = _AGENT_SETTINGS.get(key)
+        if setting is None or value is None:
+            continue
+        name, low, high = setting
+        try:
+            value = int(value) if isinstance(low, int) else float(value)
+        except (TypeError, ValueError):
+            value = None
+        if value is None or not low <= value <= high:
+            logger.warning("Ignoring invalid vadSettings.%s=%r for agent %s", key, value, agent.get("id"))
+            continue
+        overrides[name] = value
+    config = replace(config, **overrides)
+    if config.end_db > config.start_db:
+        logger.warning("Ignoring vadSettings.endDb above startDb for agent %s", agent.get("id"))
+        config = replace(config, end_db=min(config.start_db, VadConfig.end_db))
+    return config
+
+
+class StreamingVad:
+    """Per-call energy VAD; ``process`` returns an event name or None."""
+
+    __slots__ = ("config", "speaking", "noise_dbfs", "level_dbfs", "_buf", "_above", "_below", "_speech_frames")
+
+    def __init__(self, config: VadConfig | None = None, frame_samples: int = 320):
+        self.config = config or VadConfig()
+        self.speaking = False
+        self.noise_dbfs = self.config.noise_floor_dbfs
+        self.level_dbfs = -120.0
+        self._buf = np.zeros(frame_samples, dtype=np.float32)
+        self._above = 0
+        self._below = 0
+        self._speech_frames = 0
+
+    def reset(self) -> None:
+        self.speaking = False
+        self._above = 0
+        self._below = 0
+        self._speech_frames = 0
+
+    def process(self, frame: np.ndarray) -> str | None:
+        n = frame.shape[0]
+        if n != self._buf.shape[0]:
+            self._buf = np.zeros(n, dtype=np.float32)
+        buf = self._buf
+        np.copyto(buf, frame, casting="unsafe")
+        energy = float(np.dot(buf, buf)) / n
+        level = 10.0 * math.log10(energy / _FULL_SCALE_ENERGY + 1e-12)
+        self.level_dbfs = level
+
+        cfg = self.config
+        margin = level - self.noise_dbfs
+
+        if not self.speaking:
+            if margin >= cfg.start_db and level >= cfg.min_speech_dbfs:
+                self._above += 1
+                if self._above >= cfg.start_frames:
+                    self.speaking = True
+                    self._above = 0
+                    self._below = 0
+                    self._speech_frames = 0
+                    return SPEECH_START
+            else:
+                self._above = 0
+                self._adapt_noise(level, cfg.noise_rise)
+            return None
+
+        self._speech_frames += 1
+        if self._speech_frames >= cfg.max_speech_frames:
+            # Nobody talks this long without a pause; treat the sound as the new floor
+            self.speaking = False
+            self._below = 0
+            self.noise_dbfs = level
+            return SPEECH_END
+        self._adapt_noise(level, cfg.speech_noise_rise)
+        if margin < cfg.end_db or level < cfg.min_speech_dbfs:
+            self._below += 1
+            if self._below >= cfg.end_frames:
+                self.speaking = False
+                self._below = 0
+                return SPEECH_END
+        else:
+            self._below = 0
+        return None
+
+    def _adapt_noise(self, level: float, rise: float) -> None:
+        rate = self.config.noise_fall if level < self.noise_dbfs else rise
+        self.noise_dbfs += (level - self.noise_dbfs) * rate
+
+
+class BargeInController:
+    """Cancels agent playback when the caller starts talking over it.
+
+    The agent loop registers a cancel callback whenever it starts speaking
+    (TTS request + playback) and clears it when playback finishes. Feed
+    every decoded caller frame through ``feed``.
+    """
+
+    __slots__ = ("vad", "on_barge_in", "interruptions", "_cancel", "_playback_started")
+
+    def __init__(self, vad: StreamingVad, on_barge_in: Callable[[], None] | None = None):
+        self.vad = vad
+        self.on_barge_in = on_barge_in
+        self.interruptions = 0
+        self._cancel: Callable[[], None] | None = None
+        self._playback_started = 0.0
+
+    @property
+    def agent_speaking(self) -> bool:
+        return self._cancel is not None
+
+    def start_playback(self, cancel: Callable[[], None]) -> None:
+        self._cancel = cancel
+        self._playback_started = time.monotonic()
+
+    def end_playback(self) -> None:
+        self._cancel = None
+
+    def feed(self, frame: np.ndarray) -> str | None:
+        event = self.vad.process(frame)
+        if event == SPEECH_START and self._cancel is not None:
+            elapsed_ms = (time.monotonic() - self._playback_started) * 1000
+            if elapsed_ms >= self.vad.config.barge_in_grace_ms:
+                self._barge_in()
+        return event
+
+    def _barge_in(self) -> None:
+        cancel, self._cancel = self._cancel, None
+        self.interruptions += 1
+        try:
+            cancel()
+        except Exception:  # a failing cancel must not break the audio loop
+            logger.exception("Playback cancel failed during barge-in")
+        if self.on_barge_in:
+            self.on_barge_in()
@@ -1031,6 +1031,33 @@ class APITester:
         except requests.exceptions.RequestException as e:
             self.log_result("Dashboard Stats", "FAIL", f"Connection error: {str(e)}")
     
+    def test_dashboard_stats_series(self):
+        """Test GET /api/dashboard/stats/series"""
+        if not self.auth_token:
+            self.log_result("Dashboard Stats Series", "FAIL", "No auth token available")
+            return
+            
+        try:
+            headers = {"Authorization": f"Bearer {self.auth_token}"}
+            response = requests.get(f"{API_URL}/dashboard/stats/series?days=7", 
+                                  headers=headers, 
+                                  timeout=10)
+            
+            if response.status_code == 200:
+                series = response.json().get("series", [])
+                if len(series) == 7 and all("date" in point and "calls" in point for point in series):
+                    self.log_result("Dashboard Stats Series", "PASS", 
+                                  f"Got {len(series)} daily buckets")
+                else:
+                    self.log_result("Dashboard Stats Series", "FAIL", 
+                                  f"Unexpected series shape: {series[:2]}")
+            else:
+                self.log_result("Dashboard Stats Series", "FAIL", 
+                              f"Status {response.status_code}: {response.text}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Dashboard Stats Series", "FAIL", f"Connection error: {str(e)}")
+    
     def test_delete_agent(self):
         """Test DELETE /api/agents/{id}"""
         if not self.auth_token or not self.agent_id:
@@ -1117,6 +1144,7 @@ class APITester:
         # Dashboard
         print(f"\n{Colors.BLUE}=== Dashboard Tests ==={Colors.ENDC}")
         self.test_dashboard_stats()
+        self.test_dashboard_stats_series()
         
         # Contacts
         print(f"\n{Colors.BLUE}=== Contacts Tests ==={Colors.ENDC}")
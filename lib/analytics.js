@@ -0,0 +1,121 @@
+// Call analytics for dashboard charts
+//
+// Reads the roll-ups the voice engine maintains (backend/analytics.py): one
+// `call_analytics` document per workspace, agent and UTC day. Hourly values
+// are 24-slot arrays, so a chart reads one small document per agent per day
+// and never scans call_logs. Averages and p95 latency are computed here from
+// sums and latency histogram bins, which add up across agents and days.
+
+const ANALYTICS_COLLECTION = 'call_analytics'
+const MAX_DAYS = 365
+const MAX_HOURLY_DAYS = 7
+const DAY_MS = 24 * 60 * 60 * 1000
+
+function dayKey(date) {
+  return new Date(date).toISOString().slice(0, 10)
+}
+
+function emptyTotals() {
+  return { count: 0, durationS: 0, cost: 0, outcomes: {}, latencyBins: [] }
+}
+
+function addBins(target, bins = []) {
+  bins.forEach((n, i) => { target[i] = (target[i] || 0) + n })
+}
+
+function addTotals(target, source) {
+  target.count += source.count || 0
+  target.durationS += source.durationS || 0
+  target.cost += source.cost || 0
+  for (const [outcome, n] of Object.entries(source.outcomes || {})) {
+    target.outcomes[outcome] = (target.outcomes[outcome] || 0) + n
+  }
+  addBins(target.latencyBins, source.latencyBins)
+}
+
+// Upper bound of the bin holding the q-quantile (the last bound for the overflow bin)
+function quantile(bins, bounds, q) {
+  const total = bins.reduce((sum, n) => sum + (n || 0), 0)
+  if (total === 0 || bounds.length === 0) return null
+  const rank = Math.ceil(q * total)
+  let seen = 0
+  for (let i = 0; i < bins.length; i++) {
+    seen += bins[i] || 0
+    if (seen >= rank) return bounds[Math.min(i, bounds.length - 1)]
+  }
+  return bounds[bounds.length - 1]
+}
+
+function summarize(totals, bounds) {
+  const { latencyBins, ...rest } = totals
+  return {
+    ...rest,
+    durationS: Math.round(totals.durationS),
+    cost: Math.round(totals.cost * 100) / 100,
+    avgDurationS: totals.count ? Math.round(totals.durationS / totals.count) : 0,
+    p95LatencyMs: quantile(latencyBins, bounds, 0.95)
+  }
+}
+
+// Zero-filled series (oldest first) plus totals and a per-agent breakdown.
+// granularity 'hour' is limited to the last MAX_HOURLY_DAYS days.
+export async function getCallAnalytics(db, workspaceId, { days = 30, granularity = 'day', agentId } = {}) {
+  const hourly = granularity === 'hour'
+  const span = Math.min(Math.max(parseInt(days) || 30, 1), hourly ? MAX_HOURLY_DAYS : MAX_DAYS)
+  const start = new Date()
+  start.setUTCHours(0, 0, 0, 0)
+  start.setUTCDate(start.getUTCDate() - (span - 1))
+
+  const query = { workspaceId, date: { $gte: dayKey(start) } }
+  if (agentId) query.agentId = agentId
+  const projection = { _id: 0, workspaceId: 0, createdAt: 0, updatedAt: 0, source: 0, batches: 0 }
+  if (!hourly) projection.hourly = 0
+  const docs = await db.collection(ANALYTICS_COLLECTION).find(query, { projection }).toArray()
+
+  const bounds = docs.find(doc => doc.latencyBoundsMs)?.latencyBoundsMs || []
+  const byDate = new Map()
+  const byAgent = new Map()
+  const totals = emptyTotals()
+  for (const doc of docs) {
+    if (!byDate.has(doc.date)) byDate.set(doc.date, [])
+    byDate.get(doc.date).push(doc)
+    if (!byAgent.has(doc.agentId)) byAgent.set(doc.agentId, emptyTotals())
+    addTotals(byAgent.get(doc.agentId), doc)
+    addTotals(totals, doc)
+  }
+
+  const series = []
+  for (let i = 0; i < span; i++) {
+    const date = dayKey(start.getTime() + i * DAY_MS)
+    const dayDocs = byDate.get(date) || []
+    if (!hourly) {
+      const point = emptyTotals()
+      dayDocs.forEach(doc => addTotals(point, doc))
+      series.push({ date, ...summarize(point, bounds) })
+      continue
+    }
+    for (let hour = 0; hour < 24; hour++) {
+      const point = emptyTotals()
+      for (const doc of dayDocs) {
+        point.count += doc.hourly?.count?.[hour] || 0
+        point.durationS += doc.hourly?.durationS?.[hour] || 0
+        point.cost += doc.hourly?.cost?.[hour] || 0
+        addBins(point.latencyBins, doc.hourly?.latencyBins?.[hour])
+      }
+      const { outcomes, ...hourPoint } = summarize(point, bounds)
+      series.push({ date, hour, ...hourPoint })
+    }
+  }
+
+  return {
+    granularity: hourly ? 'hour' : 'day',
+    days: span,
+    totals: summarize(totals, bounds),
+    byAgent: [...byAgent].map(([id, agentTotals]) => ({ agentId: id, ...summarize(agentTotals, bounds) })),
+    series
+  }
+}
+
+export async function dropWorkspaceAnalytics(db, workspaceId) {
+  await db.collection(ANALYTICS_COLLECTION).deleteMany({ workspaceId })
+}
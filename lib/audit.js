@@ -1,4 +1,73 @@
 // Audit logging utility
+//
+// Events are buffered in memory and written with one unordered insertMany
+// per flush (size or time triggered), so audited requests never wait on
+// Mongo. Batches that fail or time out are spilled to an append-only JSONL
+// journal, and writes back off exponentially (up to AUDIT_RETRY_MAX_MS):
+// until the backoff ends, flushes append to the journal without touching
+// Mongo. Once a write succeeds the journal is replayed AUDIT_REPLAY_CHUNK
+// events per flush. A flush claims the journal by renaming it to a .replay
+// file, reads it from where the last chunk stopped, and deletes it once all
+// of it is stored. The first flush of a process also replays .replay files
+// left by processes that died mid-flush. Each event uses its id as `_id`,
+// which makes replays idempotent. Events Mongo rejects outright (validation,
+// size) go to AUDIT_QUARANTINE_PATH instead of being retried.
+//
+// Storage is tiered: the `audit_logs` collection holds the hot window
+// (AUDIT_RETENTION_DAYS) behind compound indexes (lib/indexes.js) that lead
+// with each filter field and end in createdAt. Older events are moved, one
+// UTC day at a time, into gzip-compressed JSONL files under AUDIT_ARCHIVE_DIR.
+// Each day file has a manifest listing the userIds, workspaceIds and actions
+// it contains. Queries that pass includeArchive and are not satisfied from the
+// hot tier continue into the archived days, newest first. Days whose manifest
+// rules out the filter are skipped without being read. The others are streamed,
+// holding no more than the requested number of matches. Without a startDate
+// the archive scan covers at most AUDIT_ARCHIVE_QUERY_DAYS days.
+// purgeWorkspaceAudit() takes a deleted workspace's events out of the journal
+// and the archived days.
+import fs from 'fs'
+import path from 'path'
+import readline from 'readline'
+import zlib from 'zlib'
+import { ensureIndexes } from '@/lib/indexes'
+
+const FLUSH_SIZE = parseInt(process.env.AUDIT_FLUSH_SIZE) || 200
+const FLUSH_INTERVAL_MS = parseInt(process.env.AUDIT_FLUSH_INTERVAL_MS) || 1000
+const MAX_BUFFER = parseInt(process.env.AUDIT_MAX_BUFFER) || 10000
+const WRITE_TIMEOUT_MS = parseInt(process.env.AUDIT_WRITE_TIMEOUT_MS) || 5000
+const JOURNAL_PATH = process.env.AUDIT_JOURNAL_PATH || path.join(process.cwd(), '.audit-journal.jsonl')
+const QUARANTINE_PATH = process.env.AUDIT_QUARANTINE_PATH || path.join(process.cwd(), '.audit-rejected.jsonl')
+const REPLAY_CHUNK = parseInt(process.env.AUDIT_REPLAY_CHUNK) || 1000
+const RETRY_MAX_MS = parseInt(process.env.AUDIT_RETRY_MAX_MS) || 60 * 1000
+const DRAIN_MAX_CHUNKS = 1000
+const AUDIT_DEBUG = process.env.AUDIT_DEBUG === 'true'
+
+const RETENTION_DAYS = parseInt(process.env.AUDIT_RETENTION_DAYS) || 90
+const ARCHIVE_DIR = process.env.AUDIT_ARCHIVE_DIR || path.join(process.cwd(), 'audit-archive')
+const ARCHIVE_INTERVAL_MS = parseInt(process.env.AUDIT_ARCHIVE_INTERVAL_MS) || 60 * 60 * 1000
+const ARCHIVE_QUERY_DAYS = parseInt(process.env.AUDIT_ARCHIVE_QUERY_DAYS) || 31
+const ARCHIVE_BATCH_SIZE = 1000
+const ARCHIVE_LOCK_MS = 30 * 60 * 1000
+const DAY_MS = 24 * 60 * 60 * 1000
+
+// Write errors that say nothing about the event itself (failover, shutdown, timeouts)
+const TRANSIENT_WRITE_CODES = new Set([6, 7, 50, 64, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436])
+
+let buffer = []
+let auditDb = null
+let flushTimer = null
+let flushing = null
+// Buffered events taken by the flush in progress, still journaled by spillSync until the write settles
+let inFlight = []
+let orphansClaimed = false
+// Journal files this process claimed and has not yet stored, oldest first, and how far each was replayed
+const claimedFiles = new Set()
+const replayOffsets = new Map()
+// Consecutive failed writes; no write is tried before retryAt
+let writeFailures = 0
+let retryAt = 0
+let shutdownHooksInstalled = false
+let lastArchiveRun = 0
 
 export const AUDIT_ACTIONS = {
   // Auth actions
@@ -11,6 +80,7 @@ export const AUDIT_ACTIONS = {
   ADMIN_INVITE_SENT: 'admin_invite_sent',
   ADMIN_ROLE_CHANGED: 'admin_role_changed',
   USER_DELETED: 'user_deleted',
+  LIVE_CALL_ENDED: 'live_call_ended',
   
   // Agent actions
   AGENT_CREATED: 'agent_created',
@@ -22,6 +92,11 @@ export const AUDIT_ACTIONS = {
   CONTACT_CREATED: 'contact_created',
   CONTACT_DELETED: 'contact_deleted',
   
+  // Campaign actions
+  CAMPAIGN_CREATED: 'campaign_created',
+  CAMPAIGN_STATUS_CHANGED: 'campaign_status_changed',
+  CAMPAIGN_DELETED: 'campaign_deleted',
+  
   // Integration actions
   INTEGRATION_CONFIGURED: 'integration_configured',
   INTEGRATION_REMOVED: 'integration_removed'
@@ -50,15 +125,314 @@ export async function logAuditEvent(db, {
     createdAt: new Date()
   }
   
-  await db.collection('audit_logs').insertOne(auditLog)
+  auditDb = db
+  installShutdownHooks()
+  buffer.push(auditLog)
   
-  // Also log to console for debugging
-  console.log(`[AUDIT] ${action} by ${userEmail} - ${JSON.stringify(details)}`)
+  if (AUDIT_DEBUG) {
+    console.log(`[AUDIT] ${action} by ${userEmail} - ${JSON.stringify(details)}`)
+  }
+  
+  if (buffer.length >= MAX_BUFFER) {
+    // Mongo is not keeping up - move the backlog to disk instead of growing memory
+    spillToJournal(buffer.splice(0)).catch(error => {
+      console.error('Audit journal spill failed:', error)
+    })
+  } else if (buffer.length >= FLUSH_SIZE) {
+    flushAuditLogs()
+  } else {
+    scheduleFlush(FLUSH_INTERVAL_MS)
+  }
   
   return auditLog
 }
 
-export async function getAuditLogs(db, filters = {}, limit = 100) {
+// Write everything buffered (plus any journaled backlog) to Mongo
+export function flushAuditLogs() {
+  if (flushTimer) {
+    clearTimeout(flushTimer)
+    flushTimer = null
+  }
+  
+  // Serialize flushes; a flush requested mid-write runs right after it
+  const previous = flushing || Promise.resolve()
+  const current = previous.then(writePending).catch(error => {
+    console.error('Audit flush failed:', error)
+  })
+  flushing = current
+  current.finally(() => {
+    if (flushing === current) flushing = null
+  })
+  return current
+}
+
+async function writePending() {
+  if (!auditDb) return
+  
+  ensureIndexes(auditDb, ['audit_logs'])
+  maybeArchive(auditDb)
+  
+  const batch = buffer.splice(0)
+  inFlight = batch
+  let settled = false
+  try {
+    if (Date.now() < retryAt) {
+      // Mongo failed recently - journal without trying it again
+      await spillToJournal(batch)
+      settled = true
+      scheduleFlush(retryAt - Date.now())
+      return
+    }
+    
+    const retry = await insertEvents(batch)
+    if (retry.length > 0) {
+      console.error(`Audit write failed, journaling ${retry.length} events`)
+      await spillToJournal(retry)
+      settled = true
+      backOff()
+      return
+    }
+    settled = true
+    
+    // More journaled events than one flush replays; keep going without waiting for new events
+    if (!await replayJournal() && Date.now() >= retryAt) scheduleFlush(0)
+  } catch (error) {
+    // Neither stored nor journaled; keep the batch for the next flush
+    if (!settled) buffer.unshift(...batch)
+    throw error
+  } finally {
+    inFlight = []
+  }
+}
+
+function scheduleFlush(delay) {
+  if (flushTimer) return
+  flushTimer = setTimeout(flushAuditLogs, delay)
+  flushTimer.unref?.()
+}
+
+// Exponential backoff from FLUSH_INTERVAL_MS up to RETRY_MAX_MS, after which
+// a flush replays the journal even if no new events arrive
+function backOff() {
+  writeFailures++
+  const delay = Math.min(RETRY_MAX_MS, FLUSH_INTERVAL_MS * 2 ** (writeFailures - 1))
+  retryAt = Date.now() + delay
+  scheduleFlush(delay)
+}
+
+// Inserts the events, quarantining any Mongo rejects outright (validation,
+// document too large). Resolves to the events worth retrying later: all of
+// them when nothing is known about what was stored (timeout, network,
+// no primary), otherwise those that failed with a transient code.
+async function insertEvents(events) {
+  if (events.length === 0) return []
+  try {
+    await withTimeout(
+      auditDb.collection('audit_logs').insertMany(
+        events.map(event => ({ _id: event.id, ...event })),
+        { ordered: false }
+      ),
+      WRITE_TIMEOUT_MS
+    )
+    writeFailures = 0
+    return []
+  } catch (error) {
+    const writeErrors = Array.isArray(error?.writeErrors) ? error.writeErrors : []
+    if (writeErrors.length === 0) {
+      if (error?.code === 11000) return []
+      console.error('Audit write failed:', error.message)
+      return events
+    }
+    
+    const retry = []
+    const rejected = []
+    for (const writeError of writeErrors) {
+      // Replayed events that already landed surface as duplicate-key errors
+      if (writeError.code === 11000) continue
+      const event = events[writeError.index]
+      if (TRANSIENT_WRITE_CODES.has(writeError.code)) retry.push(event)
+      else rejected.push({ ...event, rejected: { code: writeError.code, message: writeError.errmsg || writeError.message } })
+    }
+    if (rejected.length > 0) await quarantine(rejected)
+    return retry
+  }
+}
+
+// Kept for inspection instead of being retried for ever
+async function quarantine(events) {
+  console.error(`Audit write rejected ${events.length} events, moving them to ${QUARANTINE_PATH}`)
+  await fs.promises.appendFile(QUARANTINE_PATH, serializeEvents(events))
+}
+
+function withTimeout(promise, ms) {
+  let timer
+  const timeout = new Promise((_, reject) => {
+    timer = setTimeout(() => reject(new Error(`Audit write timed out after ${ms}ms`)), ms)
+  })
+  return Promise.race([promise, timeout]).finally(() => clearTimeout(timer))
+}
+
+function serializeEvents(events) {
+  return events.map(event => JSON.stringify(event)).join('\n') + '\n'
+}
+
+async function spillToJournal(events) {
+  if (events.length === 0) return
+  await fs.promises.appendFile(JOURNAL_PATH, serializeEvents(events))
+}
+
+let claimSeq = 0
+
+function isRunning(pid) {
+  try {
+    process.kill(pid, 0)
+    return true
+  } catch (error) {
+    return error.code === 'EPERM'
+  }
+}
+
+// .replay files whose process is gone. Any carrying this pid predate this process
+// (containers reuse pids), since it has not claimed anything yet.
+async function orphanedReplays() {
+  const dir = path.dirname(JOURNAL_PATH)
+  const prefix = `${path.basename(JOURNAL_PATH)}.`
+  const names = await fs.promises.readdir(dir).catch(() => [])
+  return names
+    .filter(name => name.startsWith(prefix) && name.endsWith('.replay'))
+    .filter(name => {
+      const pid = parseInt(name.slice(prefix.length))
+      return !pid || pid === process.pid || !isRunning(pid)
+    })
+    .map(name => path.join(dir, name))
+}
+
+// Atomically claim the journal so concurrent spills start a fresh file
+async function claimJournal() {
+  if (!orphansClaimed) {
+    orphansClaimed = true
+    for (const file of await orphanedReplays()) claimedFiles.add(file)
+  }
+  
+  const claimed = `${JOURNAL_PATH}.${process.pid}.${++claimSeq}.replay`
+  try {
+    await fs.promises.rename(JOURNAL_PATH, claimed)
+    claimedFiles.add(claimed)
+  } catch (error) {
+    if (error.code !== 'ENOENT') throw error
+  }
+}
+
+// Replays up to REPLAY_CHUNK journaled events, oldest file first. A file is
+// read from where the last replay stopped and deleted once all of it is
+// stored. Resolves to true when the journal is drained.
+async function replayJournal() {
+  await claimJournal()
+  
+  const events = []
+  const reads = []
+  for (const file of claimedFiles) {
+    if (events.length >= REPLAY_CHUNK) break
+    let read
+    try {
+      read = await readJournal(file, replayOffsets.get(file) || 0, REPLAY_CHUNK - events.length)
+    } catch (error) {
+      // Another process replayed this orphan first
+      if (error.code !== 'ENOENT') throw error
+      claimedFiles.delete(file)
+      replayOffsets.delete(file)
+      continue
+    }
+    events.push(...read.events)
+    reads.push({ file, ...read })
+  }
+  
+  const retry = await insertEvents(events)
+  if (retry.length > 0) {
+    // Nothing is advanced, so the whole chunk is tried again after the backoff
+    console.error(`Audit journal replay failed for ${retry.length} events`)
+    backOff()
+    return false
+  }
+  
+  for (const { file, offset, done } of reads) {
+    if (!done) {
+      replayOffsets.set(file, offset)
+      continue
+    }
+    await fs.promises.unlink(file).catch(() => {})
+    claimedFiles.delete(file)
+    replayOffsets.delete(file)
+  }
+  return claimedFiles.size === 0
+}
+
+// Up to `max` events from `start` onwards, with the byte offset to continue from
+async function readJournal(file, start, max) {
+  // Opened up front so a missing file rejects here instead of erroring on the stream
+  const handle = await fs.promises.open(file)
+  const input = handle.createReadStream({ start })
+  const lines = readline.createInterface({ input, crlfDelay: Infinity })
+  const events = []
+  let offset = start
+  let done = true
+  try {
+    for await (const line of lines) {
+      if (events.length >= max) {
+        done = false
+        break
+      }
+      offset += Buffer.byteLength(line) + 1
+      if (!line) continue
+      try {
+        const event = JSON.parse(line)
+        event.createdAt = new Date(event.createdAt)
+        events.push(event)
+      } catch {
+        // A line cut short by a crash mid-append
+        console.error(`Skipping unreadable audit journal line in ${file}`)
+      }
+    }
+  } finally {
+    input.destroy()
+  }
+  return { events, offset, done }
+}
+
+// Durability on shutdown: try a final flush when the loop drains, and
+// synchronously journal whatever is still buffered on signals/exit.
+function installShutdownHooks() {
+  if (shutdownHooksInstalled) return
+  shutdownHooksInstalled = true
+  
+  const spillSync = () => {
+    const pending = inFlight.concat(buffer.splice(0))
+    inFlight = []
+    if (pending.length === 0) return
+    try {
+      fs.appendFileSync(JOURNAL_PATH, serializeEvents(pending))
+    } catch (error) {
+      console.error('Audit journal spill on shutdown failed:', error)
+    }
+  }
+  
+  process.once('beforeExit', () => {
+    if (buffer.length > 0) flushAuditLogs()
+  })
+  process.once('exit', spillSync)
+  
+  for (const signal of ['SIGTERM', 'SIGINT']) {
+    const onSignal = () => {
+      spillSync()
+      process.removeListener(signal, onSignal)
+      // Preserve default termination when nobody else handles the signal
+      if (process.listenerCount(signal) === 0) process.kill(process.pid, signal)
+    }
+    process.on(signal, onSignal)
+  }
+}
+
+function buildAuditQuery(filters) {
   const query = {}
   
   if (filters.userId) query.userId = filters.userId
@@ -70,11 +444,354 @@ export async function getAuditLogs(db, filters = {}, limit = 100) {
     query.createdAt.$lte = new Date(filters.endDate)
   }
   
+  return query
+}
+
+function matchesFilters(event, filters) {
+  if (filters.userId && event.userId !== filters.userId) return false
+  if (filters.workspaceId && event.workspaceId !== filters.workspaceId) return false
+  if (filters.action && event.action !== filters.action) return false
+  if (filters.startDate && event.createdAt < new Date(filters.startDate)) return false
+  if (filters.endDate && event.createdAt > new Date(filters.endDate)) return false
+  return true
+}
+
+export async function getAuditLogs(db, filters = {}, limit = 100) {
+  ensureIndexes(db, ['audit_logs'])
+  
   const logs = await db.collection('audit_logs')
-    .find(query, { projection: { _id: 0 } })
+    .find(buildAuditQuery(filters), { projection: { _id: 0 } })
     .sort({ createdAt: -1 })
     .limit(limit)
     .toArray()
   
-  return logs
+  if (logs.length >= limit || !filters.includeArchive) return logs
+  
+  // Hot tier exhausted - continue into the archived days, newest first
+  const archived = await queryArchive(filters, limit - logs.length)
+  return logs.concat(archived)
+}
+
+// ====== ARCHIVE TIER ======
+
+function utcDayStart(date) {
+  const day = new Date(date)
+  day.setUTCHours(0, 0, 0, 0)
+  return day
+}
+
+function archiveFileFor(day) {
+  return path.join(ARCHIVE_DIR, `audit-${day.toISOString().slice(0, 10)}.jsonl.gz`)
+}
+
+function manifestFileFor(day) {
+  return path.join(ARCHIVE_DIR, `audit-${day.toISOString().slice(0, 10)}.manifest.json`)
+}
+
+// Manifest key -> event field
+const MANIFEST_FIELDS = { userIds: 'userId', workspaceIds: 'workspaceId', actions: 'action' }
+
+function hotCutoff() {
+  return utcDayStart(Date.now() - RETENTION_DAYS * DAY_MS)
+}
+
+async function listArchiveDays() {
+  let files
+  try {
+    files = await fs.promises.readdir(ARCHIVE_DIR)
+  } catch (error) {
+    if (error.code === 'ENOENT') return []
+    throw error
+  }
+  return files
+    .map(name => name.match(/^audit-(\d{4}-\d{2}-\d{2})\.jsonl\.gz$/))
+    .filter(Boolean)
+    .map(match => new Date(`${match[1]}T00:00:00.000Z`))
+    .sort((a, b) => b - a)
+}
+
+async function* archiveEvents(day) {
+  // Opened up front so a missing file rejects here instead of erroring on the stream
+  const handle = await fs.promises.open(archiveFileFor(day))
+  const lines = readline.createInterface({
+    input: handle.createReadStream().pipe(zlib.createGunzip()),
+    crlfDelay: Infinity
+  })
+  for await (const line of lines) {
+    if (line) yield JSON.parse(line)
+  }
+}
+
+// The newest `limit` matches of one day, newest first. Only that many events
+// are held at once, however large the day is.
+async function readArchiveDay(day, filters, limit) {
+  const newest = []
+  const ids = new Set()
+  for await (const event of archiveEvents(day)) {
+    event.createdAt = new Date(event.createdAt)
+    if (!matchesFilters(event, filters)) continue
+    if (newest.length >= limit && event.createdAt <= newest[newest.length - 1].createdAt) continue
+    // A crash between append and delete can archive a chunk twice. A copy of
+    // an event that was already pushed out is never newer than what remains.
+    if (ids.has(event.id)) continue
+
+    let low = 0
+    let high = newest.length
+    while (low < high) {
+      const mid = (low + high) >> 1
+      if (newest[mid].createdAt >= event.createdAt) low = mid + 1
+      else high = mid
+    }
+    newest.splice(low, 0, event)
+    ids.add(event.id)
+    if (newest.length > limit) ids.delete(newest.pop().id)
+  }
+  return newest
+}
+
+// null when the day has no manifest, i.e. nothing has been archived for it
+async function readManifest(day) {
+  try {
+    return JSON.parse(await fs.promises.readFile(manifestFileFor(day), 'utf8'))
+  } catch (error) {
+    if (error.code === 'ENOENT') return null
+    throw error
+  }
+}
+
+function mergeIntoManifest(manifest, events) {
+  let changed = false
+  for (const [key, field] of Object.entries(MANIFEST_FIELDS)) {
+    const values = new Set(manifest[key])
+    for (const event of events) {
+      if (event[field] != null && !values.has(event[field])) {
+        values.add(event[field])
+        changed = true
+      }
+    }
+    manifest[key] = [...values]
+  }
+  return changed
+}
+
+async function writeManifest(day, manifest) {
+  const file = manifestFileFor(day)
+  await fs.promises.writeFile(`${file}.tmp`, JSON.stringify(manifest))
+  await fs.promises.rename(`${file}.tmp`, file)
+}
+
+// Written before the chunk it describes, so a manifest never lacks a value its file holds
+async function addToManifest(day, events) {
+  const existing = await readManifest(day)
+  const manifest = existing || { userIds: [], workspaceIds: [], actions: [] }
+  if (mergeIntoManifest(manifest, events) || !existing) await writeManifest(day, manifest)
+}
+
+function manifestMatches(manifest, filters) {
+  return !!manifest &&
+    (!filters.userId || manifest.userIds.includes(filters.userId)) &&
+    (!filters.workspaceId || manifest.workspaceIds.includes(filters.workspaceId)) &&
+    (!filters.action || manifest.actions.includes(filters.action))
+}
+
+async function queryArchive(filters, limit) {
+  const days = await listArchiveDays()
+  if (days.length === 0) return []
+  const end = filters.endDate ? new Date(filters.endDate) : null
+  const newest = end && end < days[0] ? utcDayStart(end) : days[0]
+  const start = filters.startDate
+    ? utcDayStart(filters.startDate)
+    : new Date(newest.getTime() - (ARCHIVE_QUERY_DAYS - 1) * DAY_MS)
+
+  const results = []
+  for (const day of days) {
+    if (end && day > end) continue
+    if (day < start) break
+    if (!manifestMatches(await readManifest(day), filters)) continue
+
+    results.push(...await readArchiveDay(day, filters, limit - results.length))
+    if (results.length >= limit) break
+  }
+  return results
+}
+
+// Replays this process's journal to the end. False while writes are backing
+// off or the journal is too large to drain in one go.
+async function drainJournal() {
+  for (let chunk = 0; chunk < DRAIN_MAX_CHUNKS; chunk++) {
+    await flushAuditLogs()
+    if (Date.now() < retryAt) return false
+    if (claimedFiles.size === 0 && !fs.existsSync(JOURNAL_PATH)) return true
+  }
+  return false
+}
+
+// Removes a deleted workspace's audit events that the `audit_logs` batches
+// miss: those still in this process's journal, and those in archived days.
+// Each day whose manifest names the workspace is rewritten without them.
+// Throws when the journal can't be drained or the archiver holds the lease,
+// so the deletion job retries the step later. Resolves to the number of
+// events removed.
+export async function purgeWorkspaceAudit(db, workspaceId) {
+  auditDb = auditDb || db
+  if (!await drainJournal()) throw new Error('Audit journal not drained yet')
+  const { deletedCount } = await db.collection('audit_logs').deleteMany({ workspaceId })
+
+  if (!await acquireArchiveLease(db)) throw new Error('Audit archive is busy')
+  let removed = deletedCount
+  try {
+    for (const day of await listArchiveDays()) {
+      const manifest = await readManifest(day)
+      if (manifest?.workspaceIds.includes(workspaceId)) removed += await purgeArchiveDay(day, workspaceId)
+    }
+  } finally {
+    await releaseArchiveLease(db)
+  }
+  return removed
+}
+
+// The day file is replaced before its manifest, so the manifest on disk always
+// covers the file (the old one is a superset of the new one)
+async function purgeArchiveDay(day, workspaceId) {
+  const file = archiveFileFor(day)
+  const rewritten = `${file}.tmp`
+  await fs.promises.rm(rewritten, { force: true })
+
+  const manifest = { userIds: [], workspaceIds: [], actions: [] }
+  let removed = 0
+  let kept = 0
+  let events = []
+  const commitChunk = async () => {
+    if (events.length === 0) return
+    mergeIntoManifest(manifest, events)
+    await appendArchiveChunk(rewritten, events.map(event => JSON.stringify(event)))
+    kept += events.length
+    events = []
+  }
+
+  for await (const event of archiveEvents(day)) {
+    if (event.workspaceId === workspaceId) {
+      removed++
+      continue
+    }
+    events.push(event)
+    if (events.length >= ARCHIVE_BATCH_SIZE) await commitChunk()
+  }
+  await commitChunk()
+
+  if (kept > 0) {
+    await fs.promises.rename(rewritten, file)
+    await writeManifest(day, manifest)
+  } else {
+    await fs.promises.unlink(file)
+    await fs.promises.rm(manifestFileFor(day), { force: true })
+  }
+  return removed
+}
+
+function maybeArchive(db) {
+  if (Date.now() - lastArchiveRun < ARCHIVE_INTERVAL_MS) return
+  lastArchiveRun = Date.now()
+  archiveAuditLogs(db).catch(error => {
+    console.error('Audit archive run failed:', error)
+  })
+}
+
+// Cluster-wide lease so only one process archives at a time
+async function acquireArchiveLease(db) {
+  const now = new Date()
+  try {
+    await db.collection('audit_archive_state').updateOne(
+      { _id: 'lease', $or: [{ lockedUntil: { $lt: now } }, { lockedUntil: { $exists: false } }] },
+      { $set: { lockedUntil: new Date(now.getTime() + ARCHIVE_LOCK_MS), pid: process.pid } },
+      { upsert: true }
+    )
+    return true
+  } catch (error) {
+    if (error.code === 11000) return false
+    throw error
+  }
+}
+
+async function releaseArchiveLease(db) {
+  await db.collection('audit_archive_state').updateOne(
+    { _id: 'lease', pid: process.pid },
+    { $set: { lockedUntil: new Date(0) } }
+  )
+}
+
+// Move every event older than the hot window into per-day archive files.
+// Each day is written to disk before the matching documents are deleted.
+export async function archiveAuditLogs(db) {
+  if (!await acquireArchiveLease(db)) return { archived: 0, days: [] }
+
+  const cutoff = hotCutoff()
+  const collection = db.collection('audit_logs')
+  const summary = { archived: 0, days: [] }
+
+  try {
+    await fs.promises.mkdir(ARCHIVE_DIR, { recursive: true })
+
+    for (;;) {
+      const oldest = await collection.findOne(
+        { createdAt: { $lt: cutoff } },
+        { sort: { createdAt: 1 }, projection: { createdAt: 1 } }
+      )
+      if (!oldest) break
+
+      const day = utcDayStart(oldest.createdAt)
+      const dayEnd = new Date(Math.min(day.getTime() + DAY_MS, cutoff.getTime()))
+      const archived = await archiveDay(collection, day, dayEnd)
+
+      summary.archived += archived
+      summary.days.push(day.toISOString().slice(0, 10))
+    }
+  } finally {
+    await releaseArchiveLease(db)
+  }
+
+  return summary
+}
+
+async function archiveDay(collection, day, dayEnd) {
+  const range = { createdAt: { $gte: day, $lt: dayEnd } }
+  const cursor = collection.find(range).sort({ createdAt: 1 }).batchSize(ARCHIVE_BATCH_SIZE)
+  const file = archiveFileFor(day)
+
+  let archived = 0
+  let ids = []
+  let events = []
+
+  const commitChunk = async () => {
+    if (ids.length === 0) return
+    await addToManifest(day, events)
+    await appendArchiveChunk(file, events.map(event => JSON.stringify(event)))
+    await collection.deleteMany({ _id: { $in: ids } })
+    archived += ids.length
+    ids = []
+    events = []
+  }
+
+  for await (const doc of cursor) {
+    const { _id, ...event } = doc
+    ids.push(_id)
+    events.push(event)
+    if (ids.length >= ARCHIVE_BATCH_SIZE) await commitChunk()
+  }
+  await commitChunk()
+
+  return archived
+}
+
+// Each chunk is its own gzip member; gunzip reads concatenated members
+// transparently. The chunk is fsynced before its documents are deleted.
+async function appendArchiveChunk(file, lines) {
+  const compressed = zlib.gzipSync(lines.join('\n') + '\n')
+  const handle = await fs.promises.open(file, 'a')
+  try {
+    await handle.write(compressed)
+    await handle.sync()
+  } finally {
+    await handle.close()
+  }
 }
@@ -1,24 +1,199 @@
-import { MongoClient } from 'mongodb'
+// MongoDB clients
+//
+// Two connection pools, each its own MongoClient:
+// - transactional (connectToMongo): logins, CRUD and every write. Reads go
+//   to the primary.
+// - analytics (connectToAnalyticsDb): dashboards, admin listings and
+//   reports. Reads go to a secondary when one is within
+//   MONGO_ANALYTICS_MAX_STALENESS_S of the primary, and fall back to the
+//   primary otherwise. A slow report then waits on its own pool and its own
+//   server instead of holding connections a login needs.
+// Pool settings come from MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+// MONGO_MAX_IDLE_TIME_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS and MONGO_COMPRESSORS.
+// The analytics pool reads the same names with a MONGO_ANALYTICS_ prefix. Its
+// defaults are a smaller pool and a longer wait, and MONGO_ANALYTICS_URL can
+// point it at another deployment.
+//
+// Pool wait time is measured from the driver's connection-pool events.
+// The wait runs from checkout start to checkout done or failed, and a
+// failure is a wait-queue timeout or a closed pool. getPoolStats() reports
+// the totals per pool. Checkouts slower than MONGO_SLOW_CHECKOUT_MS are
+// logged.
+//
+// Secondary routing only does something on a replica set. To try it
+// locally:
+//   mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-0
+//   mongod --replSet rs0 --port 27018 --dbpath /tmp/rs0-1
+//   mongosh --eval 'rs.initiate({_id: "rs0", members: [{_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"}]})'
+//   MONGO_URL="mongodb://localhost:27017,localhost:27018/?replicaSet=rs0"
+// Then compare getPoolStats() and db.currentOp() on each member while a
+// report runs next to logins.
+import { MongoClient, ReadPreference } from 'mongodb'
+import { startIndexBootstrap } from '@/lib/indexes'
 
-let client = null
-let db = null
+const SLOW_CHECKOUT_MS = parseInt(process.env.MONGO_SLOW_CHECKOUT_MS) || 100
+// Upper bounds (ms) of the wait-time histogram bins; the last bin is open-ended
+const WAIT_BOUNDS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
 
-export async function connectToMongo() {
-  if (db) return db
-  
-  try {
-    client = new MongoClient(process.env.MONGO_URL)
-    await client.connect()
-    db = client.db(process.env.DB_NAME)
-    console.log('Connected to MongoDB')
+function envInt(name, fallback) {
+  const value = parseInt(process.env[name])
+  return Number.isNaN(value) ? fallback : value
+}
+
+function poolOptions(prefix, defaults) {
+  const options = {
+    maxPoolSize: envInt(`${prefix}MAX_POOL_SIZE`, defaults.maxPoolSize),
+    minPoolSize: envInt(`${prefix}MIN_POOL_SIZE`, defaults.minPoolSize),
+    maxIdleTimeMS: envInt(`${prefix}MAX_IDLE_TIME_MS`, defaults.maxIdleTimeMS),
+    waitQueueTimeoutMS: envInt(`${prefix}WAIT_QUEUE_TIMEOUT_MS`, defaults.waitQueueTimeoutMS),
+    appName: defaults.appName
+  }
+  // zlib needs nothing extra; snappy and zstd need their optional npm packages
+  const compressors = process.env[`${prefix}COMPRESSORS`] ?? process.env.MONGO_COMPRESSORS
+  if (compressors) options.compressors = compressors.split(',').map(c => c.trim()).filter(Boolean)
+  return options
+}
+
+const POOLS = {
+  transactional: () => ({
+    url: process.env.MONGO_URL,
+    options: poolOptions('MONGO_', {
+      maxPoolSize: 50, minPoolSize: 0, maxIdleTimeMS: 0, waitQueueTimeoutMS: 5000, appName: 'api'
+    })
+  }),
+  analytics: () => ({
+    url: process.env.MONGO_ANALYTICS_URL || process.env.MONGO_URL,
+    options: {
+      ...poolOptions('MONGO_ANALYTICS_', {
+        maxPoolSize: 10, minPoolSize: 0, maxIdleTimeMS: 60000, waitQueueTimeoutMS: 30000, appName: 'api-analytics'
+      }),
+      // The server's minimum is 90 s
+      readPreference: new ReadPreference(process.env.MONGO_ANALYTICS_READ_PREFERENCE || 'secondaryPreferred',
+        undefined, { maxStalenessSeconds: Math.max(envInt('MONGO_ANALYTICS_MAX_STALENESS_S', 120), 90) })
+    }
+  })
+}
+
+// pool name -> { client, db, connecting, stats }
+const pools = new Map()
+let indexing = false
+
+function emptyStats() {
+  return { checkouts: 0, failed: 0, failedByReason: {}, waitMsTotal: 0, waitMsMax: 0, bins: [], waiting: 0 }
+}
+
+// The driver's wait queue is FIFO per server, so each finished checkout matches the oldest start
+function instrument(client, name, stats) {
+  const started = new Map()
+  const finish = (event, failure) => {
+    const queue = started.get(event.address)
+    const start = queue?.shift()
+    if (start === undefined) return
+    stats.waiting--
+    const waitMs = performance.now() - start
+    if (failure) {
+      stats.failed++
+      stats.failedByReason[failure] = (stats.failedByReason[failure] || 0) + 1
+    } else {
+      stats.checkouts++
+    }
+    stats.waitMsTotal += waitMs
+    stats.waitMsMax = Math.max(stats.waitMsMax, waitMs)
+    const bin = WAIT_BOUNDS_MS.findIndex(bound => waitMs <= bound)
+    const index = bin === -1 ? WAIT_BOUNDS_MS.length : bin
+    stats.bins[index] = (stats.bins[index] || 0) + 1
+    if (waitMs > SLOW_CHECKOUT_MS) {
+      console.warn(`Mongo ${name} pool: connection checkout ${failure ? `failed (${failure})` : 'took'} ` +
+        `${waitMs.toFixed(0)} ms on ${event.address}`)
+    }
+  }
+  client.on('connectionCheckOutStarted', event => {
+    if (!started.has(event.address)) started.set(event.address, [])
+    started.get(event.address).push(performance.now())
+    stats.waiting++
+  })
+  client.on('connectionCheckedOut', event => finish(event, null))
+  client.on('connectionCheckOutFailed', event => finish(event, event.reason || 'unknown'))
+}
+
+async function connectPool(name) {
+  const pool = pools.get(name)
+  if (pool?.db) return pool.db
+  if (pool?.connecting) return pool.connecting
+
+  const { url, options } = POOLS[name]()
+  const stats = pool?.stats || emptyStats()
+  const client = new MongoClient(url, options)
+  instrument(client, name, stats)
+  const connecting = client.connect().then(() => {
+    const db = client.db(process.env.DB_NAME)
+    pools.set(name, { client, db, stats })
+    console.log(`Connected to MongoDB (${name} pool, maxPoolSize ${options.maxPoolSize})`)
     return db
-  } catch (error) {
-    console.error('MongoDB connection error:', error)
+  }).catch(error => {
+    pools.delete(name)
+    console.error(`MongoDB connection error (${name} pool):`, error)
     throw error
+  })
+  pools.set(name, { client, connecting, stats })
+  return connecting
+}
+
+export async function connectToMongo() {
+  const ready = pools.get('transactional')?.db
+  if (ready) return ready
+
+  const db = await connectPool('transactional')
+  // In the background: requests don't wait on index builds
+  if (!indexing) {
+    indexing = true
+    startIndexBootstrap(db)
   }
+  return db
+}
+
+// Reporting reads: secondaries with bounded staleness, separate pool. Never use it for writes.
+export function connectToAnalyticsDb() {
+  return connectPool('analytics')
 }
 
 export async function getCollection(collectionName) {
   const database = await connectToMongo()
   return database.collection(collectionName)
 }
+
+function percentileMs(bins, total, q) {
+  if (total === 0) return null
+  let seen = 0
+  for (let i = 0; i < bins.length; i++) {
+    seen += bins[i] || 0
+    if (seen >= Math.ceil(q * total)) return i < WAIT_BOUNDS_MS.length ? WAIT_BOUNDS_MS[i] : null
+  }
+  return null
+}
+
+// Checkout wait per pool: counts, failures by reason, mean/max and bin-resolution p50/p95/p99
+export function getPoolStats() {
+  const result = {}
+  for (const [name, { stats, client }] of pools) {
+    const total = stats.checkouts + stats.failed
+    result[name] = {
+      maxPoolSize: client?.options?.maxPoolSize ?? null,
+      readPreference: client?.readPreference?.mode ?? null,
+      checkouts: stats.checkouts,
+      failed: stats.failed,
+      failedByReason: stats.failedByReason,
+      waiting: stats.waiting,
+      waitMs: {
+        mean: total ? Number((stats.waitMsTotal / total).toFixed(3)) : null,
+        p50: percentileMs(stats.bins, total, 0.5),
+        p95: percentileMs(stats.bins, total, 0.95),
+        p99: percentileMs(stats.bins, total, 0.99),
+        max: Number(stats.waitMsMax.toFixed(3)),
+        bounds: WAIT_BOUNDS_MS,
+        bins: WAIT_BOUNDS_MS.concat([null]).map((_, i) => stats.bins[i] || 0)
+      }
+    }
+  }
+  return result
+}
@@ -0,0 +1,324 @@
+// Background workspace deletion jobs
+//
+// Removing a tenant is recorded as a job in `deletion_jobs` and executed in
+// bounded batches (find a page of _ids, deleteMany by _id) with a pause
+// between batches, so a workspace with millions of documents never holds
+// Mongo busy in one long operation. Progress is persisted after every batch
+// and jobs are leased, so a crashed worker's job is picked up again by any
+// process once its lease expires.
+//
+// A step that throws (voice engine down, Mongo error) leaves the job pending
+// with the error recorded and its lease pushed out by an exponential backoff,
+// so a later resume tick retries it from that step. Admins can retry it
+// straight away with retryDeletionJob().
+//
+// Call recordings are files in the voice engine's store, not documents. The
+// 'recordings' step asks the voice engine to delete them in one request. The
+// 'audit_archive' step removes the workspace's audit events that are still
+// journaled by this process or already archived to gzip files (lib/audit.js).
+// Events still journaled by other processes are only stored when those
+// processes replay them, which can be after the job completed.
+// When the job completes, the global stats are reconciled so its recent
+// lists no longer show the removed users and calls.
+import { v4 as uuidv4 } from 'uuid'
+import { trackDeleted, dropWorkspaceStats, reconcileStats, GLOBAL_SCOPE } from '@/lib/stats'
+import { dropWorkspaceAnalytics } from '@/lib/analytics'
+import { invalidateIntegrationSecrets } from '@/lib/integrations'
+import { purgeWorkspaceRecordings } from '@/lib/voiceEngine'
+import { purgeWorkspaceAudit } from '@/lib/audit'
+
+const JOBS_COLLECTION = 'deletion_jobs'
+const BATCH_SIZE = parseInt(process.env.DELETION_BATCH_SIZE) || 1000
+const MIN_BATCH_DELAY_MS = parseInt(process.env.DELETION_BATCH_DELAY_MS) || 50
+const LEASE_MS = 60 * 1000
+const RESUME_INTERVAL_MS = 30 * 1000
+const RETRY_BASE_MS = parseInt(process.env.DELETION_RETRY_BASE_MS) || 60 * 1000
+const RETRY_MAX_MS = parseInt(process.env.DELETION_RETRY_MAX_MS) || 60 * 60 * 1000
+
+export const DELETION_STATUS = {
+  PENDING: 'pending',
+  RUNNING: 'running',
+  COMPLETED: 'completed'
+}
+
+const workerId = uuidv4()
+let resumeTimer = null
+const activeJobs = new Set()
+
+// Users go first so the account stops authenticating immediately; the
+// workspace document goes last so an unfinished job stays discoverable.
+// `field` is matched against the job's workspaceId (or userIds for 'userId').
+const DELETION_STEPS = [
+  { collection: 'users', field: 'workspaceId' },
+  { collection: 'password_resets', field: 'userId' },
+  { collection: 'integrations', field: 'workspaceId' },
+  { collection: 'agents', field: 'workspaceId' },
+  { collection: 'phone_numbers', field: 'workspaceId' },
+  { collection: 'campaigns', field: 'workspaceId' },
+  { collection: 'campaign_calls', field: 'workspaceId' },
+  { collection: 'contacts', field: 'workspaceId' },
+  { collection: 'call_logs', field: 'workspaceId' },
+  { collection: 'recordings', field: 'workspaceId', external: true },
+  { collection: 'error_logs', field: 'workspaceId' },
+  { collection: 'error_groups', field: 'workspaceId' },
+  { collection: 'audit_logs', field: 'workspaceId' },
+  { collection: 'audit_archive', field: 'workspaceId', external: true },
+  { collection: 'workspaces', field: 'id' }
+]
+
+// Steps whose data lives outside Mongo: (db, workspaceId) -> number of items deleted
+const EXTERNAL_STEPS = {
+  recordings: async (db, workspaceId) => (await purgeWorkspaceRecordings(workspaceId)).deletedCalls,
+  audit_archive: purgeWorkspaceAudit
+}
+
+function stepFilter(job, step) {
+  if (step.field === 'userId') return { userId: { $in: job.userIds } }
+  return { [step.field]: job.workspaceId }
+}
+
+export async function enqueueWorkspaceDeletion(db, { workspaceId, requestedBy }) {
+  const existing = await db.collection(JOBS_COLLECTION).findOne(
+    { workspaceId, status: { $in: [DELETION_STATUS.PENDING, DELETION_STATUS.RUNNING] } },
+    { projection: { _id: 0 } }
+  )
+  if (existing) return existing
+
+  const users = await db.collection('users')
+    .find({ workspaceId }, { projection: { _id: 0, id: 1 } })
+    .toArray()
+
+  const job = {
+    id: uuidv4(),
+    workspaceId,
+    requestedBy: requestedBy || null,
+    userIds: users.map(u => u.id),
+    status: DELETION_STATUS.PENDING,
+    steps: DELETION_STEPS.map(step => ({ ...step, total: null, deleted: 0, done: false })),
+    leaseOwner: null,
+    leaseUntil: new Date(0),
+    attempts: 0,
+    error: null,
+    retryAt: null,
+    createdAt: new Date(),
+    updatedAt: new Date(),
+    startedAt: null,
+    completedAt: null
+  }
+
+  await db.collection(JOBS_COLLECTION).insertOne(job)
+  await db.collection('workspaces').updateOne(
+    { id: workspaceId },
+    { $set: { deleting: true, deletionJobId: job.id, updatedAt: new Date() } }
+  )
+
+  runInBackground(db, job.id)
+  const { _id, ...clean } = job
+  return clean
+}
+
+function runInBackground(db, jobId) {
+  if (activeJobs.has(jobId)) return
+  activeJobs.add(jobId)
+  runDeletionJob(db, jobId)
+    .catch(error => scheduleRetry(db, jobId, error))
+    .catch(error => console.error(`Deletion job ${jobId} status update failed:`, error))
+    .finally(() => activeJobs.delete(jobId))
+}
+
+// Back to pending, leased to nobody until the backoff ends
+async function scheduleRetry(db, jobId, error) {
+  const jobs = db.collection(JOBS_COLLECTION)
+  const owned = { id: jobId, leaseOwner: workerId }
+  const job = await jobs.findOne(owned, { projection: { attempts: 1 } })
+  if (!job) return
+
+  const attempts = (job.attempts || 0) + 1
+  const retryAt = new Date(Date.now() + Math.min(RETRY_MAX_MS, RETRY_BASE_MS * 2 ** (attempts - 1)))
+  console.error(`Deletion job ${jobId} failed (attempt ${attempts}), retrying at ${retryAt.toISOString()}:`, error)
+  await jobs.updateOne(owned, {
+    $set: {
+      status: DELETION_STATUS.PENDING,
+      attempts,
+      error: String(error?.message || error),
+      retryAt,
+      leaseOwner: null,
+      leaseUntil: retryAt,
+      updatedAt: new Date()
+    }
+  })
+}
+
+// Runs a pending job now instead of after its backoff. Null when the job is
+// not pending (running elsewhere, or completed).
+export async function retryDeletionJob(db, jobId) {
+  const job = await db.collection(JOBS_COLLECTION).findOneAndUpdate(
+    { id: jobId, status: DELETION_STATUS.PENDING, leaseOwner: null },
+    { $set: { leaseUntil: new Date(0), retryAt: null, updatedAt: new Date() } },
+    { returnDocument: 'after', projection: { _id: 0 } }
+  )
+  if (!job) return null
+  runInBackground(db, jobId)
+  return withProgress(job)
+}
+
+async function acquireLease(db, jobId) {
+  const now = new Date()
+  return db.collection(JOBS_COLLECTION).findOneAndUpdate(
+    {
+      id: jobId,
+      status: { $in: [DELETION_STATUS.PENDING, DELETION_STATUS.RUNNING] },
+      $or: [{ leaseOwner: workerId }, { leaseUntil: { $lt: now } }]
+    },
+    {
+      $set: {
+        status: DELETION_STATUS.RUNNING,
+        leaseOwner: workerId,
+        leaseUntil: new Date(now.getTime() + LEASE_MS),
+        updatedAt: now
+      }
+    },
+    { returnDocument: 'after' }
+  )
+}
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms))
+
+export async function runDeletionJob(db, jobId) {
+  const job = await acquireLease(db, jobId)
+  if (!job) return null
+
+  const jobs = db.collection(JOBS_COLLECTION)
+  const owned = { id: jobId, leaseOwner: workerId }
+  if (!job.startedAt) {
+    await jobs.updateOne(owned, { $set: { startedAt: new Date() } })
+  }
+
+  for (let i = 0; i < job.steps.length; i++) {
+    const step = job.steps[i]
+    if (step.done) continue
+
+    if (step.external) {
+      const deleted = await EXTERNAL_STEPS[step.collection](db, job.workspaceId)
+      const renewed = await jobs.updateOne(owned, {
+        $set: {
+          [`steps.${i}.total`]: deleted,
+          [`steps.${i}.deleted`]: deleted,
+          [`steps.${i}.done`]: true,
+          leaseUntil: new Date(Date.now() + LEASE_MS),
+          updatedAt: new Date()
+        }
+      })
+      if (renewed.matchedCount === 0) return null
+      continue
+    }
+
+    const collection = db.collection(step.collection)
+    const filter = stepFilter(job, step)
+    if (step.total === null) {
+      const total = await collection.countDocuments(filter)
+      await jobs.updateOne(owned, { $set: { [`steps.${i}.total`]: total } })
+    }
+
+    for (;;) {
+      const started = Date.now()
+      const page = await collection
+        .find(filter, { projection: { _id: 1, id: 1 } })
+        .limit(BATCH_SIZE)
+        .toArray()
+      if (page.length === 0) break
+
+      const { deletedCount } = await collection.deleteMany({ _id: { $in: page.map(d => d._id) } })
+      // The ids pull the removed documents out of the global recent lists
+      await trackDeleted(db, step.collection, null, { count: deletedCount, ids: page.map(d => d.id).filter(Boolean) })
+
+      const renewed = await jobs.updateOne(owned, {
+        $inc: { [`steps.${i}.deleted`]: deletedCount },
+        $set: { leaseUntil: new Date(Date.now() + LEASE_MS), updatedAt: new Date() }
+      })
+      // Lease lost (e.g. this worker stalled past expiry) - let the new owner continue
+      if (renewed.matchedCount === 0) return null
+
+      // Throttle: pause at least as long as the batch took, keeping
+      // this job's share of Mongo time at or below half.
+      await sleep(Math.max(MIN_BATCH_DELAY_MS, Date.now() - started))
+    }
+
+    await jobs.updateOne(owned, { $set: { [`steps.${i}.done`]: true, updatedAt: new Date() } })
+  }
+
+  await dropWorkspaceStats(db, job.workspaceId)
+  await dropWorkspaceAnalytics(db, job.workspaceId)
+  invalidateIntegrationSecrets(job.workspaceId)
+  // Refill the recent lists the pulls above shortened
+  await reconcileStats(db, GLOBAL_SCOPE)
+
+  return jobs.findOneAndUpdate(
+    owned,
+    {
+      $set: {
+        status: DELETION_STATUS.COMPLETED,
+        completedAt: new Date(),
+        updatedAt: new Date(),
+        leaseOwner: null,
+        error: null,
+        retryAt: null
+      }
+    },
+    { returnDocument: 'after', projection: { _id: 0 } }
+  )
+}
+
+// Pick up jobs whose worker died (lease expired), whose retry backoff ended, or that never started
+export async function resumeDeletionJobs(db) {
+  const orphaned = await db.collection(JOBS_COLLECTION)
+    .find(
+      { status: { $in: [DELETION_STATUS.PENDING, DELETION_STATUS.RUNNING] }, leaseUntil: { $lt: new Date() } },
+      { projection: { _id: 0, id: 1 } }
+    )
+    .toArray()
+  orphaned.forEach(job => runInBackground(db, job.id))
+  return orphaned.length
+}
+
+// Idempotent; periodically resumes orphaned jobs in this process
+export function startDeletionWorker(db) {
+  if (resumeTimer) return
+  const tick = () => resumeDeletionJobs(db).catch(error => {
+    console.error('Deletion job resume failed:', error)
+  })
+  tick()
+  resumeTimer = setInterval(tick, RESUME_INTERVAL_MS)
+  resumeTimer.unref?.()
+}
+
+function withProgress(job) {
+  const total = job.steps.reduce((sum, s) => sum + (s.total || 0), 0)
+  const deleted = job.steps.reduce((sum, s) => sum + s.deleted, 0)
+  const counted = job.steps.every(s => s.total !== null)
+  return {
+    ...job,
+    progress: {
+      deleted,
+      total: counted ? total : null,
+      percent: job.status === DELETION_STATUS.COMPLETED
+        ? 100
+        : counted && total > 0 ? Math.min(99, Math.floor((deleted / total) * 100)) : 0,
+      currentStep: job.steps.find(s => !s.done)?.collection || null
+    }
+  }
+}
+
+export async function getDeletionJob(db, jobId) {
+  const job = await db.collection(JOBS_COLLECTION).findOne({ id: jobId }, { projection: { _id: 0 } })
+  return job ? withProgress(job) : null
+}
+
+export async function listDeletionJobs(db, limit = 50) {
+  const jobs = await db.collection(JOBS_COLLECTION)
+    .find({}, { projection: { _id: 0 } })
+    .sort({ createdAt: -1 })
+    .limit(limit)
+    .toArray()
+  return jobs.map(withProgress)
+}
@@ -6,15 +6,23 @@ const KEY_LENGTH = 32
 const IV_LENGTH = 16
 const AUTH_TAG_LENGTH = 16
 
+// Derived key, recomputed only if ENCRYPTION_KEY changes
+let cachedKey = null
+let cachedKeySource
+
 // Get or generate encryption key
 function getEncryptionKey() {
   const key = process.env.ENCRYPTION_KEY
+  if (cachedKey && cachedKeySource === key) return cachedKey
+  
   if (!key) {
     console.warn('Warning: ENCRYPTION_KEY not set. Using default for development only.')
   }
   const effectiveKey = key || 'dev-only-encryption-key-32bytes!'
   // Ensure key is exactly 32 bytes
-  return Buffer.from(effectiveKey.padEnd(KEY_LENGTH, '0').slice(0, KEY_LENGTH))
+  cachedKey = Buffer.from(effectiveKey.padEnd(KEY_LENGTH, '0').slice(0, KEY_LENGTH))
+  cachedKeySource = key
+  return cachedKey
 }
 
 export function encrypt(text) {
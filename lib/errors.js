@@ -0,0 +1,221 @@
+// Error grouping
+//
+// Errors are fingerprinted by error name, normalized message, the top stack
+// frames and the route. The message and route have ids, numbers and quoted
+// values replaced, and the stack frames have line/column numbers removed.
+// Occurrences of the same fingerprint collapse into one `error_groups`
+// document per workspace, which holds a count, first/last seen and a ring of
+// the most recent raw samples.
+//
+// Occurrences are pre-aggregated in memory and flushed as one unordered bulk
+// write of upserts (size or time triggered). An outage that throws the same
+// error thousands of times costs one write per flush, and the admin view
+// reads one document per distinct error.
+import crypto from 'crypto'
+import { ensureIndexes } from '@/lib/indexes'
+
+const FLUSH_INTERVAL_MS = parseInt(process.env.ERRORS_FLUSH_INTERVAL_MS) || 5000
+// Distinct pending groups that trigger an early flush
+const FLUSH_GROUPS = parseInt(process.env.ERRORS_FLUSH_GROUPS) || 500
+const MAX_PENDING_GROUPS = parseInt(process.env.ERRORS_MAX_PENDING_GROUPS) || 5000
+const SAMPLE_LIMIT = parseInt(process.env.ERRORS_SAMPLE_LIMIT) || 20
+const STACK_FRAMES = 5
+const MAX_MESSAGE_LENGTH = 500
+const GROUPS_COLLECTION = 'error_groups'
+
+let pending = new Map()
+let errorsDb = null
+let flushTimer = null
+let flushing = null
+let exitHookInstalled = false
+let droppedOccurrences = 0
+
+export function normalizeMessage(message) {
+  return String(message || '')
+    .slice(0, MAX_MESSAGE_LENGTH)
+    .replace(/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}/gi, '<uuid>')
+    .replace(/[\w.+-]+@[\w-]+\.[\w.-]+/g, '<email>')
+    .replace(/https?:\/\/[^\s'"]+/g, '<url>')
+    .replace(/(["'`])(?:(?!\1).)*\1/g, '<str>')
+    .replace(/\b(?:0x)?[0-9a-f]{12,}\b/gi, '<hex>')
+    .replace(/\d+(\.\d+)?/g, '<n>')
+    .replace(/\s+/g, ' ')
+    .trim()
+}
+
+// Top frames without line/column numbers, so rebuilds and edits elsewhere in
+// the file keep the fingerprint stable
+export function normalizeStack(stack) {
+  if (!stack) return []
+  return String(stack)
+    .split('\n')
+    .map(line => line.trim())
+    .filter(line => line.startsWith('at '))
+    .slice(0, STACK_FRAMES)
+    .map(line => line
+      .replace(/\(?(?:file:\/\/)?[^\s()]*[/\\]([^/\\\s()]+?):\d+:\d+\)?$/, '($1)')
+      .replace(/:\d+:\d+/g, ''))
+}
+
+// Path segments that look like ids become ':id'
+export function normalizeRoute(route) {
+  if (!route) return null
+  return String(route).split('?')[0].split('/').map(segment =>
+    /^[0-9a-f]{8}-[0-9a-f-]{27}$/i.test(segment) || /^(?:\d+|[0-9a-f]{16,}|[A-Z]{2}[0-9a-f]{32})$/i.test(segment)
+      ? ':id'
+      : segment
+  ).join('/')
+}
+
+export function fingerprintError({ name, message, stack, route, source }) {
+  const parts = [source || '', normalizeRoute(route) || '', name || 'Error', normalizeMessage(message), ...normalizeStack(stack)]
+  return crypto.createHash('sha1').update(parts.join('\n')).digest('hex').slice(0, 16)
+}
+
+// Queue one error occurrence; `error` may be an Error or a plain message
+export function recordError(db, error, { workspaceId = null, route, source = 'api', severity = 'error', callId } = {}) {
+  const name = error?.name || 'Error'
+  const message = error?.message ?? String(error)
+  const stack = error?.stack
+  const fingerprint = fingerprintError({ name, message, stack, route, source })
+  const key = `${workspaceId || ''}|${fingerprint}`
+  const now = new Date()
+
+  errorsDb = db
+  installExitHook()
+
+  let group = pending.get(key)
+  if (!group) {
+    if (pending.size >= MAX_PENDING_GROUPS) {
+      droppedOccurrences++
+      return fingerprint
+    }
+    group = {
+      fingerprint,
+      workspaceId,
+      source,
+      severity,
+      name,
+      route: normalizeRoute(route),
+      message: normalizeMessage(message),
+      stack: normalizeStack(stack),
+      count: 0,
+      firstSeen: now,
+      lastSeen: now,
+      samples: []
+    }
+    pending.set(key, group)
+  }
+  group.count++
+  group.lastSeen = now
+  group.samples.push({ message: String(message).slice(0, MAX_MESSAGE_LENGTH), route: route || null, callId: callId || null, at: now })
+  if (group.samples.length > SAMPLE_LIMIT) group.samples.shift()
+
+  if (pending.size >= FLUSH_GROUPS) {
+    flushErrors()
+  } else if (!flushTimer) {
+    flushTimer = setTimeout(flushErrors, FLUSH_INTERVAL_MS)
+    flushTimer.unref?.()
+  }
+  return fingerprint
+}
+
+export function flushErrors() {
+  if (flushTimer) {
+    clearTimeout(flushTimer)
+    flushTimer = null
+  }
+
+  const previous = flushing || Promise.resolve()
+  const current = previous.then(writePending).catch(error => {
+    console.error('Error group flush failed:', error)
+  })
+  flushing = current
+  current.finally(() => {
+    if (flushing === current) flushing = null
+  })
+  return current
+}
+
+async function writePending() {
+  if (!errorsDb || pending.size === 0) return
+  const groups = pending
+  pending = new Map()
+
+  ensureIndexes(errorsDb, [GROUPS_COLLECTION])
+  const ops = [...groups.values()].map(group => ({
+    updateOne: {
+      filter: { fingerprint: group.fingerprint, workspaceId: group.workspaceId },
+      update: {
+        $setOnInsert: {
+          id: crypto.randomUUID(),
+          source: group.source,
+          name: group.name,
+          route: group.route,
+          message: group.message,
+          stack: group.stack,
+          firstSeen: group.firstSeen
+        },
+        $set: { severity: group.severity, resolvedAt: null },
+        $inc: { count: group.count },
+        $max: { lastSeen: group.lastSeen },
+        $push: { samples: { $each: group.samples, $slice: -SAMPLE_LIMIT } }
+      },
+      upsert: true
+    }
+  }))
+
+  try {
+    await errorsDb.collection(GROUPS_COLLECTION).bulkWrite(ops, { ordered: false })
+  } catch (error) {
+    // Put the counts back for the next flush unless memory is already full
+    for (const [key, group] of groups) {
+      const newer = pending.get(key)
+      if (!newer) {
+        if (pending.size < MAX_PENDING_GROUPS) pending.set(key, group)
+        continue
+      }
+      newer.count += group.count
+      newer.firstSeen = group.firstSeen
+      newer.samples = group.samples.concat(newer.samples).slice(-SAMPLE_LIMIT)
+    }
+    throw error
+  }
+}
+
+function installExitHook() {
+  if (exitHookInstalled) return
+  exitHookInstalled = true
+  process.once('beforeExit', () => {
+    if (pending.size > 0) flushErrors()
+  })
+}
+
+// One row per distinct error, most recently seen first
+export async function getErrorGroups(db, { workspaceId, since, includeResolved = false, limit = 200 } = {}) {
+  const query = {}
+  if (workspaceId) query.workspaceId = workspaceId
+  if (since) query.lastSeen = { $gte: new Date(since) }
+  if (!includeResolved) query.resolvedAt = null
+
+  return db.collection(GROUPS_COLLECTION)
+    .find(query, { projection: { _id: 0 } })
+    .sort({ lastSeen: -1 })
+    .limit(Math.min(parseInt(limit) || 200, 1000))
+    .toArray()
+}
+
+// Hidden from the default listing until the error happens again
+export async function resolveErrorGroup(db, id) {
+  const result = await db.collection(GROUPS_COLLECTION).updateOne({ id }, { $set: { resolvedAt: new Date() } })
+  return result.matchedCount > 0
+}
+
+export async function deleteErrorGroup(db, id) {
+  const result = await db.collection(GROUPS_COLLECTION).deleteOne({ id })
+  return result.deletedCount > 0
+}
+
+export function getErrorBufferStats() {
+  return { pendingGroups: pending.size, droppedOccurrences }
+}
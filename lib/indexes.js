@@ -0,0 +1,288 @@
+// Index declarations, background builds and an index advisor
+//
+// Every collection the API queries declares its indexes here. Tenant queries
+// filter on workspaceId and usually sort by createdAt, so most compound
+// indexes are { workspaceId, <sort field> }. Lookups by `id` are covered by a
+// unique index on `id`, which also serves { id, workspaceId } filters.
+//
+// connectToMongo() starts startIndexBootstrap() once per process without
+// waiting on it. The builds run one index at a time, and createIndex is a no-op for an
+// index that already exists, so every worker can run it at startup. An index
+// that fails to build, for example a unique index over duplicate data, is
+// logged and retried the next time ensureIndexes() runs. The other indexes
+// are built regardless. Set MONGO_AUTO_INDEXES=false to manage indexes by
+// hand.
+//
+// getIndexReport() compares the declarations with what exists. It lists
+// missing indexes and existing indexes with no recorded use ($indexStats),
+// and groups profiled queries that scanned a whole collection or sorted in
+// memory by shape. Shapes only show up once the profiler records queries.
+// On a local Mongo, turn it on from mongosh with
+// db.setProfilingLevel(1, { slowms: 20 }).
+
+const AUTO_INDEXES = process.env.MONGO_AUTO_INDEXES !== 'false'
+const PROFILE_SAMPLE = parseInt(process.env.INDEX_ADVISOR_PROFILE_SAMPLE) || 5000
+const RANGE_OPERATORS = new Set(['$gt', '$gte', '$lt', '$lte', '$ne', '$nin', '$exists', '$regex', '$not'])
+
+// Equality fields first, then the sort field, then range fields. Indexes the
+// voice engine builds itself are declared here too, under the same names and
+// options; tests/test_indexes.py checks the two agree.
+export const INDEXES = {
+  workspaces: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { createdAt: -1 }, name: 'createdAt_desc' }
+  ],
+  users: [
+    { key: { email: 1 }, name: 'email_unique', unique: true },
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { workspaceId: 1, role: 1 }, name: 'workspaceId_role' },
+    { key: { createdAt: -1 }, name: 'createdAt_desc' }
+  ],
+  password_resets: [
+    { key: { token: 1 }, name: 'token' },
+    { key: { userId: 1 }, name: 'userId' }
+  ],
+  admin_invites: [
+    { key: { createdAt: -1 }, name: 'createdAt_desc' }
+  ],
+  integrations: [
+    { key: { workspaceId: 1 }, name: 'workspaceId' }
+  ],
+  agents: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { workspaceId: 1, createdAt: -1 }, name: 'workspaceId_createdAt' }
+  ],
+  phone_numbers: [
+    { key: { workspaceId: 1, purchasedAt: -1 }, name: 'workspaceId_purchasedAt' }
+  ],
+  contacts: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { workspaceId: 1, createdAt: -1 }, name: 'workspaceId_createdAt' },
+    // The campaign dialer pages through a workspace's contacts in _id order
+    { key: { workspaceId: 1, _id: 1 }, name: 'workspaceId_id' }
+  ],
+  campaigns: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { workspaceId: 1, createdAt: -1 }, name: 'workspaceId_createdAt' },
+    { key: { status: 1 }, name: 'status' }
+  ],
+  campaign_calls: [
+    // These two are also built by the dialer (backend/dialer.py CAMPAIGN_CALLS_INDEXES).
+    // The unique one is what stops a campaign dialing a contact twice.
+    { key: { campaignId: 1, contactId: 1 }, name: 'campaignId_1_contactId_1', unique: true },
+    { key: { callSid: 1 }, name: 'callSid_1', sparse: true },
+    { key: { campaignId: 1, status: 1, updatedAt: -1 }, name: 'campaignId_status_updatedAt' },
+    { key: { campaignId: 1, updatedAt: -1 }, name: 'campaignId_updatedAt' },
+    { key: { workspaceId: 1 }, name: 'workspaceId' }
+  ],
+  call_logs: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { workspaceId: 1, createdAt: -1 }, name: 'workspaceId_createdAt' },
+    // Admin listing and the analytics backfill (backend/analytics.py)
+    { key: { createdAt: -1 }, name: 'createdAt_desc' }
+  ],
+  error_logs: [
+    { key: { workspaceId: 1, createdAt: -1 }, name: 'workspaceId_createdAt' },
+    { key: { createdAt: -1 }, name: 'createdAt_desc' }
+  ],
+  // Each filter combination sorted newest-first, with or without a date range
+  audit_logs: [
+    { key: { createdAt: -1 }, name: 'createdAt_desc' },
+    { key: { userId: 1, createdAt: -1 }, name: 'userId_createdAt' },
+    { key: { workspaceId: 1, createdAt: -1 }, name: 'workspaceId_createdAt' },
+    { key: { action: 1, createdAt: -1 }, name: 'action_createdAt' },
+    { key: { workspaceId: 1, action: 1, createdAt: -1 }, name: 'workspaceId_action_createdAt' },
+    { key: { userId: 1, action: 1, createdAt: -1 }, name: 'userId_action_createdAt' }
+  ],
+  error_groups: [
+    { key: { fingerprint: 1, workspaceId: 1 }, name: 'fingerprint_workspaceId', unique: true },
+    { key: { lastSeen: -1 }, name: 'lastSeen_desc' },
+    { key: { workspaceId: 1, lastSeen: -1 }, name: 'workspaceId_lastSeen' }
+  ],
+  // workspace_stats needs none: its documents are read and written by _id (the scope).
+  // Series documents are keyed by scope|date too; this serves the date-range reads.
+  stats_series: [
+    { key: { scope: 1, date: 1 }, name: 'scope_date' }
+  ],
+  deletion_jobs: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { status: 1, leaseUntil: 1 }, name: 'status_leaseUntil' }
+  ],
+  // Also built by the voice engine (backend/analytics.py CALL_ANALYTICS_INDEXES)
+  call_analytics: [
+    { key: { workspaceId: 1, agentId: 1, date: 1 }, name: 'workspaceId_1_agentId_1_date_1', unique: true },
+    { key: { workspaceId: 1, date: 1 }, name: 'workspaceId_1_date_1' }
+  ]
+}
+
+// collection -> promise of its build, dropped again when a build fails
+const builds = new Map()
+
+function sameKey(a, b) {
+  return JSON.stringify(a) === JSON.stringify(b)
+}
+
+async function buildCollection(db, name) {
+  const collection = db.collection(name)
+  const failed = []
+  for (const { key, ...options } of INDEXES[name]) {
+    try {
+      await collection.createIndex(key, options)
+    } catch (error) {
+      failed.push(options.name)
+      console.error(`Index build failed for ${name}.${options.name}:`, error.message)
+    }
+  }
+  if (failed.length > 0) builds.delete(name)
+  return { collection: name, built: INDEXES[name].length - failed.length, failed }
+}
+
+// Idempotent; resolves (never rejects) once each collection's indexes were attempted.
+// `rebuild` re-checks collections that already built, e.g. after an index was dropped by hand.
+export function ensureIndexes(db, collections = Object.keys(INDEXES), { rebuild = false } = {}) {
+  return Promise.all(collections.map(name => {
+    if (rebuild || !builds.has(name)) builds.set(name, buildCollection(db, name))
+    return builds.get(name)
+  }))
+}
+
+// Called by connectToMongo(); collections are built one after another so startup stays light
+export function startIndexBootstrap(db) {
+  if (!AUTO_INDEXES) return null
+  const started = Date.now()
+  return Object.keys(INDEXES)
+    .reduce((previous, name) => previous.then(results => ensureIndexes(db, [name]).then(r => results.concat(r))),
+      Promise.resolve([]))
+    .then(results => {
+      const failed = results.flatMap(r => r.failed.map(index => `${r.collection}.${index}`))
+      if (failed.length > 0) {
+        console.error(`Index bootstrap finished with failures: ${failed.join(', ')}`)
+      } else {
+        console.log(`Indexes ready (${results.length} collections, ${Date.now() - started} ms)`)
+      }
+      return results
+    })
+}
+
+// Filter field names, split into equality and range by the operators applied
+function filterShape(filter, shape = { equality: new Set(), range: new Set() }) {
+  for (const [field, value] of Object.entries(filter || {})) {
+    if (field === '$and' || field === '$or' || field === '$nor') {
+      (Array.isArray(value) ? value : []).forEach(clause => filterShape(clause, shape))
+      continue
+    }
+    if (field.startsWith('$')) continue
+    const operators = value && typeof value === 'object' && !Array.isArray(value) && !(value instanceof Date)
+      ? Object.keys(value).filter(k => k.startsWith('$'))
+      : []
+    if (operators.some(op => RANGE_OPERATORS.has(op))) shape.range.add(field)
+    else shape.equality.add(field)
+  }
+  return shape
+}
+
+// Filter and sort of a profiled operation, whatever command issued it
+function profiledQuery(entry) {
+  const command = entry.command || {}
+  if (command.find) return { filter: command.filter, sort: command.sort }
+  if (command.findAndModify) return { filter: command.query, sort: command.sort }
+  if (command.count) return { filter: command.query }
+  if (command.distinct) return { filter: command.query }
+  if (command.aggregate) {
+    const match = (command.pipeline || []).find(stage => stage.$match)
+    const sort = (command.pipeline || []).find(stage => stage.$sort)
+    return { filter: match?.$match, sort: sort?.$sort }
+  }
+  if (command.q) return { filter: command.q }
+  return { filter: entry.query || command.filter }
+}
+
+function suggestKey(shape, sort) {
+  const key = {}
+  for (const field of [...shape.equality].sort()) key[field] = 1
+  for (const [field, direction] of Object.entries(sort || {})) if (!(field in key)) key[field] = direction
+  for (const field of [...shape.range].sort()) if (!(field in key)) key[field] = 1
+  return key
+}
+
+async function profiledShapes(db) {
+  const profiler = await db.command({ profile: -1 }).catch(() => null)
+  const entries = await db.collection('system.profile')
+    .find({ $or: [{ planSummary: /^COLLSCAN/ }, { hasSortStage: true }] })
+    .sort({ ts: -1 })
+    .limit(PROFILE_SAMPLE)
+    .toArray()
+    .catch(() => [])
+
+  const shapes = new Map()
+  for (const entry of entries) {
+    const collection = entry.ns?.slice(entry.ns.indexOf('.') + 1)
+    if (!collection || collection.startsWith('system.')) continue
+    const { filter, sort } = profiledQuery(entry)
+    const shape = filterShape(filter)
+    const signature = JSON.stringify([collection, entry.op, [...shape.equality].sort(), [...shape.range].sort(), sort || {}])
+    let row = shapes.get(signature)
+    if (!row) {
+      row = {
+        collection,
+        op: entry.op,
+        equality: [...shape.equality].sort(),
+        range: [...shape.range].sort(),
+        sort: sort || null,
+        plan: entry.planSummary,
+        inMemorySort: Boolean(entry.hasSortStage),
+        count: 0,
+        totalMs: 0,
+        maxMs: 0,
+        docsExamined: 0,
+        suggestedKey: suggestKey(shape, sort)
+      }
+      shapes.set(signature, row)
+    }
+    row.count++
+    row.totalMs += entry.millis || 0
+    row.maxMs = Math.max(row.maxMs, entry.millis || 0)
+    row.docsExamined += entry.docsExamined || 0
+  }
+  return {
+    profiler: profiler ? { level: profiler.was, slowms: profiler.slowms } : null,
+    sampled: entries.length,
+    queries: [...shapes.values()].sort((a, b) => b.totalMs - a.totalMs)
+  }
+}
+
+async function collectionReport(db, name) {
+  const collection = db.collection(name)
+  const [existing, usage] = await Promise.all([
+    collection.indexes().catch(() => []),
+    collection.aggregate([{ $indexStats: {} }]).toArray().catch(() => [])
+  ])
+  const declared = INDEXES[name] || []
+  const ops = new Map(usage.map(u => [u.name, { ops: Number(u.accesses?.ops || 0), since: u.accesses?.since }]))
+
+  return {
+    collection: name,
+    missing: declared.filter(spec => !existing.some(index => sameKey(index.key, spec.key)))
+      .map(spec => ({ name: spec.name, key: spec.key })),
+    // Unique indexes are kept for the constraint even when no query uses them
+    unused: existing.filter(index => index.name !== '_id_' && !index.unique && ops.get(index.name)?.ops === 0)
+      .map(index => ({ name: index.name, key: index.key, since: ops.get(index.name).since })),
+    undeclared: existing.filter(index => index.name !== '_id_' && !declared.some(spec => sameKey(index.key, spec.key)))
+      .map(index => ({ name: index.name, key: index.key, ops: ops.get(index.name)?.ops ?? null })),
+    indexes: existing.map(index => ({ name: index.name, key: index.key, ...(ops.get(index.name) || {}) }))
+  }
+}
+
+// Missing, unused and undeclared indexes per collection, plus profiled scans grouped by query shape
+export async function getIndexReport(db) {
+  const [collections, profiled] = await Promise.all([
+    Promise.all(Object.keys(INDEXES).map(name => collectionReport(db, name))),
+    profiledShapes(db)
+  ])
+  return {
+    collections,
+    profiler: profiled.profiler,
+    profiledSamples: profiled.sampled,
+    unindexedQueries: profiled.queries
+  }
+}
@@ -0,0 +1,156 @@
+// Integration secrets and provider catalog cache
+//
+// Decrypted integration credentials are held in memory for a short TTL and
+// dropped explicitly whenever a workspace's integrations change. Provider
+// voice catalogs are cached per API-key fingerprint and served
+// stale-while-revalidate, so /voices never blocks on ElevenLabs once warm.
+// Both caches are LRU maps capped at SECRETS_CACHE_MAX / VOICES_CACHE_MAX
+// entries.
+//
+// A secret that fails to decrypt (corrupt ciphertext, rotated
+// ENCRYPTION_KEY) is logged and comes back as null with decryptFailed set
+// on its provider. The other providers keep working.
+import crypto from 'crypto'
+import { decrypt } from '@/lib/encryption'
+
+const SECRETS_TTL_MS = parseInt(process.env.SECRETS_CACHE_TTL_MS) || 60 * 1000
+const VOICES_FRESH_MS = parseInt(process.env.VOICES_CACHE_TTL_MS) || 5 * 60 * 1000
+const VOICES_STALE_MS = parseInt(process.env.VOICES_CACHE_STALE_MS) || 60 * 60 * 1000
+const SECRETS_CACHE_MAX = parseInt(process.env.SECRETS_CACHE_MAX) || 1000
+const VOICES_CACHE_MAX = parseInt(process.env.VOICES_CACHE_MAX) || 500
+const ELEVENLABS_API_URL = process.env.ELEVENLABS_API_URL || 'https://api.elevenlabs.io'
+
+export const INTEGRATION_PROVIDERS = ['twilio', 'ghl', 'calcom', 'deepgram', 'elevenlabs']
+const SECRET_FIELDS = ['apiKey', 'accountSid', 'authToken']
+
+// workspaceId -> { expiresAt, integrations }
+const secretsCache = new Map()
+// key fingerprint -> { voices, fetchedAt, refreshing }
+const voicesCache = new Map()
+
+// Insertion order is recency order: re-inserting a key moves it to the end
+function setBounded(cache, key, value, max) {
+  cache.delete(key)
+  cache.set(key, value)
+  while (cache.size > max) cache.delete(cache.keys().next().value)
+}
+
+function decryptProvider(config, workspaceId, name) {
+  const provider = { configured: !!config?.configured }
+  for (const field of SECRET_FIELDS) {
+    provider[field] = null
+    if (!config?.[field]) continue
+    try {
+      provider[field] = decrypt(config[field])
+    } catch (error) {
+      provider.decryptFailed = true
+      console.error(`Integration secret ${name}.${field} of workspace ${workspaceId} could not be decrypted:`, error.message)
+    }
+  }
+  if (config?.locationId !== undefined) provider.locationId = config.locationId
+  return provider
+}
+
+// Decrypted integrations for a workspace: { exists, id, twilio: {...}, ... }
+export async function getIntegrationSecrets(db, workspaceId) {
+  const cached = secretsCache.get(workspaceId)
+  if (cached && cached.expiresAt > Date.now()) {
+    setBounded(secretsCache, workspaceId, cached, SECRETS_CACHE_MAX)
+    return cached.integrations
+  }
+
+  const doc = await db.collection('integrations').findOne({ workspaceId })
+  const integrations = { exists: !!doc, id: doc?.id || null }
+  for (const name of INTEGRATION_PROVIDERS) {
+    integrations[name] = decryptProvider(doc?.[name], workspaceId, name)
+  }
+
+  setBounded(secretsCache, workspaceId, { expiresAt: Date.now() + SECRETS_TTL_MS, integrations }, SECRETS_CACHE_MAX)
+  return integrations
+}
+
+export async function getIntegrationSecret(db, workspaceId, provider, field = 'apiKey') {
+  const integrations = await getIntegrationSecrets(db, workspaceId)
+  const config = integrations[provider]
+  if (!config?.configured) return null
+  return config[field] || null
+}
+
+export function invalidateIntegrationSecrets(workspaceId) {
+  secretsCache.delete(workspaceId)
+}
+
+export function keyFingerprint(apiKey) {
+  return crypto.createHash('sha256').update(apiKey).digest('hex').slice(0, 16)
+}
+
+async function fetchElevenLabsVoices(apiKey) {
+  const response = await fetch(`${ELEVENLABS_API_URL}/v1/voices`, {
+    headers: {
+      'xi-api-key': apiKey,
+      'accept': 'application/json'
+    },
+    cache: 'no-store'
+  })
+
+  if (!response.ok) {
+    const text = await response.text().catch(() => '')
+    const error = new Error(`ElevenLabs voices fetch failed: ${response.status}`)
+    error.status = response.status
+    error.body = text.slice(0, 300)
+    throw error
+  }
+
+  const data = await response.json()
+  return (data?.voices || []).map(v => ({
+    id: v.voice_id,
+    name: v.name,
+    description: v?.labels?.description || v?.labels?.accent || v?.description || '',
+    avatar: `https://api.dicebear.com/7.x/avataaars/svg?seed=${encodeURIComponent(v.voice_id)}`
+  }))
+}
+
+function revalidateVoices(fingerprint, apiKey) {
+  const entry = voicesCache.get(fingerprint)
+  if (entry?.refreshing) return entry.refreshing
+
+  const refreshing = fetchElevenLabsVoices(apiKey)
+    .then(voices => {
+      setBounded(voicesCache, fingerprint, { voices, fetchedAt: Date.now(), refreshing: null }, VOICES_CACHE_MAX)
+      return voices
+    })
+    .finally(() => {
+      const current = voicesCache.get(fingerprint)
+      if (current?.refreshing === refreshing) current.refreshing = null
+    })
+
+  if (entry) {
+    entry.refreshing = refreshing
+  } else {
+    setBounded(voicesCache, fingerprint, { voices: null, fetchedAt: 0, refreshing }, VOICES_CACHE_MAX)
+  }
+  return refreshing
+}
+
+// Returns { voices, cache: 'hit' | 'stale' | 'miss' }. Throws only when
+// nothing usable is cached and the provider request fails.
+export async function getElevenLabsVoices(apiKey) {
+  const fingerprint = keyFingerprint(apiKey)
+  const entry = voicesCache.get(fingerprint)
+  const age = entry?.voices ? Date.now() - entry.fetchedAt : Infinity
+
+  if (age < VOICES_FRESH_MS) {
+    setBounded(voicesCache, fingerprint, entry, VOICES_CACHE_MAX)
+    return { voices: entry.voices, cache: 'hit' }
+  }
+
+  if (age < VOICES_STALE_MS) {
+    revalidateVoices(fingerprint, apiKey).catch(error => {
+      console.error('ElevenLabs voices revalidation failed:', error.message)
+    })
+    return { voices: entry.voices, cache: 'stale' }
+  }
+
+  const voices = await revalidateVoices(fingerprint, apiKey)
+  return { voices, cache: 'miss' }
+}
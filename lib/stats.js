@@ -0,0 +1,395 @@
+// Materialized dashboard/admin stats
+//
+// Counters live in `workspace_stats` (one document per workspace plus a
+// `global` document) and are updated incrementally as data is created or
+// deleted. Daily buckets in `stats_series` back the dashboard charts.
+// Documents are keyed by `_id` (the scope, or scope|date for the series), so
+// concurrent upserts can't create a second document for a scope even before
+// any index exists. Every document is periodically reconciled against the
+// source collections so missed increments can never drift for long.
+//
+// A reconcile holds a lease on the stats document, so concurrent stale reads
+// (in any process) start one recount. Every increment also counts the write
+// in `reconcileWrites`. A recount resets those, counts the sources, waits
+// RECONCILE_SETTLE_MS for counter updates of writes it may have counted to
+// land, and reads them back. Counters that saw no writes in that window get
+// the count, applied as an $inc relative to the value read, so increments
+// landing afterwards are kept. Counters that did are recounted, up to
+// RECONCILE_ATTEMPTS times, and otherwise left to the next reconcile.
+//
+// Daily series only see documents created after they were introduced.
+// startSeriesBackfill() fills the days before today once per deployment,
+// from the source collections' createdAt.
+
+const STATS_COLLECTION = 'workspace_stats'
+const SERIES_COLLECTION = 'stats_series'
+const GLOBAL_SCOPE = 'global'
+const RECENT_LIMIT = 5
+const RECONCILE_INTERVAL_MS = parseInt(process.env.STATS_RECONCILE_INTERVAL_MS) || 10 * 60 * 1000
+const MAX_SERIES_DAYS = 365
+const RECONCILE_LEASE_MS = 60 * 1000
+const RECONCILE_SETTLE_MS = parseInt(process.env.STATS_RECONCILE_SETTLE_MS) || 250
+const RECONCILE_ATTEMPTS = 3
+const SERIES_BACKFILL_LEASE_MS = 60 * 60 * 1000
+const WRITES_FIELD = 'reconcileWrites'
+const INTERNAL_FIELDS = { _id: 0, [WRITES_FIELD]: 0, reconcileLeaseUntil: 0, seriesBackfill: 0 }
+
+// Source collection -> counter field on the stats document
+export const STAT_COUNTERS = {
+  users: 'totalUsers',
+  workspaces: 'totalWorkspaces',
+  agents: 'totalAgents',
+  call_logs: 'totalCalls',
+  phone_numbers: 'totalPhoneNumbers',
+  contacts: 'totalContacts',
+  error_logs: 'totalErrors'
+}
+
+// Source collection -> key used in time-bucketed series
+const SERIES_KEYS = {
+  users: 'users',
+  workspaces: 'workspaces',
+  agents: 'agents',
+  call_logs: 'calls',
+  phone_numbers: 'phoneNumbers',
+  contacts: 'contacts',
+  error_logs: 'errors'
+}
+
+// Collections scoped by workspaceId (users/workspaces only count globally)
+const WORKSPACE_COLLECTIONS = ['agents', 'call_logs', 'phone_numbers', 'contacts', 'error_logs']
+
+// Collections whose most recent documents are embedded in the stats document
+const RECENT_LISTS = {
+  call_logs: 'recentCalls',
+  users: 'recentUsers'
+}
+
+function dayKey(date) {
+  return new Date(date).toISOString().slice(0, 10)
+}
+
+function toRecentEntry(doc) {
+  const { _id, password, ...rest } = doc
+  return rest
+}
+
+function seriesId(scope, date) {
+  return `${scope}|${date}`
+}
+
+function scopesFor(collection, workspaceId) {
+  const scopes = [GLOBAL_SCOPE]
+  if (workspaceId && WORKSPACE_COLLECTIONS.includes(collection)) scopes.push(workspaceId)
+  return scopes
+}
+
+// Record newly inserted documents (single doc or array)
+export async function trackCreated(db, collection, docs) {
+  const counter = STAT_COUNTERS[collection]
+  if (!counter) return
+
+  const list = Array.isArray(docs) ? docs : [docs]
+  if (list.length === 0) return
+
+  // Group by scope so a bulk import becomes one update per document
+  const byScope = new Map()
+  for (const doc of list) {
+    for (const scope of scopesFor(collection, doc.workspaceId)) {
+      if (!byScope.has(scope)) byScope.set(scope, [])
+      byScope.get(scope).push(doc)
+    }
+  }
+
+  const recentField = RECENT_LISTS[collection]
+  const seriesKey = SERIES_KEYS[collection]
+  const statsOps = []
+  const seriesOps = []
+
+  for (const [scope, scopeDocs] of byScope) {
+    const update = {
+      $inc: { [counter]: scopeDocs.length, [`${WRITES_FIELD}.${counter}`]: scopeDocs.length },
+      $set: { updatedAt: new Date() },
+      $setOnInsert: { scope }
+    }
+    if (recentField) {
+      update.$push = {
+        [recentField]: {
+          $each: scopeDocs.slice(-RECENT_LIMIT).map(toRecentEntry),
+          $sort: { createdAt: -1 },
+          $slice: RECENT_LIMIT
+        }
+      }
+    }
+    statsOps.push({ updateOne: { filter: { _id: scope }, update, upsert: true } })
+
+    const perDay = {}
+    for (const doc of scopeDocs) {
+      const day = dayKey(doc.createdAt || new Date())
+      perDay[day] = (perDay[day] || 0) + 1
+    }
+    for (const [date, count] of Object.entries(perDay)) {
+      seriesOps.push({
+        updateOne: {
+          filter: { _id: seriesId(scope, date) },
+          update: { $inc: { [seriesKey]: count }, $setOnInsert: { scope, date } },
+          upsert: true
+        }
+      })
+    }
+  }
+
+  await Promise.all([
+    db.collection(STATS_COLLECTION).bulkWrite(statsOps, { ordered: false }),
+    db.collection(SERIES_COLLECTION).bulkWrite(seriesOps, { ordered: false })
+  ])
+}
+
+// Record deletions. `ids` lets embedded recent lists drop the removed documents.
+export async function trackDeleted(db, collection, workspaceId, { count = 1, ids = [] } = {}) {
+  const counter = STAT_COUNTERS[collection]
+  if (!counter || count <= 0) return
+
+  const recentField = RECENT_LISTS[collection]
+  const ops = scopesFor(collection, workspaceId).map(scope => {
+    const update = {
+      $inc: { [counter]: -count, [`${WRITES_FIELD}.${counter}`]: count },
+      $set: { updatedAt: new Date() }
+    }
+    if (recentField && ids.length > 0) {
+      update.$pull = { [recentField]: { id: { $in: ids } } }
+    }
+    return { updateOne: { filter: { _id: scope }, update } }
+  })
+
+  await db.collection(STATS_COLLECTION).bulkWrite(ops, { ordered: false })
+}
+
+// Drop a workspace's stats documents entirely (workspace removal)
+export async function dropWorkspaceStats(db, workspaceId) {
+  await Promise.all([
+    db.collection(STATS_COLLECTION).deleteOne({ _id: workspaceId }),
+    db.collection(SERIES_COLLECTION).deleteMany({ scope: workspaceId })
+  ])
+}
+
+// scope -> in-flight reconcile in this process
+const reconciling = new Map()
+
+async function acquireReconcileLease(stats, scope) {
+  const now = new Date()
+  try {
+    const leased = await stats.findOneAndUpdate(
+      { _id: scope, $or: [{ reconcileLeaseUntil: { $exists: false } }, { reconcileLeaseUntil: { $lt: now } }] },
+      { $set: { reconcileLeaseUntil: new Date(now.getTime() + RECONCILE_LEASE_MS) }, $setOnInsert: { scope } },
+      { upsert: true, returnDocument: 'after' }
+    )
+    return !!leased
+  } catch (error) {
+    // The upsert raced an existing (leased) document for the scope
+    if (error?.code === 11000) return false
+    throw error
+  }
+}
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms))
+
+// Recount every counter for a scope from the source collections. Returns
+// the current document without recounting when another reconcile holds the lease.
+export function reconcileStats(db, scope = GLOBAL_SCOPE) {
+  if (!reconciling.has(scope)) {
+    reconciling.set(scope, runReconcile(db, scope).finally(() => reconciling.delete(scope)))
+  }
+  return reconciling.get(scope)
+}
+
+async function runReconcile(db, scope) {
+  const stats = db.collection(STATS_COLLECTION)
+  if (!await acquireReconcileLease(stats, scope)) {
+    return stats.findOne({ _id: scope }, { projection: INTERNAL_FIELDS })
+  }
+
+  const isGlobal = scope === GLOBAL_SCOPE
+  const collections = isGlobal ? Object.keys(STAT_COUNTERS) : WORKSPACE_COLLECTIONS
+  const filter = isGlobal ? {} : { workspaceId: scope }
+
+  let pending = collections
+  for (let attempt = 0; attempt < RECONCILE_ATTEMPTS && pending.length > 0; attempt++) {
+    await stats.updateOne({ _id: scope }, { $set: { [WRITES_FIELD]: {} } })
+    const counts = await Promise.all(pending.map(name =>
+      isGlobal
+        ? db.collection(name).estimatedDocumentCount()
+        : db.collection(name).countDocuments(filter)
+    ))
+    await sleep(RECONCILE_SETTLE_MS)
+
+    const current = await stats.findOne({ _id: scope })
+    const $inc = {}
+    const busy = []
+    pending.forEach((name, i) => {
+      const counter = STAT_COUNTERS[name]
+      if (current?.[WRITES_FIELD]?.[counter]) busy.push(name)
+      else $inc[counter] = counts[i] - (current?.[counter] || 0)
+    })
+    if (Object.keys($inc).length > 0) await stats.updateOne({ _id: scope }, { $inc })
+    pending = busy
+  }
+  if (pending.length > 0) {
+    console.log(`Stats reconcile for ${scope} skipped busy counters: ${pending.map(name => STAT_COUNTERS[name]).join(', ')}`)
+  }
+
+  const recentSources = Object.keys(RECENT_LISTS).filter(name => collections.includes(name))
+  const recentDocs = await Promise.all(recentSources.map(name =>
+    db.collection(name)
+      .find(filter, { projection: { _id: 0, password: 0 } })
+      .sort({ createdAt: -1 })
+      .limit(RECENT_LIMIT)
+      .toArray()
+  ))
+  const $set = { updatedAt: new Date(), reconciledAt: new Date() }
+  recentSources.forEach((name, i) => {
+    $set[RECENT_LISTS[name]] = recentDocs[i]
+  })
+
+  return stats.findOneAndUpdate(
+    { _id: scope },
+    { $set, $unset: { reconcileLeaseUntil: '' } },
+    { returnDocument: 'after', projection: INTERNAL_FIELDS }
+  )
+}
+
+// Single-document read; reconciles in the background once the doc is stale
+export async function getStats(db, scope = GLOBAL_SCOPE) {
+  const stats = await db.collection(STATS_COLLECTION).findOne({ _id: scope }, { projection: INTERNAL_FIELDS })
+
+  if (!stats?.reconciledAt) {
+    return reconcileStats(db, scope)
+  }
+
+  if (Date.now() - new Date(stats.reconciledAt).getTime() > RECONCILE_INTERVAL_MS) {
+    reconcileStats(db, scope).catch(error => {
+      console.error(`Stats reconcile failed for ${scope}:`, error)
+    })
+  }
+
+  return stats
+}
+
+// Daily counts by createdAt for one source collection, days before `before`
+async function seriesCounts(db, name, before) {
+  return db.collection(name).aggregate([
+    { $match: { createdAt: { $lt: before } } },
+    {
+      $group: {
+        _id: {
+          date: { $dateToString: { format: '%Y-%m-%d', date: { $toDate: '$createdAt' } } },
+          workspaceId: '$workspaceId'
+        },
+        count: { $sum: 1 }
+      }
+    }
+  ], { allowDiskUse: true }).toArray()
+}
+
+async function backfillSeries(db) {
+  // Today keeps its live increments; earlier days are rebuilt from what exists
+  const today = new Date()
+  today.setUTCHours(0, 0, 0, 0)
+
+  for (const [name, key] of Object.entries(SERIES_KEYS)) {
+    const perScope = new Map()
+    const add = (scope, date, count) => {
+      const id = `${scope}|${date}`
+      perScope.set(id, { scope, date, count: (perScope.get(id)?.count || 0) + count })
+    }
+    for (const { _id, count } of await seriesCounts(db, name, today)) {
+      for (const scope of scopesFor(name, _id.workspaceId)) add(scope, _id.date, count)
+    }
+
+    const ops = [...perScope.values()].map(({ scope, date, count }) => ({
+      updateOne: {
+        filter: { _id: seriesId(scope, date) },
+        update: { $set: { [key]: count }, $setOnInsert: { scope, date } },
+        upsert: true
+      }
+    }))
+    for (let i = 0; i < ops.length; i += 1000) {
+      await db.collection(SERIES_COLLECTION).bulkWrite(ops.slice(i, i + 1000), { ordered: false })
+    }
+  }
+}
+
+let seriesBackfillStarted = false
+
+// Idempotent; the first process to claim the marker on the global stats
+// document rebuilds the series. A failed run releases the claim, and a
+// claim left unfinished past SERIES_BACKFILL_LEASE_MS (crashed worker) can
+// be taken over by the next process that starts.
+export function startSeriesBackfill(db) {
+  if (seriesBackfillStarted) return
+  seriesBackfillStarted = true
+
+  const stats = db.collection(STATS_COLLECTION)
+  const expired = new Date(Date.now() - SERIES_BACKFILL_LEASE_MS)
+  stats.updateOne(
+    {
+      _id: GLOBAL_SCOPE,
+      $or: [
+        { seriesBackfill: { $exists: false } },
+        { 'seriesBackfill.completedAt': null, 'seriesBackfill.startedAt': { $lt: expired } }
+      ]
+    },
+    { $set: { seriesBackfill: { startedAt: new Date(), completedAt: null } }, $setOnInsert: { scope: GLOBAL_SCOPE } },
+    { upsert: true }
+  )
+    .then(async claim => {
+      if (claim.modifiedCount === 0 && claim.upsertedCount === 0) return
+      await backfillSeries(db)
+      await stats.updateOne({ _id: GLOBAL_SCOPE }, { $set: { 'seriesBackfill.completedAt': new Date() } })
+      console.log('Stats series backfill completed')
+    })
+    .catch(async error => {
+      // 11000: the global document exists and someone else holds the claim
+      if (error?.code === 11000) return
+      console.error('Stats series backfill failed:', error)
+      await stats.updateOne({ _id: GLOBAL_SCOPE }, { $unset: { seriesBackfill: '' } }).catch(() => {})
+    })
+}
+
+export function getWorkspaceStats(db, workspaceId) {
+  return getStats(db, workspaceId)
+}
+
+export function getGlobalStats(db) {
+  return getStats(db, GLOBAL_SCOPE)
+}
+
+// Daily series for charts, zero-filled, oldest first
+export async function getStatsSeries(db, scope = GLOBAL_SCOPE, days = 30) {
+  const span = Math.min(Math.max(parseInt(days) || 30, 1), MAX_SERIES_DAYS)
+  const start = new Date()
+  start.setUTCHours(0, 0, 0, 0)
+  start.setUTCDate(start.getUTCDate() - (span - 1))
+
+  const buckets = await db.collection(SERIES_COLLECTION)
+    .find({ scope, date: { $gte: dayKey(start) } }, { projection: { _id: 0, scope: 0 } })
+    .toArray()
+  const byDate = new Map(buckets.map(b => [b.date, b]))
+
+  const keys = scope === GLOBAL_SCOPE
+    ? Object.values(SERIES_KEYS)
+    : WORKSPACE_COLLECTIONS.map(name => SERIES_KEYS[name])
+
+  const series = []
+  for (let i = 0; i < span; i++) {
+    const date = new Date(start.getTime() + i * 24 * 60 * 60 * 1000)
+    const key = dayKey(date)
+    const bucket = byDate.get(key) || {}
+    const point = { date: key }
+    keys.forEach(k => { point[k] = bucket[k] || 0 })
+    series.push(point)
+  }
+  return series
+}
+
+export { GLOBAL_SCOPE }
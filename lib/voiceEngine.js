@@ -0,0 +1,87 @@
+// Client for the Python voice engine (backend/server.py internal endpoints)
+import { getIntegrationSecret } from '@/lib/integrations'
+
+const VOICE_ENGINE_URL = process.env.VOICE_ENGINE_URL || 'http://localhost:8001'
+const INTERNAL_API_TOKEN = process.env.INTERNAL_API_TOKEN
+const REQUEST_TIMEOUT_MS = 2000
+const RECORDING_PURGE_TIMEOUT_MS = 5 * 60 * 1000
+// A tracemalloc snapshot of a busy worker can take seconds
+const PROFILE_TIMEOUT_MS = 60 * 1000
+
+async function callVoiceEngine(path, { method = 'POST', body, timeoutMs = REQUEST_TIMEOUT_MS } = {}) {
+  const headers = { 'Content-Type': 'application/json' }
+  if (INTERNAL_API_TOKEN) headers['X-Internal-Token'] = INTERNAL_API_TOKEN
+
+  const response = await fetch(`${VOICE_ENGINE_URL}${path}`, {
+    method,
+    headers,
+    body: body === undefined ? undefined : JSON.stringify(body),
+    signal: AbortSignal.timeout(timeoutMs),
+    cache: 'no-store'
+  })
+  if (!response.ok) {
+    const error = new Error(`Voice engine ${path} responded ${response.status}`)
+    error.status = response.status
+    error.detail = await response.json().then(body => body?.error, () => null)
+    throw error
+  }
+  return response.json()
+}
+
+// Fire-and-forget: have the voice engine synthesize the agent's fixed lines
+// (greeting, transfer, booking confirmation) into its TTS cache so calls
+// start playing immediately. Skipped when ElevenLabs isn't configured.
+export function prewarmAgentAudio(db, agent) {
+  getIntegrationSecret(db, agent.workspaceId, 'elevenlabs')
+    .then(apiKey => {
+      if (!apiKey) return null
+      return callVoiceEngine('/internal/tts-cache/prewarm', { body: { agent, apiKey } })
+    })
+    .catch(error => {
+      console.error(`TTS prewarm for agent ${agent.id} failed:`, error.message)
+    })
+}
+
+// Live call sessions held in the voice engine's memory (not call_logs)
+export function getLiveCalls(workspaceId) {
+  const query = workspaceId ? `?workspaceId=${encodeURIComponent(workspaceId)}` : ''
+  return callVoiceEngine(`/internal/calls${query}`, { method: 'GET' })
+}
+
+export function getLiveCall(callSid) {
+  return callVoiceEngine(`/internal/calls/${encodeURIComponent(callSid)}`, { method: 'GET' })
+}
+
+export function endLiveCall(callSid) {
+  return callVoiceEngine(`/internal/calls/${encodeURIComponent(callSid)}`, { method: 'DELETE' })
+}
+
+// Drop the voice engine's cached keys and pooled provider connections for a
+// workspace after its integrations change
+export function invalidateProviderConnections(workspaceId) {
+  callVoiceEngine('/internal/providers/invalidate', { body: { workspaceId } })
+    .catch(error => {
+      console.error(`Provider invalidation for workspace ${workspaceId} failed:`, error.message)
+    })
+}
+
+// Delete a workspace's call recordings from the voice engine's store
+// (workspace deletion). Removing many directories can take a while.
+export function purgeWorkspaceRecordings(workspaceId) {
+  return callVoiceEngine('/internal/recordings/purge', { body: { workspaceId }, timeoutMs: RECORDING_PURGE_TIMEOUT_MS })
+}
+
+// tracemalloc on the voice engine: POST takes the baseline, GET diffs
+// against it, DELETE stops tracing
+export function profileVoiceEngineMemory(method, { top, groupBy } = {}) {
+  const query = new URLSearchParams()
+  if (top) query.set('top', top)
+  if (groupBy) query.set('groupBy', groupBy)
+  const suffix = query.size ? `?${query}` : ''
+  return callVoiceEngine(`/internal/profile/memory${suffix}`, { method, timeoutMs: PROFILE_TIMEOUT_MS })
+}
+
+// Starts a background rebuild of call_analytics from call_logs (days before today)
+export function startCallAnalyticsBackfill() {
+  return callVoiceEngine('/internal/analytics/backfill')
+}
@@ -0,0 +1,254 @@
+"""A small in-memory stand-in for a motor database, for tests that can't reach Mongo.
+
+Covers the query and update operators the voice engine uses: equality (with
+None matching a missing field and arrays matching any element), $in, $gt,
+$gte, $lt, $lte, $ne, $or, and $set, $inc, $unset, $setOnInsert. Unique
+indexes raise DuplicateKeyError. Reads return copies, as a real driver would.
+"""
+import copy
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def _set(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _compare(value, op, operand):
+    if value is _MISSING or value is None:
+        return False
+    try:
+        return {"$gt": value > operand, "$gte": value >= operand, "$lt": value < operand, "$lte": value <= operand}[op]
+    except TypeError:
+        return False
+
+
+def _equals(value, expected):
+    if expected is None:
+        return value is _MISSING or value is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+
+def _matches_field(value, condition):
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return _equals(value, condition)
+    for op, operand in condition.items():
+        if op == "$in":
+            if not any(_equals(value, item) for item in operand):
+                return False
+        elif op == "$ne":
+            if _equals(value, operand):
+                return False
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if not _compare(value, op, operand):
+                return False
+        else:
+            raise NotImplementedError(op)
+    return True
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif not _matches_field(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {key for key, value in projection.items() if value and key != "_id"}
+    if include:
+        projected = {}
+        for key in include:
+            value = _get(doc, key)
+            if value is not _MISSING:
+                _set(projected, key, value)
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for key, value in projection.items():
+        if not value:
+            _unset(doc, key)
+    return doc
+
+
+def _apply(doc, update, inserting=False):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set(doc, path, copy.deepcopy(value))
+            elif op == "$inc":
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING else current) + value)
+            elif op == "$unset":
+                _unset(doc, path)
+            elif op != "$setOnInsert":
+                raise NotImplementedError(op)
+
+
+class MemoryCursor:
+    def __init__(self, docs, projection):
+        self._docs = docs
+        self._projection = projection
+
+    def sort(self, key, direction=1):
+        self._docs.sort(key=lambda doc: _get(doc, key), reverse=direction < 0)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def limit(self, n):
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield _project(doc, self._projection)
+
+    async def to_list(self, length=None):
+        return [_project(doc, self._projection) for doc in self._docs[:length]]
+
+    async def close(self):
+        pass
+
+
+class MemoryCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = []
+        self.unique = []  # (fields, sparse)
+        # Called with (operation, args) before every write; raise from it to fail the write
+        self.fail_write = None
+
+    def _check(self, operation, *args):
+        if self.fail_write is not None:
+            self.fail_write(operation, args)
+
+    def _check_unique(self, doc, ignore=None):
+        for fields, sparse in self.unique:
+            values = [_get(doc, field) for field in fields]
+            if sparse and all(value is _MISSING for value in values):
+                continue
+            for other in self.docs:
+                if other is not ignore and [_get(other, field) for field in fields] == values:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+
+    async def create_index(self, keys, name=None, unique=False, sparse=False, **options):
+        if unique:
+            self.unique.append(([field for field, _ in keys], sparse))
+        return name
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor([doc for doc in self.docs if matches(doc, query or {})], projection)
+
+    async def find_one(self, query=None, projection=None):
+        for doc in self.docs:
+            if matches(doc, query or {}):
+                return _project(doc, projection)
+        return None
+
+    async def count_documents(self, query, limit=0):
+        count = sum(1 for doc in self.docs if matches(doc, query))
+        return min(count, limit) if limit else count
+
+    async def insert_one(self, doc):
+        self._check("insert_one", doc)
+        doc.setdefault("_id", ObjectId())
+        stored = copy.deepcopy(doc)
+        self._check_unique(stored)
+        self.docs.append(stored)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs):
+        return SimpleNamespace(inserted_ids=[(await self.insert_one(doc)).inserted_id for doc in docs])
+
+    async def _update(self, query, update, upsert, many):
+        self._check("update_many" if many else "update_one", query, update)
+        targets = [doc for doc in self.docs if matches(doc, query)]
+        if not many:
+            targets = targets[:1]
+        modified = 0
+        for doc in targets:
+            updated = copy.deepcopy(doc)
+            _apply(updated, update)
+            if updated != doc:
+                self._check_unique(updated, ignore=doc)
+                doc.clear()
+                doc.update(updated)
+                modified += 1
+        upserted_id = None
+        if not targets and upsert:
+            doc = {key: copy.deepcopy(value) for key, value in query.items() if not key.startswith("$")
+                   and not isinstance(value, dict)}
+            _apply(doc, update, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._check_unique(doc)
+            self.docs.append(doc)
+            upserted_id = doc["_id"]
+        return SimpleNamespace(matched_count=len(targets), modified_count=modified, upserted_id=upserted_id)
+
+    async def update_one(self, query, update, upsert=False):
+        return await self._update(query, update, upsert, many=False)
+
+    async def update_many(self, query, update, upsert=False):
+        return await self._update(query, update, upsert, many=True)
+
+    async def delete_many(self, query):
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted, self.docs[:] = len(self.docs) - len(kept), kept
+        return SimpleNamespace(deleted_count=deleted)
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
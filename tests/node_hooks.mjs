@@ -0,0 +1,19 @@
+// Module hooks for loading lib/*.js under plain node, outside Next.js:
+// resolves the "@/" alias to the repository root and loads the repository's
+// .js files as ES modules.
+const rootUrl = new URL('..', import.meta.url).href
+
+export async function resolve(specifier, context, next) {
+  if (specifier.startsWith('@/')) {
+    const path = specifier.slice(2)
+    return { url: new URL(path.endsWith('.js') ? path : `${path}.js`, rootUrl).href, shortCircuit: true }
+  }
+  return next(specifier, context)
+}
+
+export async function load(url, context, next) {
+  if (url.startsWith(rootUrl) && url.endsWith('.js') && !url.includes('/node_modules/')) {
+    return next(url, { ...context, format: 'module' })
+  }
+  return next(url, context)
+}
@@ -0,0 +1,80 @@
+import asyncio
+
+import analytics
+from analytics import CallAnalytics
+
+
+class BlockingCollection:
+    """call_analytics whose bulk writes wait for ``release`` (and fail while ``failing``)."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.writing = asyncio.Event()
+        self.failing = False
+        self.written = []
+
+    async def create_index(self, keys, **options):
+        pass
+
+    async def bulk_write(self, ops, ordered=True):
+        self.writing.set()
+        await self.release.wait()
+        if self.failing:
+            raise ConnectionError("primary unreachable")
+        self.written.extend(ops)
+
+
+class FakeDb:
+    def __init__(self):
+        self.call_analytics = BlockingCollection()
+
+
+def event(i):
+    return {"workspaceId": "ws", "agentId": "agent", "endedAt": 1_700_000_000 + i, "durationS": 60,
+            "outcome": "completed"}
+
+
+def counted(ops):
+    return sum(op._doc["$inc"]["count"] for op in ops if "$inc" in op._doc)
+
+
+def test_overflow_trims_queued_events_not_the_batch_being_written(monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_MAX_PENDING", 10)
+
+    async def main():
+        db = FakeDb()
+        calls = CallAnalytics(db=db, batch_size=1000)
+        for i in range(6):
+            calls.record(event(i))
+        flushing = asyncio.create_task(calls.flush())
+        await db.call_analytics.writing.wait()
+        for i in range(6, 14):
+            calls.record(event(i))  # 14 buffered against a cap of 10
+        db.call_analytics.release.set()
+        return calls, db, await flushing
+
+    calls, db, written = asyncio.run(main())
+    assert written == 6 and counted(db.call_analytics.written) == 6
+    assert calls.stats() == {"pending": 4, "ingested": 6, "dropped": 4}
+
+
+def test_failed_batch_stays_queued_and_is_written_next_time():
+    async def main():
+        db = FakeDb()
+        calls = CallAnalytics(db=db, batch_size=1000)
+        for i in range(3):
+            calls.record(event(i))
+        db.call_analytics.failing = True
+        db.call_analytics.release.set()
+        try:
+            await calls.flush()
+        except ConnectionError:
+            pass
+        assert calls.backlog == 3
+        calls.record(event(3))
+        db.call_analytics.failing = False
+        return calls, db, await calls.flush()
+
+    calls, db, written = asyncio.run(main())
+    assert written == 4 and counted(db.call_analytics.written) == 4
+    assert calls.stats() == {"pending": 0, "ingested": 4, "dropped": 0}
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from audio import (MULAW_DECODE_TABLE, FrameChunker, InboundTranscoder, OutboundTranscoder, Resampler, RingBuffer,
+                   TWILIO_SAMPLE_RATE, frame_samples, mulaw_to_pcm16, pcm16_to_mulaw)
+
+
+def sine(rate: int, seconds: float, hz: float = 440.0, amplitude: float = 12000.0) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * hz * t) * amplitude).astype(np.int16)
+
+
+def rms(samples: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+
+
+def resample_stream(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    resampler = Resampler(src_rate, dst_rate)
+    n = resampler.in_samples
+    return np.concatenate([resampler.process(samples[i:i + n]).copy() for i in range(0, len(samples) - n + 1, n)])
+
+
+def test_mulaw_codes_round_trip():
+    codes = np.arange(256, dtype=np.uint8)
+    encoded = pcm16_to_mulaw(mulaw_to_pcm16(codes))
+    # 0x7F is μ-law's "negative zero"; zero encodes as 0xFF
+    expected = codes.copy()
+    expected[0x7F] = 0xFF
+    np.testing.assert_array_equal(encoded, expected)
+
+
+def test_mulaw_quantization_error_is_bounded():
+    pcm = np.arange(-32768, 32768, 7, dtype=np.int32).astype(np.int16)
+    decoded = mulaw_to_pcm16(pcm16_to_mulaw(pcm)).astype(np.int32)
+    clipped = np.clip(pcm.astype(np.int32), -32635, 32635)
+    # Segment step is 1/16 of the segment's base, plus the bias near zero
+    assert np.all(np.abs(decoded - clipped) <= np.abs(clipped) // 16 + 8)
+    assert MULAW_DECODE_TABLE.max() == 32124 and MULAW_DECODE_TABLE.min() == -32124
+
+
+def test_mulaw_into_reused_buffers():
+    pcm = sine(TWILIO_SAMPLE_RATE, 0.02)
+    out = np.empty(1000, dtype=np.uint8)
+    view = pcm16_to_mulaw(pcm, out=out)
+    assert view.shape == (160,) and np.shares_memory(view, out)
+
+
+@pytest.mark.parametrize("src_rate, dst_rate", [(8000, 16000), (16000, 8000), (24000, 8000)])
+def test_resampler_lengths_and_energy(src_rate, dst_rate):
+    resampler = Resampler(src_rate, dst_rate)
+    assert resampler.in_samples == frame_samples(src_rate)
+    assert resampler.out_samples == frame_samples(dst_rate)
+
+    out = resample_stream(sine(src_rate, 1.0), src_rate, dst_rate)
+    assert len(out) == dst_rate
+    # Skip the first frame (zero history); a 440 Hz tone is well inside both bands
+    steady = out[frame_samples(dst_rate):]
+    assert rms(steady) == pytest.approx(12000 / np.sqrt(2), rel=0.05)
+
+
+def test_upsample_then_downsample_keeps_the_tone():
+    original = sine(8000, 1.0)
+    back = resample_stream(resample_stream(original, 8000, 16000), 16000, 8000)
+    assert len(back) == len(original)
+    # Each pass delays by one of its input samples (1.5 samples at 8 kHz in total)
+    a = original[200:-200].astype(np.float64)
+    best = max(np.corrcoef(a, back[200 + lag:len(back) - 200 + lag])[0, 1] for lag in range(4))
+    assert best > 0.97
+
+
+def test_resampler_rejects_wrong_frame_size():
+    with pytest.raises(ValueError):
+        Resampler(8000, 16000).process(np.zeros(100, dtype=np.int16))
+
+
+def test_ring_buffer_drops_oldest_on_overflow():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.write(np.arange(6, 10, dtype=np.int16))
+    assert len(ring) == 8 and ring.dropped == 2
+    out = np.empty(8, dtype=np.int16)
+    assert ring.read_into(out) == 8
+    np.testing.assert_array_equal(out, np.arange(2, 10))
+
+
+def test_frame_chunker_emits_whole_frames():
+    chunker = FrameChunker(160)
+    chunker.push(np.arange(100, dtype=np.int16))
+    assert chunker.pop() is None
+    chunker.push(np.arange(100, 250, dtype=np.int16))
+    np.testing.assert_array_equal(chunker.pop(), np.arange(160))
+    assert chunker.pop() is None and chunker.buffered_frames == 0
+
+
+def test_transcoders_frame_sizes():
+    inbound = InboundTranscoder(stt_rate=16000)
+    assert inbound.process(pcm16_to_mulaw(sine(8000, 0.02)).tobytes()).shape == (320,)
+
+    outbound = OutboundTranscoder(tts_rate=24000)
+    outbound.push_bytes(sine(24000, 0.05).astype("<i2").tobytes())
+    frames = []
+    while (frame := outbound.pop_frame()) is not None:
+        frames.append(frame.copy())
+    assert [f.shape for f in frames] == [(160,), (160,)]
+    outbound.clear()
+    assert outbound.pop_frame() is None
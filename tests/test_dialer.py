@@ -0,0 +1,229 @@
+"""CampaignDialer against fakes:twilio_app, with an in-memory database.
+
+The fake Twilio server runs in a thread and posts signed status callbacks to an
+/api/dialer/status endpoint served in the test's own event loop.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import parse_qsl
+
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from pymongo.errors import AutoReconnect
+from starlette.responses import Response
+
+import dialer
+import fakes
+import integrations
+from dialer import CampaignDialer
+
+from .memory_db import MemoryDatabase
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def encrypt(text):
+    iv = os.urandom(16)
+    sealed = integrations._cipher().encrypt(iv, text.encode(), None)
+    return f"{iv.hex()}:{sealed[-16:].hex()}:{sealed[:-16].hex()}"
+
+
+@pytest.fixture(scope="module")
+def twilio_server():
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(fakes.twilio_app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture
+def twilio(twilio_server, monkeypatch):
+    state = fakes.twilio_app.state
+    state.calls, state.rate_limited = 0, 0
+    state.active, state.peak, state.recent_creates = {}, {}, {}
+    monkeypatch.setenv("FAKE_TWILIO_CALL_MS", "100")
+    monkeypatch.setenv("FAKE_TWILIO_OUTCOMES", "completed:1")
+    monkeypatch.delenv("FAKE_TWILIO_CPS", raising=False)
+    monkeypatch.setattr(dialer, "DIALER_WORKSPACE_MAX_CPS", 50)
+    return twilio_server
+
+
+async def seed(db, contacts, **campaign):
+    workspace_id = f"ws-{uuid.uuid4().hex[:8]}"
+    await db.integrations.insert_one({
+        "workspaceId": workspace_id,
+        "twilio": {"configured": True, "accountSid": encrypt("AC" + uuid.uuid4().hex),
+                   "authToken": encrypt(uuid.uuid4().hex)},
+    })
+    await db.phone_numbers.insert_one({"id": str(uuid.uuid4()), "workspaceId": workspace_id, "number": "+15550000000"})
+    await db.contacts.insert_many([
+        {"id": f"contact-{i}", "workspaceId": workspace_id, "phone": f"(555) 010-{i:04d}", "tags": ["test"]}
+        for i in range(contacts)
+    ])
+    doc = {
+        "id": str(uuid.uuid4()),
+        "workspaceId": workspace_id,
+        "agentId": "agent",
+        "fromNumber": "+15550000000",
+        "status": "running",
+        "contactFilter": {"tags": ["test"]},
+        "maxConcurrentCalls": 10,
+        "callsPerSecond": 50,
+        "progress": {},
+        **campaign,
+    }
+    await db.campaigns.insert_one(doc)
+    return doc["id"]
+
+
+async def wait_for(condition, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while not await condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def run_dialer(db, twilio_url, scenario):
+    """Run ``scenario(campaign_dialer)`` with a started dialer and a status callback endpoint."""
+    async def main():
+        port = free_port()
+        campaign_dialer = CampaignDialer(db=db, twilio_url=twilio_url, public_url=f"http://127.0.0.1:{port}",
+                                         answer_url=f"http://127.0.0.1:{port}/twiml", poll_interval=0.05)
+        callbacks = FastAPI()
+
+        @callbacks.post("/api/dialer/status")
+        async def status(request: Request):
+            params = dict(parse_qsl((await request.body()).decode()))
+            ok = await campaign_dialer.handle_status(params, request.headers.get("x-twilio-signature", ""))
+            return Response(status_code=204 if ok else 403)
+
+        server = uvicorn.Server(uvicorn.Config(callbacks, host="127.0.0.1", port=port, log_level="warning"))
+        server.install_signal_handlers = lambda: None
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.02)
+        campaign_dialer.start()
+        try:
+            await scenario(campaign_dialer)
+        finally:
+            await campaign_dialer.close()
+            server.should_exit = True
+            await serving
+
+    asyncio.run(main())
+
+
+def completed(db, campaign_id):
+    async def check():
+        return await db.campaigns.count_documents({"id": campaign_id, "status": "completed"})
+    return check
+
+
+async def twilio_stats(twilio_url):
+    async with httpx.AsyncClient(base_url=twilio_url) as client:
+        return (await client.get("/_stats")).json()
+
+
+def test_contacts_with_an_attempt_row_are_not_dialed_again(twilio):
+    db = MemoryDatabase()
+
+    async def scenario(campaign_dialer):
+        campaign_id = await seed(db, 10)
+        for i in range(4):  # dialed by a node that crashed before saving its cursor
+            await db.campaign_calls.insert_one({"campaignId": campaign_id, "contactId": f"contact-{i}",
+                                                "status": "completed", "attempts": 1})
+        await wait_for(completed(db, campaign_id))
+        stats = await twilio_stats(twilio)
+        campaign = await db.campaigns.find_one({"id": campaign_id})
+        assert stats["calls"] == 6
+        assert campaign["progress"]["dialed"] == 6
+        assert campaign["progress"]["outcomes"] == {"completed": 6}
+        assert await db.campaign_calls.count_documents({"campaignId": campaign_id}) == 10
+
+    run_dialer(db, twilio, scenario)
+
+
+def test_failed_attempt_insert_requeues_the_contact(twilio, monkeypatch):
+    monkeypatch.setattr(dialer, "RECORD_RETRY_S", 0.05)
+    db = MemoryDatabase()
+    failures = []
+
+    def fail_first_insert(operation, args):
+        if operation == "insert_one" and args[0]["contactId"] == "contact-2" and not failures:
+            failures.append(args[0]["contactId"])
+            raise AutoReconnect("primary stepped down")
+
+    db.campaign_calls.fail_write = fail_first_insert
+
+    async def scenario(campaign_dialer):
+        campaign_id = await seed(db, 5)
+        await wait_for(completed(db, campaign_id))
+        rows = await db.campaign_calls.find({"campaignId": campaign_id}).to_list(None)
+        assert failures == ["contact-2"]
+        assert sorted(row["contactId"] for row in rows) == [f"contact-{i}" for i in range(5)]
+        assert all(row["status"] == "completed" for row in rows)
+        assert (await twilio_stats(twilio))["calls"] == 5
+
+    run_dialer(db, twilio, scenario)
+
+
+def test_calls_finishing_across_pause_and_resume_count_toward_the_campaign(twilio, monkeypatch):
+    monkeypatch.setenv("FAKE_TWILIO_CALL_MS", "300")
+    monkeypatch.setenv("FAKE_TWILIO_OUTCOMES", "completed:0.5,busy:0.5")
+    db = MemoryDatabase()
+
+    async def scenario(campaign_dialer):
+        campaign_id = await seed(db, 30, maxConcurrentCalls=5, callsPerSecond=20,
+                                 retry={"maxAttempts": 2, "delayMinutes": 0.005, "on": ["busy"]})
+
+        async def dialing():
+            return fakes.twilio_app.state.active and max(fakes.twilio_app.state.active.values()) >= 3
+
+        await wait_for(dialing)
+        await db.campaigns.update_one({"id": campaign_id}, {"$set": {"status": "paused"}})
+        await asyncio.sleep(0.5)  # the calls in progress finish while the campaign is paused
+        await db.campaigns.update_one({"id": campaign_id}, {"$set": {"status": "running"}})
+        await wait_for(completed(db, campaign_id))
+
+        stats = await twilio_stats(twilio)
+        progress = (await db.campaigns.find_one({"id": campaign_id}))["progress"]
+        rows = await db.campaign_calls.find({"campaignId": campaign_id}).to_list(None)
+        assert len(rows) == 30 and len({row["contactId"] for row in rows}) == 30
+        assert {row["status"] for row in rows} <= {"completed", "busy"}
+        assert progress["dialed"] == stats["calls"] == sum(row["attempts"] for row in rows)
+        assert sum(progress["outcomes"].values()) == stats["calls"]
+        assert progress.get("retried", 0) == sum(1 for row in rows if row["attempts"] == 2)
+
+    run_dialer(db, twilio, scenario)
+
+
+def test_dialing_stays_within_the_campaign_pacing(twilio, monkeypatch):
+    monkeypatch.setenv("FAKE_TWILIO_CALL_MS", "400")
+    monkeypatch.setenv("FAKE_TWILIO_CPS", "10")
+    db = MemoryDatabase()
+
+    async def scenario(campaign_dialer):
+        campaign_id = await seed(db, 20, maxConcurrentCalls=3, callsPerSecond=10)
+        await wait_for(completed(db, campaign_id))
+        stats = await twilio_stats(twilio)
+        assert stats["calls"] == 20
+        assert stats["rateLimited"] == 0
+        assert max(stats["peak"].values()) <= 3
+
+    run_dialer(db, twilio, scenario)
@@ -0,0 +1,50 @@
+"""lib/indexes.js and the indexes the voice engine builds itself must agree.
+
+Mongo rejects a second index on the same key under another name, so a
+mismatch makes whichever side builds second fail.
+"""
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import analytics
+import dialer
+
+INDEXES_JS = Path(__file__).resolve().parents[1] / "lib" / "indexes.js"
+
+# lib/indexes.js has no imports, so it loads as a data: module outside Next.js
+LOAD_INDEXES = """
+import { readFileSync } from 'fs'
+const source = readFileSync(process.argv[1], 'utf8')
+const { INDEXES } = await import('data:text/javascript,' + encodeURIComponent(source))
+console.log(JSON.stringify(INDEXES))
+"""
+
+
+@pytest.fixture(scope="module")
+def declared():
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node is not installed")
+    result = subprocess.run(
+        [node, "--input-type=module", "-e", LOAD_INDEXES, str(INDEXES_JS)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+@pytest.mark.parametrize("collection, indexes", [
+    ("campaign_calls", dialer.CAMPAIGN_CALLS_INDEXES),
+    ("call_analytics", analytics.CALL_ANALYTICS_INDEXES),
+])
+def test_voice_engine_indexes_match_lib_indexes(declared, collection, indexes):
+    by_name = {spec["name"]: spec for spec in declared[collection]}
+    for keys, options in indexes:
+        spec = by_name.get(options["name"])
+        assert spec is not None, f"{collection}.{options['name']} is missing from lib/indexes.js"
+        assert list(spec["key"].items()) == [(field, direction) for field, direction in keys]
+        js_options = {k: v for k, v in spec.items() if k not in ("key", "name")}
+        assert js_options == {k: v for k, v in options.items() if k != "name"}
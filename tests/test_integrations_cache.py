@@ -0,0 +1,159 @@
+"""lib/integrations.js voice catalog cache against fakes:elevenlabs_app.
+
+Each test runs a short node script that imports lib/integrations.js (through
+tests/node_hooks.mjs) with ELEVENLABS_API_URL pointing at the fake, and prints
+what getElevenLabsVoices returned at each step.
+"""
+import json
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+import pytest
+import uvicorn
+
+import fakes
+
+HOOKS = Path(__file__).resolve().parent / "node_hooks.mjs"
+REGISTER = f"import {{ register }} from 'node:module'; register({json.dumps(HOOKS.as_uri())})"
+
+PRELUDE = """
+import { getElevenLabsVoices, getIntegrationSecrets } from '@/lib/integrations'
+const fake = process.env.ELEVENLABS_API_URL
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms))
+const requests = async () => (await (await fetch(`${fake}/_stats`)).json()).requests
+const faults = body => fetch(`${fake}/_faults`, {
+  method: 'POST', headers: { 'content-type': 'application/json' }, body: JSON.stringify(body)
+})
+async function get(key) {
+  const started = Date.now()
+  try {
+    const { voices, cache } = await getElevenLabsVoices(key)
+    return { cache, voices: voices.length, ms: Date.now() - started }
+  } catch (error) {
+    return { error: error.status }
+  }
+}
+const steps = {}
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def elevenlabs():
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node is not installed")
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(fakes.elevenlabs_app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    yield node, f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture
+def run_script(elevenlabs, monkeypatch):
+    node, url = elevenlabs
+    monkeypatch.setenv("FAKE_ELEVENLABS_LATENCY_MS", "100")
+    monkeypatch.setenv("FAKE_ELEVENLABS_VOICE_COUNT", "3")
+    fakes.elevenlabs_app.state.voices_status = None
+
+    def run(script):
+        env = {
+            "PATH": "/usr/bin:/bin",
+            "ELEVENLABS_API_URL": url,
+            "SECRETS_CACHE_MAX": "2",
+            "VOICES_CACHE_MAX": "2",
+            "VOICES_CACHE_TTL_MS": "300",
+            "VOICES_CACHE_STALE_MS": "60000",
+        }
+        result = subprocess.run(
+            [node, "--no-warnings", "--import", "data:text/javascript," + quote(REGISTER), "--input-type=module",
+             "-e", PRELUDE + script + "\nconsole.log(JSON.stringify(steps))"],
+            capture_output=True, text=True, env=env, timeout=60,
+        )
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    yield run
+    fakes.elevenlabs_app.state.voices_status = None
+
+
+def test_voice_catalogs_are_evicted_least_recently_used_first(run_script):
+    steps = run_script("""
+      const before = await requests()
+      steps.a = await get('key-a')
+      steps.b = await get('key-b')
+      steps.aAgain = await get('key-a')     // a is now the most recently used
+      steps.c = await get('key-c')          // over VOICES_CACHE_MAX=2: evicts b
+      steps.aKept = await get('key-a')
+      steps.bEvicted = await get('key-b')
+      steps.requests = await requests() - before
+    """)
+    assert [steps[k]["cache"] for k in ("a", "b", "aAgain", "c", "aKept", "bEvicted")] == \
+        ["miss", "miss", "hit", "miss", "hit", "miss"]
+    assert steps["requests"] == 4
+
+
+def test_integration_secrets_are_evicted_least_recently_used_first(run_script):
+    steps = run_script("""
+      const reads = []
+      const db = { collection: () => ({ findOne: async ({ workspaceId }) => (reads.push(workspaceId), null) }) }
+      for (const workspaceId of ['a', 'b', 'a', 'c', 'a', 'b']) await getIntegrationSecrets(db, workspaceId)
+      steps.reads = reads
+    """)
+    assert steps["reads"] == ["a", "b", "c", "b"]
+
+
+def test_stale_catalog_is_served_while_one_refresh_is_in_flight(run_script):
+    steps = run_script("""
+      steps.first = await get('key-a')
+      await sleep(400)                      // past VOICES_CACHE_TTL_MS
+      const before = await requests()
+      steps.stale = await get('key-a')
+      steps.staleAgain = await get('key-a')
+      await sleep(300)                      // the refresh lands
+      steps.refreshed = await get('key-a')
+      steps.requests = await requests() - before
+    """)
+    assert steps["first"]["cache"] == "miss" and steps["first"]["voices"] == 3
+    assert steps["stale"]["cache"] == steps["staleAgain"]["cache"] == "stale"
+    assert steps["stale"]["ms"] < 100  # didn't wait for the upstream
+    assert steps["refreshed"]["cache"] == "hit"
+    assert steps["requests"] == 1  # both stale reads shared one refresh
+
+
+def test_failed_refresh_keeps_serving_the_stale_catalog(run_script):
+    steps = run_script("""
+      steps.first = await get('key-a')
+      await faults({ voicesStatus: 503 })
+      await sleep(400)
+      steps.stale = await get('key-a')
+      await sleep(300)                      // the refresh fails
+      steps.staleAfterFailure = await get('key-a')
+      steps.uncached = await get('key-b')
+      await faults({ voicesStatus: null })
+      await sleep(300)
+      steps.retried = await get('key-a')    // failures aren't cached; this starts a new refresh
+      await sleep(300)
+      steps.recovered = await get('key-a')
+    """)
+    assert steps["stale"]["cache"] == "stale"
+    assert steps["staleAfterFailure"]["cache"] == "stale" and steps["staleAfterFailure"]["voices"] == 3
+    assert steps["uncached"] == {"error": 503}
+    assert steps["retried"]["cache"] == "stale"
+    assert steps["recovered"]["cache"] == "hit"
@@ -0,0 +1,43 @@
+import importlib
+from decimal import Decimal
+
+import pytest
+
+import jsoncodec
+
+PAYLOAD = {
+    "contacts": [{"name": "Zoë", "tags": ["vip"], "score": 1.5, "active": True, "notes": None}],
+    1: "non-string key",
+    "cost": Decimal("1.10"),  # neither codec encodes it natively, so both go through default
+}
+EXPECTED = ('{"contacts":[{"name":"Zoë","tags":["vip"],"score":1.5,"active":true,"notes":null}],'
+            '"1":"non-string key","cost":"1.10"}').encode()
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        monkeypatch.delenv("JSON_CODEC", raising=False)
+    else:
+        monkeypatch.setenv("JSON_CODEC", "json")
+    module = importlib.reload(jsoncodec)
+    yield module
+    monkeypatch.undo()
+    importlib.reload(jsoncodec)
+
+
+def test_json_codec_env_selects_the_stdlib(codec, request):
+    assert codec.CODEC == request.node.callspec.params["codec"]
+
+
+def test_both_codecs_emit_the_same_compact_utf8(codec):
+    encoded = codec.dumps(PAYLOAD, default=str)
+    assert encoded == EXPECTED
+    assert codec.loads(encoded)["contacts"][0]["name"] == "Zoë"
+
+
+def test_response_renders_with_the_codec(codec):
+    response = codec.JSONResponse({"ok": True, "name": "Zoë"})
+    assert response.body == '{"ok":true,"name":"Zoë"}'.encode()
+    assert response.headers["content-type"] == "application/json"
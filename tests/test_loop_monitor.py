@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import loop_monitor
+from loop_monitor import LoopMonitor, is_overloaded
+
+
+def test_overload_has_hysteresis(monkeypatch):
+    monitor = LoopMonitor(shed_lag_ms=100)
+    monkeypatch.setattr(loop_monitor, "_monitor", monitor)
+    assert not is_overloaded("test")
+
+    while not monitor.overloaded:
+        monitor.observe(500)
+    assert is_overloaded("test") and monitor.lag_ms > 100
+
+    # Between half the threshold and the threshold: still shedding
+    while monitor.lag_ms > 75:
+        monitor.observe(60)
+    assert monitor.overloaded
+
+    while monitor.lag_ms >= 50:
+        monitor.observe(0)
+    assert not monitor.overloaded and not is_overloaded("test")
+    assert monitor.stats()["maxLagMs"] == 500
+
+
+def block_the_loop():
+    time.sleep(0.2)
+
+
+def test_watchdog_captures_the_blocking_callback():
+    async def main():
+        monitor = LoopMonitor(interval_ms=10, slow_callback_ms=50, shed_lag_ms=1000)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        block_the_loop()
+        await asyncio.sleep(0.05)
+        await monitor.close()
+        return monitor
+
+    monitor = asyncio.run(main())
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert stall["blockedMs"] >= 50
+    assert any("block_the_loop" in line for line in stall["stack"])
+    assert monitor.max_lag_ms >= 150
@@ -0,0 +1,100 @@
+import asyncio
+
+from pacing import FRAME_BYTES, MULAW_SILENCE, JitterBuffer, TimerWheel
+
+
+def frames(n: int, fill: bytes = b"\x10") -> bytes:
+    return fill * (FRAME_BYTES * n)
+
+
+def test_push_slices_frames_and_keeps_the_partial():
+    sent = []
+    buffer = JitterBuffer(sent.append)
+    assert buffer.push(frames(2) + b"\x10" * 50) == 2
+    assert buffer.push(b"\x10" * (FRAME_BYTES - 50)) == 1
+    assert buffer.buffered_frames == 3 and buffer.buffered_ms == 60
+
+
+def test_playout_waits_for_target_then_paces_one_frame_per_tick():
+    sent = []
+    buffer = JitterBuffer(sent.append, target_frames=3)
+    buffer.push(frames(2))
+    buffer.tick()
+    assert sent == []
+    buffer.push(frames(2))
+    for _ in range(4):
+        buffer.tick()
+    assert len(sent) == 4 and all(len(f) == FRAME_BYTES for f in sent)
+
+
+def test_underrun_grows_target_and_end_stream_does_not():
+    buffer = JitterBuffer(lambda frame: None, target_frames=2, max_target=4)
+    buffer.push(frames(2))
+    for _ in range(3):
+        buffer.tick()
+    assert buffer.underruns == 1 and buffer.target_frames == 3
+
+    buffer.push(frames(3) + b"\x10" * 10)
+    buffer.end_stream()
+    for _ in range(5):
+        buffer.tick()
+    assert buffer.underruns == 1 and buffer.target_frames == 3
+
+
+def test_end_stream_pads_the_tail_with_silence():
+    sent = []
+    buffer = JitterBuffer(sent.append, target_frames=5)
+    buffer.push(b"\x10" * 10)
+    buffer.end_stream()
+    buffer.tick()
+    assert sent == [b"\x10" * 10 + MULAW_SILENCE * (FRAME_BYTES - 10)]
+
+
+def test_target_shrinks_after_a_stable_stretch():
+    buffer = JitterBuffer(lambda frame: None, target_frames=4, min_frames=2, stable_frames=10)
+    buffer.push(frames(30))
+    for _ in range(25):
+        buffer.tick()
+    assert buffer.target_frames == 2
+
+
+def test_overrun_drops_and_clear_empties():
+    buffer = JitterBuffer(lambda frame: None, max_frames=5)
+    assert buffer.push(frames(8)) == 5
+    assert buffer.overrun_frames == 3
+    assert buffer.clear() == 5
+    assert buffer.buffered_frames == 0
+
+
+def test_write_waits_for_space():
+    async def main():
+        buffer = JitterBuffer(lambda frame: None, target_frames=1, max_frames=4)
+        writer = asyncio.create_task(buffer.write(frames(10)))
+        await asyncio.sleep(0)
+        assert not writer.done() and buffer.buffered_frames == 4
+        while not writer.done():
+            buffer.tick()
+            await asyncio.sleep(0)
+        return buffer
+
+    buffer = asyncio.run(main())
+    assert buffer.overrun_frames == 0
+    assert buffer.frames_sent + buffer.buffered_frames == 10
+
+
+def test_timer_wheel_spreads_callbacks_and_ticks():
+    async def main():
+        wheel = TimerWheel(period_ms=20, slots=4)
+        fired = [0] * 8
+        handles = [wheel.add(lambda i=i: fired.__setitem__(i, fired[i] + 1)) for i in range(8)]
+        assert sorted(len(slot) for slot in wheel._slots) == [2, 2, 2, 2]
+        wheel.remove(handles[0])
+        wheel.start()
+        await asyncio.sleep(0.2)
+        await wheel.stop()
+        return wheel, fired
+
+    wheel, fired = asyncio.run(main())
+    assert len(wheel) == 7 and fired[0] == 0
+    # ~10 periods in 200 ms; allow for a slow runner
+    assert all(5 <= count <= 11 for count in fired[1:])
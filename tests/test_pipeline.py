@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+import fakes
+from audio import TWILIO_SAMPLE_RATE, frame_samples, pcm16_to_mulaw
+from pipeline import SentenceChunker, SpeechPipeline, elevenlabs_stream, stream_chat_tokens
+from sessions import CallSession
+
+
+@pytest.fixture(autouse=True)
+def fast_fakes(monkeypatch):
+    monkeypatch.setenv("FAKE_LLM_FIRST_TOKEN_MS", "0")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_SEC", "10000")
+    monkeypatch.setenv("FAKE_TTS_FIRST_BYTE_MS", "0")
+    monkeypatch.setenv("FAKE_TTS_REALTIME_FACTOR", "1000")
+
+
+def make_pipeline(llm: httpx.AsyncClient, tts: httpx.AsyncClient, play, session=None) -> SpeechPipeline:
+    tokens = stream_chat_tokens(llm, "http://llm/v1/chat/completions", "test-key",
+                                [{"role": "user", "content": "Can I book a visit?"}], "fake-model")
+    return SpeechPipeline(tokens, elevenlabs_stream(tts, "test-key", "fake-voice-0"), play, session=session)
+
+
+def fake_clients() -> tuple[httpx.AsyncClient, httpx.AsyncClient]:
+    return (httpx.AsyncClient(transport=httpx.ASGITransport(app=fakes.llm_app)),
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=fakes.elevenlabs_app)))
+
+
+def loud_caller_frame() -> bytes:
+    t = np.arange(frame_samples(TWILIO_SAMPLE_RATE)) / TWILIO_SAMPLE_RATE
+    return pcm16_to_mulaw((np.sin(2 * np.pi * 440 * t) * 16000).astype(np.int16)).tobytes()
+
+
+def test_chunker_splits_at_sentences_and_skips_abbreviations():
+    chunker = SentenceChunker()
+    chunks = []
+    for word in fakes.FAKE_LLM_REPLY.split(" "):
+        chunks += chunker.feed(word + " ")
+    tail = chunker.flush()
+    assert chunks[0] == "Thanks for calling!"
+    assert not any(chunk.endswith("Dr.") for chunk in chunks)
+    assert " ".join(chunks + [tail] if tail else chunks) == fakes.FAKE_LLM_REPLY
+
+
+def test_turn_plays_every_chunk_in_order():
+    played = []
+
+    async def play(audio: bytes) -> None:
+        played.append(audio)
+
+    async def main():
+        llm, tts = fake_clients()
+        async with llm, tts:
+            session = CallSession("CA-turn")
+            metrics = await make_pipeline(llm, tts, play, session=session).run()
+        return metrics, session
+
+    metrics, session = asyncio.run(main())
+    assert not metrics.cancelled
+    assert metrics.chunks >= 3
+    assert metrics.audio_bytes == sum(len(p) for p in played) > 0
+    assert metrics.first_token <= metrics.first_chunk <= metrics.first_audio <= metrics.first_playback <= metrics.finished
+    assert session.response_latency.count == 1
+
+
+def test_barge_in_cancels_the_turn():
+    played = []
+
+    async def main():
+        llm, tts = fake_clients()
+        async with llm, tts:
+            session = CallSession("CA-barge")
+            session.enable_barge_in({"interruptSensitivity": "high", "vadSettings": {"bargeInGraceMs": 0}})
+
+            async def play(audio: bytes) -> None:
+                played.append(audio)
+                # The caller talks over the first piece of agent audio
+                for _ in range(3):
+                    session.record_inbound(loud_caller_frame())
+                await asyncio.sleep(0)
+
+            pipeline = make_pipeline(llm, tts, play, session=session)
+            task = asyncio.create_task(pipeline.run())
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        return pipeline, session
+
+    pipeline, session = asyncio.run(main())
+    assert pipeline.metrics.cancelled
+    assert pipeline.metrics.finished is not None
+    assert len(played) == 1
+    assert session.interruptions == 1
+    assert not session.barge_in.agent_speaking
+    assert not pipeline._tasks
+
+
+def test_cancel_before_run_is_latched():
+    async def play(audio: bytes) -> None:
+        raise AssertionError("a cancelled turn must not play")
+
+    async def main():
+        llm, tts = fake_clients()
+        async with llm, tts:
+            pipeline = make_pipeline(llm, tts, play)
+            pipeline.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.create_task(pipeline.run())
+        return pipeline
+
+    pipeline = asyncio.run(main())
+    assert pipeline.metrics.cancelled
+    assert pipeline.metrics.chunks == 0
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import profiling
+from profiling import MemoryTracer, ProfilerBusy, folded_text, measure_loop, sample_cpu, top_functions
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_cpu_profile_attributes_samples_to_the_busy_function():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,))
+    worker.start()
+    try:
+        profile = sample_cpu(worker.ident, 0.3, interval_ms=2)
+    finally:
+        stop.set()
+        worker.join()
+    assert profile["samples"] > 20
+    spinning = next(f for f in top_functions(profile) if f["function"].startswith("spin "))
+    assert spinning["totalPct"] > 90
+    first_line = folded_text(profile).splitlines()[0]
+    assert ";" in first_line and first_line.rsplit(" ", 1)[1].isdigit()
+
+
+def test_only_one_cpu_profile_at_a_time():
+    with profiling._cpu_lock:
+        with pytest.raises(ProfilerBusy):
+            sample_cpu(threading.get_ident(), 0.1)
+
+
+def test_loop_measurement_reports_lag_and_the_stuck_task():
+    async def stuck(event):
+        await event.wait()
+
+    async def main():
+        event = asyncio.Event()
+        task = asyncio.create_task(stuck(event), name="stuck-task")
+        await asyncio.sleep(0)
+        asyncio.get_running_loop().call_later(0.05, time.sleep, 0.1)  # blocks the loop once
+        result = await measure_loop(0.3, interval_ms=5)
+        event.set()
+        await task
+        return result
+
+    result = asyncio.run(main())
+    assert result["lagMs"]["max"] >= 80
+    stuck_task = next(t for t in result["longestPending"] if t["name"] == "stuck-task")
+    assert stuck_task["olderThanWindow"] and stuck_task["awaitingAt"].startswith("stuck ")
+
+
+def test_memory_diff_points_at_the_allocation_and_tracing_stops_on_its_own():
+    async def main():
+        tracer = MemoryTracer(max_s=0.5)
+        await tracer.baseline()
+        held = [bytes(1024) for _ in range(2000)]
+        diff = await tracer.diff(top=5)
+        traced = tracer.tracing
+        await asyncio.sleep(0.7)
+        return diff, traced, tracer.stats(), held
+
+    diff, traced, stats, _ = asyncio.run(main())
+    assert traced and diff["sizeDiffBytes"] > 2000 * 1024
+    assert diff["top"][0]["site"].startswith(__file__) and diff["top"][0]["countDiff"] >= 2000
+    assert not stats["tracing"] and not stats["hasBaseline"]
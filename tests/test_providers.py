@@ -0,0 +1,110 @@
+"""ProviderPool against the fake Deepgram (fakes:stt_app) and ElevenLabs servers."""
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+import fakes
+from providers import PoolExhaustedError, ProviderPool, key_id
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(app):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, port
+
+
+@pytest.fixture(scope="module")
+def upstreams():
+    stt, stt_thread, stt_port = serve(fakes.stt_app)
+    tts, tts_thread, tts_port = serve(fakes.elevenlabs_app)
+    yield f"ws://127.0.0.1:{stt_port}/v1/listen", f"http://127.0.0.1:{tts_port}"
+    stt.should_exit = tts.should_exit = True
+    stt_thread.join(5)
+    tts_thread.join(5)
+
+
+async def settled(pool):
+    while pool._replenishing or pool._opening:
+        await asyncio.sleep(0.01)
+
+
+def test_calls_get_a_warm_socket_and_the_spare_is_replaced(upstreams):
+    deepgram_url, elevenlabs_url = upstreams
+
+    async def main():
+        pool = ProviderPool(max_connections=4, warm_per_key=1, deepgram_url=deepgram_url,
+                            elevenlabs_url=elevenlabs_url)
+        first = await pool.acquire_stt("dg-key")
+        await settled(pool)
+        second = await pool.acquire_stt("dg-key")
+        await settled(pool)
+        during = pool.stats()
+        await first.close()
+        await second.close()
+        await asyncio.sleep(0.05)
+        after = pool.stats()
+        await pool.close()
+        return during, after
+
+    during, after = asyncio.run(main())
+    assert (during["misses"], during["hits"], during["inUse"], during["open"]) == (1, 1, 2, 3)
+    assert after["inUse"] == 0 and after["open"] == 1  # the spare stays warm
+
+
+def test_cap_evicts_other_keys_spares_then_refuses(upstreams):
+    deepgram_url, elevenlabs_url = upstreams
+
+    async def main():
+        pool = ProviderPool(max_connections=2, warm_per_key=1, deepgram_url=deepgram_url,
+                            elevenlabs_url=elevenlabs_url)
+        a = await pool.acquire_stt("key-a")
+        await settled(pool)
+        assert pool.stats()["spare"] == {key_id("key-a"): 1}
+        b = await pool.acquire_stt("key-b")  # evicts key-a's spare
+        await settled(pool)
+        with pytest.raises(PoolExhaustedError):
+            await pool.acquire_stt("key-c")
+        stats = pool.stats()
+        for ws in (a, b):
+            await ws.close()
+        await pool.close()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["open"] == stats["inUse"] == 2 and stats["spare"] == {}
+
+
+def test_drop_workspace_closes_every_key_it_used(upstreams):
+    deepgram_url, elevenlabs_url = upstreams
+
+    async def main():
+        pool = ProviderPool(max_connections=4, warm_per_key=1, deepgram_url=deepgram_url,
+                            elevenlabs_url=elevenlabs_url)
+        await pool.warm(deepgram_key="dg-old", elevenlabs_key="el-old", workspace_id="ws")
+        client = await pool.elevenlabs_client("el-old", workspace_id="ws")
+        warmed = pool.stats()
+        dropped = pool.drop_workspace("ws")
+        await asyncio.sleep(0.05)
+        stats = pool.stats()
+        await pool.close()
+        return warmed, dropped, stats, client.is_closed
+
+    warmed, dropped, stats, client_closed = asyncio.run(main())
+    assert warmed["open"] == 1 and warmed["httpClients"] == 1 and warmed["hits"] == 1
+    assert dropped == 2 and client_closed
+    assert stats["open"] == 0 and stats["httpClients"] == 0
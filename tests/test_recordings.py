@@ -0,0 +1,93 @@
+import os
+import time
+
+import pytest
+
+import recordings
+from recordings import FRAME_BYTES, RecordingStore, parse_range, wav_header
+
+
+def record(store, call_sid, frames, workspace_id="ws"):
+    writer = store.start(call_sid, workspace_id=workspace_id)
+    for i in range(frames):
+        writer.append_frame(bytes([i]) * FRAME_BYTES, bytes([100 + i]) * FRAME_BYTES)
+    writer.append_segment("agent", "Hello!")
+    return store.finish(call_sid)
+
+
+def read_all(store, call_sid, start=0, end=None):
+    reader = store.open_reader(call_sid)
+    try:
+        return b"".join(bytes(part) for part in reader.iter_range(start, end, chunk_size=100))
+    finally:
+        reader.close()
+
+
+def test_rotated_chunks_read_back_as_one_interleaved_wav(tmp_path, monkeypatch):
+    monkeypatch.setattr(recordings, "RECORDING_CHUNK_BYTES", FRAME_BYTES * 2 * 3)
+    store = RecordingStore(tmp_path)
+    index = record(store, "CA1", 10)
+    assert len(index["chunks"]) == 4 and index["audioBytes"] == FRAME_BYTES * 2 * 10
+
+    header = wav_header(index["audioBytes"])
+    data = read_all(store, "CA1")
+    assert data[:len(header)] == header and len(data) == len(header) + index["audioBytes"]
+    first_frame = data[len(header):len(header) + FRAME_BYTES * 2]
+    assert first_frame[0::2] == b"\x00" * FRAME_BYTES and first_frame[1::2] == b"\x64" * FRAME_BYTES
+    # A range across the first chunk boundary
+    boundary = len(header) + FRAME_BYTES * 2 * 3
+    assert read_all(store, "CA1", boundary - 2, boundary + 1) == bytes([2, 102, 3, 103])
+    assert store.transcript("CA1") == [{"t": 0.2, "role": "agent", "text": "Hello!"}]
+
+
+def test_maintain_compacts_expires_and_recovers(tmp_path, monkeypatch):
+    monkeypatch.setattr(recordings, "RECORDING_CHUNK_BYTES", FRAME_BYTES * 2 * 3)
+    store = RecordingStore(tmp_path)
+    record(store, "CA-keep", 10)
+    before = read_all(store, "CA-keep")
+
+    expired = record(store, "CA-old", 1)
+    old_day = tmp_path / "2000-01-01"
+    old_day.mkdir()
+    os.rename(tmp_path / recordings._day(expired["startedAt"]) / "CA-old", old_day / "CA-old")
+
+    orphan = store.start("CA-orphan")
+    orphan.append_frame(None, None)
+    orphan._audio.flush()
+    store._writers.pop("CA-orphan")  # the writer died without an index.json
+
+    result = store.maintain(now=time.time() + recordings.ORPHAN_AFTER_S + 1)
+    assert (result["expiredCalls"], result["recovered"], result["compacted"]) == (1, 1, 1)
+    assert not old_day.exists() and store.open_reader("CA-old") is None
+    index = store.get_index("CA-keep")
+    assert [c["name"] for c in index["chunks"]] == ["audio-004.ulaw"]
+    assert read_all(store, "CA-keep") == before
+    assert store.get_index("CA-orphan")["recovered"] is True
+
+
+def test_delete_workspace_removes_only_its_finished_calls(tmp_path):
+    store = RecordingStore(tmp_path)
+    record(store, "CA-a", 2, workspace_id="a")
+    record(store, "CA-b", 2, workspace_id="b")
+    store.start("CA-live", workspace_id="a")
+    result = store.delete_workspace("a")
+    assert result["deletedCalls"] == 1 and store.get_index("CA-a") is None
+    assert store.get_index("CA-b") is not None and store.is_active("CA-live")
+    assert store.get_index("CA-live")["inProgress"] is True
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=990-5000", (990, 999)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=0-1,5-6", "items=0-1", "bytes=50-10"])
+def test_parse_range_rejects(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import sessions
+from pacing import TimerWheel
+from recordings import RecordingStore
+from sessions import CallSession, CallSessionRegistry, SessionLimitError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeAnalytics:
+    def __init__(self):
+        self.events = []
+
+    def record(self, event):
+        self.events.append(event)
+
+
+def test_open_reuses_retried_webhooks_and_enforces_the_cap():
+    calls = CallSessionRegistry(max_sessions=2)
+    first = calls.open("CA1", workspace_id="ws")
+    assert calls.open("CA1") is first
+    calls.open("CA2")
+    with pytest.raises(SessionLimitError):
+        calls.open("CA3")
+    assert len(calls) == 2 and "CA3" not in calls
+
+
+def test_transcript_is_capped_in_turns_and_characters(monkeypatch):
+    monkeypatch.setattr(sessions, "CALL_TRANSCRIPT_MAX_CHARS", 100)
+    session = CallSession("CA1")
+    for i in range(10):
+        session.add_turn("caller", f"turn {i} " + "x" * 20)
+    assert session.transcript_chars <= 100
+    assert session.transcript_dropped == 10 - len(session.transcript)
+    assert session.transcript[-1][2].startswith("turn 9")
+
+
+def test_audio_history_keeps_only_the_recent_window():
+    session = CallSession("CA1")
+    for _ in range(200):  # 4 s of 20 ms frames
+        session.record_inbound(b"\xff" * 160)
+    assert session.frames_in == 200
+    assert session.detail()["audioHistoryMs"] == sessions.CALL_AUDIO_HISTORY_MS
+
+
+def test_close_tears_everything_down_once(tmp_path):
+    async def main():
+        wheel = TimerWheel()
+        analytics = FakeAnalytics()
+        store = RecordingStore(tmp_path)
+        calls = CallSessionRegistry(wheel=wheel, recordings=store, analytics=analytics)
+        session = calls.open("CA1", record=True, workspace_id="ws", agent_id="agent")
+        session.wheel_handle = wheel.add(lambda: None)
+        connection = FakeConnection()
+        session.attach_provider("stt", connection)
+        task = session.spawn(asyncio.sleep(3600))
+        session.recording.append_frame(b"\x10" * 160, None)
+        session.record_latency(420.0)
+
+        closed = await calls.close("CA1", reason="hangup")
+        again = await calls.close("CA1", reason="hangup")
+        return calls, wheel, analytics, store, closed, again, connection, task
+
+    calls, wheel, analytics, store, closed, again, connection, task = asyncio.run(main())
+    assert closed.closed and closed.close_reason == "hangup" and again is None
+    assert len(calls) == 0 and len(wheel) == 0
+    assert task.cancelled() and connection.closed
+    assert not store.is_active("CA1") and store.get_index("CA1")["audioBytes"] == 320
+    assert len(analytics.events) == 1
+    event = analytics.events[0]
+    assert event["outcome"] == "hangup" and event["workspaceId"] == "ws" and sum(event["latencyBins"]) == 1
+
+
+def test_reap_candidates_by_idle_time_and_duration():
+    calls = CallSessionRegistry(idle_timeout=60, max_duration=3600)
+    idle = calls.open("CA-idle")
+    long = calls.open("CA-long")
+    fresh = calls.open("CA-fresh")
+    now = fresh.started + 120
+    idle.last_activity = fresh.started
+    long.started = now - 4000
+    long.last_activity = now
+    fresh.last_activity = now
+    assert sorted(calls.reap_candidates(now)) == [("CA-idle", "idle_timeout"), ("CA-long", "max_duration")]
+
+
+def test_list_sessions_filters_by_workspace():
+    calls = CallSessionRegistry()
+    calls.open("CA1", workspace_id="a")
+    calls.open("CA2", workspace_id="b")
+    assert [s["callSid"] for s in calls.list_sessions("a")] == ["CA1"]
+    assert calls.stats()["byState"] == {"ringing": 2}
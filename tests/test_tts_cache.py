@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+from tts_cache import TtsCache, agent_utterances, cache_key
+
+
+def test_evicts_least_recently_played_and_keeps_recency_across_restarts(tmp_path):
+    a, b, c, d = (cache_key("rachel", line) for line in ("Hello.", "Goodbye.", "One moment.", "Booked!"))
+    cache = TtsCache(tmp_path, max_bytes=300)
+    for played, key in enumerate((a, b, c), start=1):
+        cache.put(key, b"\xff" * 100)
+        os.utime(tmp_path / key[:2] / key, (played * 1000, played * 1000))
+    cache.get(a).close()  # playing a makes b the least recently used
+
+    reopened = TtsCache(tmp_path, max_bytes=300)
+    reopened.put(d, b"\xff" * 100)
+    assert b not in reopened and all(key in reopened for key in (a, c, d))
+    assert reopened.stats()["bytes"] == 300
+    assert not (tmp_path / b[:2] / b).exists()
+
+
+def test_concurrent_misses_synthesize_once(tmp_path):
+    cache = TtsCache(tmp_path, max_bytes=1 << 20)
+    key = cache_key("rachel", "Thanks for calling!")
+    calls = []
+
+    async def synthesize():
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return b"\xff" * 800
+
+    async def main():
+        mapped = await asyncio.gather(*(cache.get_or_synthesize(key, synthesize) for _ in range(5)))
+        sizes = [len(m) for m in mapped]
+        for m in mapped:
+            m.close()
+        return sizes
+
+    assert asyncio.run(main()) == [800] * 5
+    assert calls == [key]
+
+
+def test_agent_utterances_are_the_enabled_fixed_lines_once_each():
+    agent = {
+        "initialMessage": "Hi, this is Ava.",
+        "callTransferEnabled": False,
+        "callTransferMessage": "Transferring you now.",
+        "calendarBookingEnabled": True,
+        "bookingConfirmationMessage": "Hi, this is Ava.",
+    }
+    assert agent_utterances(agent) == ["Hi, this is Ava."]
+    assert cache_key("rachel", "hi") != cache_key("rachel", "hi", settings={"stability": 0.5})